@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
 MIDDLEWARE = [
+    'taskFlow.middleware.QueryProfilerMiddleware', # Першим - щоб враховувати запити всіх інших middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,9 +99,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # atomic() бере блокування запису на BEGIN (oids/sqlite_profile.py)
+            'timeout': 5,                     # Скільки секунд SQLite чекає, поки базу звільнить інший запис
+        },
+        'CONN_MAX_AGE': 600,                  # З'єднання живе між запитами (None - без обмеження, 0 - нове на кожен запит)
+        'CONN_HEALTH_CHECKS': True,           # Перевіряти збережене з'єднання перед повторним використанням
     }
 }
 
+# Прагми, що застосовуються до кожного нового з'єднання SQLite (oids/sqlite_profile.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',                    # Читання не блокуються записом
+    'synchronous': 'NORMAL',                  # У режимі WAL - без fsync на кожен коміт, цілісність зберігається
+    'mmap_size': 256 * 1024 * 1024,           # Читати файл бази через пам'ять (байт)
+    'cache_size': -64 * 1024,                 # Кеш сторінок з'єднання (від'ємне - у КіБ)
+    'temp_store': 'MEMORY',                   # Тимчасові таблиці сортувань - у пам'яті
+}
+SQLITE_BUSY_RETRIES = 5                       # Спроб транзакції, якщо база зайнята і після timeout
+SQLITE_BUSY_RETRY_DELAY = 0.05                # Базова пауза між спробами (с), подвоюється з кожною спробою
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,5 +164,54 @@ LOGIN_URL = '/accounts/login/' # Явно вказуємо URL для сторі
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Фонові експорти в Excel (oids/export_jobs.py)
+EXPORT_JOBS_DIR = BASE_DIR / 'export_cache'   # Кеш готових файлів
+EXPORT_JOBS_TTL = 600                         # Скільки секунд готовий файл віддається з кешу
+EXPORT_JOBS_MAX_WORKERS = 2                   # Потоків у пулі експорту
+EXPORT_JOBS_STALE_AFTER = 1800                # Після скількох секунд незавершене завдання вважається "зависшим"
+EXPORT_JOBS_SYNC = False                      # True - формувати файл одразу в запиті (тести, налагодження)
+
+# Потоковий імпорт CSV (manage.py import_real_data)
+IMPORT_CHECKPOINT_DIR = BASE_DIR / 'import_checkpoints'  # Контрольні точки для продовження перерваного імпорту
+IMPORT_CHUNK_SIZE = 2000                      # Рядків CSV на одну транзакцію (і контрольну точку)
+IMPORT_BATCH_SIZE = 500                       # Розмір пакета bulk_create/bulk_update
+
+# Кеш Django. Довідники для форм (oids/reference_cache.py) за замовчуванням - у пам'яті процесу;
+# для кількох процесів (gunicorn workers) - спільний файловий кеш:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'django_cache'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+REFERENCE_CACHE_ALIAS = 'default'             # Який кеш використовують довідники
+REFERENCE_CACHE_TIMEOUT = 3600                # Скільки секунд живе запис довідника (скидається й сигналами)
+
+# Кеш AJAX-списків ОІД військової частини (oids/unit_payload_cache.py)
+UNIT_PAYLOAD_CACHE_ALIAS = 'default'          # Який кеш зберігає версії ВЧ та готові JSON-відповіді
+UNIT_PAYLOAD_CACHE_TIMEOUT = 3600             # Скільки секунд живе готова відповідь (версія ВЧ - без обмеження)
+
+# Історія змін моделей (oids/history.py, manage.py compact_history)
+HISTORY_RETENTION_DAYS = {                    # Скільки днів зберігати історію моделі ('app.Model': днів; нема - без обмеження)
+    # 'oids.OIDStatusChange': 3 * 365,
+}
+
+# Пагінація за ключем сортування (oids/pagination.py)
+KEYSET_COUNT_CACHE_TIMEOUT = 300              # Скільки секунд кешується точна кількість записів (count='cached')
+KEYSET_COUNT_ESTIMATE_LIMIT = 10000           # До скількох записів рахувати при count='estimate'
+
+# Профілювання запитів (taskFlow.middleware.QueryProfilerMiddleware, звіт - /tasks/profiling/)
+QUERY_PROFILER_ENABLED = False                # Увімкнути збір статистики
+QUERY_PROFILER_BUFFER_SIZE = 500              # Скільки останніх запитів тримати в пам'яті процесу
+QUERY_PROFILER_SAMPLE_RATE = 1.0              # Частка запитів, що профілюються (0.1 - кожен десятий)
+QUERY_PROFILER_DUPLICATE_THRESHOLD = 3        # З якої кількості однакових SQL вважати повтор (N+1)
+
+# Інструментування машини статусів (oids/instrumentation.py): приймачі подій, таймінгів та лічильників.
+# Налагодження: {'class': 'oids.instrumentation.LoggingSink', 'level': 'DEBUG', 'metrics': True}
+# Метрики в пам'яті процесу: {'class': 'oids.instrumentation.AggregateSink'}
+INSTRUMENTATION_SINKS = [
+    {'class': 'oids.instrumentation.LoggingSink', 'level': 'WARNING'},
+]
+
 # from import_export.formats.base_formats import CSV, XLSX
 # IMPORT_FORMATS = [CSV, XLSX]
\ No newline at end of file
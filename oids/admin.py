@@ -11,11 +11,31 @@ from .models import (
     AttestationRegistration, AttestationResponse,
     WorkCompletionRegistration, WorkCompletionResponse,
     Declaration, DeclarationRegistration,
-    OIDProcess, OIDProcessStepInstance, ProcessTemplate, ProcessStep, OIDStatusChoices
+    OIDProcess, OIDProcessStepInstance, ProcessTemplate, ProcessStep, OIDStatusChoices,
+    Holiday
 )
+from . import search_index
 
 
 
+class SearchIndexAdminMixin:
+    """
+    Пошук у списку адмінки через повнотекстовий індекс (oids/search_index.py)
+    замість LIKE по search_fields. Як і стандартний пошук, кожне слово запиту
+    має знайтися; якщо є слово коротше за 3 символи - стандартний пошук.
+    Застосовується лише там, де індекс покриває всі search_fields.
+    """
+    search_index_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search_term.split()
+        if terms and all(len(term) >= search_index.MIN_QUERY_LENGTH for term in terms):
+            subquery = search_index.ids_subquery(self.search_index_kind, search_term, all_terms=True)
+            if subquery is not None:
+                return queryset.filter(pk__in=subquery), False
+        return super().get_search_results(request, queryset, search_term)
+
+
 @admin.register(TerritorialManagement)
 class TerritorialManagementAdmin(admin.ModelAdmin):
     list_display = ('code', 'name')
@@ -29,7 +49,8 @@ class UnitGroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Unit)
-class UnitAdmin(SimpleHistoryAdmin):
+class UnitAdmin(SearchIndexAdminMixin, SimpleHistoryAdmin):
+    search_index_kind = search_index.UNIT
     list_display = ('code', 'name', 'city', 'territorial_management')
     search_fields = ('code', 'name', 'city')
     list_filter = ('territorial_management', 'unit_groups')
@@ -313,7 +334,8 @@ class PersonAdmin(admin.ModelAdmin):
 
 
 @admin.register(WorkRequest)
-class WorkRequestAdmin(SimpleHistoryAdmin):
+class WorkRequestAdmin(SearchIndexAdminMixin, SimpleHistoryAdmin):
+    search_index_kind = search_index.WORK_REQUEST
     list_display = ('incoming_number', 'incoming_date', 'unit', 'status', 'created_at')
     list_filter = ('status', 'unit', 'incoming_date')
     search_fields = ('incoming_number', 'unit__code', 'unit__name')
@@ -326,6 +348,13 @@ class WorkRequestItemAdmin(SimpleHistoryAdmin):
     list_filter = ('work_type', 'status', 'request__unit')
     search_fields = ('oid__cipher', 'request__incoming_number')
 
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name', 'is_working_day')
+    list_filter = ('is_working_day',)
+    search_fields = ('name',)
+    date_hierarchy = 'date'
+
 @admin.register(DocumentType)
 class DocumentTypeAdmin(admin.ModelAdmin):
     list_display = ('name', 'oid_type', 'work_type', 'sort_order', 'is_active', 'has_expiration', 'duration_months')
@@ -334,7 +363,8 @@ class DocumentTypeAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     
 @admin.register(Document)
-class DocumentAdmin(SimpleHistoryAdmin):
+class DocumentAdmin(SearchIndexAdminMixin, SimpleHistoryAdmin):
+    search_index_kind = search_index.DOCUMENT
     list_display = (
         'document_number', 
         'document_type', 
@@ -7,4 +7,5 @@ class OidsConfig(AppConfig):
 
     def ready(self):
         import oids.signals # Імпортуємо наш файл з сигналами
+        import oids.sqlite_profile # Прагми SQLite для нових з'єднань
         
\ No newline at end of file
@@ -0,0 +1,359 @@
+# oids/benchmarks.py
+"""
+Бенчмарки списків, дашбордів, AJAX та експортів додатку oids.
+
+- seed_benchmark_data() - синтетичний набір даних: довідники з populate_data,
+  далі bulk_create тисяч ВЧ, десятків тисяч ОІД, документів та елементів заявок.
+- BENCHMARK_ENDPOINTS - перелік URL з oids/urls.py з бюджетом SQL-запитів.
+- run_benchmarks() - кількість запитів, час та пікова пам'ять для кожного URL.
+
+Запуск: python manage.py benchmark_views (окрема тестова БД, результат у JSON);
+бюджети перевіряються тестами oids/tests/test_query_budgets.py.
+"""
+import datetime
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .document_roles import invalidate_document_roles
+from .reference_cache import invalidate_reference_cache
+from .models import (
+    Unit, TerritorialManagement, OID, Person, DocumentType, Document, WorkRequest, WorkRequestItem,
+    Trip, AttestationRegistration, AttestationResponse, TechnicalTask,
+    OIDTypeChoices, OIDStatusChoices, SecLevelChoices, PeminSubTypeChoices, WorkTypeChoices,
+    WorkRequestStatusChoices, DocumentReviewResultChoices,
+)
+from .services import refresh_oid_validity, refresh_processing_snapshots
+
+
+BENCHMARK_SIZES = {
+    # Для тестів бюджетів - секунди на наповнення
+    'small': {'units': 20, 'oids_per_unit': 5, 'documents_per_oid': 3, 'work_requests_per_unit': 2, 'items_per_request': 3},
+    # "Виробничий" масштаб: 2000 ВЧ, 20 000 ОІД, 60 000 документів, 24 000 елементів заявок
+    'large': {'units': 2000, 'oids_per_unit': 10, 'documents_per_oid': 3, 'work_requests_per_unit': 3, 'items_per_request': 4},
+}
+
+BENCHMARK_START_DATE = datetime.date(2021, 1, 1)
+BULK_BATCH_SIZE = 2000
+
+# Типи документів з populate_data, що мають значення для статусів і термінів дії
+SEED_DOCUMENT_TYPE_NAMES = ["Акт атестації комплексу ТЗІ", "Висновок ІК", "Припис на експлуатацію"]
+
+
+def _random_date(rng, start=BENCHMARK_START_DATE, days=4 * 365):
+    return start + datetime.timedelta(days=rng.randrange(days))
+
+
+def seed_benchmark_data(size='small', seed=42, **overrides):
+    """
+    Наповнює БД синтетичними даними. Довідники (типи документів, виконавці, ТУ,
+    базові ВЧ/ОІД/заявки) - командою populate_data, масові дані - bulk_create.
+    Сигнали при bulk_create не спрацьовують, тож знімки OIDValiditySnapshot
+    перебудовуються, а кеш довідника ВЧ скидається наприкінці. Повертає кількість створених записів.
+    """
+    from .management.commands.populate_data import Command as PopulateDataCommand
+
+    params = {**BENCHMARK_SIZES[size], **overrides}
+    rng = random.Random(seed)
+
+    PopulateDataCommand(stdout=StringIO()).handle()
+    # populate_data не створює тип "Акт завершення" - без нього список АЗР лише перенаправляє
+    DocumentType.objects.get_or_create(
+        name="Акт завершення робіт", oid_type='СПІЛЬНИЙ', work_type=WorkTypeChoices.ATTESTATION,
+        defaults={'has_expiration': False},
+    )
+    invalidate_document_roles()
+
+    doc_types = list(DocumentType.objects.filter(name__in=SEED_DOCUMENT_TYPE_NAMES))
+    persons = list(Person.objects.all())
+    territorial_managements = list(TerritorialManagement.objects.all())
+    cities = ['Київ', 'Львів', 'Одеса', 'Дніпро', 'Харків', 'Житомир', 'Рівне', 'Полтава']
+
+    units = Unit.objects.bulk_create([
+        Unit(
+            code=f"B{i:05d}", name=f"Військова частина B{i:05d}", city=rng.choice(cities),
+            distance_from_gu=rng.randrange(10, 800), territorial_management=rng.choice(territorial_managements),
+        )
+        for i in range(params['units'])
+    ], batch_size=BULK_BATCH_SIZE)
+
+    oid_statuses = [OIDStatusChoices.ACTIVE, OIDStatusChoices.ACTIVE, OIDStatusChoices.RECEIVED_REQUEST, OIDStatusChoices.NEW]
+    oids = []
+    for unit in units:
+        for j in range(params['oids_per_unit']):
+            is_pemin = j % 2 == 0
+            oids.append(OID(
+                unit=unit,
+                oid_type=OIDTypeChoices.PEMIN if is_pemin else OIDTypeChoices.SPEAK,
+                pemin_sub_type=PeminSubTypeChoices.AS1_23PORTABLE if is_pemin else PeminSubTypeChoices.SPEAKSUBTYPE,
+                cipher=f"{unit.code}/{j:02d}",
+                full_name=f"ОІД {j} частини {unit.code}",
+                room=f"к. {100 + j}",
+                status=rng.choice(oid_statuses),
+                sec_level=rng.choice([SecLevelChoices.S, SecLevelChoices.TS]),
+            ))
+    oids = OID.objects.bulk_create(oids, batch_size=BULK_BATCH_SIZE)
+
+    documents = []
+    for oid in oids:
+        for k in range(params['documents_per_oid']):
+            doc_type = doc_types[k % len(doc_types)]
+            work_date = _random_date(rng)
+            documents.append(Document(
+                oid=oid, document_type=doc_type, document_number=f"27/14-{oid.pk}-{k}",
+                work_date=work_date, doc_process_date=work_date + datetime.timedelta(days=rng.randrange(1, 20)),
+                expiration_date=work_date + relativedelta(months=doc_type.duration_months) if doc_type.has_expiration else None,
+                author=rng.choice(persons),
+            ))
+    documents = Document.objects.bulk_create(documents, batch_size=BULK_BATCH_SIZE)
+
+    oids_by_unit = {}
+    for oid in oids:
+        oids_by_unit.setdefault(oid.unit_id, []).append(oid)
+    item_statuses = [
+        WorkRequestStatusChoices.PENDING, WorkRequestStatusChoices.IN_PROGRESS,
+        WorkRequestStatusChoices.TO_SEND_VCH, WorkRequestStatusChoices.COMPLETED,
+    ]
+    work_requests = WorkRequest.objects.bulk_create([
+        WorkRequest(
+            unit=unit, incoming_number=f"{unit.code}/{n}", incoming_date=_random_date(rng),
+            status=rng.choice(item_statuses),
+        )
+        for unit in units for n in range(params['work_requests_per_unit'])
+    ], batch_size=BULK_BATCH_SIZE)
+    items = []
+    for work_request in work_requests:
+        unit_oids = oids_by_unit[work_request.unit_id]
+        for oid in rng.sample(unit_oids, min(params['items_per_request'], len(unit_oids))):
+            items.append(WorkRequestItem(
+                request=work_request, oid=oid, status=rng.choice(item_statuses),
+                work_type=rng.choice([WorkTypeChoices.ATTESTATION, WorkTypeChoices.IK]),
+            ))
+    items = WorkRequestItem.objects.bulk_create(items, batch_size=BULK_BATCH_SIZE)
+
+    # Відрядження: одне на кожні 20 ВЧ
+    trips = []
+    for start in range(0, len(units), 20):
+        trip_units = units[start:start + 20]
+        trip = Trip.objects.create(
+            start_date=_random_date(rng), end_date=_random_date(rng), purpose="Бенчмарк")
+        trip.units.set(trip_units)
+        trip.oids.set([oid for unit in trip_units for oid in oids_by_unit[unit.pk]])
+        trip.work_requests.set([wr for wr in work_requests if wr.unit_id in {unit.pk for unit in trip_units}])
+        trip.persons.set(persons[:2])
+        trips.append(trip)
+
+    # Реєстрація актів атестації: відправка на кожні 10 ВЧ, половина - з відповіддю
+    registrations = []
+    act_documents = [doc for doc in documents if doc.document_type.name == SEED_DOCUMENT_TYPE_NAMES[0]]
+    for index, start in enumerate(range(0, len(act_documents), 10 * params['oids_per_unit'])):
+        registration = AttestationRegistration.objects.create(
+            outgoing_letter_number=f"АА-{index}", outgoing_letter_date=_random_date(rng), sent_by=persons[0])
+        chunk = act_documents[start:start + 10 * params['oids_per_unit']]
+        registration.units.set({doc.oid.unit_id for doc in chunk})
+        Document.objects.filter(pk__in=[doc.pk for doc in chunk]).update(attestation_registration_sent=registration)
+        registrations.append(registration)
+    AttestationResponse.objects.bulk_create([
+        AttestationResponse(
+            attestation_registration_sent=registration, response_letter_number=f"ДССЗЗІ-{registration.pk}",
+            response_letter_date=registration.outgoing_letter_date + datetime.timedelta(days=30),
+            received_by=persons[0],
+        )
+        for registration in registrations[::2]
+    ])
+
+    TechnicalTask.objects.bulk_create([
+        TechnicalTask(
+            oid=oid, input_number=f"ТЗ-{oid.pk}", input_date=_random_date(rng),
+            read_till_date=_random_date(rng), review_result=DocumentReviewResultChoices.READ,
+        )
+        for oid in oids[::5]
+    ], batch_size=BULK_BATCH_SIZE)
+
+    all_oid_ids = list(OID.objects.values_list('pk', flat=True))
+    for start in range(0, len(all_oid_ids), 1000):
+        refresh_oid_validity(all_oid_ids[start:start + 1000])
+    # Документи створено через bulk_create (без сигналів) - знімки дат опрацювання явно
+    for start in range(0, len(items), 1000):
+        refresh_processing_snapshots([item.pk for item in items[start:start + 1000]])
+    invalidate_reference_cache(Unit)
+
+    return {
+        'units': Unit.objects.count(),
+        'oids': OID.objects.count(),
+        'documents': Document.objects.count(),
+        'work_requests': WorkRequest.objects.count(),
+        'work_request_items': WorkRequestItem.objects.count(),
+        'trips': len(trips),
+        'attestation_registrations': len(registrations),
+    }
+
+
+def get_benchmark_context():
+    """Ідентифікатори "типових" об'єктів для URL з параметрами (найбільша ВЧ, ОІД з документами тощо)."""
+    unit = Unit.objects.order_by('-pk').first()
+    oid = OID.objects.filter(unit=unit).order_by('pk').first()
+    oid_ids = list(OID.objects.filter(unit=unit).values_list('pk', flat=True))
+    trip = Trip.objects.order_by('-pk').first()
+    return {
+        'unit_id': unit.pk,
+        'unit_ids': list(Unit.objects.order_by('-pk').values_list('pk', flat=True)[:5]),
+        'oid_id': oid.pk,
+        'oid_ids': oid_ids,
+        'trip_id': trip.pk if trip else None,
+        'work_request_id': WorkRequest.objects.filter(unit=unit).order_by('pk').values_list('pk', flat=True).first(),
+    }
+
+
+# Бюджет - максимально допустима кількість SQL-запитів на наборі 'small'
+# (разом із сесією, користувачем та Person з middleware). None - лише вимірювання:
+# processing_control, technical_task_control, technical_task_list, trip_list та azr_document_list
+# поки роблять запити на кожен рядок (N+1), їхня кількість росте з даними.
+BENCHMARK_ENDPOINTS = [
+    # --- Дашборди ---
+    {'name': 'main_dashboard', 'kind': 'dashboard', 'url': 'oids:main_dashboard', 'params': lambda ctx: {'unit': ctx['unit_id']}, 'budget': 8},
+    {'name': 'oid_detail', 'kind': 'dashboard', 'url': 'oids:oid_detail_view_name', 'args': lambda ctx: [ctx['oid_id']], 'budget': 19},
+    {'name': 'processing_control', 'kind': 'dashboard', 'url': 'oids:processing_control_dashboard', 'budget': None},
+    {'name': 'technical_task_control', 'kind': 'dashboard', 'url': 'oids:technical_task_control', 'budget': None},
+    {'name': 'summary_hub', 'kind': 'dashboard', 'url': 'oids:summary_information_hub', 'budget': 5},
+    # --- Списки ---
+    {'name': 'oid_list', 'kind': 'list', 'url': 'oids:list_oids', 'budget': 9},
+    {'name': 'document_list', 'kind': 'list', 'url': 'oids:list_documents', 'budget': 10},
+    {'name': 'unit_list', 'kind': 'list', 'url': 'oids:list_units', 'budget': 10},
+    {'name': 'work_request_list', 'kind': 'list', 'url': 'oids:list_work_requests', 'budget': 9},
+    {'name': 'work_request_detail', 'kind': 'list', 'url': 'oids:work_request_detail', 'args': lambda ctx: [ctx['work_request_id']], 'budget': 7},
+    {'name': 'trip_list', 'kind': 'list', 'url': 'oids:list_trips', 'budget': None},
+    {'name': 'technical_task_list', 'kind': 'list', 'url': 'oids:list_technical_tasks', 'budget': None},
+    {'name': 'registered_acts_list', 'kind': 'list', 'url': 'oids:list_registered_acts', 'budget': 7},
+    {'name': 'trip_result_list', 'kind': 'list', 'url': 'oids:list_trip_results_for_units', 'budget': 6},
+    {'name': 'oid_status_change_list', 'kind': 'list', 'url': 'oids:list_oid_status_changes', 'budget': 10},
+    {'name': 'attestation_registration_list', 'kind': 'list', 'url': 'oids:list_attestation_registrations', 'budget': 14},
+    {'name': 'attestation_response_list', 'kind': 'list', 'url': 'oids:list_attestation_responses', 'budget': 14},
+    {'name': 'azr_document_list', 'kind': 'list', 'url': 'oids:list_azr_documents', 'budget': None},
+    {'name': 'territorial_management_list', 'kind': 'list', 'url': 'oids:list_territorial_managements', 'budget': 9},
+    {'name': 'unit_group_list', 'kind': 'list', 'url': 'oids:list_unit_groups', 'budget': 8},
+    {'name': 'document_type_list', 'kind': 'list', 'url': 'oids:list_document_types', 'budget': 7},
+    {'name': 'person_list', 'kind': 'list', 'url': 'oids:list_persons', 'budget': 7},
+    # --- AJAX ---
+    {'name': 'ajax_oids_for_unit', 'kind': 'ajax', 'url': 'oids:ajax_load_oids_for_unit', 'params': lambda ctx: {'unit_id': ctx['unit_id']}, 'budget': 6},
+    {'name': 'ajax_oids_categorized', 'kind': 'ajax', 'url': 'oids:ajax_load_oids_categorized', 'params': lambda ctx: {'unit_id': ctx['unit_id']}, 'budget': 6},
+    {'name': 'ajax_oids_for_multiple_units', 'kind': 'ajax', 'url': 'oids:ajax_load_oids_for_multiple_units', 'params': lambda ctx: {'unit_ids[]': ctx['unit_ids']}, 'budget': 6},
+    {'name': 'ajax_work_requests_for_oids', 'kind': 'ajax', 'url': 'oids:ajax_load_work_requests_for_oids', 'params': lambda ctx: {'oid_ids[]': ctx['oid_ids']}, 'budget': 6},
+    {'name': 'ajax_work_request_items_for_oid', 'kind': 'ajax', 'url': 'oids:ajax_load_work_request_items_for_oid', 'params': lambda ctx: {'oid_id': ctx['oid_id']}, 'budget': 6},
+    {'name': 'ajax_document_types_for_oid', 'kind': 'ajax', 'url': 'oids:ajax_load_document_types_for_oid_and_work', 'params': lambda ctx: {'oid_id': ctx['oid_id'], 'work_type': WorkTypeChoices.ATTESTATION}, 'budget': 7},
+    {'name': 'ajax_oid_current_status', 'kind': 'ajax', 'url': 'oids:ajax_get_oid_current_status', 'params': lambda ctx: {'oid_id': ctx['oid_id']}, 'budget': 6},
+    {'name': 'ajax_attestation_acts_for_oid', 'kind': 'ajax', 'url': 'oids:ajax_load_attestation_acts_for_oid', 'params': lambda ctx: {'oid_id': ctx['oid_id']}, 'budget': 6},
+    {'name': 'ajax_attestation_acts_for_oids', 'kind': 'ajax', 'url': 'oids:ajax_load_attestation_acts_for_multiple_oids', 'params': lambda ctx: {'oid_ids[]': ctx['oid_ids']}, 'budget': 6},
+    {'name': 'ajax_units_for_trip', 'kind': 'ajax', 'url': 'oids:ajax_load_units_for_trip', 'params': lambda ctx: {'trip_id': ctx['trip_id']}, 'budget': 7},
+    {'name': 'ajax_oids_for_trip_units', 'kind': 'ajax', 'url': 'oids:ajax_load_oids_for_trip_units', 'params': lambda ctx: {'trip_id': ctx['trip_id'], 'unit_ids[]': ctx['unit_ids']}, 'budget': 7},
+    {'name': 'ajax_documents_for_trip_oids', 'kind': 'ajax', 'url': 'oids:ajax_load_documents_for_trip_oids', 'params': lambda ctx: {'trip_id': ctx['trip_id'], 'oid_ids[]': ctx['oid_ids']}, 'budget': 8},
+    # --- Експорти в Excel (формуються синхронно, без кешу) ---
+    {'name': 'oid_list_export', 'kind': 'export', 'url': 'oids:list_oids', 'params': lambda ctx: {'export': 'excel'}, 'budget': 10},
+    {'name': 'document_list_export', 'kind': 'export', 'url': 'oids:list_documents', 'params': lambda ctx: {'export': 'excel'}, 'budget': 11},
+    {'name': 'work_request_list_export', 'kind': 'export', 'url': 'oids:list_work_requests', 'params': lambda ctx: {'export': 'excel'}, 'budget': 7},
+    {'name': 'technical_task_list_export', 'kind': 'export', 'url': 'oids:list_technical_tasks', 'params': lambda ctx: {'export': 'excel'}, 'budget': 6},
+    {'name': 'attestation_registration_list_export', 'kind': 'export', 'url': 'oids:list_attestation_registrations', 'params': lambda ctx: {'export': 'excel'}, 'budget': 17},
+    {'name': 'attestation_response_list_export', 'kind': 'export', 'url': 'oids:list_attestation_responses', 'params': lambda ctx: {'export': 'excel'}, 'budget': 16},
+]
+
+
+def get_endpoint(name):
+    for endpoint in BENCHMARK_ENDPOINTS:
+        if endpoint['name'] == name:
+            return endpoint
+    raise KeyError(name)
+
+
+def _get(client, endpoint, path, params):
+    """Один запит; експорти - синхронно у власний тимчасовий каталог (щоб не віддавати з кешу)."""
+    if endpoint['kind'] != 'export':
+        response = client.get(path, params)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    jobs_dir = tempfile.mkdtemp(prefix='benchmark_export_')
+    try:
+        with override_settings(EXPORT_JOBS_SYNC=True, EXPORT_JOBS_DIR=jobs_dir):
+            response = client.get(path, params)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            if response.streaming:
+                response.close()
+        return response, body
+    finally:
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+
+def measure_endpoint(client, endpoint, context, repeat=3, measure_memory=True):
+    """
+    Вимірює один URL: прогрів, repeat прогонів (береться найкращий час),
+    кількість SQL (з останнього прогону) та пікова пам'ять (окремий прогін з tracemalloc).
+    """
+    path = reverse(endpoint['url'], args=endpoint.get('args', lambda ctx: [])(context))
+    params = endpoint.get('params', lambda ctx: {})(context)
+
+    _get(client, endpoint, path, params)  # прогрів: реєстр ролей, шаблони
+
+    best_seconds = None
+    for _ in range(max(repeat, 1)):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response, body = _get(client, endpoint, path, params)
+            seconds = time.perf_counter() - started
+        # Рахуємо одразу: наступний запит поза контекстом очистить журнал (reset_queries)
+        query_count = len(queries)
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    peak_memory_kb = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            _get(client, endpoint, path, params)
+            peak_memory_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    budget = endpoint.get('budget')
+    return {
+        'name': endpoint['name'],
+        'kind': endpoint['kind'],
+        'path': path,
+        'status': response.status_code,
+        'query_count': query_count,
+        'wall_ms': round(best_seconds * 1000, 2),
+        'peak_memory_kb': peak_memory_kb,
+        'response_bytes': len(body),
+        'budget': budget,
+        'over_budget': budget is not None and query_count > budget,
+    }
+
+
+def run_benchmarks(client, context, names=None, repeat=3, measure_memory=True):
+    endpoints = [endpoint for endpoint in BENCHMARK_ENDPOINTS if not names or endpoint['name'] in names]
+    return [measure_endpoint(client, endpoint, context, repeat=repeat, measure_memory=measure_memory) for endpoint in endpoints]
+
+
+def compare_results(previous, current, slowdown_ratio=1.2):
+    """
+    Порівнює два прогони (списки результатів) по назві URL.
+    Регресія - більше SQL-запитів або час, гірший за slowdown_ratio.
+    """
+    previous_by_name = {result['name']: result for result in previous}
+    regressions = []
+    for result in current:
+        old = previous_by_name.get(result['name'])
+        if old is None:
+            continue
+        if result['query_count'] > old['query_count']:
+            regressions.append((result['name'], 'query_count', old['query_count'], result['query_count']))
+        if old['wall_ms'] and result['wall_ms'] > old['wall_ms'] * slowdown_ratio:
+            regressions.append((result['name'], 'wall_ms', old['wall_ms'], result['wall_ms']))
+    return regressions
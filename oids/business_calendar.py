@@ -0,0 +1,221 @@
+# oids/business_calendar.py
+"""
+Календар робочих днів з урахуванням святкових днів (модель Holiday).
+
+Замість покрокового перебору днів (колишній цикл add_working_days) календар один раз
+будує для діапазону років масив накопичених порядкових номерів робочих днів:
+
+    cumulative[i] - кількість робочих днів у [start, start + i] включно;
+    working_offsets[k] - зміщення (від start) (k+1)-го робочого дня діапазону.
+
+Тоді "N-й робочий день після дати" - working_offsets[cumulative[i] + N - 1], а
+"робочих днів між датами" - різниця двох cumulative: обидва запити - O(1).
+Діапазон розширюється автоматично, якщо дата виходить за його межі.
+
+Вихідні - субота та неділя; записи Holiday додають неробочі дні
+або (is_working_day=True) робочі дні, перенесені на вихідні.
+
+Кеш тримається в пам'яті процесу разом зі спільною версією Holiday
+(oids/reference_cache.py): сигнали post_save/post_delete (oids/signals.py) через
+invalidate_business_calendar() змінюють версію, і інші процеси перебудовують календар.
+Поки зміна Holiday не закомічена, календар будується з БД і не кешується.
+"""
+import datetime
+import threading
+
+from .reference_cache import invalidate_model_version, model_version
+
+# Скільки років до/після поточного покриває календар при першій побудові
+DEFAULT_YEARS_BEFORE = 5
+DEFAULT_YEARS_AFTER = 5
+
+HOLIDAY = 'oids.Holiday'
+
+_lock = threading.Lock()
+_calendar = None  # (версія Holiday, календар)
+
+
+class BusinessCalendar:
+    """Незмінний календар робочих днів для [start, end] (цілі роки)."""
+
+    def __init__(self, first_year, last_year, holidays=(), working_days=()):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.start = datetime.date(first_year, 1, 1)
+        self.end = datetime.date(last_year, 12, 31)
+        self.holidays = frozenset(holidays)
+        self.working_days = frozenset(working_days)
+
+        start_ordinal = self.start.toordinal()
+        start_weekday = self.start.weekday()
+        holiday_offsets = {day.toordinal() - start_ordinal for day in self.holidays}
+        working_offsets_extra = {day.toordinal() - start_ordinal for day in self.working_days}
+
+        cumulative = []
+        working_offsets = []
+        count = 0
+        for offset in range(self.end.toordinal() - start_ordinal + 1):
+            if offset in working_offsets_extra:
+                is_working = True
+            elif offset in holiday_offsets:
+                is_working = False
+            else:
+                is_working = (start_weekday + offset) % 7 < 5  # 0-Пн ... 4-Пт
+            if is_working:
+                count += 1
+                working_offsets.append(offset)
+            cumulative.append(count)
+        self._start_ordinal = start_ordinal
+        self._cumulative = cumulative
+        self._working_offsets = working_offsets
+
+    def covers(self, day):
+        return self.start <= day <= self.end
+
+    def _offset(self, day):
+        return day.toordinal() - self._start_ordinal
+
+    def is_working_day(self, day):
+        offset = self._offset(day)
+        return self._cumulative[offset] - (self._cumulative[offset - 1] if offset else 0) == 1
+
+    def add_working_days(self, start_date, days):
+        """
+        N-й робочий день ПІСЛЯ start_date (сама start_date не рахується).
+        IndexError - якщо результат виходить за межі календаря.
+        """
+        index = self._cumulative[self._offset(start_date)] + days - 1
+        if index >= len(self._working_offsets):
+            raise IndexError(index)
+        return datetime.date.fromordinal(self._start_ordinal + self._working_offsets[index])
+
+    def working_days_between(self, start_date, end_date):
+        """Кількість робочих днів у (start_date, end_date]; від'ємна, якщо end_date < start_date."""
+        return self._cumulative[self._offset(end_date)] - self._cumulative[self._offset(start_date)]
+
+
+def _load_calendar(first_year, last_year):
+    from .models import Holiday
+
+    holidays, working_days = [], []
+    for day, is_working_day in Holiday.objects.filter(
+        date__year__gte=first_year, date__year__lte=last_year,
+    ).values_list('date', 'is_working_day'):
+        (working_days if is_working_day else holidays).append(day)
+    return BusinessCalendar(first_year, last_year, holidays, working_days)
+
+
+def get_business_calendar(*dates):
+    """
+    Календар, що покриває передані дати (з запасом у рік для відліку вперед).
+    Без дат - календар за замовчуванням (поточний рік ± DEFAULT_YEARS_*).
+    """
+    global _calendar
+    version = model_version(HOLIDAY)
+    if version is None:
+        # Незакомічені зміни Holiday - календар лише для цього виклику
+        return _load_calendar(*_year_range(dates))
+    calendar = _cached_calendar(version)
+    if calendar is not None and all(calendar.covers(day) for day in dates) \
+            and all(day.year < calendar.last_year for day in dates):
+        return calendar
+    with _lock:
+        calendar = _cached_calendar(version)
+        first_year, last_year = _year_range(dates)
+        if calendar is not None:
+            first_year = min(first_year, calendar.first_year)
+            last_year = max(last_year, calendar.last_year)
+        if calendar is None or first_year < calendar.first_year or last_year > calendar.last_year:
+            calendar = _load_calendar(first_year, last_year)
+            _calendar = (version, calendar)
+        return calendar
+
+
+def _cached_calendar(version):
+    cached = _calendar
+    return cached[1] if cached is not None and cached[0] == version else None
+
+
+def _year_range(dates):
+    this_year = datetime.date.today().year
+    years = [day.year for day in dates]
+    first_year = min([this_year - DEFAULT_YEARS_BEFORE] + years)
+    # Рік запасу після найпізнішої дати - щоб "N робочих днів після" не виходило за межі
+    last_year = max([this_year + DEFAULT_YEARS_AFTER] + [year + 1 for year in years])
+    return first_year, last_year
+
+
+def invalidate_business_calendar():
+    """Скидає кеш (у всіх процесах); наступне звернення перебудує календар з урахуванням Holiday."""
+    global _calendar
+    invalidate_model_version(HOLIDAY)
+    with _lock:
+        _calendar = None
+
+
+def _validate(start_date, days_to_add):
+    if not isinstance(start_date, datetime.date):
+        raise ValueError("start_date має бути об'єктом datetime.date")
+    if not isinstance(days_to_add, int) or days_to_add <= 0:
+        # Для "наступного робочого дня" - days_to_add=1
+        raise ValueError("days_to_add має бути позитивним цілим числом")
+
+
+def add_working_days(start_date, days_to_add):
+    """
+    Додає вказану кількість робочих днів до початкової дати.
+    start_date - це дата, ПІСЛЯ якої починається відлік.
+    days_to_add - кількість робочих днів, які потрібно додати.
+    Функція повертає N-й робочий день після start_date (вихідні та святкові дні не рахуються).
+    """
+    _validate(start_date, days_to_add)
+    if isinstance(start_date, datetime.datetime):
+        start_date = start_date.date()
+    calendar = get_business_calendar(start_date)
+    try:
+        return calendar.add_working_days(start_date, days_to_add)
+    except IndexError:
+        # Дуже велике N - розширюємо календар з запасом
+        years_needed = days_to_add // 200 + 1
+        calendar = get_business_calendar(start_date, start_date.replace(year=start_date.year + years_needed, day=1))
+        return calendar.add_working_days(start_date, days_to_add)
+
+
+def add_working_days_many(start_dates, days_to_add):
+    """
+    Пакетний варіант add_working_days: список дат -> список дат.
+    days_to_add - одне число для всіх дат або послідовність тієї ж довжини.
+    Календар отримується один раз на весь пакет.
+    """
+    start_dates = [day.date() if isinstance(day, datetime.datetime) else day for day in start_dates]
+    if isinstance(days_to_add, int):
+        days_to_add = [days_to_add] * len(start_dates)
+    else:
+        days_to_add = list(days_to_add)
+        if len(days_to_add) != len(start_dates):
+            raise ValueError("days_to_add має містити по одному значенню на дату")
+    for start_date, days in zip(start_dates, days_to_add):
+        _validate(start_date, days)
+    if not start_dates:
+        return []
+
+    calendar = get_business_calendar(min(start_dates), max(start_dates))
+    try:
+        return [calendar.add_working_days(day, days) for day, days in zip(start_dates, days_to_add)]
+    except IndexError:
+        return [add_working_days(day, days) for day, days in zip(start_dates, days_to_add)]
+
+
+def working_days_between(start_date, end_date):
+    """Кількість робочих днів після start_date до end_date включно (від'ємна, якщо end_date раніше)."""
+    if isinstance(start_date, datetime.datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime.datetime):
+        end_date = end_date.date()
+    return get_business_calendar(start_date, end_date).working_days_between(start_date, end_date)
+
+
+def is_working_day(day):
+    if isinstance(day, datetime.datetime):
+        day = day.date()
+    return get_business_calendar(day).is_working_day(day)
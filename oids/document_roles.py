@@ -0,0 +1,104 @@
+# oids/document_roles.py
+"""
+Реєстр "ролей" типів документів.
+
+Бізнес-логіка (Document.save, статуси WorkRequestItem, контроль опрацювання,
+форми) оперує не конкретними записами DocumentType, а їх ролями:
+"Акт атестації", "Висновок ІК", "АЗР", "Декларація", "Припис".
+Замість `DocumentType.objects.filter(name__icontains=...)` на кожному виклику
+реєстр один раз завантажує довідник і тримає в пам'яті процесу
+відповідність роль -> id типів документів.
+
+Реєстр прив'язаний до спільної версії DocumentType (oids/reference_cache.py):
+сигнали post_save/post_delete (oids/signals.py) через invalidate_document_roles()
+змінюють версію, і інші процеси перечитують довідник при наступному зверненні.
+Поки зміна DocumentType не закомічена, реєстр будується з БД і не кешується -
+після відкату в пам'яті не лишиться типів, яких немає в БД.
+"""
+import threading
+
+from .reference_cache import invalidate_model_version, model_version
+
+
+class DocumentRole:
+    ATTESTATION_ACT = 'attestation_act'
+    IK_CONCLUSION = 'ik_conclusion'
+    AZR_ACT = 'azr_act'
+    DECLARATION = 'declaration'
+    PRESCRIPTION = 'prescription'
+
+
+# Роль -> ключове слово в назві DocumentType (аналог name__icontains).
+# Висновок ІК - документ з терміном дії 20 місяців.
+DOCUMENT_ROLE_KEYWORDS = {
+    DocumentRole.ATTESTATION_ACT: 'Акт атестації',
+    DocumentRole.IK_CONCLUSION: 'Висновок',
+    DocumentRole.AZR_ACT: 'Акт завершення',
+    DocumentRole.DECLARATION: 'Декларація',
+    DocumentRole.PRESCRIPTION: 'Припис',
+}
+
+DOCUMENT_TYPE = 'oids.DocumentType'
+
+_lock = threading.Lock()
+_registry = None  # (версія DocumentType, реєстр)
+
+
+def _load_registry():
+    """
+    Завантажує довідник одним запитом. Для кожної ролі зберігає кортеж
+    екземплярів DocumentType у порядку Meta.ordering, тож перший елемент
+    відповідає колишньому `.filter(name__icontains=...).first()`.
+    """
+    from .models import DocumentType
+
+    registry = {role: [] for role in DOCUMENT_ROLE_KEYWORDS}
+    for doc_type in DocumentType.objects.all():
+        lowered_name = doc_type.name.lower()
+        for role, keyword in DOCUMENT_ROLE_KEYWORDS.items():
+            if keyword.lower() in lowered_name:
+                registry[role].append(doc_type)
+    return {role: tuple(doc_types) for role, doc_types in registry.items()}
+
+
+def _get_registry():
+    global _registry
+    version = model_version(DOCUMENT_TYPE)
+    if version is None:
+        return _load_registry()
+    cached = _registry
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        if _registry is None or _registry[0] != version:
+            _registry = (version, _load_registry())
+        return _registry[1]
+
+
+def invalidate_document_roles():
+    """Скидає кеш (у всіх процесах); наступне звернення перечитає довідник типів документів."""
+    global _registry
+    invalidate_model_version(DOCUMENT_TYPE)
+    with _lock:
+        _registry = None
+
+
+def get_role_types(role):
+    """Усі типи документів з цією роллю (кортеж, може бути порожнім)."""
+    return _get_registry()[role]
+
+
+def get_role_type(role):
+    """Основний (перший за сортуванням) тип документа для ролі або None."""
+    doc_types = get_role_types(role)
+    return doc_types[0] if doc_types else None
+
+
+def get_role_type_ids(role):
+    """Множина id типів документів з цією роллю - для document_type_id__in=..."""
+    return frozenset(doc_type.pk for doc_type in get_role_types(role))
+
+
+def has_role(document_type_id, role):
+    """Чи має тип документа з цим id задану роль."""
+    return document_type_id in get_role_type_ids(role)
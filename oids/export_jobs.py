@@ -0,0 +1,271 @@
+# oids/export_jobs.py
+"""
+Фонові завдання експорту в Excel з кешем результатів на диску.
+
+Великі експорти списків (ОІД, документи, реєстрація атестації) більше не
+формуються всередині запиту: view ставить завдання в локальний пул потоків
+і віддає сторінку очікування, яка опитує статус і завантажує файл, щойно він готовий.
+
+Результат зберігається у EXPORT_JOBS_DIR під ключем - відбитком
+(назва експорту + нормалізовані GET-параметри фільтрів/сортування + версія даних).
+Версія даних - максимальний history_id (django-simple-history) моделей, з яких
+будується файл, тож будь-яке збереження/видалення через ORM дає новий ключ.
+Зміни в обхід історії (queryset.update()) обмежені вікном актуальності EXPORT_JOBS_TTL.
+Ідентичний експорт у межах вікна віддається з кешу одразу.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.http import FileResponse, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+
+from .utils import XLSX_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Параметри, що не впливають на вміст файлу
+IGNORED_EXPORT_PARAMS = {'export', 'page', 'csrfmiddlewaretoken'}
+
+JOB_KEY_RE = re.compile(r'^[0-9a-f]{40}$')
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+_lock = threading.Lock()
+_executor = None
+_in_flight = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_jobs_dir():
+    path = Path(_setting('EXPORT_JOBS_DIR', Path(settings.BASE_DIR) / 'export_cache'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_setting('EXPORT_JOBS_MAX_WORKERS', 2),
+                thread_name_prefix='export-job',
+            )
+        return _executor
+
+
+def _model_version(model):
+    """Штамп версії даних однієї моделі (один агрегатний запит)."""
+    history = getattr(model, 'history', None)
+    if history is not None:
+        return history.aggregate(version=Max('history_id'))['version']
+    # Модель без історії - кількість записів, максимальний pk та час останнього оновлення
+    aggregates = {'count': Count('pk'), 'max_pk': Max('pk')}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        aggregates['updated_at'] = Max('updated_at')
+    return sorted((key, str(value)) for key, value in model._default_manager.aggregate(**aggregates).items())
+
+
+def data_version(models):
+    return [(model._meta.label, _model_version(model)) for model in models]
+
+
+def normalize_params(query_dict):
+    """GET-параметри без службових і порожніх значень, у стабільному порядку."""
+    normalized = []
+    for key in sorted(query_dict.keys()):
+        if key in IGNORED_EXPORT_PARAMS:
+            continue
+        values = sorted(value for value in query_dict.getlist(key) if value != '')
+        if values:
+            normalized.append((key, values))
+    return normalized
+
+
+def export_fingerprint(export_name, query_dict, models):
+    payload = json.dumps(
+        [export_name, normalize_params(query_dict), data_version(models)],
+        ensure_ascii=False, default=str,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _state_path(key):
+    return get_jobs_dir() / f'{key}.json'
+
+
+def _result_path(key):
+    return get_jobs_dir() / f'{key}.xlsx'
+
+
+def read_job_state(key):
+    # Ключ приходить з URL - лише hex-відбиток, без шляхів
+    if not JOB_KEY_RE.match(key):
+        return None
+    try:
+        with open(_state_path(key), encoding='utf-8') as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_job_state(state):
+    path = _state_path(state['key'])
+    tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _is_fresh(state):
+    """Готовий результат у межах вікна актуальності, і файл справді є на диску."""
+    return (
+        state is not None
+        and state['status'] == STATUS_DONE
+        and time.time() - state['finished_at'] < _setting('EXPORT_JOBS_TTL', 600)
+        and _result_path(state['key']).exists()
+    )
+
+
+def _is_alive(state):
+    """Завдання в черзі/в роботі і не "зависло" (процес, що його виконував, міг завершитися)."""
+    return (
+        state is not None
+        and state['status'] in (STATUS_PENDING, STATUS_RUNNING)
+        and time.time() - state['created_at'] < _setting('EXPORT_JOBS_STALE_AFTER', 1800)
+    )
+
+
+def _run_job(key, write, state):
+    background = not _setting('EXPORT_JOBS_SYNC', False)
+    result_path = _result_path(key)
+    tmp_path = result_path.with_name(f'{result_path.name}.tmp')
+    try:
+        _write_job_state({**state, 'status': STATUS_RUNNING})
+        started = time.perf_counter()
+        with open(tmp_path, 'wb') as output:
+            write(output)
+        os.replace(tmp_path, result_path)
+        _write_job_state({**state, 'status': STATUS_DONE, 'finished_at': time.time(),
+                          'seconds': round(time.perf_counter() - started, 3)})
+    except Exception as e:
+        logger.exception("Export job %s (%s) failed", key, state['export_name'])
+        tmp_path.unlink(missing_ok=True)
+        _write_job_state({**state, 'status': STATUS_FAILED, 'error': str(e), 'finished_at': time.time()})
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+        if background:
+            # Потік пулу живе довго - не тримаємо відкрите з'єднання з БД між завданнями
+            connections.close_all()
+
+
+def cleanup_expired_results():
+    """Видаляє результати та стани, старші за вікно актуальності (з запасом на зависання)."""
+    max_age = max(_setting('EXPORT_JOBS_TTL', 600), _setting('EXPORT_JOBS_STALE_AFTER', 1800))
+    now = time.time()
+    for path in get_jobs_dir().iterdir():
+        try:
+            if now - path.stat().st_mtime > max_age:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def submit_export_job(key, export_name, write, filename):
+    """Ставить завдання в пул (якщо таке саме ще не виконується). Повертає стан завдання."""
+    with _lock:
+        state = read_job_state(key)
+        if key in _in_flight or _is_fresh(state) or _is_alive(state):
+            return state
+        state = {
+            'key': key,
+            'export_name': export_name,
+            'filename': filename,
+            'status': STATUS_PENDING,
+            'created_at': time.time(),
+        }
+        _write_job_state(state)
+        _in_flight[key] = True
+
+    cleanup_expired_results()
+    if _setting('EXPORT_JOBS_SYNC', False):
+        _run_job(key, write, state)
+    else:
+        _get_executor().submit(_run_job, key, write, state)
+    return read_job_state(key)
+
+
+def job_file_response(state):
+    return FileResponse(
+        open(_result_path(state['key']), 'rb'),
+        as_attachment=True,
+        filename=state['filename'],
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def job_status_payload(state):
+    payload = {
+        'key': state['key'],
+        'status': state['status'],
+        'status_url': reverse('oids:export_job_status', args=[state['key']]),
+    }
+    if state['status'] == STATUS_DONE:
+        payload['download_url'] = reverse('oids:export_job_download', args=[state['key']])
+    if state['status'] == STATUS_FAILED:
+        payload['error'] = state.get('error', '')
+    return payload
+
+
+def _wants_json(request):
+    return (
+        request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('accept', '')
+    )
+
+
+def export_in_background(request, export_name, write, filename, models):
+    """
+    Точка входу для view: повертає готовий файл з кешу або ставить завдання
+    і віддає сторінку очікування (для AJAX - JSON зі статусом і URL опитування).
+
+    :param export_name: Назва експорту (частина ключа кешу).
+    :param write: Функція write(output), що записує .xlsx у файлоподібний об'єкт.
+                  Виконується у фоновому потоці - queryset має бути вже відфільтрований.
+    :param filename: Ім'я файлу для завантаження.
+    :param models: Моделі, з яких будується файл (для версії даних).
+    """
+    key = export_fingerprint(export_name, request.GET, models)
+    state = read_job_state(key)
+    if not _is_fresh(state):
+        state = submit_export_job(key, export_name, write, filename)
+
+    if _is_fresh(state) and not _wants_json(request):
+        return job_file_response(state)
+
+    payload = job_status_payload(state)
+    if _wants_json(request):
+        return JsonResponse(payload, status=200 if state['status'] == STATUS_DONE else 202)
+    return render(request, 'oids/export_job_status.html', {
+        'page_title': 'Формування файлу експорту',
+        'job': payload,
+        'filename': filename,
+        'back_url': request.META.get('HTTP_REFERER') or request.path,
+    })
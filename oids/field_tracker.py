@@ -0,0 +1,92 @@
+# oids/field_tracker.py
+"""
+Відстеження змін полів моделі без SELECT перед збереженням.
+
+Document.save, TechnicalTask.save та сигнал pre_save завдання taskFlow читали
+з БД "старий" екземпляр лише для порівняння кількох полів - зайвий запит на
+кожне збереження. FieldTrackerMixin запам'ятовує значення полів tracked_fields
+у момент завантаження (from_db) і після кожного збереження:
+
+    class Document(FieldTrackerMixin, models.Model):
+        tracked_fields = ('dsszzi_registered_number',)
+
+    document.has_changed('dsszzi_registered_number')
+    document.previous('dsszzi_registered_number')
+
+- зберігається лише кортеж значень відстежуваних полів (без копії екземпляра);
+- для ForeignKey порівнюється і повертається id (attname) - без запитів до
+  пов'язаних моделей;
+- нового (ще не збереженого) екземпляра previous() - None, has_changed() - True;
+- якщо поле не було завантажене (only()/defer()), previous() читає лише його
+  одним запитом - як і раніше, але тільки коли значення справді потрібне.
+"""
+
+_NOT_LOADED = object()
+
+
+class FieldTrackerMixin:
+    """Запам'ятовує значення tracked_fields при завантаженні з БД та після збереження."""
+
+    tracked_fields = ()
+
+    @classmethod
+    def _tracked_attnames(cls):
+        # Обчислюється один раз на клас (ім'я поля -> attname, напр. 'assignee' -> 'assignee_id')
+        attnames = cls.__dict__.get('_tracked_attnames_cache')
+        if attnames is None:
+            attnames = tuple(cls._meta.get_field(name).attname for name in cls.tracked_fields)
+            cls._tracked_attnames_cache = attnames
+        return attnames
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._capture_tracked()
+        return instance
+
+    def _capture_tracked(self, fields=None):
+        """Запам'ятовує поточні значення (лише полів fields, якщо передано)."""
+        attnames = self._tracked_attnames()
+        previous = getattr(self, '_tracked_values', None) or (_NOT_LOADED,) * len(attnames)
+        values = []
+        for name, attname, old_value in zip(self.tracked_fields, attnames, previous):
+            if fields is not None and name not in fields and attname not in fields:
+                values.append(old_value)
+            else:
+                values.append(self.__dict__.get(attname, _NOT_LOADED))
+        self._tracked_values = tuple(values)
+
+    def _tracked_index(self, field):
+        try:
+            return self.tracked_fields.index(field)
+        except ValueError:
+            raise ValueError(f"Поле '{field}' не відстежується моделлю {type(self).__name__}")
+
+    def previous(self, field):
+        """Значення поля на момент завантаження з БД або останнього збереження."""
+        index = self._tracked_index(field)
+        if self._state.adding:
+            return None
+        values = getattr(self, '_tracked_values', None)
+        value = values[index] if values is not None else _NOT_LOADED
+        if value is _NOT_LOADED:
+            attname = self._tracked_attnames()[index]
+            value = type(self)._base_manager.using(self._state.db).filter(pk=self.pk) \
+                .values_list(attname, flat=True).first()
+        return value
+
+    def has_changed(self, field):
+        """Чи відрізняється поточне значення поля від previous(field)."""
+        if self._state.adding:
+            return True
+        attname = self._tracked_attnames()[self._tracked_index(field)]
+        return getattr(self, attname) != self.previous(field)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._capture_tracked(fields=None if update_fields is None else set(update_fields))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._capture_tracked(fields=None if fields is None else set(fields))
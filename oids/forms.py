@@ -10,6 +10,9 @@ from .models import (
     AttestationRegistration, AttestationResponse, WorkCompletionRegistration, WorkCompletionResponse, 
     Declaration, DeclarationRegistration, TechnicalTask, 
 )
+from .document_roles import DocumentRole, get_role_type_ids
+from .status_sync import mark_work_request_items
+from .reference_cache import CachedModelChoiceField, CachedModelMultipleChoiceField
 
 from django_tomselect.forms import TomSelectModelChoiceField, TomSelectConfig
 from django.utils import timezone
@@ -28,8 +31,8 @@ def get_last_week_date():
 # дата СЬОГОДНІ - 1 тиждень
 
 class WorkRequestForm(forms.ModelForm):
-    unit = forms.ModelChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelChoiceField(
+        'units',
         label="Військова частина",
         # Додаємо клас для ініціалізації TomSelect, якщо потрібно для цього поля
         widget=forms.Select(attrs={'class': 'form-select tomselect-main-unit'}) 
@@ -112,8 +115,8 @@ WorkRequestItemFormSet = inlineformset_factory(
 )
 
 class TripForm(forms.ModelForm):
-    units = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    units = CachedModelMultipleChoiceField(
+        'units',
         label="Військові частини призначення",
         widget=forms.SelectMultiple(attrs={'class': 'form-select tomselect-field', 'id': 'id_trip_form_units'}), # Додав ID
         required=True
@@ -125,8 +128,8 @@ class TripForm(forms.ModelForm):
         widget=forms.SelectMultiple(attrs={'class': 'form-select tomselect-field', 'id': 'id_trip_form_oids'}), # Додав ID
         required=False # Може бути False, якщо ОІДи не завжди відомі одразу
     )
-    persons = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    persons = CachedModelMultipleChoiceField(
+        'active_persons',
         label="Особи у відрядженні",
         widget=forms.SelectMultiple(attrs={'class': 'form-select tomselect-field'}),
         required=True
@@ -514,8 +517,8 @@ def update_statuses_after_sending_to_unit(trip_result):
 class DocumentForm(forms.ModelForm): 
     # Поле для вибору типу документа. Фільтрація на основі OID.oid_type та work_type
     # буде реалізована через JavaScript або при ініціалізації форми у view.
-    document_type = forms.ModelChoiceField(
-        queryset=DocumentType.objects.all().order_by('name'),
+    document_type = CachedModelChoiceField(
+        'document_types',
         label="Тип документа",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field'}), 
         empty_label="Спочатку оберіть ОІД та вид робіт"
@@ -627,8 +630,8 @@ class DocumentItemForm(forms.ModelForm):
 
 # Головна форма для сторінки "Опрацювання документів"
 class DocumentProcessingMainForm(forms.Form):
-    unit = forms.ModelChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelChoiceField(
+        'units',
         label="Військова частина",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_proc_form_unit'})
     )
@@ -657,8 +660,8 @@ class DocumentProcessingMainForm(forms.Form):
         initial=get_last_week_date,
         required=True
     )
-    author = forms.ModelChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    author = CachedModelChoiceField(
+        'active_persons',
         label="Автор/Виконавець (загальний для пакету)",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_proc_form_author'}),
         required=False
@@ -743,8 +746,8 @@ DocumentItemFormSet = formset_factory(DocumentItemForm, extra=1, can_delete=True
 # --- Форма для створення "Відправки на реєстрацію" ---
 class AttestationRegistrationSendForm(forms.ModelForm):
     # 1. Поле для вибору ВІЙСЬКОВИХ ЧАСТИН (множинний вибір)
-    selected_units = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    selected_units = CachedModelMultipleChoiceField(
+        'units',
         label="1. Оберіть Військові Частини",
         widget=forms.SelectMultiple(attrs={'class': 'form-select tomselect-field', 'id': 'id_att_reg_send_units_selector'}),
         required=True,
@@ -813,13 +816,11 @@ class AttestationRegistrationSendForm(forms.ModelForm):
             if oid_ids_from_data:
                 valid_oid_ids = [int(oid_id) for oid_id in oid_ids_from_data if oid_id.isdigit()]
                 if valid_oid_ids:
-                    document_type_act_att = DocumentType.objects.filter(name__icontains="Акт атестації").first() # Ваш спосіб ідентифікації "Акту атестації"
-                    # document_type_act_att = DocumentType.objects.filter(duration_months=60).first() # Ваш спосіб ідентифікації "Акту атестації"
-                    # attestation_act_type = DocumentType.objects.get(name__icontains="Акт атестації")
-                    if document_type_act_att:
+                    attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT) # Типи "Акту атестації" з реєстру ролей
+                    if attestation_act_type_ids:
                         self.fields['attestation_acts_to_send'].queryset = Document.objects.filter(
                             oid_id__in=valid_oid_ids,
-                            document_type=document_type_act_att,
+                            document_type_id__in=attestation_act_type_ids,
                             attestation_registration_sent__isnull=True
                         ).order_by('oid__cipher', '-work_date')
                         print(f"DEBUG AttestationRegSendForm (POST): Acts queryset set for oid_ids: {valid_oid_ids}")
@@ -912,10 +913,9 @@ class AttestationActUpdateForm(forms.ModelForm):
     def save(self, commit=True):
         instance = super().save(commit=commit)
         
-        if commit and instance.work_request_item:
-            # ДОДАНО: перевіряємо статус після збереження
-            print(f"[FORM] Attestation doc saved. Checking WRI ID {instance.work_request_item.id}")
-            instance.work_request_item.check_and_update_status_based_on_documents()
+        if commit and instance.work_request_item_id:
+            # ДОДАНО: перевіряємо статус після збереження (один раз на коміт транзакції)
+            mark_work_request_items([instance.work_request_item_id])
         
         return instance
     
@@ -945,8 +945,8 @@ class WorkCompletionSendForm(forms.ModelForm):
     Збирає дані про супровідний лист та обирає ОІДи.
     """
     # Поле для вибору кількох військових частин, щоб відфільтрувати ОІДи
-    units = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    units = CachedModelMultipleChoiceField(
+        'units',
         label="1. Оберіть військові частини",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field'}),
         required=True
@@ -1179,8 +1179,8 @@ ALLOWED_STATUS_CHOICES = [
 ]
 
 class OIDStatusUpdateForm(forms.Form):
-    unit = forms.ModelChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelChoiceField(
+        'units',
         label="Військова частина",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_status_update_unit'}),
         empty_label="Оберіть ВЧ..."
@@ -1219,8 +1219,8 @@ class OIDStatusUpdateForm(forms.Form):
         required=False
     )
 
-    changed_by = forms.ModelChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    changed_by = CachedModelChoiceField(
+        'active_persons',
         label="Хто змінив статус (виконавець)",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_status_update_changed_by'}),
         required=False # Буде заповнюватися автоматично в майбутньому
@@ -1392,8 +1392,8 @@ class TripResultSendForm(forms.ModelForm):
         return instance
      
 class TechnicalTaskCreateForm(forms.ModelForm):
-    unit = forms.ModelChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelChoiceField(
+        'units',
         label="1. Військова частина",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_tt_create_unit'}),
         empty_label="Оберіть ВЧ..."
@@ -1469,8 +1469,8 @@ class TechnicalTaskProcessForm(forms.ModelForm):
     # Якщо залишити як є в моделі, то у view при збереженні ми його оновимо.
     # Для простоти, припустимо, що reviewed_by буде заповнюватися у view.
     # Або можна додати його сюди:
-    processed_by = forms.ModelChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    processed_by = CachedModelChoiceField(
+        'active_persons',
         label="3. Хто опрацював",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field', 'id': 'id_tt_process_processed_by'}),
         required=True # Або False, якщо може бути автоматично
@@ -1500,8 +1500,8 @@ class TechnicalTaskProcessForm(forms.ModelForm):
 
 class OIDCreateForm(forms.ModelForm):
     # Додаємо поле `unit` для вибору ВЧ, оскільки воно є ForeignKey у моделі OID
-    unit = forms.ModelChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelChoiceField(
+        'units',
         label="Військова частина",
         widget=forms.Select(attrs={'class': 'form-select tomselect-field'}), # Клас для TomSelect
         empty_label="Оберіть ВЧ..."
@@ -8,13 +8,14 @@ from .models import (
     WorkRequest, WorkRequestItem, OID, DskEot, Unit, Person, Trip, TripResultForUnit, Document, DocumentType,
     AttestationRegistration, AttestationResponse,  TechnicalTask
 )
+from .reference_cache import CachedModelMultipleChoiceField
 
 
 # форма для фільтрації
 class OIDFilterForm(forms.Form):
     # Використовуємо ModelMultipleChoiceField для полів, пов'язаних з моделями
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть одну або декілька ВЧ...'})
@@ -65,8 +66,8 @@ class OIDFilterForm(forms.Form):
         self.fields['city'].choices = cities
 
 class TechnicalTaskFilterForm(forms.Form):
-    unit = forms.ModelMultipleChoiceField( 
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField( 
+        'units',
         required=False,
         label="Військові частини",
         widget=forms.SelectMultiple(attrs={'id': 'id_tt_filter_unit', 'class': ' tomselect-field'}) 
@@ -84,14 +85,11 @@ class TechnicalTaskFilterForm(forms.Form):
         required=False, label="Статус ТЗ",
         widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
     )
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Встановлюємо актуальний queryset для поля 'unit' при кожному створенні форми
-        self.fields['unit'].queryset = Unit.objects.all().order_by('code')
+    # Варіанти поля 'unit' актуальні без перевстановлення queryset: кеш довідника скидається сигналами
 
 class WorkRequestFilterForm(forms.Form):
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть ВЧ...'})
@@ -120,8 +118,8 @@ class WorkRequestFilterForm(forms.Form):
 
 class WorkRequestItemProcessingFilterForm(forms.Form):
     prefix = 'wri'
-    unit = forms.ModelMultipleChoiceField(  
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(  
+        'units',
         required=False,
         label="Військові частини",
         widget=forms.SelectMultiple(attrs={'id': 'id_wri_filter_unit', 'class': ' tomselect-field'})  
@@ -155,29 +153,26 @@ class WorkRequestItemProcessingFilterForm(forms.Form):
 		label="Стан факт. опрацювання",
 		widget=forms.Select(attrs={'class': 'form-select form-select-sm '})
 	)
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Встановлюємо актуальний queryset для поля 'unit'
-        self.fields['unit'].queryset = Unit.objects.all().order_by('code')
+    # Варіанти поля 'unit' актуальні без перевстановлення queryset: кеш довідника скидається сигналами
 
 class DocumentFilterForm(forms.Form):
     # Дозволяємо вибір кількох ВЧ
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть ВЧ...'})
     )
     # Дозволяємо вибір кількох типів документів
-    document_type = forms.ModelMultipleChoiceField(
-        queryset=DocumentType.objects.all().order_by('name'),
+    document_type = CachedModelMultipleChoiceField(
+        'document_types',
         required=False,
         label="Тип документа",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть тип...'})
     )
     # Дозволяємо вибір кількох авторів
-    author = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    author = CachedModelMultipleChoiceField(
+        'active_persons',
         required=False,
         label="Автор/Виконавець",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть автора...'})
@@ -201,8 +196,8 @@ class DocumentFilterForm(forms.Form):
     )
 
 class TechnicalTaskFilterForm(forms.Form):
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть ВЧ...'})
@@ -219,8 +214,8 @@ class TechnicalTaskFilterForm(forms.Form):
         label="Результат розгляду",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть результат...'})
     )
-    reviewed_by = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    reviewed_by = CachedModelMultipleChoiceField(
+        'active_persons',
         required=False,
         label="Хто ознайомився",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть особу...'})
@@ -241,8 +236,8 @@ class TechnicalTaskFilterForm(forms.Form):
     )
     
 class AttestationRegistrationFilterForm(forms.Form):
-    units = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    units = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть ВЧ...'})
@@ -253,8 +248,8 @@ class AttestationRegistrationFilterForm(forms.Form):
         label="Статус відправки",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть статус...'})
     )
-    sent_by = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    sent_by = CachedModelMultipleChoiceField(
+        'active_persons',
         required=False,
         label="Хто відправив",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть особу...'})
@@ -284,8 +279,8 @@ class AttestationResponseFilterForm(forms.Form):
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть відправку...'})
     )
     # Дозволяємо вибір кількох осіб, що отримали відповідь
-    received_by = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True).order_by('full_name'),
+    received_by = CachedModelMultipleChoiceField(
+        'active_persons',
         required=False,
         label="Хто отримав",
         widget=forms.SelectMultiple(attrs={'class': 'tomselect-field', 'placeholder': 'Оберіть особу...'})
@@ -309,8 +304,8 @@ class AttestationResponseFilterForm(forms.Form):
     )
 
 class RegisteredActsFilterForm(forms.Form):
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         required=False,
         label="Військова частина",
         widget=forms.SelectMultiple(attrs={'id': 'id_filter_unit', 'class': 'tomselect-field'})
@@ -334,8 +329,8 @@ class AzrDocumentFilterForm(forms.Form):
     Оновлена форма для фільтрації списку АЗР з підтримкою множинного вибору.
     """
     # Змінюємо на ModelMultipleChoiceField для множинного вибору
-    unit = forms.ModelMultipleChoiceField(
-        queryset=Unit.objects.all().order_by('code'),
+    unit = CachedModelMultipleChoiceField(
+        'units',
         label="ВЧ",
         required=False,
         # Важливо: використовуємо SelectMultiple і додаємо клас для TomSelect
@@ -363,7 +358,7 @@ class DeclarationFilterForm(forms.Form):
     """
     Форма для фільтрації списку Декларацій відповідності.
     """
-    unit = forms.ModelMultipleChoiceField(queryset=Unit.objects.all().order_by('code'), label="ВЧ", required=False, widget=forms.SelectMultiple(attrs={'class': 'tomselect-field'}))
+    unit = CachedModelMultipleChoiceField('units', label="ВЧ", required=False, widget=forms.SelectMultiple(attrs={'class': 'tomselect-field'}))
     dsk_eot = forms.ModelMultipleChoiceField(queryset=DskEot.objects.all().order_by('cipher'), label="ДСК ЕОТ", required=False, widget=forms.SelectMultiple(attrs={'class': 'tomselect-field'}))
     prepared_number = forms.CharField(label="Підготовлений №", required=False)
     registered_number = forms.CharField(label="Зареєстрований №", required=False)
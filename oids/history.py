@@ -0,0 +1,210 @@
+# oids/history.py
+"""
+Історія змін моделей (django-simple-history): пакетний запис, ущільнення та строк зберігання.
+
+Кожне збереження моделі з HistoricalRecords - окремий INSERT в історичну таблицю,
+а каскади (WorkRequestItem.save -> OID.save -> OIDStatusChange) та повторні
+збереження того самого об'єкта множать записи. Тут:
+
+- HistoricalRecords - заміна simple_history.models.HistoricalRecords (моделі
+  oids/models.py імпортують її звідси). Поза buffered_history() поводиться
+  так само, як оригінал;
+- buffered_history() - у межах блоку записи історії накопичуються в пам'яті
+  потоку і вставляються одним bulk_create на кожну історичну модель при виході
+  з блоку (всередині тієї ж транзакції). Повторний запис того самого об'єкта
+  без змін ("~" з тими самими значеннями, користувачем і причиною) не додається.
+  Використовується в status_sync.flush_dirty та import_real_data. Блок не має
+  містити savepoint, що відкочується частково: записи відкоченої частини
+  лишаться в буфері;
+- compact_history_model() / prune_history_model() - для команди
+  `manage.py compact_history`: видалення послідовних записів без змін та
+  записів, старших за HISTORY_RETENTION_DAYS моделі (останній запис кожного
+  об'єкта зберігається завжди).
+"""
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from simple_history.models import HistoricalRecords as BaseHistoricalRecords
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
+
+from . import instrumentation as trace
+
+# Службові поля історичних моделей (не порівнюються при ущільненні)
+HISTORY_FIELDS = ('history_id', 'history_date', 'history_change_reason', 'history_type', 'history_user')
+
+_state = threading.local()
+
+
+def _buffer():
+    return getattr(_state, 'buffer', None)
+
+
+class HistoricalRecords(BaseHistoricalRecords):
+    """HistoricalRecords, що в межах buffered_history() відкладає записи для bulk_create."""
+
+    def create_historical_record(self, instance, history_type, using=None):
+        buffer = _buffer()
+        manager = getattr(instance, self.manager_name)
+        if buffer is None or getattr(manager.model, '_history_m2m_fields', None):
+            return super().create_historical_record(instance, history_type, using=using)
+
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, "_history_date", timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+
+        attrs = {}
+        for field in self.fields_included(instance):
+            attrs[field.attname] = getattr(instance, field.attname)
+
+        # Той самий об'єкт без змін (крім auto_now) - запис нічого не додає до історії
+        key = (manager.model, instance.pk)
+        values = [value for attname, value in attrs.items() if attname not in _auto_now_attnames(type(instance))]
+        signature = (history_type, getattr(history_user, 'pk', history_user), history_change_reason, values)
+        if history_type == '~' and buffer.last.get(key) == signature:
+            buffer.skipped += 1
+            return
+        buffer.last[key] = signature
+
+        relation_field = getattr(manager.model, "history_relation", None)
+        if relation_field is not None:
+            attrs["history_relation"] = instance
+
+        history_instance = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=manager.model,
+            instance=instance,
+            history_date=history_date,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            history_instance=history_instance,
+            using=using,
+        )
+        buffer.records.setdefault((manager.model, using), []).append((instance, history_instance))
+
+
+def _auto_now_attnames(model):
+    return {field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+
+
+class _HistoryBuffer:
+
+    def __init__(self):
+        self.records = {}  # (історична модель, БД) -> [(екземпляр, історичний запис)]
+        self.last = {}     # (історична модель, pk) -> підпис останнього запису
+        self.skipped = 0
+
+
+@contextmanager
+def buffered_history():
+    """
+    Накопичує записи історії в блоці та вставляє їх одним bulk_create на модель.
+    Вкладені блоки приєднуються до зовнішнього; при винятку записи відкидаються
+    (разом з транзакцією, що відкочується).
+    """
+    if _buffer() is not None:
+        yield
+        return
+    _state.buffer = buffer = _HistoryBuffer()
+    try:
+        yield
+    finally:
+        _state.buffer = None
+    flush_history(buffer)
+
+
+def flush_history(buffer):
+    created = 0
+    for (model, using), records in buffer.records.items():
+        model.objects.using(using).bulk_create([history_instance for _, history_instance in records])
+        created += len(records)
+        for instance, history_instance in records:
+            post_create_historical_record.send(
+                sender=model,
+                instance=instance,
+                history_instance=history_instance,
+                history_date=history_instance.history_date,
+                history_user=history_instance.history_user,
+                history_change_reason=history_instance.history_change_reason,
+                using=using,
+            )
+    if created or buffer.skipped:
+        trace.incr('history.buffered_records', created)
+        trace.incr('history.skipped_records', buffer.skipped)
+        trace.debug('history', "Buffered history: %s records in %s bulk inserts, %s no-op skipped",
+                    created, len(buffer.records), buffer.skipped)
+
+
+# --- Ущільнення та строк зберігання (manage.py compact_history) ---
+
+def compared_fields(history_model):
+    """Поля, зміна яких робить запис історії змістовним (без службових і auto_now)."""
+    # В історичній моделі auto_now вимкнено - ознака береться з поля самої моделі
+    auto_now = _auto_now_attnames(history_model.instance_type)
+    return [
+        field.attname for field in history_model._meta.concrete_fields
+        if field.name not in HISTORY_FIELDS and field.attname not in auto_now
+    ]
+
+
+def compact_history_model(history_model, dry_run=False, chunk_size=2000):
+    """
+    Видаляє записи "~", що не змінюють жодного поля відносно попереднього запису
+    того самого об'єкта (і не мають причини зміни). Повертає кількість таких записів.
+    """
+    pk_attname = history_model.instance_type._meta.pk.attname
+    fields = compared_fields(history_model)
+    rows = history_model.objects.order_by(pk_attname, 'history_date', 'history_id').values_list(
+        'history_id', pk_attname, 'history_type', 'history_change_reason', *fields,
+    )
+    redundant = []
+    previous_pk, previous_values = object(), None
+    for history_id, object_pk, history_type, reason, *values in rows.iterator(chunk_size=chunk_size):
+        if object_pk == previous_pk and history_type == '~' and not reason and values == previous_values:
+            redundant.append(history_id)
+            continue
+        previous_pk, previous_values = object_pk, values
+    if not dry_run:
+        _delete(history_model, redundant, chunk_size)
+    return len(redundant)
+
+
+def retention_days(history_model):
+    """Строк зберігання історії моделі в днях (None - без обмеження)."""
+    return getattr(settings, 'HISTORY_RETENTION_DAYS', {}).get(history_model.instance_type._meta.label)
+
+
+def prune_history_model(history_model, dry_run=False, chunk_size=2000, now=None):
+    """
+    Видаляє записи, старші за строк зберігання моделі, крім останнього запису
+    кожного об'єкта (стан на момент видалення лишається видимим). Повертає кількість.
+    """
+    days = retention_days(history_model)
+    if days is None:
+        return 0
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=days)
+    pk_attname = history_model.instance_type._meta.pk.attname
+    latest = history_model.objects.order_by().values(pk_attname).annotate(latest_id=Max('history_id')).values('latest_id')
+    expired = list(
+        history_model.objects.filter(history_date__lt=cutoff).exclude(history_id__in=latest)
+        .values_list('history_id', flat=True)
+    )
+    if not dry_run:
+        _delete(history_model, expired, chunk_size)
+    return len(expired)
+
+
+def _delete(history_model, history_ids, chunk_size):
+    for start in range(0, len(history_ids), chunk_size):
+        history_model.objects.filter(history_id__in=history_ids[start:start + chunk_size])._raw_delete(
+            history_model.objects.db)
@@ -0,0 +1,265 @@
+# oids/importing.py
+"""
+Будівельні блоки потокового імпорту CSV (management-команда import_real_data).
+
+- read_csv_chunks() - читає файл порціями (chunk) по N рядків, не тримаючи весь файл у пам'яті;
+- DateColumns / DateColumnParser - формат дати визначається один раз на колонку
+  (за першим непорожнім значенням) і далі застосовується без перебору форматів;
+- NaturalKeyMap - словник "природний ключ -> pk" (код ВЧ, шифр ОІД, ПІБ...) замість
+  запиту .get() на кожен рядок;
+- bulk_create_objects() / bulk_update_objects() - пакетні вставка/оновлення разом з
+  історією simple_history (якщо модель її має);
+- ImportCheckpoint - збережений прогрес по файлу, щоб перерваний імпорт продовжився
+  з першої незакоміченої порції.
+"""
+import csv
+import datetime
+import hashlib
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from dateutil import parser as date_parser
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+
+# Формати дат у порядку спроб (перший, що підійшов до першого значення колонки, фіксується)
+DATE_FORMATS = [
+    '%Y.%m.%d',     # 2024.01.15 (основний формат вивантажень)
+    '%Y-%m-%d',     # 2024-01-15
+    '%d.%m.%Y',     # 15.01.2024
+    '%d-%m-%Y',     # 15-01-2024
+    '%d/%m/%Y',     # 15/01/2024
+    '%Y/%m/%d',     # 2024/01/15
+    '%m/%d/%Y',     # 01/15/2024 (американський формат)
+    '%Y.%m.%d %H:%M:%S',  # з часом
+    '%Y-%m-%d %H:%M:%S',  # з часом
+]
+
+# Формат, визначений через dateutil (жоден зі стандартних не підійшов)
+DATEUTIL_FORMAT = 'dateutil'
+
+
+def _parse_with_format(value, fmt):
+    if fmt == '%Y-%m-%d':
+        # Найчастіший випадок - без strptime
+        return datetime.date.fromisoformat(value)
+    if fmt == DATEUTIL_FORMAT:
+        try:
+            return date_parser.parse(value, dayfirst=True).date()
+        except OverflowError as e:
+            raise ValueError(str(e))
+    return datetime.datetime.strptime(value, fmt).date()
+
+
+def detect_date_format(value):
+    """Перший формат з DATE_FORMATS, що розбирає значення; DATEUTIL_FORMAT або None."""
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.datetime.strptime(value, fmt)
+            return fmt
+        except ValueError:
+            continue
+    try:
+        date_parser.parse(value, dayfirst=True)
+        return DATEUTIL_FORMAT
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+class DateColumnParser:
+    """
+    Розбір дат однієї колонки. Формат визначається за першим непорожнім значенням
+    і далі використовується напряму. Значення, що не відповідають зафіксованому
+    формату, розбираються повним перебором (рахуються в fallbacks).
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.format = None
+        self.fallbacks = 0
+        self.failures = 0
+
+    def parse(self, value):
+        """Повертає datetime.date або None (порожнє чи нерозпізнане значення)."""
+        if not value:
+            return None
+        value = value.strip()
+        if not value:
+            return None
+
+        if self.format is None:
+            self.format = detect_date_format(value)
+            if self.format is None:
+                self.failures += 1
+                return None
+        try:
+            return _parse_with_format(value, self.format)
+        except ValueError:
+            pass
+
+        fmt = detect_date_format(value)
+        if fmt is None:
+            self.failures += 1
+            return None
+        self.fallbacks += 1
+        return _parse_with_format(value, fmt)
+
+
+class DateColumns:
+    """Набір парсерів дат файлу - по одному на колонку."""
+
+    def __init__(self):
+        self._parsers = {}
+
+    def parse(self, column, value):
+        parser = self._parsers.get(column)
+        if parser is None:
+            parser = self._parsers[column] = DateColumnParser(column)
+        return parser.parse(value)
+
+    def __iter__(self):
+        return iter(self._parsers.values())
+
+
+def read_csv_chunks(file_path, chunk_size, skip_rows=0):
+    """
+    Генератор порцій рядків CSV: (номер рядка файлу для першого запису порції, [dict, ...]).
+    skip_rows - скільки записів (без заголовка) пропустити з початку файлу.
+    Нумерація рядків - як у редакторі: заголовок - рядок 1.
+    """
+    with open(file_path, mode='r', encoding='utf-8', newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        rows = iter(reader)
+        skipped = sum(1 for _ in islice(rows, skip_rows))
+        line_number = skipped + 2
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield line_number, chunk
+            line_number += len(chunk)
+
+
+class NaturalKeyMap:
+    """
+    Словник "природний ключ -> pk" для моделі. Ключ - кортеж значень key_fields
+    (рядки порівнюються після strip()). Якщо ключ не унікальний у базі,
+    get() повертає None, а is_ambiguous() - True; всі pk доступні через get_all().
+    """
+
+    def __init__(self, queryset, *key_fields):
+        self.key_fields = key_fields
+        self._pks = {}
+        self._duplicates = {}
+        for *values, pk in queryset.order_by().values_list(*key_fields, 'pk').iterator(chunk_size=5000):
+            self.add(values, pk)
+
+    @staticmethod
+    def _key(values):
+        if not isinstance(values, (list, tuple)):
+            values = (values,)
+        return tuple(value.strip() if isinstance(value, str) else value for value in values)
+
+    def add(self, values, pk):
+        key = self._key(values)
+        existing = self._pks.get(key)
+        if existing is None and key not in self._duplicates:
+            self._pks[key] = pk
+        elif existing != pk:
+            duplicates = self._duplicates.setdefault(key, [existing])
+            if pk not in duplicates:
+                duplicates.append(pk)
+            self._pks[key] = None
+
+    def get(self, values):
+        return self._pks.get(self._key(values))
+
+    def get_all(self, values):
+        key = self._key(values)
+        if key in self._duplicates:
+            return list(self._duplicates[key])
+        pk = self._pks.get(key)
+        return [] if pk is None else [pk]
+
+    def is_ambiguous(self, values):
+        return self._key(values) in self._duplicates
+
+    def __contains__(self, values):
+        return self._key(values) in self._pks
+
+    def __len__(self):
+        return len(self._pks)
+
+
+def _has_history(model):
+    return hasattr(model, 'history')
+
+
+def bulk_create_objects(model, objects, batch_size):
+    """Пакетна вставка (з історією simple_history, якщо модель її веде). Повертає об'єкти з pk."""
+    if not objects:
+        return []
+    if _has_history(model):
+        return bulk_create_with_history(objects, model, batch_size=batch_size)
+    return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def bulk_update_objects(model, objects, fields, batch_size):
+    """Пакетне оновлення полів fields (з історією simple_history, якщо модель її веде)."""
+    if not objects:
+        return 0
+    fields = list(fields)
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields) and 'updated_at' not in fields:
+        # auto_now поля bulk_update сам не оновлює
+        now = timezone.now()
+        for obj in objects:
+            obj.updated_at = now
+        fields.append('updated_at')
+    if _has_history(model):
+        return bulk_update_with_history(objects, model, fields, batch_size=batch_size)
+    return model.objects.bulk_update(objects, fields, batch_size=batch_size)
+
+
+class ImportCheckpoint:
+    """
+    Прогрес імпорту одного файлу: скільки записів вже закомічено.
+    Зберігається у JSON в каталозі checkpoint_dir; прив'язаний до шляху, розміру
+    та часу зміни файлу - якщо файл змінився, імпорт починається спочатку.
+    """
+
+    def __init__(self, checkpoint_dir, file_path):
+        self.file_path = os.path.abspath(file_path)
+        digest = hashlib.sha1(self.file_path.encode('utf-8')).hexdigest()[:16]
+        self.path = Path(checkpoint_dir) / f'{Path(file_path).name}.{digest}.json'
+
+    def _fingerprint(self):
+        stat = os.stat(self.file_path)
+        return {'file': self.file_path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load(self):
+        """Кількість вже імпортованих записів (0, якщо контрольної точки немає або файл змінився)."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if {key: data.get(key) for key in ('file', 'size', 'mtime')} != self._fingerprint():
+            return 0
+        return int(data.get('rows_done', 0))
+
+    def save(self, rows_done):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = dict(self._fingerprint(), rows_done=rows_done)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,312 @@
+# oids/instrumentation.py
+"""
+Інструментування машини статусів: події з рівнями, таймінги (span), лічильники.
+
+Замість print() у гарячих шляхах (перевірка статусів WorkRequestItem/WorkRequest,
+Document.save, Trip.save, сигнали) код викликає:
+
+    from . import instrumentation as trace
+
+    trace.debug('wri.status', "WRI %s: %s -> %s", item.pk, old, new)
+    trace.incr('wri.status_changed')
+    with trace.span('trip.deadlines', trip_id=trip.pk) as span:
+        ...
+        span.set(updated=count)
+
+Повідомлення форматуються ліниво (як у logging) і лише якщо хоч один приймач
+(sink) приймає цей рівень. Без приймачів кожен виклик - одне порівняння,
+span() повертає спільний порожній об'єкт.
+
+Приймачі задаються в settings.INSTRUMENTATION_SINKS (шлях до класу + параметри)
+або додаються під час роботи через add_sink()/remove_sink():
+
+- LoggingSink - події у logging (логер 'oids.trace.<назва>'), span-и - на рівні DEBUG;
+- AggregateSink - лічильники та статистика таймінгів у пам'яті процесу (snapshot()).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+# За замовчуванням - лише попередження та помилки в logging, метрики не збираються
+DEFAULT_SINKS = [
+    {'class': 'oids.instrumentation.LoggingSink', 'level': 'WARNING'},
+]
+
+_DISABLED_LEVEL = logging.CRITICAL + 1
+
+_lock = threading.Lock()
+_sinks = None
+# До першого виклику конфігурація невідома - пропускаємо все на повільний шлях (_configure)
+_event_level = logging.NOTSET
+_metrics_enabled = True
+
+
+class Sink:
+    """
+    Базовий приймач. level - мінімальний рівень подій, metrics - чи приймає
+    лічильники, таймінги та span-и.
+    """
+    metrics = False
+
+    def __init__(self, level=DEBUG, metrics=None):
+        self.level = level if isinstance(level, int) else logging.getLevelNamesMapping()[level]
+        if metrics is not None:
+            self.metrics = metrics
+
+    def event(self, level, name, message, args, fields):
+        pass
+
+    def counter(self, name, value):
+        pass
+
+    def timing(self, name, ms):
+        pass
+
+    def span(self, name, ms, fields, error):
+        self.timing(name, ms)
+
+
+class LoggingSink(Sink):
+    """Події - у logging, span-и (якщо metrics=True) - DEBUG-записом з тривалістю."""
+
+    def __init__(self, level=DEBUG, metrics=None, logger_prefix='oids.trace'):
+        super().__init__(level, metrics)
+        self.logger_prefix = logger_prefix
+
+    def _logger(self, name):
+        return logging.getLogger(f'{self.logger_prefix}.{name}')
+
+    def event(self, level, name, message, args, fields):
+        self._logger(name).log(level, message, *args, extra={'trace_fields': fields})
+
+    def span(self, name, ms, fields, error):
+        logger = self._logger(name)
+        if error is not None:
+            logger.warning("span %s failed after %.2f ms: %r %s", name, ms, error, fields)
+        elif logger.isEnabledFor(DEBUG):
+            logger.debug("span %s %.2f ms %s", name, ms, fields)
+
+
+class AggregateSink(Sink):
+    """Лічильники та таймінги (кількість, сума, мін., макс.) у пам'яті процесу."""
+    metrics = True
+
+    def __init__(self, level=_DISABLED_LEVEL, metrics=None):
+        super().__init__(level, metrics)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+            self.errors = {}
+
+    def event(self, level, name, message, args, fields):
+        self.counter(f'{name}.{logging.getLevelName(level).lower()}', 1)
+
+    def counter(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timing(self, name, ms):
+        with self._lock:
+            stats = self.timings.get(name)
+            if stats is None:
+                self.timings[name] = [1, ms, ms, ms]
+            else:
+                stats[0] += 1
+                stats[1] += ms
+                stats[2] = min(stats[2], ms)
+                stats[3] = max(stats[3], ms)
+
+    def span(self, name, ms, fields, error):
+        self.timing(name, ms)
+        if error is not None:
+            with self._lock:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(sorted(self.counters.items())),
+                'timings': {
+                    name: {
+                        'count': count,
+                        'total_ms': round(total, 3),
+                        'avg_ms': round(total / count, 3),
+                        'min_ms': round(minimum, 3),
+                        'max_ms': round(maximum, 3),
+                    }
+                    for name, (count, total, minimum, maximum) in sorted(self.timings.items())
+                },
+                'errors': dict(sorted(self.errors.items())),
+            }
+
+
+def _build_sink(config):
+    if isinstance(config, Sink):
+        return config
+    config = dict(config)
+    return import_string(config.pop('class'))(**config)
+
+
+def _recompute():
+    global _event_level, _metrics_enabled
+    _event_level = min((sink.level for sink in _sinks), default=_DISABLED_LEVEL)
+    _metrics_enabled = any(sink.metrics for sink in _sinks)
+
+
+def _configure():
+    global _sinks
+    with _lock:
+        if _sinks is None:
+            _sinks = [_build_sink(config) for config in getattr(settings, 'INSTRUMENTATION_SINKS', DEFAULT_SINKS)]
+            _recompute()
+    return _sinks
+
+
+def reset():
+    """Перечитати INSTRUMENTATION_SINKS при наступному виклику (додані add_sink() приймачі відкидаються)."""
+    global _sinks, _event_level, _metrics_enabled
+    with _lock:
+        _sinks = None
+        _event_level = logging.NOTSET
+        _metrics_enabled = True
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'INSTRUMENTATION_SINKS':
+        reset()
+
+
+def add_sink(sink):
+    global _sinks
+    _configure()
+    with _lock:
+        _sinks = _sinks + [sink]
+        _recompute()
+    return sink
+
+
+def remove_sink(sink):
+    global _sinks
+    _configure()
+    with _lock:
+        _sinks = [existing for existing in _sinks if existing is not sink]
+        _recompute()
+
+
+def get_sinks():
+    return list(_configure())
+
+
+def is_enabled_for(level):
+    if level < _event_level:
+        return False
+    return any(sink.level <= level for sink in _configure())
+
+
+# --- Події ---
+
+def _emit(level, name, message, args, fields):
+    for sink in _configure():
+        if sink.level <= level:
+            sink.event(level, name, message, args, fields)
+
+
+def debug(name, message, *args, **fields):
+    if _event_level <= DEBUG:
+        _emit(DEBUG, name, message, args, fields)
+
+
+def info(name, message, *args, **fields):
+    if _event_level <= INFO:
+        _emit(INFO, name, message, args, fields)
+
+
+def warning(name, message, *args, **fields):
+    if _event_level <= WARNING:
+        _emit(WARNING, name, message, args, fields)
+
+
+def error(name, message, *args, **fields):
+    if _event_level <= ERROR:
+        _emit(ERROR, name, message, args, fields)
+
+
+# --- Метрики ---
+
+def incr(name, value=1):
+    if _metrics_enabled:
+        for sink in _configure():
+            if sink.metrics:
+                sink.counter(name, value)
+
+
+def timing(name, ms):
+    if _metrics_enabled:
+        for sink in _configure():
+            if sink.metrics:
+                sink.timing(name, ms)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ('name', 'fields', 'started')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.started) * 1000
+        for sink in _configure():
+            if sink.metrics:
+                sink.span(self.name, ms, self.fields, exc)
+        return False
+
+    def set(self, **fields):
+        """Додаткові поля, відомі лише в кінці (кількість оновлених записів, новий статус)."""
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    """Таймінг блоку коду; без приймачів метрик - спільний порожній об'єкт."""
+    if not _metrics_enabled:
+        return _NULL_SPAN
+    _configure()
+    if not _metrics_enabled:
+        return _NULL_SPAN
+    return Span(name, fields)
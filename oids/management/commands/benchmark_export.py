@@ -0,0 +1,89 @@
+# oids/management/commands/benchmark_export.py
+
+import time
+import tempfile
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from oids.models import OID, Document
+from oids.utils import EXPORT_CHUNK_SIZE, write_excel_export
+
+# Ті самі набори стовпців, що й у експорті списків ОІД та документів (oids/views.py)
+EXPORT_BENCHMARKS = {
+    'oid': (
+        lambda: OID.objects.select_related('unit', 'validity').order_by('unit__code', 'oid_type', 'cipher'),
+        {
+            'unit__city': 'Місто',
+            'unit__code': 'В/Ч',
+            'cipher': 'Шифр ОІД',
+            'full_name': 'Повна назва ОІД',
+            'get_oid_type_display': 'Тип ОІД',
+            'get_pemin_sub_type_display': 'Клас',
+            'room': 'Приміщення №',
+            'get_status_display': 'Статус',
+            'get_sec_level_display': 'Гриф',
+            'validity__attestation_expiration_date': 'Атестація діє до',
+            'validity__ik_expiration_date': 'ІК діє до',
+            'validity__prescription_expiration_date': 'Припис діє до',
+            'unit__note': 'Примітка',
+        },
+    ),
+    'document': (
+        lambda: Document.objects.select_related('oid__unit', 'document_type', 'author').order_by('-doc_process_date'),
+        {
+            'oid__unit__code': 'ВЧ',
+            'oid__cipher': 'ОІД',
+            'document_type__name': 'Тип документа',
+            'document_number': 'Підг. №',
+            'doc_process_date': 'Підг. від',
+            'work_date': 'Дата проведення робіт',
+            'expiration_date': 'Термін дії',
+            'author__full_name': 'Автор',
+            'note': 'Примітки',
+        },
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Вимірює швидкість (рядків/сек), кількість запитів та пікову пам\'ять експорту в Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', default=list(EXPORT_BENCHMARKS), help=f'Що експортувати: {", ".join(EXPORT_BENCHMARKS)}')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Кількість рядків, що читаються з БД за раз')
+        parser.add_argument('--repeat', type=int, default=3, help='Кількість повторів (береться найкращий час)')
+
+    def handle(self, *args, **options):
+        for name in options['models']:
+            if name not in EXPORT_BENCHMARKS:
+                raise CommandError(f"Невідомий експорт '{name}'. Доступні: {', '.join(EXPORT_BENCHMARKS)}")
+
+            get_queryset, columns = EXPORT_BENCHMARKS[name]
+
+            def run_export():
+                with tempfile.TemporaryFile() as output, CaptureQueriesContext(connection) as queries:
+                    rows = write_excel_export(output, get_queryset(), columns, include_row_numbers=True, chunk_size=options['chunk_size'])
+                    return rows, len(queries), output.tell()
+
+            best_seconds = None
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                rows, query_count, file_size = run_export()
+                seconds = time.perf_counter() - started
+                best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+            # Пам'ять - окремим прогоном: tracemalloc суттєво сповільнює виконання
+            tracemalloc.start()
+            run_export()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rows_per_second = rows / best_seconds if best_seconds else 0
+            self.stdout.write(
+                f"{name}: {rows} рядків за {best_seconds:.3f} с ({rows_per_second:.0f} рядків/с), "
+                f"{query_count} запитів, пік пам'яті {peak_memory / 1024 / 1024:.1f} МБ, файл {file_size / 1024:.0f} КБ"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark finished!'))
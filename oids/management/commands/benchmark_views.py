@@ -0,0 +1,82 @@
+# oids/management/commands/benchmark_views.py
+# python manage.py benchmark_views --size large --output bench.json --compare previous_bench.json
+
+import json
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from oids.benchmarks import (BENCHMARK_SIZES, BENCHMARK_ENDPOINTS, seed_benchmark_data,
+                             get_benchmark_context, run_benchmarks, compare_results)
+
+
+class Command(BaseCommand):
+    help = ('Наповнює окрему тестову БД синтетичними даними та вимірює кількість SQL-запитів, '
+            'час і пікову пам\'ять для списків, дашбордів, AJAX та експортів. Робоча БД не змінюється.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Назви URL з oids.benchmarks.BENCHMARK_ENDPOINTS (за замовчуванням - усі)')
+        parser.add_argument('--size', choices=list(BENCHMARK_SIZES), default='large', help='Розмір синтетичного набору даних')
+        parser.add_argument('--repeat', type=int, default=3, help='Кількість прогонів кожного URL (береться найкращий час)')
+        parser.add_argument('--no-memory', action='store_true', help='Не вимірювати пікову пам\'ять (tracemalloc)')
+        parser.add_argument('--output', help='Файл для результатів у JSON')
+        parser.add_argument('--compare', help='JSON попереднього прогону - показати регресії')
+
+    def handle(self, *args, **options):
+        known_names = {endpoint['name'] for endpoint in BENCHMARK_ENDPOINTS}
+        unknown = set(options['names']) - known_names
+        if unknown:
+            raise CommandError(f"Невідомі URL: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Наповнення даними (--size {options['size']})...")
+            started = datetime.datetime.now()
+            dataset = seed_benchmark_data(options['size'])
+            self.stdout.write(f"  {dataset} за {(datetime.datetime.now() - started).total_seconds():.1f} с")
+
+            client = Client()
+            client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', None))
+            results = run_benchmarks(
+                client, get_benchmark_context(), names=options['names'],
+                repeat=options['repeat'], measure_memory=not options['no_memory'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+
+        for result in results:
+            budget = f" / бюджет {result['budget']}" if result['budget'] is not None else ''
+            memory = f", пам'ять {result['peak_memory_kb']} КБ" if result['peak_memory_kb'] is not None else ''
+            line = f"{result['name']:<40} {result['status']}  SQL {result['query_count']}{budget}, {result['wall_ms']} мс{memory}"
+            self.stdout.write(self.style.ERROR(line) if result['over_budget'] else line)
+
+        report = {
+            'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'size': options['size'],
+            'dataset': dataset,
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результати збережено у {options['output']}")
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous_file:
+                previous = json.load(previous_file)
+            regressions = compare_results(previous['results'], results)
+            for name, metric, old, new in regressions:
+                self.stdout.write(self.style.WARNING(f"  РЕГРЕСІЯ {name}: {metric} {old} -> {new}"))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('Регресій відносно попереднього прогону немає'))
+
+        over_budget = [result['name'] for result in results if result['over_budget']]
+        if over_budget:
+            raise CommandError(f"Перевищено бюджет SQL-запитів: {', '.join(over_budget)}")
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark finished!'))
@@ -0,0 +1,48 @@
+# oids/management/commands/compact_history.py
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from simple_history.models import HistoricalChanges
+
+from oids.history import compact_history_model, prune_history_model, retention_days
+
+
+class Command(BaseCommand):
+    help = ('Ущільнює історію змін (django-simple-history): видаляє послідовні записи без змін '
+            'та записи, старші за строк зберігання моделі (settings.HISTORY_RETENTION_DAYS)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models', metavar='APP.MODEL',
+                            help='Обробити лише цю модель (можна вказати кілька разів)')
+        parser.add_argument('--dry-run', action='store_true', help='Лише порахувати записи, нічого не видаляючи')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Кількість записів, що обробляються за один прохід')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        history_models = {
+            model.instance_type._meta.label_lower: model
+            for model in apps.get_models() if issubclass(model, HistoricalChanges) and hasattr(model, 'instance_type')
+        }
+        if options['models']:
+            unknown = [label for label in options['models'] if label.lower() not in history_models]
+            if unknown:
+                raise CommandError(f"Моделі без історії змін: {', '.join(unknown)}")
+            history_models = {label.lower(): history_models[label.lower()] for label in options['models']}
+
+        total_compacted = total_pruned = 0
+        for label, history_model in sorted(history_models.items()):
+            with transaction.atomic():
+                compacted = compact_history_model(history_model, dry_run=dry_run, chunk_size=options['chunk_size'])
+                pruned = prune_history_model(history_model, dry_run=dry_run, chunk_size=options['chunk_size'])
+            if compacted or pruned:
+                days = retention_days(history_model)
+                retention = f" (retention {days} days)" if days is not None else ""
+                self.stdout.write(f"  {history_model.instance_type._meta.label}: {compacted} no-op, {pruned} expired{retention}")
+            total_compacted += compacted
+            total_pruned += pruned
+
+        action = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {action} {total_compacted} no-op and {total_pruned} expired history records!'
+        ))
@@ -1,480 +1,554 @@
 # oids/management/commands/import_real_data.py
 
-import csv
-import datetime
-from django.core.management.base import BaseCommand
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from dateutil import parser as date_parser
 
 # Імпортуємо всі необхідні моделі
 from oids.models import (
     TerritorialManagement, Unit, Person, DocumentType, OID, DskEot,
     WorkRequest, WorkRequestItem, Document, Declaration,
-    Trip, TechnicalTask, DeclarationRegistration
+    Trip, TechnicalTask
+)
+from oids.importing import (
+    DateColumns, ImportCheckpoint, NaturalKeyMap, read_csv_chunks,
+    bulk_create_objects, bulk_update_objects,
 )
+from oids.services import complete_process_steps_for_documents, ingest_documents
+from oids.status_sync import mark_documents, mark_work_request_items, mark_work_requests
+from oids import search_index
+from oids.history import buffered_history
+from oids.reference_cache import invalidate_reference_cache
+from oids.unit_payload_cache import invalidate_unit_payloads
+
+
+# Словники "природний ключ -> pk": назва -> (модель, поля ключа).
+# Завантажуються один раз (за першим зверненням) і доповнюються створеними записами.
+KEY_MAPS = {
+    'tu': (TerritorialManagement, ('code',)),
+    'unit': (Unit, ('code',)),
+    'person': (Person, ('full_name',)),
+    'document_type': (DocumentType, ('name', 'oid_type', 'work_type')),
+    'oid': (OID, ('unit_id', 'cipher')),
+    'oid_cipher': (OID, ('cipher',)),              # файли без коду ВЧ (ТЗ, відрядження)
+    'dsk_eot': (DskEot, ('unit_id', 'cipher')),
+    'dsk_eot_cipher': (DskEot, ('cipher',)),       # декларації
+    'work_request': (WorkRequest, ('unit_id', 'incoming_number')),
+    'work_request_number': (WorkRequest, ('incoming_number',)),  # відрядження
+    'work_request_item': (WorkRequestItem, ('request_id', 'oid_id', 'work_type')),
+    'technical_task': (TechnicalTask, ('oid_id', 'input_number')),
+    'declaration': (Declaration, ('dsk_eot_id', 'prepared_number')),
+    'trip': (Trip, ('purpose', 'start_date', 'end_date')),
+}
+
+# Поля документа, які оновлюються при повторному імпорті (як defaults у колишньому update_or_create)
+DOCUMENT_UPDATE_FIELDS = [
+    'document_type', 'doc_process_date', 'work_date', 'author', 'work_request_item',
+    'dsszzi_registered_number', 'dsszzi_registered_date', 'expiration_date',
+]
+
+
+class ImportStats:
+    """Лічильники імпорту одного файлу."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
 
 class Command(BaseCommand):
-    help = 'Імпорт даних з CSV файлів у правильному порядку'
+    help = (
+        'Імпорт даних з CSV файлів у правильному порядку. Файли читаються порціями, '
+        'кожна порція - окрема транзакція з пакетними вставками; перерваний імпорт '
+        'продовжується з контрольної точки.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('files', nargs='+', type=str, help='Шляхи до CSV файлів')
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'IMPORT_CHUNK_SIZE', 2000),
+                            help='Кількість рядків CSV в одній транзакції (і між контрольними точками)')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'IMPORT_BATCH_SIZE', 500),
+                            help='Розмір пакета bulk_create/bulk_update')
+        parser.add_argument('--checkpoint-dir', type=str,
+                            default=str(getattr(settings, 'IMPORT_CHECKPOINT_DIR', settings.BASE_DIR / 'import_checkpoints')),
+                            help='Каталог контрольних точок')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ігнорувати збережені контрольні точки та імпортувати файли спочатку')
 
-    @transaction.atomic
     def handle(self, *args, **options):
         files = options['files']
-        
+        self.chunk_size = options['chunk_size']
+        self.batch_size = options['batch_size']
+        self.checkpoint_dir = options['checkpoint_dir']
+        self.restart = options['restart']
+        if self.chunk_size < 1 or self.batch_size < 1:
+            raise CommandError("--chunk-size та --batch-size мають бути додатними.")
+        self._maps = {}
+        self._document_types = None
+
         # Визначаємо порядок імпорту, щоб уникнути помилок залежностей
         import_order = [
-            ('tu.csv', self._import_territorial_managements),
-            ('units.csv', self._import_units),
-            ('persons.csv', self._import_persons),
-            ('document_types.csv', self._import_document_types),
-            ('oids.csv', self._import_oids),
-            ('dsk_eot.csv', self._import_dsk_eot), # <-- Нова модель
-            ('work_requests.csv', self._import_work_requests),
-            ('work_request_items.csv', self._import_work_request_items),
-            ('technical_tasks.csv', self._import_technical_tasks), # <-- Нова функція
-            ('documents.csv', self._import_documents),
-            ('declarations.csv', self._import_declarations), # <-- Нова модель
-            ('trips.csv', self._import_trips), # <-- Нова функція
-            # Додайте сюди файли для DeclarationRegistration, якщо потрібно
+            ('tu.csv', 'територіальних управлінь', self._import_territorial_managements),
+            ('units.csv', 'військових частин', self._import_units),
+            ('persons.csv', 'виконавців', self._import_persons),
+            ('document_types.csv', 'типів документів', self._import_document_types),
+            ('oids.csv', 'ОІД', self._import_oids),
+            ('dsk_eot.csv', "об'єктів ДСК ЕОТ", self._import_dsk_eot),
+            ('work_requests.csv', 'заявок на роботи', self._import_work_requests),
+            ('work_request_items.csv', 'елементів заявок', self._import_work_request_items),
+            ('technical_tasks.csv', 'Технічних Завдань', self._import_technical_tasks),
+            ('documents.csv', 'документів', self._import_documents),
+            ('declarations.csv', 'Декларацій відповідності', self._import_declarations),
+            ('trips.csv', 'Відряджень', self._import_trips),
         ]
 
-        for file_pattern, import_func in import_order:
+        for file_pattern, title, import_chunk in import_order:
             for file_path in files:
                 if file_pattern in file_path:
-                    import_func(file_path)
+                    self._run_file(file_path, title, import_chunk)
                     break # Переходимо до наступного типу файлу
 
-    def _parse_date(self, date_string):
-        """
-        Автоматично парсить дату з різних форматів.
-        Повертає datetime.date або None якщо не вдалося розпарсити.
-        """
-        if not date_string or date_string.strip() == '':
-            return None
-            
-        date_string = date_string.strip()
-        
-        # Список популярних форматів дат для спроби парсингу
-        date_formats = [
-            '%Y.%m.%d',     # 2024.01.15 (ваш основний формат)
-            '%Y-%m-%d',     # 2024-01-15
-            '%d.%m.%Y',     # 15.01.2024
-            '%d-%m-%Y',     # 15-01-2024
-            '%d/%m/%Y',     # 15/01/2024
-            '%Y/%m/%d',     # 2024/01/15
-            '%m/%d/%Y',     # 01/15/2024 (американський формат)
-            '%Y.%m.%d %H:%M:%S',  # з часом
-            '%Y-%m-%d %H:%M:%S',  # з часом
-        ]
-        
-        # Спочатку пробуємо стандартні формати
-        for fmt in date_formats:
+    # --- Конвеєр ---
+
+    def _run_file(self, file_path, title, import_chunk):
+        """Імпорт одного файлу порціями: транзакція та контрольна точка на кожну порцію."""
+        self.stdout.write(f"Імпорт {title} з {file_path}...")
+        if not os.path.exists(file_path):
+            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено. Перевірте шлях."))
+            raise CommandError(f"Файл '{file_path}' не знайдено.")
+
+        checkpoint = ImportCheckpoint(self.checkpoint_dir, file_path)
+        if self.restart:
+            checkpoint.clear()
+        rows_done = checkpoint.load()
+        if rows_done:
+            self.stdout.write(f"  Продовження з контрольної точки: {rows_done} записів вже імпортовано.")
+
+        self.dates = DateColumns()
+        stats = ImportStats()
+        started = time.perf_counter()
+        for line_number, rows in read_csv_chunks(file_path, self.chunk_size, skip_rows=rows_done):
             try:
-                parsed_date = datetime.datetime.strptime(date_string, fmt)
-                return parsed_date.strftime('%Y-%m-%d')
-                # return parsed_date.date()
-            except ValueError:
+                with transaction.atomic(), buffered_history():
+                    import_chunk(rows, line_number, stats)
+            except Exception:
+                # Словники могли отримати pk відкочених записів
+                self._maps = {}
+                self.stdout.write(self.style.ERROR(
+                    f"  Імпорт '{file_path}' перервано в порції з рядка {line_number}. "
+                    f"Збережено {rows_done} записів - повторний запуск продовжить з цього місця."
+                ))
+                raise
+            rows_done += len(rows)
+            stats.rows += len(rows)
+            checkpoint.save(rows_done)
+        checkpoint.clear()
+
+        elapsed = time.perf_counter() - started
+        rate = stats.rows / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"  Імпорт {title} завершено: {stats.rows} рядків за {elapsed:.2f} с ({rate:.0f} рядків/с); "
+            f"створено {stats.created}, оновлено {stats.updated}, пропущено {stats.skipped}."
+        ))
+        for parser in self.dates:
+            if parser.format:
+                message = f"    Формат дат '{parser.column}': {parser.format}"
+                if parser.fallbacks or parser.failures:
+                    message += f" (інший формат: {parser.fallbacks}, не розпізнано: {parser.failures})"
+                self.stdout.write(message)
+
+    def _map(self, name):
+        key_map = self._maps.get(name)
+        if key_map is None:
+            model, key_fields = KEY_MAPS[name]
+            key_map = self._maps[name] = NaturalKeyMap(model.objects.all(), *key_fields)
+        return key_map
+
+    def _remember(self, model, objects):
+        """Додає створені записи до вже завантажених словників цієї моделі."""
+        for name, (map_model, key_fields) in KEY_MAPS.items():
+            key_map = self._maps.get(name)
+            if key_map is not None and map_model is model:
+                for obj in objects:
+                    key_map.add([getattr(obj, field) for field in key_fields], obj.pk)
+
+    def _create(self, model, pending, stats):
+        """Пакетна вставка нових записів порції (pending: ключ -> об'єкт)."""
+        created = bulk_create_objects(model, list(pending.values()), self.batch_size)
+        self._remember(model, created)
+        # bulk_create не надсилає post_save - пошуковий індекс і кеші оновлюються тут
+        search_index.reindex_model(model, [obj.pk for obj in created])
+        if created:
+            invalidate_reference_cache(model)
+            if model is OID:
+                invalidate_unit_payloads({obj.unit_id for obj in created})
+        stats.created += len(created)
+        return created
+
+    def _skip(self, stats, line, message):
+        stats.skipped += 1
+        self.stdout.write(self.style.WARNING(f"  Попередження (рядок {line}): {message}"))
+
+    def _date(self, row, column):
+        return self.dates.parse(column, row.get(column))
+
+    def _get_document_types(self):
+        # Типи документів з об'єктами - для розрахунку expiration_date без запиту на документ
+        if self._document_types is None:
+            self._document_types = DocumentType.objects.in_bulk()
+        return self._document_types
+
+    # --- Імпорт по файлах: кожна функція обробляє одну порцію рядків ---
+
+    def _import_territorial_managements(self, rows, line, stats):
+        tu_map = self._map('tu')
+        pending = {}
+        for row in rows:
+            code = row['tu_code'].strip()
+            if code not in tu_map and code not in pending:
+                pending[code] = TerritorialManagement(code=code, name=row['tu_name'])
+        self._create(TerritorialManagement, pending, stats)
+
+    def _import_units(self, rows, line, stats):
+        tu_map, unit_map = self._map('tu'), self._map('unit')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            code = row['unit_code'].strip()
+            if code in unit_map or code in pending:
                 continue
-        
-        # Якщо стандартні формати не спрацювали, використовуємо dateutil
-        try:
-            parsed_date = date_parser.parse(date_string, dayfirst=True)  # dayfirst=True для європейського формату
-            return parsed_date.strftime('%Y-%m-%d')
-            # return parsed_date.date()
-        except (ValueError, TypeError):
-            return None
-
-    # --- ІСНУЮЧІ ФУНКЦІЇ ІМПОРТУ (залишаються без змін) ---
-
-    def _import_territorial_managements(self, file_path):
-        self.stdout.write(f"Імпорт територіальних управлінь з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    TerritorialManagement.objects.get_or_create(
-                        code=row['tu_code'], defaults={'name': row['tu_name']}
-                    )
-            self.stdout.write(self.style.SUCCESS('  Територіальні управління імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено. Перевірте шлях."))
-            raise
- 
-    def _import_units(self, file_path):
-        self.stdout.write(f"Імпорт військових частин з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        tu_instance = TerritorialManagement.objects.get(code=row['tu_code'])
-                        Unit.objects.get_or_create(
-                            code=row['unit_code'],
-                            defaults={
-                                'name': row['full_name'], 'city': row['city'],
-                                'distance_from_gu': int(row['distance']) if row['distance'] else 0,
-                                'territorial_management': tu_instance
-                            }
-                        )
-                    except TerritorialManagement.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"  Попередження: ТУ з кодом '{row['tu_code']}' не знайдено для ВЧ '{row['unit_code']}'. Пропускаємо."))
-                        continue
-            self.stdout.write(self.style.SUCCESS('  Військові частини імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено."))
-            raise
-            
-    def _import_persons(self, file_path):
-        self.stdout.write(f"Імпорт виконавців з {file_path}...")
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                Person.objects.get_or_create(
-                    full_name=row['full_name'],
-                    defaults={
-                        'position': row['position'],
-                        'group': row['group'],
-                        'is_active': row['is_active'].upper() == 'TRUE'
-                    }
+            tu_id = tu_map.get(row['tu_code'])
+            if tu_id is None:
+                self._skip(stats, i, f"ТУ з кодом '{row['tu_code']}' не знайдено для ВЧ '{code}'. Пропускаємо.")
+                continue
+            pending[code] = Unit(
+                code=code, name=row['full_name'], city=row['city'],
+                distance_from_gu=int(row['distance']) if row['distance'] else 0,
+                territorial_management_id=tu_id,
+            )
+        self._create(Unit, pending, stats)
+
+    def _import_persons(self, rows, line, stats):
+        person_map = self._map('person')
+        pending = {}
+        for row in rows:
+            full_name = row['full_name'].strip()
+            if full_name not in person_map and full_name not in pending:
+                pending[full_name] = Person(
+                    full_name=full_name,
+                    position=row['position'],
+                    group=row['group'],
+                    is_active=row['is_active'].upper() == 'TRUE',
                 )
-        self.stdout.write(self.style.SUCCESS('  Виконавців імпортовано.'))
-
-    def _import_document_types(self, file_path):
-        self.stdout.write(f"Імпорт типів документів з {file_path}...")
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                DocumentType.objects.get_or_create(
-                    name=row['name'],
-                    oid_type=row['oid_type'],
-                    work_type=row['work_type'],
-                    defaults={
-                        'has_expiration': row['has_expiration'].upper() == 'TRUE',
-                        'duration_months': int(row['duration_months'])
-                    }
+        self._create(Person, pending, stats)
+
+    def _import_document_types(self, rows, line, stats):
+        type_map = self._map('document_type')
+        pending = {}
+        for row in rows:
+            key = (row['name'].strip(), row['oid_type'].strip(), row['work_type'].strip())
+            if key not in type_map and key not in pending:
+                pending[key] = DocumentType(
+                    name=key[0], oid_type=key[1], work_type=key[2],
+                    has_expiration=row['has_expiration'].upper() == 'TRUE',
+                    duration_months=int(row['duration_months']),
                 )
-        self.stdout.write(self.style.SUCCESS('  Типи документів імпортовано.'))
-
-    # def _import_oids(self, file_path):
-    #     self.stdout.write(f"Імпорт ОІД з {file_path}...")
-    #     with open(file_path, mode='r', encoding='utf-8') as csvfile:
-    #         reader = csv.DictReader(csvfile)
-    #         for row in reader:
-    #             try:
-    #                 unit_instance = Unit.objects.get(code=row['unit_code'])
-    #                 OID.objects.get_or_create(
-    #                     cipher=row['cipher'],
-    #                     defaults={ # Змінив на defaults, щоб не оновлювати існуючі ОІД
-    #                         'unit': unit_instance,
-    #                         'oid_type': row['oid_type'], 'full_name': row['full_name'],
-    #                         'room': row['room'], 'status': row['status'],
-    #                         'sec_level': row['sec_level']
-    #                     }
-    #                 )
-    #             except Unit.DoesNotExist:
-    #                 self.stdout.write(self.style.WARNING(f"  Попередження: ВЧ з кодом '{row['unit_code']}' не знайдено для ОІД '{row['cipher']}'. Пропускаємо."))
-    #                 continue
-    #     self.stdout.write(self.style.SUCCESS('  ОІД імпортовано.'))
-
-    def _import_oids(self, file_path):
-        self.stdout.write(f"Імпорт ОІД з {file_path}...")
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                try:
-                    unit_instance = Unit.objects.get(code=row['unit_code'])
-                    
-                    # Створюємо або знаходимо ОІД за його унікальним шифром
-                    oid_instance, created = OID.objects.get_or_create(
-                        cipher=row['cipher'],
-                        # Ми шукаємо за шифром, тому він має бути унікальним.
-                        # Якщо шифри не унікальні, потрібно додати unit до пошуку:
-                        # unit=unit_instance,
-                        defaults={
-                            'unit': unit_instance,
-                            'oid_type': row['oid_type'],
-                            'full_name': row['full_name'],
-                            'room': row['room'],
-                            'status': row['status'],
-                            'sec_level': row.get('sec_level', 'Таємно'), # Значення за замовчуванням, якщо поле відсутнє
-                            
-                            # --- НОВІ ПОЛЯ ---
-                            # Використовуємо .get() для необов'язкових полів.
-                            # Якщо в CSV немає стовпця, .get() поверне None, і поле в базі буде NULL.
-                            'pemin_sub_type': row.get('pemin_sub_type') or None,
-                            'serial_number': row.get('serial_number') or None,
-                            'inventory_number': row.get('inventory_number') or None,
-                            'note': row.get('note') or None,
-                        }
-                    )
-                    
-                    if created:
-                        self.stdout.write(f"  Створено ОІД: {oid_instance.cipher}")
-                    else:
-                        self.stdout.write(f"  ОІД {oid_instance.cipher} вже існує, не оновлювався.")
-
-                except Unit.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"  Попередження: ВЧ з кодом '{row['unit_code']}' не знайдено для ОІД '{row['cipher']}'. Пропускаємо."))
-                    continue
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"  Помилка при обробці ОІД '{row.get('cipher', 'N/A')}': {e}"))
-                    
-        self.stdout.write(self.style.SUCCESS('  Імпорт ОІД завершено.'))
-        
-    def _import_work_requests(self, file_path):
-        self.stdout.write(f"Імпорт заявок на роботи з {file_path}...")
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                try:
-                    unit_instance = Unit.objects.get(code=row['unit_code'])
-                    WorkRequest.objects.get_or_create(
-                        unit=unit_instance,
-                        incoming_number=row['incoming_number'],
-                        defaults={
-                            'incoming_date': datetime.datetime.strptime(row['incoming_date'], '%Y-%m-%d').date(),
-                            'status': row['status'],
-                            # 'note': row['note']
-                        }
-                    )
-                except Unit.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"  Попередження: ВЧ з кодом '{row['unit_code']}' не знайдено для заявки '{row['incoming_number']}'. Пропускаємо."))
-                    continue
-        self.stdout.write(self.style.SUCCESS('  Заявки на роботи імпортовано.'))
-
-    def _import_work_request_items(self, file_path):
-        self.stdout.write(f"Імпорт елементів заявок з {file_path}...")
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                try:
-                    request_instance = WorkRequest.objects.get(
-                        unit__code=row['request_unit_code'],
-                        incoming_number=row['request_incoming_number']
-                    )
-                    oid_instance = OID.objects.get(cipher=row['oid_cipher'])
-                    WorkRequestItem.objects.get_or_create(
-                        request=request_instance,
-                        oid=oid_instance,
-                        work_type=row['work_type'],
-                        defaults={'status': row['status']}
-                    )
-                except WorkRequest.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"  Попередження: Заявку '{row['request_incoming_number']}' для ВЧ '{row['request_unit_code']}' не знайдено. Пропускаємо елемент."))
-                    continue
-                except OID.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"  Попередження: ОІД з шифром '{row['oid_cipher']}' не знайдено. Пропускаємо елемент."))
+        self._create(DocumentType, pending, stats)
+        self._document_types = None
+
+    def _import_oids(self, rows, line, stats):
+        unit_map, oid_map = self._map('unit'), self._map('oid')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            cipher = row['cipher'].strip()
+            unit_id = unit_map.get(row['unit_code'])
+            if unit_id is None:
+                self._skip(stats, i, f"ВЧ з кодом '{row['unit_code']}' не знайдено для ОІД '{cipher}'. Пропускаємо.")
+                continue
+            key = (unit_id, cipher)
+            if key in oid_map or key in pending:
+                # ОІД вже існує - не оновлюється
+                continue
+            oid = OID(
+                unit_id=unit_id,
+                cipher=cipher,
+                oid_type=row['oid_type'],
+                full_name=row['full_name'],
+                room=row['room'],
+                status=row['status'],
+                sec_level=row.get('sec_level', 'Таємно'), # Значення за замовчуванням, якщо поле відсутнє
+                # Необов'язкові поля: якщо в CSV немає стовпця, поле в базі буде NULL
+                pemin_sub_type=row.get('pemin_sub_type') or None,
+                serial_number=row.get('serial_number') or None,
+                inventory_number=row.get('inventory_number') or None,
+                note=row.get('note') or None,
+            )
+            try:
+                # Та сама валідація, що й в OID.save(), але без запитів (ВЧ та унікальність перевірені словником)
+                oid.full_clean(exclude=['unit'], validate_unique=False, validate_constraints=False)
+            except ValidationError as e:
+                self._skip(stats, i, f"ОІД '{cipher}' не пройшов перевірку: {'; '.join(e.messages)}")
+                continue
+            pending[key] = oid
+        self._create(OID, pending, stats)
+
+    def _import_dsk_eot(self, rows, line, stats):
+        unit_map, dsk_eot_map = self._map('unit'), self._map('dsk_eot')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            cipher = row['cipher'].strip()
+            unit_id = unit_map.get(row['unit_code'])
+            if unit_id is None:
+                self._skip(stats, i, f"ВЧ з кодом '{row['unit_code']}' не знайдено для ДСК ЕОТ '{cipher}'. Пропускаємо.")
+                continue
+            key = (unit_id, cipher)
+            if key not in dsk_eot_map and key not in pending:
+                pending[key] = DskEot(
+                    unit_id=unit_id, cipher=cipher,
+                    serial_number=row.get('serial_number'),
+                    inventory_number=row.get('inventory_number'),
+                    room=row.get('room'),
+                    security_level=row.get('security_level', 'ДСК'),
+                )
+        self._create(DskEot, pending, stats)
+
+    def _import_work_requests(self, rows, line, stats):
+        unit_map, request_map = self._map('unit'), self._map('work_request')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            incoming_number = row['incoming_number'].strip()
+            unit_id = unit_map.get(row['unit_code'])
+            if unit_id is None:
+                self._skip(stats, i, f"ВЧ з кодом '{row['unit_code']}' не знайдено для заявки '{incoming_number}'. Пропускаємо.")
+                continue
+            key = (unit_id, incoming_number)
+            if key in request_map or key in pending:
+                continue
+            incoming_date = self._date(row, 'incoming_date')
+            if incoming_date is None:
+                self._skip(stats, i, f"Невірна дата заявки '{row['incoming_date']}' ('{incoming_number}'). Пропускаємо.")
+                continue
+            pending[key] = WorkRequest(
+                unit_id=unit_id, incoming_number=incoming_number,
+                incoming_date=incoming_date, status=row['status'],
+            )
+        self._create(WorkRequest, pending, stats)
+
+    def _import_work_request_items(self, rows, line, stats):
+        unit_map, oid_map = self._map('unit'), self._map('oid')
+        request_map, item_map = self._map('work_request'), self._map('work_request_item')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            unit_id = unit_map.get(row['request_unit_code'])
+            request_id = request_map.get((unit_id, row['request_incoming_number'])) if unit_id else None
+            if request_id is None:
+                self._skip(stats, i, f"Заявку '{row['request_incoming_number']}' для ВЧ '{row['request_unit_code']}' не знайдено. Пропускаємо елемент.")
+                continue
+            # ОІД шукаємо в тій же ВЧ, що й заявка (шифр унікальний лише в межах ВЧ)
+            oid_id = oid_map.get((unit_id, row['oid_cipher']))
+            if oid_id is None:
+                self._skip(stats, i, f"ОІД з шифром '{row['oid_cipher']}' не знайдено у ВЧ '{row['request_unit_code']}'. Пропускаємо елемент.")
+                continue
+            key = (request_id, oid_id, row['work_type'].strip())
+            if key not in item_map and key not in pending:
+                pending[key] = WorkRequestItem(
+                    request_id=request_id, oid_id=oid_id, work_type=key[2], status=row['status'],
+                )
+        created = self._create(WorkRequestItem, pending, stats)
+        # Статуси батьківських заявок - один раз після коміту порції (status_sync)
+        mark_work_requests({item.request_id for item in created})
+        search_index.reindex(search_index.WORK_REQUEST, {item.request_id for item in created})
+
+    def _import_technical_tasks(self, rows, line, stats):
+        oid_map, person_map, task_map = self._map('oid_cipher'), self._map('person'), self._map('technical_task')
+        for i, row in enumerate(rows, start=line):
+            input_number = row['input_number'].strip()
+            oid_id = oid_map.get(row['oid_cipher'])
+            if oid_id is None:
+                reason = "неоднозначний (є в кількох ВЧ)" if oid_map.is_ambiguous(row['oid_cipher']) else "не знайдено"
+                self._skip(stats, i, f"ОІД '{row['oid_cipher']}' {reason} для ТЗ '{input_number}'. Пропускаємо.")
+                continue
+            if (oid_id, input_number) in task_map:
+                continue
+            reviewed_by_id = None
+            if row.get('reviewed_by_full_name'):
+                reviewed_by_id = person_map.get(row['reviewed_by_full_name'])
+                if reviewed_by_id is None:
+                    self._skip(stats, i, f"Виконавця '{row['reviewed_by_full_name']}' не знайдено для ТЗ '{input_number}'. Пропускаємо.")
                     continue
-        self.stdout.write(self.style.SUCCESS('  Елементи заявок імпортовано.'))
-        
-          
-    def _import_documents(self, file_path):
-        self.stdout.write(f"Імпорт документів з {file_path}...")
-        
-        with open(file_path, mode='r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for i, row in enumerate(reader, start=2):
-                document_number = row.get('document_number', f'в рядку {i}')
-                try:
-                    # --- 1. НАДІЙНИЙ ПОШУК ОІДа ЗА КОМБІНАЦІЄЮ ВЧ + ШИФР ---
-                    # Переконуємося, що в CSV є стовпці 'unit_code' та 'oid_cipher'
-                    unit_code = row['unit_code']
-                    oid_cipher = row['oid_cipher']
-                    
-                    oid_instance = OID.objects.get(
-                        unit__code=unit_code,
-                        cipher=oid_cipher
-                    )
-                    
-                    # --- Решта логіки пошуку залишається без змін ---
-                    doc_type_instance = DocumentType.objects.get(
-                        name=row['document_type_name'],
-                        oid_type=row['document_type_oid_type'],
-                        work_type=row['document_type_work_type']
-                    )
-                    author_instance = Person.objects.get(full_name=row['author_full_name'])
-
-                    # --- 2. Парсинг дат (без змін) ---
-                    doc_process_date = self._parse_date(row.get('doc_process_date'))
-                    work_date = self._parse_date(row.get('work_date'))
-                    dsszzi_registered_date = self._parse_date(row.get('dsszzi_registered_date'))
-                    
-                    if not doc_process_date or not work_date:
-                        raise ValueError(f"Обов'язкові дати (doc_process_date, work_date) не можуть бути порожніми.")
-
-                    # --- 3. Зв'язок з WorkRequestItem (без змін) ---
-                    wri_instance = None
-                    if row.get('wri_request_number') and row.get('wri_oid_cipher'):
-                        try:
-                            # Шукаємо WRI, використовуючи вже точно знайдений ОІД
-                            wri_instance = WorkRequestItem.objects.get(
-                                request__incoming_number=row['wri_request_number'],
-                                oid=oid_instance 
-                            )
-                        except WorkRequestItem.DoesNotExist:
-                            self.stdout.write(self.style.WARNING(f"  Попередження: WRI для заявки '{row.get('wri_request_number')}' та ОІД '{row.get('wri_oid_cipher')}' не знайдено."))
-                        except WorkRequestItem.MultipleObjectsReturned:
-                            self.stdout.write(self.style.WARNING(f"  Попередження: Знайдено декілька WRI для документа '{document_number}'. Зв'язок не встановлено."))
-                    
-                   # 4. Створюємо АБО ОНОВЛЮЄМО документ
-                    # Використовуємо update_or_create для гарантованого оновлення
-                    doc, created = Document.objects.update_or_create(
-                        document_number=document_number,
-                        oid=oid_instance,
-                        defaults={
-                            'document_type': doc_type_instance,
-                            'doc_process_date': doc_process_date,
-                            'work_date': work_date,
-                            'author': author_instance,
-                            'work_request_item': wri_instance,
-                            'dsszzi_registered_number': row.get('dsszzi_registered_number') or None,
-                            'dsszzi_registered_date': dsszzi_registered_date,
-                            'expiration_date': None
-                        }
+            # Поштучно: TechnicalTask.save() змінює статус ОІД та пише OIDStatusChange
+            task = TechnicalTask(
+                oid_id=oid_id, input_number=input_number,
+                input_date=self._date(row, 'input_date'),
+                read_till_date=self._date(row, 'read_till_date'),
+                review_result=row['review_result'],
+                reviewed_by_id=reviewed_by_id,
+            )
+            task.save()
+            task_map.add((oid_id, input_number), task.pk)
+            stats.created += 1
+
+    def _import_documents(self, rows, line, stats):
+        unit_map, oid_map = self._map('unit'), self._map('oid')
+        type_map, person_map = self._map('document_type'), self._map('person')
+        document_types = self._get_document_types()
+
+        # 1. Розбір рядків та пошук зв'язків у словниках
+        parsed = []
+        for i, row in enumerate(rows, start=line):
+            document_number = row.get('document_number', f'в рядку {i}')
+            try:
+                unit_id = unit_map.get(row['unit_code'])
+                oid_id = oid_map.get((unit_id, row['oid_cipher'])) if unit_id else None
+                if oid_id is None:
+                    raise ValueError(f"ОІД з шифром '{row['oid_cipher']}' для ВЧ '{row['unit_code']}' не знайдено.")
+                type_id = type_map.get((row['document_type_name'], row['document_type_oid_type'], row['document_type_work_type']))
+                if type_id is None:
+                    raise ValueError(
+                        f"Тип документа з параметрами (name='{row['document_type_name']}', oid_type='{row['document_type_oid_type']}', "
+                        f"work_type='{row['document_type_work_type']}') не знайдено в базі."
                     )
-                    print(f"DEBUG: self.document_type {doc_type_instance}  ")
-                    print(f"DEBUG: self.document_type {row.get('document_type_name')}  ")
-                    print(f"DEBUG: self.document_type {row.get('document_type_oid_type')}  ")
-                    print(f"DEBUG: self.document_type {row.get('document_type_work_type')}  ")
-                    print(f"DEBUG: self.document_type {row.get('doc_process_date')}  ")
-                    print(f"DEBUG: self.document_type {row.get('work_date')}  ")
-                    print(f"DEBUG: self.document_type {row.get('author')}  ")
-                    print(f"DEBUG: self.document_type {row.get('work_request_item')}  ")
-                    print(f"DEBUG: self.document_type {row.get('dsszzi_registered_number')}  ")
-                    print(f"DEBUG: self.document_type {row.get('dsszzi_registered_date')}  ")
-
-                    if not created:
-                        self.stdout.write(f"  Документ '{document_number}' для ОІД '{oid_cipher}' вже існує.")
-                    else:
-                        self.stdout.write(f"  Успішно імпортовано документ '{document_number}'")
-
-                # --- Блок обробки помилок ---
-                except OID.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Не вдалося імпортувати документ '{document_number}'. Причина: ОІД з шифром '{row.get('oid_cipher')}' для ВЧ '{row.get('unit_code')}' не знайдено."))
-                except KeyError as e:
-                    self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: У CSV-файлі відсутній необхідний стовпець: {e}."))
-                except DocumentType.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Не вдалося імпортувати документ '{document_number}'. Причина: Тип документа з параметрами (name='{row.get('document_type_name')}', oid_type='{row.get('document_type_oid_type')}', work_type='{row.get('document_type_work_type')}') не знайдено в базі."))
-                except Person.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Не вдалося імпортувати документ '{document_number}'. Причина: Виконавець з ім'ям '{row.get('author_full_name')}' не знайдений."))
-                except ValueError as e:
-                    self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Не вдалося імпортувати документ '{document_number}'. Причина: {e}"))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"  НЕВІДОМА ПОМИЛКА в рядку {i} для документа '{document_number}': {e}"))
-        
-        self.stdout.write(self.style.SUCCESS('  Імпорт документів завершено.'))
-  
-    # --- НОВІ ФУНКЦІЇ ІМПОРТУ ---
-
-    def _import_dsk_eot(self, file_path):
-        self.stdout.write(f"Імпорт об'єктів ДСК ЕОТ з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        unit_instance = Unit.objects.get(code=row['unit_code'])
-                        DskEot.objects.get_or_create(
-                            cipher=row['cipher'],
-                            unit=unit_instance,
-                            defaults={
-                                'serial_number': row.get('serial_number'),
-                                'inventory_number': row.get('inventory_number'),
-                                'room': row.get('room'),
-                                'security_level': row.get('security_level', 'ДСК'),
-                            }
-                        )
-                    except Unit.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"  Попередження: ВЧ з кодом '{row['unit_code']}' не знайдено для ДСК ЕОТ '{row['cipher']}'. Пропускаємо."))
-                        continue
-            self.stdout.write(self.style.SUCCESS('  Об\'єкти ДСК ЕОТ імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено."))
-
-    def _import_declarations(self, file_path):
-        self.stdout.write(f"Імпорт Декларацій відповідності з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        dsk_eot_instance = DskEot.objects.get(cipher=row['dsk_eot_cipher'])
-                        Declaration.objects.get_or_create(
-                            prepared_number=row['prepared_number'],
-                            dsk_eot=dsk_eot_instance,
-                            defaults={
-                                'prepared_date': self._parse_date(row['prepared_date']),
-                                'registered_number': row.get('registered_number'),
-                                'registered_date': self._parse_date(row.get('registered_date')),
-                            }
-                        )
-                    except DskEot.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"  Попередження: ДСК ЕОТ з шифром '{row['dsk_eot_cipher']}' не знайдено. Пропускаємо декларацію '{row['prepared_number']}'."))
-                        continue
-            self.stdout.write(self.style.SUCCESS('  Декларації відповідності імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено."))
-
-    def _import_technical_tasks(self, file_path):
-        self.stdout.write(f"Імпорт Технічних Завдань з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        oid_instance = OID.objects.get(cipher=row['oid_cipher'])
-                        reviewed_by_instance = Person.objects.get(full_name=row['reviewed_by_full_name']) if row.get('reviewed_by_full_name') else None
-                        
-                        TechnicalTask.objects.get_or_create(
-                            oid=oid_instance,
-                            input_number=row['input_number'],
-                            defaults={
-                                'input_date': self._parse_date(row['input_date']),
-                                'read_till_date': self._parse_date(row['read_till_date']),
-                                'review_result': row['review_result'],
-                                'reviewed_by': reviewed_by_instance
-                            }
-                        )
-                    except OID.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"  Попередження: ОІД '{row['oid_cipher']}' не знайдено для ТЗ '{row['input_number']}'. Пропускаємо."))
-                    except Person.DoesNotExist:
-                         self.stdout.write(self.style.WARNING(f"  Попередження: Виконавця '{row['reviewed_by_full_name']}' не знайдено для ТЗ '{row['input_number']}'. Пропускаємо."))
-            self.stdout.write(self.style.SUCCESS('  Технічні Завдання імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено."))
-
-    def _import_trips(self, file_path):
-        self.stdout.write(f"Імпорт Відряджень з {file_path}...")
-        try:
-            with open(file_path, mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        # Створюємо або знаходимо відрядження за унікальним полем, наприклад, purpose
-                        trip_instance, created = Trip.objects.get_or_create(
-                            purpose=row['purpose'],
-                            start_date=self._parse_date(row['start_date']),
-                            end_date=self._parse_date(row['end_date']),
-                        )
-                        if created:
-                            # Додаємо M2M зв'язки, якщо це новий запис
-                            unit_codes = [code.strip() for code in row.get('unit_codes', '').split(',') if code.strip()]
-                            oid_ciphers = [cipher.strip() for cipher in row.get('oid_ciphers', '').split(',') if cipher.strip()]
-                            person_names = [name.strip() for name in row.get('person_names', '').split(',') if name.strip()]
-                            wr_numbers = [num.strip() for num in row.get('wr_numbers', '').split(',') if num.strip()]
-
-                            trip_instance.units.set(Unit.objects.filter(code__in=unit_codes))
-                            trip_instance.oids.set(OID.objects.filter(cipher__in=oid_ciphers))
-                            trip_instance.persons.set(Person.objects.filter(full_name__in=person_names))
-                            trip_instance.work_requests.set(WorkRequest.objects.filter(incoming_number__in=wr_numbers))
-                            
-                            self.stdout.write(f"  Створено відрядження: '{trip_instance.purpose[:50]}...'")
-                        else:
-                            self.stdout.write(f"  Відрядження '{trip_instance.purpose[:50]}...' вже існує.")
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"  Помилка при обробці рядка для відрядження '{row.get('purpose')}': {e}"))
-            self.stdout.write(self.style.SUCCESS('  Відрядження імпортовано.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"Помилка: файл '{file_path}' не знайдено."))
\ No newline at end of file
+                author_id = person_map.get(row['author_full_name'])
+                if author_id is None:
+                    raise ValueError(f"Виконавець з ім'ям '{row['author_full_name']}' не знайдений.")
+                doc_process_date = self._date(row, 'doc_process_date')
+                work_date = self._date(row, 'work_date')
+                if not doc_process_date or not work_date:
+                    raise ValueError("Обов'язкові дати (doc_process_date, work_date) не можуть бути порожніми.")
+            except KeyError as e:
+                self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: У CSV-файлі відсутній необхідний стовпець: {e}."))
+                stats.skipped += 1
+                continue
+            except ValueError as e:
+                self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Не вдалося імпортувати документ '{document_number}'. Причина: {e}"))
+                stats.skipped += 1
+                continue
+            parsed.append((i, row, document_number, oid_id, {
+                'document_type': document_types[type_id],
+                'doc_process_date': doc_process_date,
+                'work_date': work_date,
+                'author_id': author_id,
+                'dsszzi_registered_number': row.get('dsszzi_registered_number') or None,
+                'dsszzi_registered_date': self._date(row, 'dsszzi_registered_date'),
+            }))
+        if not parsed:
+            return
+
+        # 2. Елементи заявок та вже імпортовані документи порції - по одному запиту
+        oid_ids = {oid_id for _, _, _, oid_id, _ in parsed}
+        request_numbers = {row['wri_request_number'] for _, row, _, _, _ in parsed if row.get('wri_request_number')}
+        item_map = NaturalKeyMap(
+            WorkRequestItem.objects.filter(oid_id__in=oid_ids, request__incoming_number__in=request_numbers),
+            'oid_id', 'request__incoming_number',
+        )
+        existing = {}
+        for document in Document.objects.filter(
+            oid_id__in=oid_ids, document_number__in={number for _, _, number, _, _ in parsed},
+        ):
+            existing.setdefault((document.oid_id, document.document_number), []).append(document)
+
+        # 3. Створення АБО оновлення (семантика update_or_create за (document_number, ОІД))
+        to_create, to_update = {}, {}
+        was_registered = {}
+        previous_items = set()
+        for i, row, document_number, oid_id, values in parsed:
+            wri_id = None
+            if row.get('wri_request_number') and row.get('wri_oid_cipher'):
+                wri_key = (oid_id, row['wri_request_number'])
+                wri_id = item_map.get(wri_key)
+                if item_map.is_ambiguous(wri_key):
+                    self.stdout.write(self.style.WARNING(f"  Попередження: Знайдено декілька WRI для документа '{document_number}'. Зв'язок не встановлено."))
+                elif wri_id is None:
+                    self.stdout.write(self.style.WARNING(f"  Попередження: WRI для заявки '{row.get('wri_request_number')}' та ОІД '{row.get('wri_oid_cipher')}' не знайдено."))
+            values['work_request_item_id'] = wri_id
+
+            key = (oid_id, document_number)
+            matches = existing.get(key, [])
+            if len(matches) > 1:
+                self.stdout.write(self.style.ERROR(f"  ПОМИЛКА в рядку {i}: Документ '{document_number}' існує для ОІД у кількох примірниках. Пропускаємо."))
+                stats.skipped += 1
+                continue
+            document = to_create.get(key) or (matches[0] if matches else None)
+            if document is None:
+                to_create[key] = Document(oid_id=oid_id, document_number=document_number, **values)
+                continue
+            if document.pk:
+                was_registered.setdefault(document.pk, bool(document.dsszzi_registered_number))
+                previous_items.add(document.work_request_item_id)
+                to_update[document.pk] = document
+            for field, value in values.items():
+                setattr(document, field, value)
+
+        # Нові - через пакетне внесення (історія, ефекти статусів, кроки процесів, status_sync)
+        created = ingest_documents(to_create.values(), batch_size=self.batch_size)
+        stats.created += len(created)
+
+        updated = list(to_update.values())
+        if updated:
+            for document in updated:
+                document.expiration_date = document.compute_expiration_date()
+            bulk_update_objects(Document, updated, DOCUMENT_UPDATE_FIELDS, self.batch_size)
+            # "Ефект доміно" Document.save() - лише для документів, що щойно отримали реєстрацію
+            for document in updated:
+                if not was_registered[document.pk] and document.dsszzi_registered_number and document.dsszzi_registered_date:
+                    document.apply_status_effects(is_newly_created=False, was_registered=False)
+            complete_process_steps_for_documents(updated)
+            mark_documents(updated)
+            mark_work_request_items(previous_items)
+            search_index.reindex(search_index.DOCUMENT, to_update)
+            stats.updated += len(updated)
+
+    def _import_declarations(self, rows, line, stats):
+        dsk_eot_map, declaration_map = self._map('dsk_eot_cipher'), self._map('declaration')
+        pending = {}
+        for i, row in enumerate(rows, start=line):
+            prepared_number = row['prepared_number'].strip()
+            dsk_eot_id = dsk_eot_map.get(row['dsk_eot_cipher'])
+            if dsk_eot_id is None:
+                reason = "неоднозначний (є в кількох ВЧ)" if dsk_eot_map.is_ambiguous(row['dsk_eot_cipher']) else "не знайдено"
+                self._skip(stats, i, f"ДСК ЕОТ з шифром '{row['dsk_eot_cipher']}' {reason}. Пропускаємо декларацію '{prepared_number}'.")
+                continue
+            key = (dsk_eot_id, prepared_number)
+            if key in declaration_map or key in pending:
+                continue
+            prepared_date = self._date(row, 'prepared_date')
+            if prepared_date is None:
+                self._skip(stats, i, f"Невірна дата декларації '{row['prepared_date']}' ('{prepared_number}'). Пропускаємо.")
+                continue
+            pending[key] = Declaration(
+                dsk_eot_id=dsk_eot_id, prepared_number=prepared_number,
+                prepared_date=prepared_date,
+                registered_number=row.get('registered_number'),
+                registered_date=self._date(row, 'registered_date'),
+            )
+        self._create(Declaration, pending, stats)
+
+    def _import_trips(self, rows, line, stats):
+        trip_map = self._map('trip')
+        unit_map, oid_map, person_map = self._map('unit'), self._map('oid_cipher'), self._map('person')
+        request_map = self._map('work_request_number')
+        for i, row in enumerate(rows, start=line):
+            start_date, end_date = self._date(row, 'start_date'), self._date(row, 'end_date')
+            if start_date is None or end_date is None:
+                self._skip(stats, i, f"Невірні дати відрядження '{row.get('purpose')}'. Пропускаємо.")
+                continue
+            key = (row['purpose'], start_date, end_date)
+            if key in trip_map:
+                continue
+            # Поштучно: M2M-сигнали відрядження розраховують дедлайни елементів заявок
+            trip = Trip.objects.create(purpose=row['purpose'], start_date=start_date, end_date=end_date)
+            trip.units.set(pk for code in _split_list(row.get('unit_codes')) for pk in unit_map.get_all(code))
+            trip.oids.set(pk for cipher in _split_list(row.get('oid_ciphers')) for pk in oid_map.get_all(cipher))
+            trip.persons.set(pk for name in _split_list(row.get('person_names')) for pk in person_map.get_all(name))
+            trip.work_requests.set(pk for number in _split_list(row.get('wr_numbers')) for pk in request_map.get_all(number))
+            trip_map.add(key, trip.pk)
+            stats.created += 1
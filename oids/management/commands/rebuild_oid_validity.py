@@ -0,0 +1,24 @@
+# oids/management/commands/rebuild_oid_validity.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from oids.models import OID
+from oids.services import rebuild_oid_validity
+
+
+class Command(BaseCommand):
+    help = 'Повністю перебудовує таблицю знімків стану дії ОІД (OIDValiditySnapshot)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Кількість ОІД, що обробляються за один прохід')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Found {OID.objects.count()} OIDs")
+
+        def progress(done, total):
+            self.stdout.write(f"  ... {done}/{total}")
+
+        with transaction.atomic():
+            refreshed = rebuild_oid_validity(chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {refreshed} OID validity snapshots!'))
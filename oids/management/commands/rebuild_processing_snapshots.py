@@ -0,0 +1,30 @@
+# oids/management/commands/rebuild_processing_snapshots.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from oids.models import WorkRequest, WorkRequestItem
+from oids.services import rebuild_processing_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Повністю перебудовує read model сторінки "Контроль опрацювання": '
+            'останні відрядження заявок (WorkRequestTripSnapshot) та дати опрацювання '
+            'елементів заявок (WorkRequestItemProcessingSnapshot)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Кількість записів, що обробляються за один прохід')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Found {WorkRequest.objects.count()} work requests, "
+                          f"{WorkRequestItem.objects.count()} work request items")
+
+        def progress(done, total):
+            self.stdout.write(f"  ... {done}/{total}")
+
+        with transaction.atomic():
+            trips_refreshed, items_refreshed = rebuild_processing_snapshots(
+                chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt {trips_refreshed} work request trip snapshots and {items_refreshed} processing snapshots!'
+        ))
@@ -0,0 +1,27 @@
+# oids/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from oids import search_index
+
+
+class Command(BaseCommand):
+    help = 'Повністю перебудовує повнотекстовий пошуковий індекс (ОІД, ВЧ, документи, заявки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(search_index.KIND_CODES),
+                            help='Тип записів для перебудови (можна кілька); за замовчуванням - усі')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Кількість об\'єктів за один прохід')
+
+    def handle(self, *args, **options):
+        if not search_index.is_available():
+            raise CommandError("Пошуковий індекс підтримується лише для SQLite (FTS5).")
+
+        def progress(kind, done, total):
+            self.stdout.write(f"  ... {search_index.KIND_LABELS[kind]}: {done}/{total}")
+
+        with transaction.atomic():
+            counts = search_index.rebuild(options['kind'], chunk_size=options['chunk_size'], progress=progress)
+
+        summary = ', '.join(f"{search_index.KIND_LABELS[kind]}: {count}" for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'✅ Пошуковий індекс перебудовано ({summary})'))
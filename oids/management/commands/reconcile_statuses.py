@@ -0,0 +1,57 @@
+# oids/management/commands/reconcile_statuses.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from oids.models import Unit, WorkRequestStatusChoices
+from oids.reconciliation import reconcile_statuses
+
+
+def status_label(status):
+    try:
+        return WorkRequestStatusChoices(status).label
+    except ValueError:
+        return status
+
+
+def write_summary(command, result):
+    """Підсумок звірки: перевірено / виправлено, переходи статусів."""
+    action = 'Would correct' if result.dry_run else 'Corrected'
+    command.stdout.write(f"Checked {result.items_checked} work request items, {result.work_requests_checked} work requests")
+    for title, changes in (('Work request items', result.item_changes), ('Work requests', result.work_request_changes)):
+        for (old_status, new_status), count in sorted(changes.items(), key=lambda change: -change[1]):
+            command.stdout.write(f"  {title}: {status_label(old_status)} -> {status_label(new_status)}: {count}")
+    if result.processed_dates_filled:
+        command.stdout.write(f"  Work request items: processed date filled: {result.processed_dates_filled}")
+    command.stdout.write(command.style.SUCCESS(
+        f'✅ {action} {result.items_corrected} work request items and {result.work_requests_corrected} work requests!'
+    ))
+
+
+class Command(BaseCommand):
+    help = ('Звіряє статуси елементів заявок (за документами) та заявок (за елементами) з очікуваними '
+            'і зберігає лише відмінності (пакетно)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати відмінності, нічого не змінюючи')
+        parser.add_argument('--unit', action='append', dest='units', metavar='CODE',
+                            help='Лише заявки цієї ВЧ (код; можна вказати кілька разів)')
+        parser.add_argument('--since', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Лише елементи та заявки, змінені (або з документами, зміненими) з цієї дати')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Кількість записів, що обробляються за один прохід')
+
+    def handle(self, *args, **options):
+        units = options['units']
+        if units:
+            unknown = set(units) - set(Unit.objects.filter(code__in=units).values_list('code', flat=True))
+            if unknown:
+                raise CommandError(f"Невідомі ВЧ: {', '.join(sorted(unknown))}")
+
+        result = reconcile_statuses(
+            unit_codes=units,
+            since=options['since'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        write_summary(self, result)
@@ -2,20 +2,23 @@
 # oids/management/commands/update_trip_result_statuses.py
 
 from django.core.management.base import BaseCommand
-from oids.models import TripResultForUnit
+
+from oids.management.commands.reconcile_statuses import write_summary
+from oids.models import TripResultForUnit, WorkRequestItem
+from oids.reconciliation import reconcile_statuses
+
+
 class Command(BaseCommand):
     help = 'Оновлює статуси WorkRequestItem для всіх відправок у в/ч'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати відмінності, нічого не змінюючи')
+
     def handle(self, *args, **options):
-        trip_results = TripResultForUnit.objects.all()
-        
-        self.stdout.write(f"Found {trip_results.count()} trip results")
-        
-        for trip_result in trip_results:
-            self.stdout.write(f"\nProcessing TripResult ID {trip_result.id}")
-            trip_result.update_related_wri_statuses()
-        
-        self.stdout.write(self.style.SUCCESS('\n✅ All statuses updated!'))
+        self.stdout.write(f"Found {TripResultForUnit.objects.count()} trip results")
+        # Елементи заявок документів усіх відправок - звірка пакетами (oids/reconciliation.py)
+        items = WorkRequestItem.objects.filter(produced_documents__sent_in_trip_results__isnull=False)
+        write_summary(self, reconcile_statuses(items=items, dry_run=options['dry_run']))
 
 
 # ВИКОРИСТАННЯ:
@@ -30,4 +33,7 @@ test_trip_result_status_update(1)  # ID вашої відправки
 
 # 3. Management command для масового оновлення:
 python manage.py update_trip_result_statuses
+
+# 4. Звірка всіх статусів (з фільтрами --unit, --since, --dry-run):
+python manage.py reconcile_statuses --dry-run
 """
\ No newline at end of file
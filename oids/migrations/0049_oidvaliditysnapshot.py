@@ -0,0 +1,101 @@
+# Generated by Django 6.1.2 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, CharField, F, Max, Value, When, Window
+from django.db.models.functions import RowNumber
+
+# Категорія -> ключове слово в назві DocumentType (копія document_roles.DOCUMENT_ROLE_KEYWORDS
+# на момент міграції; порядок - як у services.EXPIRATION_CATEGORIES)
+EXPIRATION_KEYWORDS = {
+    'ik': 'Висновок',
+    'attestation': 'Акт атестації',
+    'prescription': 'Припис',
+}
+
+
+def backfill_oid_validity(apps, schema_editor):
+    """
+    Знімки для вже існуючих ОІД на історичних моделях - та сама логіка, що й
+    services.refresh_oid_validity (`manage.py rebuild_oid_validity`): останній документ
+    кожної категорії через ROW_NUMBER(), дата останніх робіт - Max, запис - bulk_create.
+    """
+    OID = apps.get_model('oids', 'OID')
+    Document = apps.get_model('oids', 'Document')
+    DocumentType = apps.get_model('oids', 'DocumentType')
+    OIDValiditySnapshot = apps.get_model('oids', 'OIDValiditySnapshot')
+
+    oid_ids = list(OID.objects.order_by('pk').values_list('pk', flat=True))
+    if not oid_ids:
+        return
+
+    type_ids = {category: [] for category in EXPIRATION_KEYWORDS}
+    for type_id, name in DocumentType.objects.values_list('pk', 'name'):
+        for category, keyword in EXPIRATION_KEYWORDS.items():
+            if keyword.lower() in name.lower():
+                type_ids[category].append(type_id)
+
+    expirations = {oid_id: dict.fromkeys(EXPIRATION_KEYWORDS) for oid_id in oid_ids}
+    whens = [When(document_type_id__in=ids, then=Value(category)) for category, ids in type_ids.items() if ids]
+    if whens:
+        category_expr = Case(*whens, default=Value(None), output_field=CharField())
+        latest_documents = Document.objects.filter(
+            expiration_date__isnull=False,
+        ).annotate(
+            category=category_expr,
+        ).filter(
+            category__isnull=False,
+        ).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('oid_id'), category_expr],
+                order_by=[F('work_date').desc(), F('doc_process_date').desc(), F('pk').desc()],
+            )
+        ).filter(row_number=1).order_by().values_list('oid_id', 'category', 'expiration_date')
+        for oid_id, category, expiration_date in latest_documents:
+            expirations[oid_id][category] = expiration_date
+
+    last_work_dates = dict(
+        Document.objects.order_by().values('oid_id').annotate(last_work_date=Max('work_date'))
+        .values_list('oid_id', 'last_work_date')
+    )
+
+    snapshots = []
+    for oid_id in oid_ids:
+        known_dates = [date for date in expirations[oid_id].values() if date]
+        snapshots.append(OIDValiditySnapshot(
+            oid_id=oid_id,
+            attestation_expiration_date=expirations[oid_id]['attestation'],
+            ik_expiration_date=expirations[oid_id]['ik'],
+            prescription_expiration_date=expirations[oid_id]['prescription'],
+            last_work_date=last_work_dates.get(oid_id),
+            next_expiration_date=min(known_dates) if known_dates else None,
+        ))
+    OIDValiditySnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oids', '0048_alter_documenttype_options_documenttype_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OIDValiditySnapshot',
+            fields=[
+                ('oid', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='validity', serialize=False, to='oids.oid', verbose_name='ОІД')),
+                ('attestation_expiration_date', models.DateField(blank=True, null=True, verbose_name='Атестація діє до')),
+                ('ik_expiration_date', models.DateField(blank=True, null=True, verbose_name='ІК діє до')),
+                ('prescription_expiration_date', models.DateField(blank=True, null=True, verbose_name='Припис діє до')),
+                ('last_work_date', models.DateField(blank=True, null=True, verbose_name='Дата останніх робіт на ОІД')),
+                ('next_expiration_date', models.DateField(blank=True, db_index=True, null=True, verbose_name='Найближча дата закінчення дії')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата останнього оновлення')),
+            ],
+            options={
+                'verbose_name': 'Стан дії ОІД (знімок)',
+                'verbose_name_plural': 'Стан дії ОІД (знімки)',
+            },
+        ),
+        migrations.RunPython(backfill_oid_validity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oids', '0049_oidvaliditysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='Назва')),
+                ('is_working_day', models.BooleanField(default=False, help_text='Позначте для вихідного дня, який є робочим (перенесення). Інакше - день неробочий.', verbose_name='Робочий день')),
+            ],
+            options={
+                'verbose_name': 'Святковий день',
+                'verbose_name_plural': 'Святкові дні',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
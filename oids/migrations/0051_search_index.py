@@ -0,0 +1,90 @@
+# Повнотекстовий індекс пошуку (oids/search_index.py): SQLite FTS5 з токенізатором trigram.
+# Наповнюється тут же (для вже існуючих записів); повна перебудова - `manage.py rebuild_search_index`.
+
+from collections import defaultdict
+
+from django.db import migrations
+
+# Копія формату записів search_index на момент міграції (rowid = object_id * KIND_SLOTS + код типу)
+KIND_SLOTS = 8
+KIND_CODES = {'oid': 0, 'unit': 1, 'document': 2, 'work_request': 3}
+
+
+def _join(*parts):
+    return '\n'.join(str(part) for part in parts if part)
+
+
+def populate_search_index(apps, schema_editor):
+    """
+    Індексує вже існуючі ОІД, ВЧ, документи та заявки на історичних моделях - ті самі
+    записи, що й search_index.rebuild (`manage.py rebuild_search_index`), з values_list
+    без завантаження об'єктів. Без цього списки з пошуком від 3 символів нічого
+    не знаходили б до ручної перебудови.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    OID = apps.get_model('oids', 'OID')
+    Unit = apps.get_model('oids', 'Unit')
+    Document = apps.get_model('oids', 'Document')
+    WorkRequest = apps.get_model('oids', 'WorkRequest')
+    WorkRequestItem = apps.get_model('oids', 'WorkRequestItem')
+
+    rows = []  # (kind, object_id, label, ref, title, body)
+    ciphers = {}
+    for pk, cipher, full_name, room, note in OID.objects.values_list('pk', 'cipher', 'full_name', 'room', 'note'):
+        ciphers[pk] = cipher
+        rows.append(('oid', pk, f"{cipher} - {full_name}", cipher, cipher, _join(full_name, room, note)))
+
+    units = {}
+    for pk, code, name, city in Unit.objects.values_list('pk', 'code', 'name', 'city'):
+        units[pk] = (code, name)
+        rows.append(('unit', pk, f"{code} - {name or ''}", _join(code, name), code, _join(name, city)))
+
+    for pk, number, registered_number, note, oid_id in Document.objects.values_list(
+            'pk', 'document_number', 'dsszzi_registered_number', 'note', 'oid_id'):
+        cipher = ciphers.get(oid_id, '')
+        rows.append(('document', pk, f"№{number} ({cipher})", '', _join(number, registered_number), _join(note, cipher)))
+
+    request_ciphers = defaultdict(set)
+    for request_id, oid_id in WorkRequestItem.objects.values_list('request_id', 'oid_id'):
+        request_ciphers[request_id].add(ciphers[oid_id])
+    for pk, number, unit_id in WorkRequest.objects.values_list('pk', 'incoming_number', 'unit_id'):
+        code, name = units[unit_id]
+        rows.append(('work_request', pk, f"№{number} ({code})", '',
+                     number, _join(code, name, *sorted(request_ciphers[pk]))))
+
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM oids_search_index")
+        for start in range(0, len(rows), 2000):
+            cursor.executemany(
+                "INSERT INTO oids_search_index (rowid, kind, object_id, label, ref, title, body) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [(pk * KIND_SLOTS + KIND_CODES[kind], kind, pk, *entry)
+                 for kind, pk, *entry in rows[start:start + 2000]],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oids', '0050_holiday'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE VIRTUAL TABLE IF NOT EXISTS oids_search_index USING fts5(
+                    kind UNINDEXED,
+                    object_id UNINDEXED,
+                    label UNINDEXED,
+                    ref UNINDEXED,
+                    title,
+                    body,
+                    tokenize = 'trigram'
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS oids_search_index",
+        ),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:51
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+# Ключові слова ролей у назві DocumentType (копія document_roles.DOCUMENT_ROLE_KEYWORDS на момент міграції)
+ATTESTATION_ACT_KEYWORD = 'Акт атестації'
+IK_CONCLUSION_KEYWORD = 'Висновок'
+
+
+def backfill_processing_snapshots(apps, schema_editor):
+    """
+    Знімки для вже існуючих заявок на історичних моделях - та сама логіка, що й
+    services.refresh_work_request_trip_snapshots / refresh_processing_snapshots
+    (`manage.py rebuild_processing_snapshots`): одне читання M2M відряджень,
+    два агрегуючі запити по документах, запис - bulk_create.
+    Без них "Контроль опрацювання" (INNER JOIN на знімок відрядження) був би порожнім.
+    """
+    Trip = apps.get_model('oids', 'Trip')
+    Document = apps.get_model('oids', 'Document')
+    DocumentType = apps.get_model('oids', 'DocumentType')
+    WorkRequestItem = apps.get_model('oids', 'WorkRequestItem')
+    WorkRequestTripSnapshot = apps.get_model('oids', 'WorkRequestTripSnapshot')
+    WorkRequestItemProcessingSnapshot = apps.get_model('oids', 'WorkRequestItemProcessingSnapshot')
+
+    # Останнє відрядження - з найпізнішою датою завершення (без дати - лише якщо інших немає),
+    # за рівних дат - з більшим id
+    latest = {}
+    for work_request_id, trip_id, start_date, end_date in Trip.work_requests.through.objects.values_list(
+            'workrequest_id', 'trip_id', 'trip__start_date', 'trip__end_date'):
+        key = (end_date is not None, end_date or datetime.date.min, trip_id)
+        if work_request_id not in latest or key > latest[work_request_id][0]:
+            latest[work_request_id] = (key, trip_id, start_date, end_date)
+    WorkRequestTripSnapshot.objects.bulk_create(
+        [
+            WorkRequestTripSnapshot(
+                work_request_id=work_request_id, trip_id=trip_id,
+                trip_start_date=start_date, trip_end_date=end_date,
+            )
+            for work_request_id, (_, trip_id, start_date, end_date) in latest.items()
+        ],
+        batch_size=500,
+    )
+
+    def type_ids(keyword):
+        return [pk for pk, name in DocumentType.objects.values_list('pk', 'name') if keyword.lower() in name.lower()]
+
+    def latest_dates(documents):
+        return dict(
+            documents.filter(work_request_item_id__isnull=False)
+            .order_by()
+            .values('work_request_item_id')
+            .annotate(latest_date=Max('doc_process_date'))
+            .values_list('work_request_item_id', 'latest_date')
+        )
+
+    attestation_dates = latest_dates(Document.objects.filter(
+        document_type_id__in=type_ids(ATTESTATION_ACT_KEYWORD),
+        dsszzi_registered_number__isnull=False,
+        dsszzi_registered_date__isnull=False,
+    ))
+    ik_dates = latest_dates(Document.objects.filter(document_type_id__in=type_ids(IK_CONCLUSION_KEYWORD)))
+    WorkRequestItemProcessingSnapshot.objects.bulk_create(
+        [
+            WorkRequestItemProcessingSnapshot(
+                work_request_item_id=wri_id,
+                final_attestation_date=attestation_dates.get(wri_id),
+                final_ik_date=ik_dates.get(wri_id),
+            )
+            for wri_id in WorkRequestItem.objects.order_by('pk').values_list('pk', flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oids', '0051_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkRequestItemProcessingSnapshot',
+            fields=[
+                ('work_request_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='processing_snapshot', serialize=False, to='oids.workrequestitem', verbose_name='Елемент заявки')),
+                ('final_attestation_date', models.DateField(blank=True, null=True, verbose_name='Дата акту атестації')),
+                ('final_ik_date', models.DateField(blank=True, null=True, verbose_name='Дата висновку ІК')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата останнього оновлення')),
+            ],
+            options={
+                'verbose_name': 'Дати опрацювання елемента заявки (знімок)',
+                'verbose_name_plural': 'Дати опрацювання елементів заявок (знімки)',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkRequestTripSnapshot',
+            fields=[
+                ('work_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trip_snapshot', serialize=False, to='oids.workrequest', verbose_name='Заявка')),
+                ('trip_start_date', models.DateField(blank=True, null=True, verbose_name='Дата початку відрядження')),
+                ('trip_end_date', models.DateField(blank=True, db_index=True, null=True, verbose_name='Дата завершення відрядження')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата останнього оновлення')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='oids.trip', verbose_name='Останнє відрядження')),
+            ],
+            options={
+                'verbose_name': 'Останнє відрядження заявки (знімок)',
+                'verbose_name_plural': 'Останні відрядження заявок (знімки)',
+            },
+        ),
+        migrations.RunPython(backfill_processing_snapshots, migrations.RunPython.noop),
+    ]
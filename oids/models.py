@@ -6,7 +6,11 @@ from django.db.models import Q
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import User
 from multiselectfield import MultiSelectField
-from simple_history.models import HistoricalRecords
+from .history import HistoricalRecords
+from .document_roles import DocumentRole, get_role_type_ids
+from .field_tracker import FieldTrackerMixin
+from .status_sync import mark_work_requests, mark_work_request_items
+from . import instrumentation as trace
 
 	
 # --- CONSTANTS / CHOICES ---
@@ -14,28 +18,10 @@ from simple_history.models import HistoricalRecords
 # Для загальних виборів, які використовуються в кількох моделях, можна тримати їх тут.
 
 
-def add_working_days(start_date, days_to_add):
-    """
-    Додає вказану кількість робочих днів до початкової дати.
-    start_date - це дата, ПІСЛЯ якої починається відлік.
-    days_to_add - кількість робочих днів, які потрібно додати.
-    Функція повертає N-й робочий день після start_date.
-    """
-    if not isinstance(start_date, datetime.date):
-        raise ValueError("start_date має бути об'єктом datetime.date")
-    if not isinstance(days_to_add, int) or days_to_add <= 0: # days_to_add має бути > 0
-        # Якщо days_to_add = 0, то це має бути перший робочий день після start_date,
-        # що потребує іншої логіки або days_to_add=1 для "наступного робочого дня".
-        # Для нашого випадку "10-й робочий день ПІСЛЯ end_date" -> days_to_add буде 10.
-        raise ValueError("days_to_add має бути позитивним цілим числом")
-
-    current_day_iterator = start_date
-    work_days_counted = 0
-    while work_days_counted < days_to_add:
-        current_day_iterator += datetime.timedelta(days=1)
-        if current_day_iterator.weekday() < 5: # 0-Mon, 4-Fri
-            work_days_counted += 1
-    return current_day_iterator
+# add_working_days(start_date, N) - N-й робочий день ПІСЛЯ start_date з урахуванням
+# вихідних та святкових днів (Holiday); O(1) за попередньо побудованим календарем.
+# Імпортується звідси у views/signals, тому ре-експортуємо.
+from .business_calendar import add_working_days, add_working_days_many  # noqa: E402,F401
 
 
  # Твоя допоміжна функція (залишається без змін, але буде викликатися в AJAX view)
@@ -203,10 +189,13 @@ class Unit(models.Model):
         verbose_name = "Структура: Військова частина"
         verbose_name_plural = "Структура: Військові частини"
 
-class OID(models.Model):
+class OID(FieldTrackerMixin, models.Model):
     """
     Об'єкт інформаційної діяльності (ОІД)
     """
+    # Попередня ВЧ при перенесенні ОІД (кеш AJAX-списків обох частин, oids/signals.py)
+    tracked_fields = ('unit',)
+
     unit = models.ForeignKey(
         Unit, 
         on_delete=models.PROTECT,  # ✅ PROTECT замість CASCADE - безпечніше
@@ -455,6 +444,115 @@ class Person(models.Model):
         return self.assigned_tasks.filter(is_completed=False).count()
 
 
+# Ключі гістограми статусів елементів заявки -> статус WorkRequestItem
+WORK_REQUEST_ITEM_STATUS_KEYS = {
+    'completed': WorkRequestStatusChoices.COMPLETED,
+    'canceled': WorkRequestStatusChoices.CANCELED,
+    'on_registration': WorkRequestStatusChoices.ON_REGISTRATION,
+    'to_send_aa': WorkRequestStatusChoices.TO_SEND_AA,
+    'to_send_vch': WorkRequestStatusChoices.TO_SEND_VCH,
+    'in_progress': WorkRequestStatusChoices.IN_PROGRESS,
+    'pending': WorkRequestStatusChoices.PENDING,
+}
+
+
+def _work_request_item_status_counts():
+    """Умовні агрегати: items_total та items_<ключ> для кожного статусу елементів заявки."""
+    # distinct=True - щоб додаткові JOIN-и по items (пошук, фільтри) не множили лічильники
+    counts = {'items_total': models.Count('items', distinct=True)}
+    for key, status in WORK_REQUEST_ITEM_STATUS_KEYS.items():
+        counts[f'items_{key}'] = models.Count('items', filter=Q(items__status=status), distinct=True)
+    return counts
+
+
+def work_request_status_from_counts(status_counts):
+    """
+    Статус заявки за гістограмою статусів її елементів (status_histogram) - за пріоритетом:
+    - Якщо елементів немає → PENDING
+    - Якщо всі COMPLETED → COMPLETED
+    - Якщо всі CANCELED → CANCELED
+    - Якщо є хоча б один ON_REGISTRATION → ON_REGISTRATION
+    - Якщо є хоча б один TO_SEND_AA або TO_SEND_VCH → відповідний статус (обидва - TO_SEND_AA)
+    - Якщо є хоча б один IN_PROGRESS → IN_PROGRESS
+    - Якщо є хоча б один PENDING → PENDING
+    Інакше None - статус заявки не змінюється.
+    """
+    if not status_counts['total']:
+        return WorkRequestStatusChoices.PENDING
+    if status_counts['completed'] == status_counts['total']:
+        return WorkRequestStatusChoices.COMPLETED
+    if status_counts['canceled'] == status_counts['total']:
+        return WorkRequestStatusChoices.CANCELED
+    if status_counts['on_registration'] > 0:
+        return WorkRequestStatusChoices.ON_REGISTRATION
+    if status_counts['to_send_aa'] > 0:
+        return WorkRequestStatusChoices.TO_SEND_AA
+    if status_counts['to_send_vch'] > 0:
+        return WorkRequestStatusChoices.TO_SEND_VCH
+    if status_counts['in_progress'] > 0:
+        return WorkRequestStatusChoices.IN_PROGRESS
+    if status_counts['pending'] > 0:
+        return WorkRequestStatusChoices.PENDING
+    return None
+
+
+def expected_item_status(work_type, document):
+    """
+    (статус, дата документа) елемента заявки за його останнім документом - Актом атестації
+    для атестації або Висновком ІК для ІК; (None, None) - документ статус не визначає.
+    document - Document (достатньо полів doc_process_date, dsszzi_registered_number,
+    dsszzi_registered_date, attestation_registration_sent_id) або None. Відправку у в/ч
+    можна передати анотацією sent_to_unit, інакше - окремий запит (is_sent_to_unit).
+    """
+    if document is None:
+        return None, None
+    is_sent_to_unit = getattr(document, 'sent_to_unit', None)
+    if is_sent_to_unit is None:
+        is_sent_to_unit = document.is_sent_to_unit
+
+    if work_type in (WorkTypeChoices.PLAND_ATTESTATION, WorkTypeChoices.ATTESTATION):
+        has_registration = bool(document.dsszzi_registered_number and document.dsszzi_registered_number.strip())
+        if is_sent_to_unit:
+            # Документ відправлено у в/ч → статус "Виконано"
+            return WorkRequestStatusChoices.COMPLETED, document.doc_process_date
+        if has_registration:
+            # Є реєстраційний номер, але ще не відправлено у в/ч → "Готово до відправки в в/ч"
+            return WorkRequestStatusChoices.TO_SEND_VCH, document.dsszzi_registered_date or document.doc_process_date
+        if document.attestation_registration_sent_id is not None:
+            # Відправлено на реєстрацію, але номера ще немає → "На реєстрації в ДССЗЗІ"
+            return WorkRequestStatusChoices.ON_REGISTRATION, document.doc_process_date
+        if document.doc_process_date:
+            # Документ опрацьовано, але не відправлено → "Готово до відправки в ДССЗЗІ"
+            return WorkRequestStatusChoices.TO_SEND_AA, document.doc_process_date
+
+    elif work_type == WorkTypeChoices.IK:
+        if is_sent_to_unit:
+            # Документ відправлено у в/ч → "Виконано"
+            return WorkRequestStatusChoices.COMPLETED, document.doc_process_date
+        if document.doc_process_date:
+            # Документ опрацьовано, але не відправлено → "Готово до відправки в в/ч"
+            return WorkRequestStatusChoices.TO_SEND_VCH, document.doc_process_date
+
+    return None, None
+
+
+class WorkRequestQuerySet(models.QuerySet):
+    def with_status_histogram(self):
+        """
+        Анотує кожну заявку лічильниками статусів її елементів (items_total,
+        items_completed, items_pending, ...) - один запит на всю сторінку заявок.
+        """
+        return self.annotate(**_work_request_item_status_counts())
+
+    def status_histogram(self):
+        """
+        Гістограма статусів елементів усіх заявок queryset-у одним запитом:
+        {'total': N, 'completed': N, 'canceled': N, ...}
+        """
+        aggregated = self.aggregate(**_work_request_item_status_counts())
+        return {key.removeprefix('items_'): count or 0 for key, count in aggregated.items()}
+
+
 class WorkRequest(models.Model):
     """
     Заявка на проведення робіт
@@ -482,7 +580,40 @@ class WorkRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата внесення заявки")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата останнього оновлення")
     history = HistoricalRecords()
+
+    objects = WorkRequestQuerySet.as_manager()
+    
+    def update_status_from_items(self):
+        """
+        Оновлює статус заявки на основі статусів всіх її елементів WorkRequestItem.
+        Пріоритети статусів - work_request_status_from_counts (спільні з oids/reconciliation.py).
+        """
+        # Усі лічильники статусів елементів - одним запитом
+        status_counts = WorkRequest.objects.filter(pk=self.pk).status_histogram()
     
+        if not status_counts['total']:
+            trace.debug('wr.status', "WorkRequest %s has no items", self.id)
+            if self.status != WorkRequestStatusChoices.PENDING:
+                self.status = WorkRequestStatusChoices.PENDING
+                self.save(update_fields=['status', 'updated_at'])
+                trace.incr('wr.status_changed')
+            return
+    
+        trace.debug('wr.status', "WorkRequest %s status counts: %s", self.id, status_counts)
+        
+        original_status = self.status
+        # Визначаємо новий статус заявки за пріоритетом
+        new_status = work_request_status_from_counts(status_counts) or original_status
+    
+        # Зберігаємо новий статус, якщо він змінився
+        if original_status != new_status:
+            self.status = new_status
+            self.save(update_fields=['status', 'updated_at'])
+            trace.incr('wr.status_changed')
+            trace.debug('wr.status', "WorkRequest %s status changed: %s -> %s", self.id, original_status, new_status)
+        else:
+            trace.debug('wr.status', "WorkRequest %s status unchanged: %s", self.id, new_status)
+
     @property
     def get_items_for_export(self):
         """
@@ -579,10 +710,11 @@ class WorkRequestItem(models.Model):
         - TO_SEND_VCH: Документи зареєстровано в ДССЗЗІ / опрацьовано для ІК, готові до відправки у в/ч
         - COMPLETED: Документи відправлено у в/ч
         """
-        print(f"[WRI_STATUS_CHECKER] Checking status for WRI ID {self.id} (OID: {self.oid.cipher}, Work Type: {self.work_type})")
+        trace.incr('wri.status_checks')
+        trace.debug('wri.status', "Checking WRI %s (OID %s, work type %s)", self.id, self.oid_id, self.work_type)
     
         if self.status in [WorkRequestStatusChoices.COMPLETED, WorkRequestStatusChoices.CANCELED]:
-            print(f"[WRI_STATUS_CHECKER] WRI ID {self.id} is already {self.status}. No update needed.")
+            trace.debug('wri.status', "WRI %s is already %s, no update needed", self.id, self.status)
             return
     
         existing_docs_for_item = Document.objects.filter(work_request_item=self)
@@ -593,202 +725,75 @@ class WorkRequestItem(models.Model):
     
         # --- ОНОВЛЕНА ЛОГІКА ДЛЯ АТЕСТАЦІЇ (ATTESTATION та PLAND_ATTESTATION) ---
         if self.work_type in [WorkTypeChoices.PLAND_ATTESTATION, WorkTypeChoices.ATTESTATION]:
-            attestation_act_type = DocumentType.objects.filter(name__icontains="Акт атестації").first()
+            attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
             
-            if not attestation_act_type:
-                print(f"[WRI_STATUS_CHECKER] Attestation Act type not found in system!")
+            if not attestation_act_type_ids:
+                trace.warning('wri.status', "Attestation Act document type not found (WRI %s)", self.id)
                 return
             
             # Шукаємо Акт Атестації для цього WRI
             attestation_doc = existing_docs_for_item.filter(
-                document_type=attestation_act_type
-            ).order_by('-doc_process_date').first()
+                document_type_id__in=attestation_act_type_ids
+            ).order_by('-doc_process_date', '-pk').first()
             
             if attestation_doc:
-                # Перевіряємо, чи є реєстраційний номер ДССЗЗІ
-                has_registration = (
-                    attestation_doc.dsszzi_registered_number and 
-                    attestation_doc.dsszzi_registered_number.strip() != ''
-                )
-                
-                # Перевіряємо, чи документ відправлено на реєстрацію (має attestation_registration_sent)
-                is_sent_for_registration = attestation_doc.attestation_registration_sent is not None
-                
-                # НОВИНКА: Перевіряємо, чи документ відправлено у в/ч (має trip_result_sent)
-                is_sent_to_unit = hasattr(attestation_doc, 'trip_result_sent') and attestation_doc.trip_result_sent is not None
-                
-                if is_sent_to_unit:
-                    # Документ відправлено у в/ч → статус "Виконано"
-                    new_status = WorkRequestStatusChoices.COMPLETED
-                    document_date = attestation_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] Attestation doc sent to unit. Setting status to COMPLETED.")
-                    
-                elif has_registration:
-                    # Є реєстраційний номер, але ще не відправлено у в/ч → "Готово до відправки в в/ч"
-                    new_status = WorkRequestStatusChoices.TO_SEND_VCH
-                    document_date = attestation_doc.dsszzi_registered_date or attestation_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] Attestation doc has registration number but not sent to unit. Setting status to TO_SEND_VCH.")
-                    
-                elif is_sent_for_registration:
-                    # Відправлено на реєстрацію, але номера ще немає → "На реєстрації в ДССЗЗІ"
-                    new_status = WorkRequestStatusChoices.ON_REGISTRATION
-                    document_date = attestation_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] Attestation doc sent for registration. Setting status to ON_REGISTRATION.")
-                    
-                elif attestation_doc.doc_process_date:
-                    # Документ опрацьовано, але не відправлено → "Готово до відправки в ДССЗЗІ"
-                    new_status = WorkRequestStatusChoices.TO_SEND_AA
-                    document_date = attestation_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] Attestation doc processed but not sent. Setting status to TO_SEND_AA.")
+                # Реєстрація в ДССЗЗІ / відправка на реєстрацію / у в/ч (trip_result_sent)
+                new_status, document_date = expected_item_status(self.work_type, attestation_doc)
+                new_status = new_status or self.status
             else:
-                print(f"[WRI_STATUS_CHECKER] No Attestation Act found for WRI ID {self.id}.")
+                trace.debug('wri.status', "No Attestation Act found for WRI %s", self.id)
     
         # --- ЛОГІКА ДЛЯ ІК ---
         elif self.work_type == WorkTypeChoices.IK:
-            ik_conclusion_type = DocumentType.objects.filter(duration_months=20).first()
+            ik_conclusion_type_ids = get_role_type_ids(DocumentRole.IK_CONCLUSION)
             
-            if not ik_conclusion_type:
-                print(f"[WRI_STATUS_CHECKER] IK Conclusion type not found in system!")
+            if not ik_conclusion_type_ids:
+                trace.warning('wri.status', "IK Conclusion document type not found (WRI %s)", self.id)
                 return
             
             # Шукаємо Висновок ІК для цього WRI
             ik_doc = existing_docs_for_item.filter(
-                document_type=ik_conclusion_type
-            ).order_by('-doc_process_date').first()
+                document_type_id__in=ik_conclusion_type_ids
+            ).order_by('-doc_process_date', '-pk').first()
             
             if ik_doc:
-                # Перевіряємо, чи документ відправлено у в/ч (має trip_result_sent)
-                is_sent_to_unit = hasattr(ik_doc, 'trip_result_sent') and ik_doc.trip_result_sent is not None
-                
-                if is_sent_to_unit:
-                    # Документ відправлено у в/ч → "Виконано"
-                    new_status = WorkRequestStatusChoices.COMPLETED
-                    document_date = ik_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] IK doc sent to unit. Setting status to COMPLETED.")
-                    
-                elif ik_doc.doc_process_date:
-                    # Документ опрацьовано, але не відправлено → "Готово до відправки в в/ч"
-                    new_status = WorkRequestStatusChoices.TO_SEND_VCH
-                    document_date = ik_doc.doc_process_date
-                    print(f"[WRI_STATUS_CHECKER] IK doc processed but not sent. Setting status to TO_SEND_VCH.")
+                # Відправлено у в/ч (trip_result_sent) або опрацьовано
+                new_status, document_date = expected_item_status(self.work_type, ik_doc)
+                new_status = new_status or self.status
             else:
-                print(f"[WRI_STATUS_CHECKER] No IK Conclusion found for WRI ID {self.id}.")
+                trace.debug('wri.status', "No IK Conclusion found for WRI %s", self.id)
     
         # --- Оновлюємо статус, якщо він змінився ---
         if new_status != self.status:
+            trace.debug('wri.status', "WRI %s status changed: %s -> %s", self.id, self.status, new_status)
             self.status = new_status
             fields_to_update.append('status')
-            print(f"[WRI_STATUS_CHECKER] Status changed from {self.status} to {new_status}")
+            trace.incr('wri.status_changed')
         
         # --- Оновлюємо дату фактичного опрацювання ---
         if document_date and not self.docs_actually_processed_on:
             self.docs_actually_processed_on = document_date
             fields_to_update.append('docs_actually_processed_on')
-            print(f"[WRI_STATUS_CHECKER] Setting docs_actually_processed_on to {document_date}")
         
         # --- Зберігаємо зміни ---
         if fields_to_update:
             fields_to_update.append('updated_at')
             self.save(update_fields=fields_to_update)
-            print(f"[WRI_STATUS_CHECKER] WRI ID {self.id} updated. New status: {self.get_status_display()}")
+            trace.debug('wri.status', "WRI %s updated: %s", self.id, fields_to_update)
             
             # Оновлюємо статус батьківської заявки
             self.update_parent_request_status()
         else:
-            print(f"[WRI_STATUS_CHECKER] No changes needed for WRI ID {self.id}. Current status: {self.get_status_display()}")
+            trace.debug('wri.status', "WRI %s unchanged: %s", self.id, self.status)
     
     
     def update_parent_request_status(self):
         """
-        Оновлює статус батьківської заявки WorkRequest на основі статусів
-        всіх її елементів WorkRequestItem.
-        
-        Логіка:
-        - Якщо всі COMPLETED → заявка COMPLETED
-        - Якщо всі CANCELED → заявка CANCELED
-        - Якщо є хоча б один ON_REGISTRATION → заявка ON_REGISTRATION
-        - Якщо є хоча б один TO_SEND_AA або TO_SEND_VCH → відповідний статус заявки
-        - Якщо є хоча б один IN_PROGRESS → заявка IN_PROGRESS
-        - Інакше → PENDING
+        Позначає батьківську заявку для перерахунку статусу.
+        Сам перерахунок (WorkRequest.update_status_from_items) виконується один раз
+        на заявку в transaction.on_commit - див. oids/status_sync.py.
         """
-        work_request = self.request
-        all_items = work_request.items.all()
-    
-        if not all_items.exists():
-            print(f"[REQUEST_STATUS_UPDATER] WorkRequest ID {work_request.id} has no items.")
-            if work_request.status != WorkRequestStatusChoices.PENDING:
-                work_request.status = WorkRequestStatusChoices.PENDING
-                work_request.save(update_fields=['status', 'updated_at'])
-                print(f"[REQUEST_STATUS_UPDATER] Set to PENDING (no items).")
-            return
-    
-        print(f"[REQUEST_STATUS_UPDATER] Updating status for WorkRequest ID {work_request.id}")
-        
-        # Підраховуємо статуси елементів
-        status_counts = {
-            'completed': all_items.filter(status=WorkRequestStatusChoices.COMPLETED).count(),
-            'canceled': all_items.filter(status=WorkRequestStatusChoices.CANCELED).count(),
-            'on_registration': all_items.filter(status=WorkRequestStatusChoices.ON_REGISTRATION).count(),
-            'to_send_aa': all_items.filter(status=WorkRequestStatusChoices.TO_SEND_AA).count(),
-            'to_send_vch': all_items.filter(status=WorkRequestStatusChoices.TO_SEND_VCH).count(),
-            'in_progress': all_items.filter(status=WorkRequestStatusChoices.IN_PROGRESS).count(),
-            'pending': all_items.filter(status=WorkRequestStatusChoices.PENDING).count(),
-            'total': all_items.count()
-        }
-        
-        print(f"[REQUEST_STATUS_UPDATER] Status counts: {status_counts}")
-        
-        original_status = work_request.status
-        new_status = original_status
-    
-        # Визначаємо новий статус заявки за пріоритетом
-        if status_counts['completed'] == status_counts['total']:
-            # Всі елементи виконані
-            new_status = WorkRequestStatusChoices.COMPLETED
-            print(f"[REQUEST_STATUS_UPDATER] All items COMPLETED.")
-            
-        elif status_counts['canceled'] == status_counts['total']:
-            # Всі елементи скасовані
-            new_status = WorkRequestStatusChoices.CANCELED
-            print(f"[REQUEST_STATUS_UPDATER] All items CANCELED.")
-            
-        elif status_counts['on_registration'] > 0:
-            # Є елементи на реєстрації в ДССЗЗІ
-            new_status = WorkRequestStatusChoices.ON_REGISTRATION
-            print(f"[REQUEST_STATUS_UPDATER] Has items ON_REGISTRATION.")
-            
-        elif status_counts['to_send_aa'] > 0 and status_counts['to_send_vch'] > 0:
-            # Є елементи обох типів, готові до відправки
-            new_status = WorkRequestStatusChoices.TO_SEND_AA
-            print(f"[REQUEST_STATUS_UPDATER] Has items TO_SEND (both types).")
-            
-        elif status_counts['to_send_aa'] > 0:
-            # Є елементи, готові до відправки в ДССЗЗІ
-            new_status = WorkRequestStatusChoices.TO_SEND_AA
-            print(f"[REQUEST_STATUS_UPDATER] Has items TO_SEND_AA.")
-            
-        elif status_counts['to_send_vch'] > 0:
-            # Є елементи, готові до відправки у в/ч
-            new_status = WorkRequestStatusChoices.TO_SEND_VCH
-            print(f"[REQUEST_STATUS_UPDATER] Has items TO_SEND_VCH.")
-            
-        elif status_counts['in_progress'] > 0:
-            # Є елементи в роботі
-            new_status = WorkRequestStatusChoices.IN_PROGRESS
-            print(f"[REQUEST_STATUS_UPDATER] Has items IN_PROGRESS.")
-            
-        elif status_counts['pending'] > 0:
-            # Є елементи, що очікують
-            new_status = WorkRequestStatusChoices.PENDING
-            print(f"[REQUEST_STATUS_UPDATER] Has items PENDING.")
-    
-        # Зберігаємо новий статус, якщо він змінився
-        if original_status != new_status:
-            work_request.status = new_status
-            work_request.save(update_fields=['status', 'updated_at'])
-            print(f"[REQUEST_STATUS_UPDATER] WorkRequest ID {work_request.id} status changed: {original_status} → {new_status}")
-        else:
-            print(f"[REQUEST_STATUS_UPDATER] WorkRequest ID {work_request.id} status unchanged: {new_status}")
+        mark_work_requests([self.request_id])
     
     
     def save(self, *args, **kwargs):
@@ -797,34 +802,20 @@ class WorkRequestItem(models.Model):
         # Спочатку зберігаємо сам елемент заявки
         super().save(*args, **kwargs)
 
-        # Якщо це новий елемент заявки...
-        if is_new and self.oid:
-            oid_to_update = self.oid
-            old_status = oid_to_update.get_status_display()
-            
-            # Визначаємо новий статус ОІД на основі типу робіт у заявці
-            new_status_enum = None
-            if self.work_type == WorkTypeChoices.IK:
-                new_status_enum = OIDStatusChoices.RECEIVED_REQUEST_IK
-            elif self.work_type == WorkTypeChoices.ATTESTATION:
-                new_status_enum = OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION
-            elif self.work_type == WorkTypeChoices.PLAND_ATTESTATION:
-                new_status_enum = OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION
-            else:
-                # Залишаємо загальний статус
-                new_status_enum = OIDStatusChoices.RECEIVED_REQUEST 
-
-            if oid_to_update.status != new_status_enum:
-                oid_to_update.status = new_status_enum
-                oid_to_update.save(update_fields=['status'])
-
-                # Створюємо запис в історії
-                OIDStatusChange.objects.create(
-                    oid=oid_to_update,
-                    old_status=old_status,
-                    new_status=new_status_enum.label,
-                    reason=f"ОІД додано до заявки №{self.request.incoming_number} (Тип робіт: {self.get_work_type_display()})"
-                )
+        # Якщо це новий елемент заявки - статус ОІД за типом робіт (oids/oid_status.py)
+        if is_new and self.oid_id:
+            from .oid_status import Transition, apply
+
+            event = {
+                WorkTypeChoices.IK: 'request_ik',
+                WorkTypeChoices.ATTESTATION: 'request_attestation',
+                WorkTypeChoices.PLAND_ATTESTATION: 'request_pland_attestation',
+            }.get(self.work_type, 'request_other')
+            apply([Transition(
+                oid=self.oid,
+                event=event,
+                context={'request_number': self.request.incoming_number, 'work_type': self.get_work_type_display()},
+            )])
        
         # Викликаємо існуючу логіку для оновлення статусу батьківської заявки
         self.update_parent_request_status()
@@ -1000,26 +991,19 @@ class WorkCompletionRegistration(models.Model):
         # Спочатку зберігаємо сам об'єкт, щоб він отримав ID
         super().save(*args, **kwargs)
         
-        # Використовуємо .all() після збереження, щоб отримати доступ до M2M
-        # Цей цикл пройде по всіх документах (АЗР), які були додані до цієї відправки
-        for doc in self.documents.all():
-            oid_to_update = doc.oid
-            if oid_to_update:
-                old_status = oid_to_update.get_status_display()
-                new_status_enum = OIDStatusChoices.AZR_SEND
-
-                if oid_to_update.status != new_status_enum:
-                    oid_to_update.status = new_status_enum
-                    oid_to_update.save(update_fields=['status'])
-                    
-                    # Створюємо запис в історії
-                    OIDStatusChange.objects.create(
-                        oid=oid_to_update,
-                        old_status=old_status,
-                        new_status=new_status_enum.label,
-                        reason=f"АЗР (документ №{doc.document_number}) відправлено на реєстрацію в складі листа №{self.outgoing_letter_number}",
-                        initiating_document=doc
-                    )
+        # Використовуємо .all() після збереження, щоб отримати доступ до M2M.
+        # Статуси ОІД усіх документів (АЗР) відправки - одним пакетом (oids/oid_status.py)
+        from .oid_status import Transition, apply
+
+        apply([
+            Transition(
+                oid=doc.oid_id,
+                event='azr_sent',
+                context={'document_number': doc.document_number, 'letter_number': self.outgoing_letter_number},
+                initiating_document_id=doc.pk,
+            )
+            for doc in self.documents.all()
+        ])
 
     def __str__(self):
         return f"Відправка АЗР (лист №{self.outgoing_letter_number} від {self.outgoing_letter_date.strftime('%d.%m.%Y')})"
@@ -1070,10 +1054,13 @@ class WorkCompletionResponse(models.Model):
         verbose_name_plural = "ДССЗЗІ: АЗР відповіді ДССЗЗІ"
 
 
-class Document(models.Model):
+class Document(FieldTrackerMixin, models.Model):
     """
     Опрацьовані документи Залежить від типу ОІД та виду робіт.
     """
+    # Попередній реєстраційний номер - для "ефекту доміно" без SELECT перед збереженням
+    tracked_fields = ('dsszzi_registered_number',)
+
     oid = models.ForeignKey(OID, on_delete=models.CASCADE, verbose_name="ОІД", related_name='documents')
     work_request_item = models.ForeignKey(WorkRequestItem, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="Елемент заявки", related_name='produced_documents')
     document_type = models.ForeignKey(DocumentType, on_delete=models.PROTECT, verbose_name="Тип документа")
@@ -1132,92 +1119,85 @@ class Document(models.Model):
             return f"№ {response.response_letter_number} від {date_str}"
         return "N/A"
     
-    def save(self, *args, **kwargs):
-        # === БЛОК 1: Логіка, що виконується ДО збереження в базу даних ===
-		# 1.1. Розрахунок терміну дії (expiration_date)
+    def compute_expiration_date(self):
+        """
+        Дата завершення дії: work_date + duration_months типу документа (або None).
+        Лише обчислення в пам'яті - спільне для save() та пакетного services.ingest_documents().
+        """
         if self.document_type and self.document_type.has_expiration and self.document_type.duration_months and self.work_date:
             try:
                 duration = int(self.document_type.duration_months)
-                # print(f"DEBUG: duration (from document_type.duration_months): {duration}")
-                
                 if duration > 0:
-                    delta = relativedelta(months=duration)
-                    if isinstance(self.work_date, str):
-                        # Використовуємо self._parse_date, якщо він у вас є, 
-                        # або просту конвертацію, якщо формат відомий (наприклад, 'YYYY-MM-DD')
+                    work_date_obj = self.work_date
+                    if isinstance(work_date_obj, str):
+                        # Формат дати з форм/імпорту - 'YYYY-MM-DD'
                         try:
-                            work_date_obj = datetime.datetime.strptime(self.work_date, '%Y-%m-%d').date()
+                            work_date_obj = datetime.datetime.strptime(work_date_obj, '%Y-%m-%d').date()
                         except ValueError:
-                            # Обробка помилки парсингу, якщо формат невірний
-                            print(f"ERROR: work_date '{self.work_date}' має невірний формат!")
-                            self.expiration_date = None
-                            return super().save(*args, **kwargs) # Перериваємо збереження з None
-                    elif self.work_date is not None:
-                        work_date_obj = self.work_date
-                    else:
-                        # Якщо work_date порожній, пропускаємо
-                        self.expiration_date = None
-                        return super().save(*args, **kwargs)
-        
-                    # --- Використовуємо об'єкт дати для розрахунку ---
-                    self.expiration_date = work_date_obj + delta
-    
-                    # print(f"DEBUG: Calculated self.expiration_date object: {self.expiration_date}")
-                else:
-                    self.expiration_date = None
-                    
-            # --- ВИПРАВЛЕНИЙ БЛОК EXCEPT (тепер він має 'as e') ---
+                            trace.error('document.save', "work_date '%s' має невірний формат (документ %s)", self.work_date, self.pk)
+                            return None
+                    return work_date_obj + relativedelta(months=duration)
             except (ValueError, TypeError) as e:
-                print(f"ERROR calculating expiration_date: {e}") 
-                self.expiration_date = None
-        else:
-            self.expiration_date = None
+                trace.error('document.save', "Помилка розрахунку expiration_date (документ %s): %s", self.pk, e)
+        return None
+
+    def save(self, *args, **kwargs):
+        # === БЛОК 1: Логіка, що виконується ДО збереження в базу даних ===
+		# 1.1. Розрахунок терміну дії (expiration_date)
+        self.expiration_date = self.compute_expiration_date()
         
-        # 1.2. Отримуємо стан об'єкта з бази даних ДО того, як ми його змінимо.
-        old_instance = self.__class__.objects.filter(pk=self.pk).first()
+        # 1.2. Стан об'єкта ДО збереження - зі значень, запам'ятованих при завантаженні (FieldTrackerMixin)
+        is_newly_created = self._state.adding
+        was_registered = bool(self.previous('dsszzi_registered_number'))
         
         # === БЛОК 2: Виконуємо стандартне збереження ===
         super().save(*args, **kwargs)
 
         # === БЛОК 3: Логіка "ефекту доміно" ПІСЛЯ збереження ===
-        
+        self.apply_status_effects(
+            is_newly_created=is_newly_created,
+            was_registered=was_registered,
+        )
+
+    def apply_status_effects(self, is_newly_created, was_registered=False):
+        """
+        "Ефект доміно" збереженого документа: статус елемента заявки, статус/примітка ОІД
+        та запис OIDStatusChange - для щойно зареєстрованих актів атестації/АЗР
+        і щойно створених висновків ІК.
+
+        :param is_newly_created: Документ щойно створено.
+        :param was_registered: До збереження документ вже мав реєстраційний номер ДССЗЗІ.
+        """
         if not self.work_request_item:
             return
-        # 1. Надійно визначаємо типи документів за їхніми назвами
-        try:
-                attestation_doc_type = DocumentType.objects.get(name__icontains='Акт атестації')
-                ik_conclusion_doc_type = DocumentType.objects.get(name__icontains='Висновок')
-                azr_act_doc_type = DocumentType.objects.get(name__icontains='Акт завершення')
-                declaration_doc_type = DocumentType.objects.get(name__icontains='Декларація')  # НОВИЙ ТИП
-        except DocumentType.DoesNotExist:
+        # 1. Визначаємо роль типу документа через кешований реєстр (без запитів до DocumentType)
+        attestation_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
+        ik_conclusion_type_ids = get_role_type_ids(DocumentRole.IK_CONCLUSION)
+        azr_act_type_ids = get_role_type_ids(DocumentRole.AZR_ACT)
+        declaration_type_ids = get_role_type_ids(DocumentRole.DECLARATION)  # НОВИЙ ТИП
+        if not (attestation_type_ids and ik_conclusion_type_ids and azr_act_type_ids and declaration_type_ids):
                 # Якщо ключові типи документів не знайдено в базі, нічого не робимо
                 return 
 
-        is_attestation_act = self.document_type == attestation_doc_type
-        is_ik_conclusion = self.document_type == ik_conclusion_doc_type
-        is_azr_act = self.document_type == azr_act_doc_type
+        is_attestation_act = self.document_type_id in attestation_type_ids
+        is_ik_conclusion = self.document_type_id in ik_conclusion_type_ids
+        is_azr_act = self.document_type_id in azr_act_type_ids
         
         
-        if (is_attestation_act):
-            print(f"DEBUG: save document ID {old_instance} (type: {is_attestation_act}) is_attestation_act ")
-        if (is_ik_conclusion):
-            print(f"DEBUG: save document ID {old_instance} (type: {is_ik_conclusion}) is_ik_conclusion ")
-        if (is_azr_act):
-            print(f"DEBUG: save document ID {old_instance} (type: {is_azr_act}) is_azr_act ")
+        trace.debug('document.save', "Document %s saved: attestation_act=%s ik_conclusion=%s azr_act=%s",
+                    self.pk, is_attestation_act, is_ik_conclusion, is_azr_act)
                 
         # 2. Перевіряємо умови-тригери для кожного типу документа
         
         # -- УМОВА ДЛЯ АТЕСТАЦІЇ, АЗР ТА ДЕКЛАРАЦІЇ --
         # Тригер: документи, які щойно отримали реєстраційний номер
         is_registered = bool(self.dsszzi_registered_number and self.dsszzi_registered_date)
-        was_just_registered = not (old_instance and old_instance.dsszzi_registered_number) and is_registered
+        was_just_registered = not was_registered and is_registered
 
         should_process_registration = (is_attestation_act or is_azr_act) and was_just_registered
         
         # -- УМОВА ДЛЯ ІК --
         # Тригер: Просто створення документу "Висновок ІК"
-        is_newly_created = old_instance is None
-        
         should_process_ik = is_ik_conclusion and is_newly_created
 
         # --- Застосування логіки ---
@@ -1230,9 +1210,9 @@ class Document(models.Model):
                 if should_process_registration:
                         # Для атестації, АЗР та декларації встановлюємо різні статуси залежно від типу
                         if is_attestation_act:
-                                # Для атестації встановлюємо статус "До відправки"
-                                if wri.status != WorkRequestStatusChoices.TO_SEND:
-                                        wri.status = WorkRequestStatusChoices.TO_SEND
+                                # Для атестації: акт зареєстровано в ДССЗЗІ - "готово до відправки в в/ч"
+                                if wri.status != WorkRequestStatusChoices.TO_SEND_VCH:
+                                        wri.status = WorkRequestStatusChoices.TO_SEND_VCH
                                         wri.docs_actually_processed_on = self.doc_process_date or datetime.date.today()
                                         wri.save(update_fields=['status', 'docs_actually_processed_on'])
                         else:  # АЗР або Декларація
@@ -1249,133 +1229,26 @@ class Document(models.Model):
                                 wri.docs_actually_processed_on = self.doc_process_date or datetime.date.today()
                                 wri.save(update_fields=['status', 'docs_actually_processed_on'])
 
-        # 4. Обробляємо ОІД незалежно від наявності work_request_item
-        if should_process_registration:
-                # Знаходимо ОІД для оновлення
-                oid_to_update = None
-                
-                if self.work_request_item:
-                        # Якщо є пов'язаний work_request_item
-                        oid_to_update = self.work_request_item.oid
-                elif hasattr(self, 'oid') and self.oid:
-                        # Якщо документ прямо пов'язаний з ОІД
-                        oid_to_update = self.oid
-                elif hasattr(self, 'get_related_oid'):
-                        # Якщо є спеціальний метод для знаходження ОІД
-                        oid_to_update = self.get_related_oid()
-                
-                if oid_to_update:
-                        old_status = oid_to_update.get_status_display()
-                        
-                        if is_attestation_act:
-                                # Логіка для атестації (як було раніше)
-                                statuses_for_first_attestation = [
-                                        OIDStatusChoices.NEW,
-                                        OIDStatusChoices.RECEIVED_TZ, 
-                                        OIDStatusChoices.RECEIVED_TZ_REPEAT,
-                                        OIDStatusChoices.RECEIVED_TZ_APPROVE,
-                                        OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION,
-                                        OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,
-                                        OIDStatusChoices.TERMINATED
-                                ]
-                                
-                                if oid_to_update.status in statuses_for_first_attestation:
-                                        new_status_enum = OIDStatusChoices.ATTESTED
-                                        oid_to_update.status = new_status_enum
-                                        oid_to_update.note = f"Об'єкт атестовано {self.doc_process_date.strftime('%d.%m.%Y') if self.doc_process_date else ''}. ||"
-                                        oid_to_update.save(update_fields=['status', 'note'])
-                                        
-                                        # Створюємо запис в історії
-                                        OIDStatusChange.objects.create(
-                                                oid=oid_to_update,
-                                                old_status=old_status,
-                                                new_status=new_status_enum.label,
-                                                reason=f"Атестацію завершено. Зареєстровано Акт атестації №{self.dsszzi_registered_number}",
-                                                initiating_document=self
-                                        )
-                                
-                                elif oid_to_update.status == OIDStatusChoices.ACTIVE:
-                                        # Повторна атестація
-                                        attestation_note = f"Проведено чергову атестацію ({self.doc_process_date.strftime('%d.%m.%Y') if self.doc_process_date else ''}). ||"
-                                        oid_to_update.note = f"{attestation_note}\n{oid_to_update.note or ''}".strip()
-                                        oid_to_update.save(update_fields=['note'])
-                                        
-                                        OIDStatusChange.objects.create(
-                                                oid=oid_to_update,
-                                                old_status=old_status,
-                                                new_status=old_status,
-                                                reason=f"Проведено чергову атестацію (Акт №{self.dsszzi_registered_number}) ||",
-                                                initiating_document=self
-                                        )
-                        
-                        elif is_azr_act:
-                                # Логіка для АЗР - статус стає ACTIVE
-                                new_status_enum = OIDStatusChoices.ACTIVE
-                                if oid_to_update.status != new_status_enum:
-                                        oid_to_update.status = new_status_enum
-                                        oid_to_update.save(update_fields=['status'])
-                                        
-                                        # Формуємо причину для запису в історію
-                                        reason_text = f"Зареєстровано АЗР №{self.dsszzi_registered_number} від {self.dsszzi_registered_date.strftime('%d.%m.%Y')}"
-                                        
-                                        OIDStatusChange.objects.create(
-                                                oid=oid_to_update,
-                                                old_status=old_status,
-                                                new_status=new_status_enum.label,
-                                                reason=reason_text,
-                                                initiating_document=self
-                                        )
-
-        # 5. Обробляємо ІК незалежно від наявності work_request_item (як було раніше)
-        if should_process_ik:
-                # Знаходимо ОІД для оновлення
-                oid_to_update = None
-                
-                if self.work_request_item:
-                        # Якщо є пов'язаний work_request_item
-                        oid_to_update = self.work_request_item.oid
-                elif hasattr(self, 'oid') and self.oid:
-                        # Якщо документ прямо пов'язаний з ОІД
-                        oid_to_update = self.oid
-                elif hasattr(self, 'get_related_oid'):
-                        # Якщо є спеціальний метод для знаходження ОІД
-                        oid_to_update = self.get_related_oid()
-                
-                if oid_to_update and oid_to_update.status == OIDStatusChoices.ACTIVE:
-                        old_status = oid_to_update.get_status_display()
-                        
-                        # Додаємо нотатку про ІК
-                        ik_note = f"Проведено інструментальний контроль ({self.doc_process_date.strftime('%d.%m.%Y') if self.doc_process_date else ''}). ||"
-                        oid_to_update.note = f"{ik_note}\n{oid_to_update.note or ''}".strip()
-                        oid_to_update.save(update_fields=['note'])
-                        
-                        # Створюємо запис в історії, але статус не змінюється (OIDStatusChoices.ACTIVE)
-                        OIDStatusChange.objects.create(
-                                oid=oid_to_update,
-                                old_status=old_status,
-                                new_status=old_status,  # Статус залишається ACTIVE
-                                reason=f"Проведено інструментальний контроль (Висновок №{self.document_number} від {self.doc_process_date.strftime('%d.%m.%Y')}) ||",
-                                initiating_document=self
-                        )
-                        
-                # перевірка статуса на ОК
-                elif oid_to_update.status != OIDStatusChoices.ACTIVE:
-                        old_status = oid_to_update.get_status_display()
-                        new_status_enum = OIDStatusChoices.ACTIVE
-                        # Додаємо нотатку про ІК
-                        ik_note = f"Уточнити попередній статус ОІД.(був {old_status if old_status else ''}) Проведено інструментальний контроль ({self.doc_process_date.strftime('%d.%m.%Y') if self.doc_process_date else ''}) роботи проводились {self.work_date.strftime('%d.%m.%Y') if self.work_date else ''}. ||"
-                        oid_to_update.note = f"{ik_note}\n{oid_to_update.note or ''}".strip()
-                        oid_to_update.save(update_fields=['note'])
-                        oid_to_update.status = new_status_enum
-                        
-                        # Створюємо запис в історії, але статус не змінюється (OIDStatusChoices.ACTIVE)
-                        OIDStatusChange.objects.create(
-                                oid=oid_to_update,
-                                old_status=old_status,
-                                new_status=old_status,  # Статус залишається ACTIVE
-                                reason=f"Проведено інструментальний контроль (Висновок №{self.document_number} від {self.doc_process_date.strftime('%d.%m.%Y')}) роботи проводились {self.work_date.strftime('%d.%m.%Y') if self.work_date else ''}.",
-                                initiating_document=self
-                        )
+        # 4-5. Статус/примітка ОІД та запис OIDStatusChange - через машину статусів (oids/oid_status.py)
+        if should_process_registration or should_process_ik:
+                from .oid_status import Transition, apply, format_date
+
+                if should_process_ik:
+                        event = 'ik_completed'
+                else:
+                        event = 'attestation_registered' if is_attestation_act else 'azr_registered'
+                apply([Transition(
+                        oid=self.work_request_item.oid_id or self.oid_id,
+                        event=event,
+                        context={
+                                'document_number': self.document_number,
+                                'registered_number': self.dsszzi_registered_number,
+                                'registered_date': format_date(self.dsszzi_registered_date),
+                                'process_date': format_date(self.doc_process_date),
+                                'work_date': format_date(self.work_date),
+                        },
+                        initiating_document_id=self.pk,
+                )])
 
     def __str__(self):
         return f"{self.document_type.name} / {self.document_number} (ОІД: {self.oid.cipher})"
@@ -1595,7 +1468,7 @@ class Trip(models.Model):
     def save(self, *args, **kwargs):
         # Тут може бути інша логіка, специфічна для збереження Trip,
         # але розрахунок дедлайнів для WorkRequestItem тепер обробляється сигналом.
-        print(f"TRIP_MODEL_SAVE: Saving Trip ID {self.pk} with end_date: {self.end_date}")
+        trace.debug('trip.save', "Saving Trip %s with end_date %s", self.pk, self.end_date)
         super().save(*args, **kwargs)
         # НЕМАЄ логіки розрахунку дедлайнів тут
     
@@ -1648,6 +1521,109 @@ class OIDStatusChange(models.Model):
         verbose_name_plural = "ДССЗЗІ: Зміни статусу ОІД"
         ordering = ['-changed_at'] # За замовчуванням сортувати за датою зміни
 
+
+class OIDValiditySnapshot(models.Model):
+    """
+    Денормалізований "поточний стан дії" ОІД: дати закінчення дії останніх
+    документів кожної ролі, дата останніх робіт та найближча дата закінчення.
+    Оновлюється інкрементально сигналами Document (через oids/status_sync.py),
+    повністю перебудовується командою `manage.py rebuild_oid_validity`.
+    Історію не ведемо - це похідні дані.
+    """
+    oid = models.OneToOneField(
+        OID,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="ОІД",
+        related_name='validity'
+    )
+    attestation_expiration_date = models.DateField(null=True, blank=True, verbose_name="Атестація діє до")
+    ik_expiration_date = models.DateField(null=True, blank=True, verbose_name="ІК діє до")
+    prescription_expiration_date = models.DateField(null=True, blank=True, verbose_name="Припис діє до")
+    last_work_date = models.DateField(null=True, blank=True, verbose_name="Дата останніх робіт на ОІД")
+    next_expiration_date = models.DateField(null=True, blank=True, db_index=True, verbose_name="Найближча дата закінчення дії")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата останнього оновлення")
+
+    def __str__(self):
+        return f"{self.oid_id}: до {self.next_expiration_date or '-'}"
+
+    class Meta:
+        verbose_name = "Стан дії ОІД (знімок)"
+        verbose_name_plural = "Стан дії ОІД (знімки)"
+
+class WorkRequestTripSnapshot(models.Model):
+    """
+    Денормалізоване "останнє відрядження" заявки (за датою завершення) для сторінки
+    "Контроль опрацювання". Рядок є лише для заявок з відрядженнями.
+    Оновлюється інкрементально сигналами Trip (через oids/status_sync.py),
+    повністю перебудовується командою `manage.py rebuild_processing_snapshots`.
+    """
+    work_request = models.OneToOneField(
+        WorkRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Заявка",
+        related_name='trip_snapshot'
+    )
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='+', verbose_name="Останнє відрядження")
+    trip_start_date = models.DateField(null=True, blank=True, verbose_name="Дата початку відрядження")
+    trip_end_date = models.DateField(null=True, blank=True, db_index=True, verbose_name="Дата завершення відрядження")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата останнього оновлення")
+
+    def __str__(self):
+        return f"{self.work_request_id}: відрядження {self.trip_id}"
+
+    class Meta:
+        verbose_name = "Останнє відрядження заявки (знімок)"
+        verbose_name_plural = "Останні відрядження заявок (знімки)"
+
+class WorkRequestItemProcessingSnapshot(models.Model):
+    """
+    Денормалізовані дати опрацювання елемента заявки: дата останнього зареєстрованого
+    акту атестації та останнього висновку ІК. Оновлюється інкрементально сигналами
+    Document (через oids/status_sync.py), повністю перебудовується командою
+    `manage.py rebuild_processing_snapshots`.
+    """
+    work_request_item = models.OneToOneField(
+        WorkRequestItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Елемент заявки",
+        related_name='processing_snapshot'
+    )
+    final_attestation_date = models.DateField(null=True, blank=True, verbose_name="Дата акту атестації")
+    final_ik_date = models.DateField(null=True, blank=True, verbose_name="Дата висновку ІК")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата останнього оновлення")
+
+    def __str__(self):
+        return f"{self.work_request_item_id}: атестація {self.final_attestation_date or '-'}, ІК {self.final_ik_date or '-'}"
+
+    class Meta:
+        verbose_name = "Дати опрацювання елемента заявки (знімок)"
+        verbose_name_plural = "Дати опрацювання елементів заявок (знімки)"
+
+class Holiday(models.Model):
+    """
+    Святкові (неробочі) дні та перенесені робочі дні для розрахунку строків
+    у робочих днях (oids/business_calendar.py). Зміни скидають кеш календаря.
+    """
+    date = models.DateField("Дата", unique=True)
+    name = models.CharField("Назва", max_length=200, blank=True)
+    is_working_day = models.BooleanField(
+        "Робочий день", default=False,
+        help_text="Позначте для вихідного дня, який є робочим (перенесення). Інакше - день неробочий."
+    )
+
+    def __str__(self):
+        kind = "робочий" if self.is_working_day else "вихідний"
+        return f"{self.date.strftime('%d.%m.%Y')} - {self.name or kind}"
+
+    class Meta:
+        verbose_name = "Святковий день"
+        verbose_name_plural = "Святкові дні"
+        ordering = ['-date']
+
+
 # --- Додаткові сутності, які були в оригінальному файлі, але не були інтегровані в бізнес-логіку ---
 
 class TripResultForUnit(models.Model):
@@ -1694,10 +1670,8 @@ class TripResultForUnit(models.Model):
             self.update_related_wri_statuses()
     
     def update_related_wri_statuses(self):
-        """Оновлює статуси всіх пов'язаних WorkRequestItem"""
-        for document in self.documents.all():
-            if document.work_request_item:
-                document.work_request_item.check_and_update_status_based_on_documents()
+        """Позначає для перерахунку статуси всіх пов'язаних WorkRequestItem (див. oids/status_sync.py)"""
+        mark_work_request_items(self.documents.values_list('work_request_item_id', flat=True))
 
 
 
@@ -1710,8 +1684,9 @@ class TripResultForUnit(models.Model):
         ordering = ['-outgoing_letter_date', '-id']
         
 # oids/models.py
-class TechnicalTask(models.Model):
+class TechnicalTask(FieldTrackerMixin, models.Model):
     # ... (поля як у вас)
+    tracked_fields = ('review_result',)
     oid = models.ForeignKey(OID, on_delete=models.CASCADE, verbose_name="ОІД", related_name='technical_tasks')
     input_number = models.CharField(max_length=50, verbose_name="Вхідний номер")
     input_date = models.DateField(verbose_name="Вхідна дата")
@@ -1736,68 +1711,31 @@ class TechnicalTask(models.Model):
     
     def save(self, *args, **kwargs):
         is_new = self._state.adding
-        # Отримуємо старий стан об'єкта з бази даних ДО збереження
-        old_instance = TechnicalTask.objects.filter(pk=self.pk).first()
+        # Чи змінився результат розгляду - з запам'ятованого при завантаженні значення (без SELECT)
+        review_result_changed = not is_new and self.has_changed('review_result')
 
         # Виконуємо збереження
         super().save(*args, **kwargs)
         
-        oid_to_update = self.oid
-        if not oid_to_update:
+        if not self.oid_id:
             return # Якщо ОІД не вказано, нічого не робимо
 
-        # --- Логіка для створення ---
+        # Статус ОІД - через машину статусів (oids/oid_status.py)
         if is_new:
-            old_status = oid_to_update.get_status_display()
-            new_status_enum = OIDStatusChoices.RECEIVED_TZ
-            
-            if oid_to_update.status != new_status_enum:
-                oid_to_update.status = new_status_enum
-                oid_to_update.save(update_fields=['status'])
-
-        # --- Логіка для погодження ---
-        # Перевіряємо, чи змінився статус на "Погоджено"
-        elif old_instance and old_instance.review_result != self.review_result:
-            old_status = oid_to_update.get_status_display()
-            if self.review_result == DocumentReviewResultChoices.FOR_REVISION:
-                new_status_enum = OIDStatusChoices.RECEIVED_TZ_REPEAT
-                reason = f"ТЗ №{self.input_number} відправлено на доопрацювання"
-                
-                if oid_to_update.status != new_status_enum:
-                    oid_to_update.status = new_status_enum
-                    oid_to_update.save(update_fields=['status'])
-                    
-                    OIDStatusChange.objects.create(
-						oid=oid_to_update,
-						old_status=old_status,
-						new_status=new_status_enum.label,
-						reason=reason
-					)
-					
-            elif self.review_result == DocumentReviewResultChoices.AWAITING_DOCS:
-                new_status_enum = OIDStatusChoices.RECEIVED_TZ_REPEAT
-                reason = f"ТЗ №{self.input_number} очікує додаткові документи"
-                if oid_to_update.status != new_status_enum:
-                    oid_to_update.status = new_status_enum
-                    oid_to_update.save(update_fields=['status'])
-                    OIDStatusChange.objects.create(
-						oid=oid_to_update,
-						old_status=old_status,
-						new_status=new_status_enum.label,
-						reason=reason
-					)
-            elif self.review_result == DocumentReviewResultChoices.APPROVED:
-                new_status_enum = OIDStatusChoices.RECEIVED_TZ_APPROVE
-                reason = f"ТЗ №{self.input_number} погоджено"
-                if oid_to_update.status != new_status_enum:
-                    oid_to_update.status = new_status_enum
-                    oid_to_update.save(update_fields=['status'])
-                    OIDStatusChange.objects.create(
-						oid=oid_to_update,
-						old_status=old_status,
-						new_status=new_status_enum.label,
-						reason=reason
-					)
+            event = 'tz_received'
+        elif review_result_changed:
+            event = {
+                DocumentReviewResultChoices.FOR_REVISION: 'tz_for_revision',
+                DocumentReviewResultChoices.AWAITING_DOCS: 'tz_awaiting_docs',
+                DocumentReviewResultChoices.APPROVED: 'tz_approved',
+            }.get(self.review_result)
+        else:
+            event = None
+        if event:
+            from .oid_status import Transition, apply
+
+            apply([Transition(oid=self.oid, event=event, context={'tz_number': self.input_number})])
+
     def __str__(self):
         return f"ТЗ/МЗ від в/ч {self.oid.unit.code} на ОІД: {self.oid.cipher} (статус : {self.get_review_result_display()}) від {self.input_date.strftime("%d.%m.%Y")} вх.№{self.input_number}"
 
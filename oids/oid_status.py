@@ -0,0 +1,241 @@
+# oids/oid_status.py
+"""
+Машина статусів ОІД.
+
+Переходи статусу ОІД були розкидані по WorkRequestItem.save, Document.save
+(apply_status_effects), TechnicalTask.save, WorkCompletionRegistration.save,
+services.complete_process_steps_for_documents та update_oid_status_view: кожен
+робив oid.save(update_fields=['status']) і OIDStatusChange.objects.create(...)
+окремо. Тепер:
+
+- TRANSITIONS - декларативна таблиця: подія -> правила (з яких статусів, у який
+  статус, причина та примітка ОІД як шаблони). Діє перше правило, чий перелік
+  вихідних статусів містить поточний статус ОІД;
+- apply_many(transitions) застосовує пакет переходів: один SELECT ОІД, один
+  UPDATE ... CASE (bulk_update з історією) та одна вставка OIDStatusChange
+  (з історією) - незалежно від кількості ОІД. Кілька переходів одного ОІД
+  застосовуються по черзі, кожен - від результату попереднього;
+- apply(transitions) - те саме, але в межах deferred_transitions() переходи
+  накопичуються і застосовуються одним apply_many при виході з блоку (напр.
+  реєстрація всіх актів з однієї відповіді ДССЗЗІ).
+
+Перехід у той самий статус нічого не робить (крім правил з journal_unchanged);
+правило без цільового статусу (target=None) лише оновлює примітку та пише
+подію в журнал - як чергова атестація чи ІК активного ОІД.
+"""
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from . import instrumentation as trace
+from . import search_index
+from .models import OID, OIDStatusChange, OIDStatusChoices
+from .unit_payload_cache import invalidate_unit_payloads
+
+ANY = None          # будь-який вихідний статус
+REQUESTED = '*'     # цільовий статус передається в самому переході (ручна зміна)
+PREPEND, REPLACE = 'prepend', 'replace'  # як правило змінює примітку ОІД
+
+
+@dataclass(frozen=True)
+class Rule:
+    sources: frozenset = ANY
+    target: str = None
+    reason: str = ''
+    note: str = None
+    note_mode: str = PREPEND
+    journal_unchanged: bool = False
+
+
+FIRST_ATTESTATION_SOURCES = frozenset({
+    OIDStatusChoices.NEW,
+    OIDStatusChoices.RECEIVED_TZ,
+    OIDStatusChoices.RECEIVED_TZ_REPEAT,
+    OIDStatusChoices.RECEIVED_TZ_APPROVE,
+    OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION,
+    OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,
+    OIDStatusChoices.TERMINATED,
+})
+
+_REQUEST_REASON = "ОІД додано до заявки №{request_number} (Тип робіт: {work_type})"
+_IK_REASON = "Проведено інструментальний контроль (Висновок №{document_number} від {process_date})"
+
+TRANSITIONS = {
+    # Заявка (WorkRequestItem.save)
+    'request_ik': (Rule(ANY, OIDStatusChoices.RECEIVED_REQUEST_IK, _REQUEST_REASON),),
+    'request_attestation': (Rule(ANY, OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION, _REQUEST_REASON),),
+    'request_pland_attestation': (Rule(ANY, OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION, _REQUEST_REASON),),
+    'request_other': (Rule(ANY, OIDStatusChoices.RECEIVED_REQUEST, _REQUEST_REASON),),
+    # Технічне завдання (TechnicalTask.save)
+    'tz_received': (Rule(ANY, OIDStatusChoices.RECEIVED_TZ, "Отримано ТЗ №{tz_number}"),),
+    'tz_for_revision': (Rule(ANY, OIDStatusChoices.RECEIVED_TZ_REPEAT, "ТЗ №{tz_number} відправлено на доопрацювання"),),
+    'tz_awaiting_docs': (Rule(ANY, OIDStatusChoices.RECEIVED_TZ_REPEAT, "ТЗ №{tz_number} очікує додаткові документи"),),
+    'tz_approved': (Rule(ANY, OIDStatusChoices.RECEIVED_TZ_APPROVE, "ТЗ №{tz_number} погоджено"),),
+    # Документи (Document.apply_status_effects)
+    'attestation_registered': (
+        Rule(FIRST_ATTESTATION_SOURCES, OIDStatusChoices.ATTESTED,
+             "Атестацію завершено. Зареєстровано Акт атестації №{registered_number}",
+             note="Об'єкт атестовано {process_date}. ||", note_mode=REPLACE),
+        Rule(frozenset({OIDStatusChoices.ACTIVE}), None,
+             "Проведено чергову атестацію (Акт №{registered_number}) ||",
+             note="Проведено чергову атестацію ({process_date}). ||"),
+    ),
+    'azr_registered': (
+        Rule(ANY, OIDStatusChoices.ACTIVE, "Зареєстровано АЗР №{registered_number} від {registered_date}"),
+    ),
+    'ik_completed': (
+        Rule(frozenset({OIDStatusChoices.ACTIVE}), None, _IK_REASON + " ||",
+             note="Проведено інструментальний контроль ({process_date}). ||"),
+        Rule(ANY, None, _IK_REASON + " роботи проводились {work_date}.",
+             note="Уточнити попередній статус ОІД.(був {old_status}) Проведено інструментальний контроль "
+                  "({process_date}) роботи проводились {work_date}. ||"),
+    ),
+    # Реєстрація АЗР (WorkCompletionRegistration.save)
+    'azr_sent': (
+        Rule(ANY, OIDStatusChoices.AZR_SEND,
+             "АЗР (документ №{document_number}) відправлено на реєстрацію в складі листа №{letter_number}"),
+    ),
+    # Процес ОІД (services.complete_process_steps_for_documents)
+    'process_completed': (Rule(ANY, OIDStatusChoices.ACTIVE, "Завершено крок процесу \"{step_name}\""),),
+    # Ручна зміна (update_oid_status_view)
+    'manual': (Rule(ANY, REQUESTED, "{reason}", journal_unchanged=True),),
+}
+
+
+@dataclass
+class Transition:
+    """
+    Подія для ОІД. oid - екземпляр OID або його pk; переданому екземпляру після
+    застосування переходу оновлюються status та note (щоб подальший save() їх не відкотив).
+    """
+    oid: object
+    event: str
+    context: dict = field(default_factory=dict)
+    initiating_document_id: int = None
+    changed_by_id: int = None
+    target: str = None  # лише для правил з target=REQUESTED
+
+    def __post_init__(self):
+        if self.event not in TRANSITIONS:
+            raise ValueError(f"Невідома подія статусу ОІД: '{self.event}'")
+
+    @property
+    def oid_id(self):
+        return self.oid.pk if isinstance(self.oid, OID) else self.oid
+
+
+def format_date(value):
+    """Дата для шаблонів причин та приміток ('' - якщо дати немає)."""
+    return value.strftime('%d.%m.%Y') if value else ''
+
+
+def match_rule(event, status):
+    """Перше правило події, що діє для статусу (None - подія не змінює ОІД)."""
+    for rule in TRANSITIONS[event]:
+        if rule.sources is ANY or status in rule.sources:
+            return rule
+    return None
+
+
+def _status_label(status):
+    try:
+        return OIDStatusChoices(status).label
+    except ValueError:
+        return status
+
+
+def apply_many(transitions, batch_size=500):
+    """
+    Застосовує переходи пакетом. Повертає створені записи OIDStatusChange.
+    Кількість запитів не залежить від кількості переходів.
+    """
+    transitions = [transition for transition in transitions if transition.oid_id is not None]
+    if not transitions:
+        return []
+
+    with trace.span('oid.transitions', transitions=len(transitions)) as span, transaction.atomic():
+        oids = OID.objects.in_bulk({transition.oid_id for transition in transitions})
+        changed, note_changed, journal = {}, set(), []
+        for transition in transitions:
+            oid = oids.get(transition.oid_id)
+            rule = match_rule(transition.event, oid.status) if oid else None
+            if rule is None:
+                continue
+            target = transition.target if rule.target == REQUESTED else rule.target
+            if target is not None and target == oid.status and not rule.journal_unchanged:
+                continue
+
+            old_label = oid.get_status_display()
+            context = {**transition.context, 'old_status': old_label}
+            if rule.note:
+                note = rule.note.format(**context)
+                oid.note = note if rule.note_mode == REPLACE else f"{note}\n{oid.note or ''}".strip()
+                note_changed.add(oid.pk)
+                changed[oid.pk] = oid
+            if target is not None and target != oid.status:
+                oid.status = target
+                changed[oid.pk] = oid
+            journal.append(OIDStatusChange(
+                oid_id=oid.pk,
+                old_status=old_label,
+                new_status=_status_label(oid.status),
+                reason=rule.reason.format(**context),
+                initiating_document_id=transition.initiating_document_id,
+                changed_by_id=transition.changed_by_id,
+            ))
+
+        if changed:
+            now = timezone.now()
+            for oid in changed.values():
+                oid.updated_at = now
+            bulk_update_with_history(list(changed.values()), OID, ['status', 'note', 'updated_at'],
+                                     batch_size=batch_size)
+            invalidate_unit_payloads({oid.unit_id for oid in changed.values()})
+            search_index.reindex(search_index.OID, note_changed)
+        if journal:
+            journal = bulk_create_with_history(journal, OIDStatusChange, batch_size=batch_size)
+
+        # Екземпляри, передані в переходах, - з актуальними статусом і приміткою
+        for transition in transitions:
+            oid = oids.get(transition.oid_id)
+            if isinstance(transition.oid, OID) and oid is not None:
+                transition.oid.status, transition.oid.note = oid.status, oid.note
+        span.set(changed=len(changed), journal=len(journal))
+
+    trace.incr('oid.status_changed', len(changed))
+    trace.debug('oid.status', "%s transitions: %s OIDs changed, %s journal records",
+                len(transitions), len(changed), len(journal))
+    return journal
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_transitions():
+    """
+    Накопичує переходи apply() у блоці та застосовує їх одним apply_many при виході.
+    Вкладені блоки приєднуються до зовнішнього; при винятку переходи відкидаються.
+    """
+    if getattr(_deferred, 'queue', None) is not None:
+        yield
+        return
+    _deferred.queue = queue = []
+    try:
+        yield
+    finally:
+        _deferred.queue = None
+    apply_many(queue)
+
+
+def apply(transitions):
+    """apply_many() одразу або, в межах deferred_transitions(), - при виході з блоку."""
+    queue = getattr(_deferred, 'queue', None)
+    if queue is None:
+        return apply_many(transitions)
+    queue.extend(transitions)
+    return []
@@ -0,0 +1,282 @@
+# oids/pagination.py
+"""
+Пагінація за ключем сортування (keyset / seek) для великих списків.
+
+Django Paginator на кожну сторінку виконує COUNT(*) по всьому відфільтрованому
+(часто з JOIN та DISTINCT) queryset і читає сторінку через OFFSET - глибокі
+сторінки стають лінійно повільнішими. KeysetPaginator замість OFFSET бере
+значення полів сортування останнього (першого) запису сторінки і читає
+наступну (попередню) сторінку умовою "після цього кортежу":
+
+    (unit__code, oid_type, cipher, id) > ('A0001', 'МОВНА', 'К-1', 42)
+
+розгорнутою в OR/AND для змішаних напрямків та NULL. Сортування береться з
+самого queryset (order_by у view), до нього додається pk як унікальний ключ.
+Кортеж кодується в непрозорий підписаний курсор (GET-параметр `cursor`);
+курсор іншого сортування або підроблений - перша сторінка.
+
+Кількість записів - за бажанням (count=):
+    None        - не рахується;
+    'cached'    - точний COUNT(*), кешується на KEYSET_COUNT_CACHE_TIMEOUT секунд;
+    'estimate'  - рахує не далі KEYSET_COUNT_ESTIMATE_LIMIT записів ("понад N").
+
+Сторінка (KeysetPage) сумісна з шаблонами списків: ітерація, has_next/has_previous,
+start_index (позиція переноситься в курсорі), paginator.count.
+Підключення у view: get_paginated_page(queryset, request, keyset=True, count='cached').
+"""
+import datetime
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import F, Q
+
+CURSOR_PARAM = 'cursor'
+CURSOR_SALT = 'oids.pagination.keyset'
+
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATE = 'estimate'
+
+
+class UnsupportedOrdering(ValueError):
+    """Сортування, для якого keyset-пагінація неможлива (випадкове, вирази, зв'язки "до багатьох")."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return datetime.date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+    return value
+
+
+class KeysetPaginator:
+
+    def __init__(self, queryset, per_page, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_mode = count
+        self.ordering = self._resolve_ordering(queryset)
+        self.signature = hashlib.sha1(repr(self.ordering).encode()).hexdigest()[:12]
+        self._count = None
+        self.count_is_estimate = False
+
+    def _resolve_ordering(self, queryset):
+        """[(шлях, descending)] з order_by queryset (або Meta.ordering) + pk, якщо його там немає."""
+        order_by = list(queryset.query.order_by)
+        if not order_by and queryset.query.default_ordering:
+            order_by = list(queryset.model._meta.ordering)
+        ordering = []
+        for item in order_by:
+            if not isinstance(item, str) or item == '?':
+                raise UnsupportedOrdering(item)
+            name = item.lstrip('-')
+            if name == queryset.model._meta.pk.name:
+                name = 'pk'
+            if name != 'pk' and name not in queryset.query.annotations:
+                self._check_path(queryset.model, name)
+            ordering.append((name, item.startswith('-')))
+        if 'pk' not in [name for name, _ in ordering]:
+            ordering.append(('pk', False))
+        return ordering
+
+    @staticmethod
+    def _check_path(model, path):
+        # Значення має читатися з об'єкта: лише прямі FK по шляху і не FK в кінці
+        # (order_by('unit') сортує за Meta.ordering пов'язаної моделі)
+        parts = path.split('__')
+        for i, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise UnsupportedOrdering(path)
+            if field.many_to_many or field.one_to_many:
+                raise UnsupportedOrdering(path)
+            if field.is_relation:
+                if i == len(parts) - 1:
+                    raise UnsupportedOrdering(path)
+                model = field.related_model
+
+    # --- Кількість записів ---
+
+    @property
+    def count(self):
+        if self._count is None and self.count_mode:
+            self._count = self._compute_count()
+        return self._count
+
+    def _compute_count(self):
+        queryset = self.queryset.order_by()
+        if self.count_mode == COUNT_ESTIMATE:
+            limit = settings.KEYSET_COUNT_ESTIMATE_LIMIT
+            count = queryset[:limit + 1].count()
+            self.count_is_estimate = count > limit
+            return min(count, limit)
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'oids:keyset-count:' + hashlib.sha1(repr((sql, params)).encode()).hexdigest()
+        return cache.get_or_set(key, queryset.count, settings.KEYSET_COUNT_CACHE_TIMEOUT)
+
+    # --- Курсор ---
+
+    def _key(self, obj):
+        values = []
+        for name, _ in self.ordering:
+            value = obj
+            for part in name.split('__'):
+                value = getattr(value, part)
+                if value is None:
+                    break
+            values.append(_encode_value(value))
+        return values
+
+    def encode_cursor(self, obj, backwards, start):
+        return signing.dumps(
+            {'o': self.signature, 'k': self._key(obj), 'b': backwards, 's': start},
+            salt=CURSOR_SALT, compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """(значення ключа, назад?, позиція) або None для відсутнього/чужого/підробленого курсора."""
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if data.get('o') != self.signature or len(data.get('k', ())) != len(self.ordering):
+            return None
+        return [_decode_value(value) for value in data['k']], bool(data.get('b')), max(int(data.get('s', 1)), 1)
+
+    # --- Умова "після ключа" ---
+
+    def _order_expressions(self, backwards):
+        expressions = []
+        for name, descending in self.ordering:
+            # NULL - "найменше" значення незалежно від СУБД (як у SQLite)
+            if descending != backwards:
+                expressions.append(F(name).desc(nulls_last=True))
+            else:
+                expressions.append(F(name).asc(nulls_first=True))
+        return expressions
+
+    @staticmethod
+    def _beyond(name, value, descending):
+        """Записи, що йдуть після value в заданому напрямку (NULL - перед усіма значеннями)."""
+        if descending:
+            if value is None:
+                return None
+            return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+        if value is None:
+            return Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__gt': value})
+
+    @staticmethod
+    def _equal(name, value):
+        return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+    def _after(self, values, backwards):
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            beyond = self._beyond(name, value, descending != backwards)
+            if beyond is not None:
+                condition |= prefix & beyond
+            prefix &= self._equal(name, value)
+        return condition
+
+    # --- Сторінки ---
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.queryset
+        backwards, start = False, 1
+        if decoded is not None:
+            values, backwards, start = decoded
+            queryset = queryset.filter(self._after(values, backwards))
+        rows = list(queryset.order_by(*self._order_expressions(backwards))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+            if not has_previous:
+                start = 1
+        else:
+            has_previous, has_next = decoded is not None and start > 1, has_more
+        return KeysetPage(rows, self, start, has_previous, has_next)
+
+    def get_page(self, cursor=None):
+        return self.page(cursor)
+
+
+class KeysetPage:
+    is_keyset = True
+    number = None
+
+    def __init__(self, object_list, paginator, start, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._start = start
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<Keyset page from {self._start} ({len(self.object_list)} records)>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __bool__(self):
+        return True
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        return self._start if self.object_list else 0
+
+    def end_index(self):
+        return self._start + len(self.object_list) - 1
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], False, self._start + len(self.object_list))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], True, max(self._start - self.paginator.per_page, 1))
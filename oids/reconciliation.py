@@ -0,0 +1,211 @@
+# oids/reconciliation.py
+"""
+Звірка похідних статусів: WorkRequestItem (за документами) та WorkRequest
+(за статусами елементів) для всієї бази або її частини.
+
+Інкрементальний перерахунок (status_sync) покриває зміни через save() та сигнали;
+зміни в обхід них (QuerySet.update, ручні правки, старі дані) дають "дрейф".
+Команда update_trip_result_statuses виправляла його циклом по відправках з
+кількома запитами на кожен документ. Тут - набором запитів на порцію:
+
+- очікуваний статус елемента заявки - за останнім документом його ролі
+  (Акт атестації / Висновок ІК), що вибирається для всієї порції одним запитом
+  з віконною функцією; правила - models.expected_item_status (ті самі, що в
+  WorkRequestItem.check_and_update_status_based_on_documents);
+- очікуваний статус заявки - за гістограмою статусів елементів
+  (with_status_histogram, один агрегатний запит на порцію) та
+  models.work_request_status_from_counts;
+- зберігаються лише відмінності - bulk_update з історією (одна транзакція на
+  порцію); при dry_run нічого не зберігається, а статуси заявок рахуються з
+  урахуванням ще не збережених виправлень елементів.
+
+Елементи у фінальних статусах (COMPLETED, CANCELED) не перераховуються - як і в
+check_and_update_status_based_on_documents.
+"""
+import datetime
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from simple_history.utils import bulk_update_with_history
+
+from . import instrumentation as trace
+from .document_roles import DocumentRole, get_role_type_ids
+from .models import (Document, TripResultForUnit, WorkRequest, WorkRequestItem, WorkRequestStatusChoices,
+                     WorkTypeChoices, WORK_REQUEST_ITEM_STATUS_KEYS, expected_item_status, work_request_status_from_counts)
+
+FINAL_ITEM_STATUSES = (WorkRequestStatusChoices.COMPLETED, WorkRequestStatusChoices.CANCELED)
+ATTESTATION_WORK_TYPES = (WorkTypeChoices.ATTESTATION, WorkTypeChoices.PLAND_ATTESTATION)
+
+# Поля документа, потрібні expected_item_status
+DOCUMENT_STATUS_FIELDS = ('pk', 'work_request_item', 'doc_process_date', 'dsszzi_registered_number',
+                          'dsszzi_registered_date', 'attestation_registration_sent')
+
+_STATUS_KEYS = {status: key for key, status in WORK_REQUEST_ITEM_STATUS_KEYS.items()}
+
+
+@dataclass
+class ReconciliationResult:
+    dry_run: bool = False
+    items_checked: int = 0
+    work_requests_checked: int = 0
+    item_changes: Counter = field(default_factory=Counter)          # (старий, новий статус) -> кількість
+    work_request_changes: Counter = field(default_factory=Counter)  # (старий, новий статус) -> кількість
+    processed_dates_filled: int = 0
+
+    @property
+    def items_corrected(self):
+        return sum(self.item_changes.values())
+
+    @property
+    def work_requests_corrected(self):
+        return sum(self.work_request_changes.values())
+
+
+def _chunks(ids, chunk_size):
+    ids = sorted(ids)
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
+
+
+def latest_status_documents(wri_ids):
+    """
+    {pk елемента заявки: останній документ його ролі} - одним запитом.
+    Атестація - Акт атестації, ІК - Висновок ІК; останній - за doc_process_date, потім pk.
+    Відправка у в/ч (TripResultForUnit.documents) - анотація sent_to_unit.
+    """
+    role_filter = Q()
+    attestation_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
+    if attestation_type_ids:
+        role_filter |= Q(work_request_item__work_type__in=ATTESTATION_WORK_TYPES,
+                         document_type_id__in=attestation_type_ids)
+    ik_type_ids = get_role_type_ids(DocumentRole.IK_CONCLUSION)
+    if ik_type_ids:
+        role_filter |= Q(work_request_item__work_type=WorkTypeChoices.IK, document_type_id__in=ik_type_ids)
+    if not role_filter:
+        return {}
+
+    sent_to_unit = TripResultForUnit.documents.through.objects.filter(document_id=OuterRef('pk'))
+    documents = Document.objects.filter(role_filter, work_request_item_id__in=wri_ids).annotate(
+        sent_to_unit=Exists(sent_to_unit),
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('work_request_item_id')],
+            order_by=[F('doc_process_date').desc(), F('pk').desc()],
+        )
+    ).filter(row_number=1).order_by().only(*DOCUMENT_STATUS_FIELDS)
+    return {document.work_request_item_id: document for document in documents}
+
+
+def _item_scope(unit_codes, since, items):
+    queryset = WorkRequestItem.objects.exclude(status__in=FINAL_ITEM_STATUSES)
+    if items is not None:
+        queryset = queryset.filter(pk__in=items.values('pk'))
+    if unit_codes:
+        queryset = queryset.filter(request__unit__code__in=unit_codes)
+    if since:
+        changed_documents = Document.objects.filter(work_request_item=OuterRef('pk'), updated_at__gte=since)
+        queryset = queryset.filter(Q(updated_at__gte=since) | Exists(changed_documents))
+    return queryset
+
+
+def _work_request_scope(unit_codes, since, items):
+    queryset = WorkRequest.objects.all()
+    if items is not None:
+        queryset = queryset.filter(pk__in=items.values('request_id'))
+    if unit_codes:
+        queryset = queryset.filter(unit__code__in=unit_codes)
+    if since:
+        changed_items = WorkRequestItem.objects.filter(request=OuterRef('pk'), updated_at__gte=since)
+        queryset = queryset.filter(Q(updated_at__gte=since) | Exists(changed_items))
+    return queryset
+
+
+def reconcile_statuses(unit_codes=None, since=None, items=None, chunk_size=1000, dry_run=False, batch_size=500):
+    """
+    Звіряє статуси елементів заявок і заявок з очікуваними та виправляє відмінності.
+
+    :param unit_codes: Лише заявки цих ВЧ (коди).
+    :param since: datetime/date - лише елементи, змінені (або з документами, зміненими) з цього моменту,
+                  та заявки, змінені з цього моменту або з такими елементами.
+    :param items: Queryset WorkRequestItem - додаткове обмеження набору елементів (і їх заявок).
+    :param chunk_size: Скільки об'єктів обробляється (і зберігається) за один прохід.
+    :param dry_run: Лише порахувати відмінності.
+    Повертає ReconciliationResult.
+    """
+    if isinstance(since, datetime.date) and not isinstance(since, datetime.datetime):
+        since = timezone.make_aware(datetime.datetime.combine(since, datetime.time.min))
+    result = ReconciliationResult(dry_run=dry_run)
+    # Заявка -> Counter зміни кількості елементів за статусом (для dry_run)
+    pending_deltas = {}
+
+    with trace.span('reconcile.statuses', dry_run=dry_run) as span:
+        wri_ids = list(_item_scope(unit_codes, since, items).values_list('pk', flat=True))
+        for chunk in _chunks(wri_ids, chunk_size):
+            items_chunk = list(WorkRequestItem.objects.filter(pk__in=chunk))
+            documents = latest_status_documents(chunk)
+            changed = []
+            for item in items_chunk:
+                new_status, document_date = expected_item_status(item.work_type, documents.get(item.pk))
+                new_status = new_status or item.status
+                item_changed = False
+                if new_status != item.status:
+                    result.item_changes[(item.status, new_status)] += 1
+                    delta = pending_deltas.setdefault(item.request_id, Counter())
+                    delta[item.status] -= 1
+                    delta[new_status] += 1
+                    item.status = new_status
+                    item_changed = True
+                if document_date and not item.docs_actually_processed_on:
+                    item.docs_actually_processed_on = document_date
+                    result.processed_dates_filled += 1
+                    item_changed = True
+                if item_changed:
+                    changed.append(item)
+            result.items_checked += len(items_chunk)
+
+            if changed and not dry_run:
+                now = timezone.now()
+                for item in changed:
+                    item.updated_at = now
+                with transaction.atomic():
+                    bulk_update_with_history(changed, WorkRequestItem,
+                                             ['status', 'docs_actually_processed_on', 'updated_at'],
+                                             batch_size=batch_size)
+
+        work_request_ids = set(_work_request_scope(unit_codes, since, items).values_list('pk', flat=True))
+        work_request_ids.update(pending_deltas)
+        for chunk in _chunks(work_request_ids, chunk_size):
+            changed = []
+            for work_request in WorkRequest.objects.filter(pk__in=chunk).with_status_histogram():
+                counts = {'total': work_request.items_total}
+                counts.update({key: getattr(work_request, f'items_{key}') for key in WORK_REQUEST_ITEM_STATUS_KEYS})
+                if dry_run:
+                    # Виправлення елементів ще не збережені - враховуємо їх у гістограмі
+                    for status, delta in pending_deltas.get(work_request.pk, {}).items():
+                        if status in _STATUS_KEYS:
+                            counts[_STATUS_KEYS[status]] += delta
+                new_status = work_request_status_from_counts(counts) or work_request.status
+                if new_status != work_request.status:
+                    result.work_request_changes[(work_request.status, new_status)] += 1
+                    work_request.status = new_status
+                    changed.append(work_request)
+                result.work_requests_checked += 1
+
+            if changed and not dry_run:
+                now = timezone.now()
+                for work_request in changed:
+                    work_request.updated_at = now
+                with transaction.atomic():
+                    bulk_update_with_history(changed, WorkRequest, ['status', 'updated_at'], batch_size=batch_size)
+
+        span.set(items_checked=result.items_checked, items_corrected=result.items_corrected,
+                 work_requests_checked=result.work_requests_checked,
+                 work_requests_corrected=result.work_requests_corrected)
+
+    trace.incr('reconcile.items_corrected', result.items_corrected)
+    trace.incr('reconcile.work_requests_corrected', result.work_requests_corrected)
+    return result
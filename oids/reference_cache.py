@@ -0,0 +1,285 @@
+# oids/reference_cache.py
+"""
+Кеш довідкових таблиць (військові частини, виконавці, ТУ, типи документів) для форм і фільтрів.
+
+Ці невеликі таблиці перечитувались і перетворювались на <option> при кожному
+рендері форм (oids/forms.py, oids/forms_filters.py) та сторінок зі списками-фільтрами.
+Тепер кожен набір (REFERENCE_SETS) зберігається в кеші Django як готові
+(pk, підпис) + словник pk -> об'єкт:
+
+- бекенд - settings.REFERENCE_CACHE_ALIAS (locmem за замовчуванням; для кількох
+  процесів - спільний, напр. FileBasedCache, див. CACHES у settings.py);
+- записи версіоновані: версія (випадковий токен) набору зберігається в тому ж кеші,
+  сигнали post_save/post_delete моделі (oids/signals.py) її змінюють - старі записи
+  просто перестають читатися (у т.ч. в інших процесах при спільному кеші);
+- у межах процесу готовий запис тримається в пам'яті, поки версія не змінилась
+  (без розпаковування на кожне звернення);
+- поки в поточній транзакції є незакомічені зміни моделі, набір будується з БД
+  і не кешується - після відкату в кеші не лишиться даних, яких немає в БД.
+
+Зміни в обхід сигналів (bulk_create, QuerySet.update) потребують явного
+invalidate_reference_cache(model).
+
+Поля форм: CachedModelChoiceField / CachedModelMultipleChoiceField беруть варіанти
+з кешу та перевіряють надіслані pk за словником (невідомий pk - перевірка в БД).
+Якщо форма замінює queryset поля (self.fields[...].queryset = ...) - поле
+поводиться як звичайне ModelChoiceField.
+"""
+import copy
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+
+# Набір -> (модель, функція побудови queryset)
+REFERENCE_SETS = {
+    'units': ('oids.Unit', lambda model: model.objects.order_by('code')),
+    'active_persons': ('oids.Person', lambda model: model.objects.filter(is_active=True).order_by('full_name')),
+    'territorial_managements': ('oids.TerritorialManagement', lambda model: model.objects.order_by('name')),
+    'document_types': ('oids.DocumentType', lambda model: model.objects.order_by('name')),
+}
+
+_lock = threading.Lock()
+_local_entries = {}  # набір -> ReferenceEntry (пам'ять процесу)
+_pending = threading.local()  # моделі, змінені в незакоміченій транзакції
+
+
+@dataclass(frozen=True)
+class ReferenceEntry:
+    version: str
+    objects: tuple
+    choices: tuple  # ((pk, підпис), ...)
+    by_id: dict = field(default_factory=dict)
+
+
+def _cache():
+    return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 3600)
+
+
+def _version_key(model_label):
+    return f'oids:reference-version:{model_label}'
+
+
+def _entry_key(name):
+    return f'oids:reference:{name}'
+
+
+def reference_queryset(name):
+    """Свіжий (не виконаний) queryset набору."""
+    model_label, build = REFERENCE_SETS[name]
+    return build(apps.get_model(model_label))
+
+
+def _pending_models():
+    models = getattr(_pending, 'models', None)
+    if models is None:
+        models = _pending.models = set()
+    elif models and not connection.in_atomic_block:
+        # Транзакція завершилась (коміт уже скинув версію, або відкат) - позначки не потрібні
+        models.clear()
+    return models
+
+
+def model_version(model_label):
+    """
+    Поточна спільна версія даних моделі або None, якщо в поточній транзакції є
+    незакомічені зміни моделі (тоді результат не можна кешувати).
+    Використовується й іншими кешами в пам'яті процесу (реєстр ролей, календар).
+    """
+    if model_label in _pending_models():
+        return None
+    cache = _cache()
+    version = cache.get(_version_key(model_label))
+    if version is None:
+        # Версії нема (перший запуск або витіснена з кешу) - нова, тож старі записи не збіжуться
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(model_label), version, None):
+            version = cache.get(_version_key(model_label), version)
+    return version
+
+
+def invalidate_model_version(model_label):
+    """
+    Змінює спільну версію моделі. Усередині транзакції модель до коміту
+    вважається зміненою (model_version -> None); після коміту версія змінюється ще раз.
+    """
+    _bump(model_label)
+    if connection.in_atomic_block:
+        _pending_models().add(model_label)
+        transaction.on_commit(lambda: _commit(model_label))
+
+
+def get_reference(name):
+    """ReferenceEntry набору: з пам'яті процесу, з кешу Django або (промах) з БД."""
+    model_label = REFERENCE_SETS[name][0]
+    version = model_version(model_label)
+    if version is None:
+        return _build(name, version=None)
+
+    entry = _local_entries.get(name)
+    if entry is not None and entry.version == version:
+        return entry
+    cache = _cache()
+    entry = cache.get(_entry_key(name), version=version)
+    if entry is None:
+        entry = _build(name, version)
+        cache.set(_entry_key(name), entry, _timeout(), version=version)
+    with _lock:
+        _local_entries[name] = entry
+    return entry
+
+
+def _build(name, version):
+    objects = tuple(reference_queryset(name))
+    return ReferenceEntry(
+        version=version,
+        objects=objects,
+        choices=tuple((obj.pk, str(obj)) for obj in objects),
+        by_id={obj.pk: obj for obj in objects},
+    )
+
+
+def _bump(model_label):
+    _cache().set(_version_key(model_label), uuid.uuid4().hex, None)
+
+
+def invalidate_reference_cache(model=None):
+    """
+    Скидає набори моделі (всі набори - без аргументу). Усередині транзакції набори
+    моделі до коміту будуються з БД; після коміту версія змінюється ще раз.
+    """
+    if model is None:
+        labels = {model_label for model_label, _ in REFERENCE_SETS.values()}
+    else:
+        labels = {model._meta.label} & {model_label for model_label, _ in REFERENCE_SETS.values()}
+    for model_label in labels:
+        invalidate_model_version(model_label)
+    with _lock:
+        for name, (model_label, _) in REFERENCE_SETS.items():
+            if model_label in labels:
+                _local_entries.pop(name, None)
+
+
+def _commit(model_label):
+    _bump(model_label)
+    getattr(_pending, 'models', set()).discard(model_label)
+
+
+# --- Поля форм ---
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    """Варіанти з кешованого набору замість виконання queryset."""
+
+    @property
+    def entry(self):
+        # Ліниво - щоб оголошення поля у класі форми не зверталось до кешу/БД
+        return get_reference(self.field.reference)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        entry = self.entry
+        if self.field.has_custom_label:
+            for obj in entry.objects:
+                yield self.choice(obj)
+        else:
+            for (pk, label), obj in zip(entry.choices, entry.objects):
+                yield ModelChoiceIteratorValue(pk, obj), label
+
+    def __len__(self):
+        return len(self.entry.objects) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.entry.objects)
+
+
+class CachedChoiceFieldMixin:
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        self._reference_queryset = None
+        super().__init__(reference_queryset(reference), **kwargs)
+        self._mark_reference()
+
+    def _mark_reference(self):
+        # Кеш використовується, лише поки queryset поля - вихідний queryset набору
+        self._reference_queryset = self._queryset
+        self.widget.choices = self.choices
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        if self.uses_reference_cache:
+            result._mark_reference()
+        return result
+
+    @property
+    def uses_reference_cache(self):
+        return self._queryset is not None and self._queryset is self._reference_queryset and not self.to_field_name
+
+    @property
+    def has_custom_label(self):
+        return 'label_from_instance' in self.__dict__ or \
+            type(self).label_from_instance is not forms.ModelChoiceField.label_from_instance
+
+    def _get_choices(self):
+        if not hasattr(self, '_choices') and self.uses_reference_cache:
+            return ReferenceChoiceIterator(self)
+        return super()._get_choices()
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+    def _cached_object(self, value, entry):
+        """Об'єкт з набору за надісланим значенням або None (невідомий pk)."""
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            pk = self.queryset.model._meta.pk.to_python(value)
+        except forms.ValidationError:
+            return None
+        return entry.by_id.get(pk)
+
+
+class CachedModelChoiceField(CachedChoiceFieldMixin, forms.ModelChoiceField):
+    """ModelChoiceField з варіантами з кешу довідників (oids/reference_cache.py)."""
+
+    def to_python(self, value):
+        if value in self.empty_values or not self.uses_reference_cache:
+            return super().to_python(value)
+        self.validate_no_null_characters(value)
+        obj = self._cached_object(value, get_reference(self.reference))
+        if obj is None:
+            # Невідомий pk (або кеш ще не бачив новий запис) - звичайна перевірка в БД
+            return super().to_python(value)
+        # Копія - щоб зміни в одному запиті не потрапили в спільний кеш
+        return copy.copy(obj)
+
+
+class CachedModelMultipleChoiceField(CachedChoiceFieldMixin, forms.ModelMultipleChoiceField):
+    """ModelMultipleChoiceField з варіантами з кешу; надіслані pk перевіряються за словником."""
+
+    def _check_values(self, value):
+        if not self.uses_reference_cache:
+            return super()._check_values(value)
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        entry = get_reference(self.reference)
+        pks = []
+        for item in value:
+            self.validate_no_null_characters(item)
+            obj = self._cached_object(item, entry)
+            if obj is None:
+                return super()._check_values(value)
+            pks.append(obj.pk)
+        return self.queryset.filter(pk__in=pks)
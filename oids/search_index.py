@@ -0,0 +1,300 @@
+# oids/search_index.py
+"""
+Повнотекстовий пошуковий індекс (SQLite FTS5, токенізатор trigram) по ОІД,
+військових частинах, документах та заявках.
+
+Навіщо: пошук у списках (oid_list_view, unit_list_view, document_list_view,
+work_request_list_view) та в адмінці будувався як OR з кількох `icontains` -
+повний перебір таблиць, до того ж SQLite LIKE не зводить кирилицю до одного
+регістру. Trigram-індекс зберігає семантику "підрядок" (запит від 3 символів),
+ігнорує регістр (включно з кирилицею) і ранжує збіги bm25.
+
+Таблиця oids_search_index (міграція 0051_search_index):
+    kind, object_id, label, ref - не індексуються (тип, pk, підпис, денормалізований ключ)
+    title - основні ідентифікатори (шифр, код ВЧ, номер документа/заявки), вага 10
+    body  - решта тексту (назва, приміщення, примітка, пов'язані шифри), вага 1
+rowid = object_id * KIND_SLOTS + код типу - заміна/видалення запису без пошуку.
+
+Індекс підтримується сигналами (oids/signals.py) та пакетними шляхами
+(services.ingest_documents, import_real_data); повна перебудова -
+`manage.py rebuild_search_index`.
+
+Для запитів, коротших за 3 символи, індекс не застосовний - search_ids() повертає
+None, а filter_queryset() використовує переданий "запасний" Q-фільтр (icontains).
+"""
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+TABLE = 'oids_search_index'
+KIND_SLOTS = 8
+MIN_QUERY_LENGTH = 3  # trigram
+
+# Ваги bm25 по колонках (kind, object_id, label, ref, title, body)
+_BM25 = f"bm25({TABLE}, 0.0, 0.0, 0.0, 0.0, 10.0, 1.0)"
+
+OID = 'oid'
+UNIT = 'unit'
+DOCUMENT = 'document'
+WORK_REQUEST = 'work_request'
+
+KIND_CODES = {OID: 0, UNIT: 1, DOCUMENT: 2, WORK_REQUEST: 3}
+KIND_LABELS = {OID: 'ОІД', UNIT: 'Військова частина', DOCUMENT: 'Документ', WORK_REQUEST: 'Заявка'}
+
+# Поля моделі, зміна яких (save(update_fields=...)) потребує переіндексації
+INDEXED_FIELDS = {
+    OID: {'cipher', 'full_name', 'room', 'note'},
+    UNIT: {'code', 'name', 'city'},
+    DOCUMENT: {'document_number', 'dsszzi_registered_number', 'note', 'oid'},
+    WORK_REQUEST: {'incoming_number', 'unit'},
+}
+
+
+def _join(*parts):
+    # Розділювач рядка - щоб збіг не "перетікав" з одного поля в інше
+    return '\n'.join(str(part) for part in parts if part)
+
+
+def _models():
+    from .models import OID as OIDModel, Unit, Document, WorkRequest
+    return {OID: OIDModel, UNIT: Unit, DOCUMENT: Document, WORK_REQUEST: WorkRequest}
+
+
+def _queryset(kind):
+    """Queryset з усім потрібним для побудови записів індексу (без запитів на об'єкт)."""
+    from django.db.models import Prefetch
+    from .models import WorkRequestItem
+
+    model = _models()[kind]
+    if kind == DOCUMENT:
+        return model.objects.select_related('oid')
+    if kind == WORK_REQUEST:
+        return model.objects.select_related('unit').prefetch_related(
+            Prefetch('items', queryset=WorkRequestItem.objects.select_related('oid').only('request_id', 'oid__cipher'))
+        )
+    return model.objects.all()
+
+
+def _entry(kind, obj):
+    """(label, ref, title, body) для об'єкта."""
+    if kind == OID:
+        return (f"{obj.cipher} - {obj.full_name}", obj.cipher,
+                obj.cipher, _join(obj.full_name, obj.room, obj.note))
+    if kind == UNIT:
+        return (f"{obj.code} - {obj.name or ''}", _join(obj.code, obj.name),
+                obj.code, _join(obj.name, obj.city))
+    if kind == DOCUMENT:
+        cipher = obj.oid.cipher if obj.oid_id else ''
+        return (f"№{obj.document_number} ({cipher})", '',
+                _join(obj.document_number, obj.dsszzi_registered_number), _join(obj.note, cipher))
+    if kind == WORK_REQUEST:
+        ciphers = sorted({item.oid.cipher for item in obj.items.all()})
+        return (f"№{obj.incoming_number} ({obj.unit.code})", '',
+                obj.incoming_number, _join(obj.unit.code, obj.unit.name, *ciphers))
+    raise ValueError(kind)
+
+
+def _rowid(kind, object_id):
+    return object_id * KIND_SLOTS + KIND_CODES[kind]
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def kind_for_model(model):
+    for kind, kind_model in _models().items():
+        if kind_model is model:
+            return kind
+    return None
+
+
+# --- Підтримка індексу ---
+
+def index_objects(kind, objects):
+    """
+    Записує (замінює) записи індексу для завантажених об'єктів.
+    Повертає pk об'єктів, у яких змінився денормалізований ключ (ref) - шифр ОІД,
+    код/назва ВЧ; від нього залежать записи документів та заявок.
+    """
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects or not is_available():
+        return set()
+    rows = {_rowid(kind, obj.pk): (obj.pk, _entry(kind, obj)) for obj in objects}
+    changed_refs = set()
+    with connection.cursor() as cursor:
+        rowids = list(rows)
+        for start in range(0, len(rowids), 500):
+            batch = rowids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"SELECT rowid, ref FROM {TABLE} WHERE rowid IN ({placeholders})", batch)
+            for rowid, old_ref in cursor.fetchall():
+                if old_ref != rows[rowid][1][1]:
+                    changed_refs.add(rows[rowid][0])
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", batch)
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, kind, object_id, label, ref, title, body) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(rowid, kind, pk) + entry for rowid, (pk, entry) in rows.items()],
+        )
+    return changed_refs
+
+
+def remove(kind, object_ids):
+    object_ids = [pk for pk in object_ids if pk is not None]
+    if not object_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(object_ids), 500):
+            batch = [_rowid(kind, pk) for pk in object_ids[start:start + 500]]
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(batch))})", batch)
+
+
+def reindex(kind, object_ids):
+    """Переіндексація за pk (записи видалених об'єктів прибираються)."""
+    object_ids = {pk for pk in object_ids if pk is not None}
+    if not object_ids or not is_available():
+        return
+    objects = list(_queryset(kind).filter(pk__in=object_ids))
+    remove(kind, object_ids - {obj.pk for obj in objects})
+    changed = index_objects(kind, objects)
+    reindex_dependents(kind, changed)
+
+
+def reindex_model(model, object_ids):
+    """reindex() за класом моделі; для моделей без індексу нічого не робить."""
+    kind = kind_for_model(model)
+    if kind is not None:
+        reindex(kind, object_ids)
+
+
+def reindex_dependents(kind, object_ids):
+    """Записи, що містять денормалізовані дані змінених ОІД / ВЧ."""
+    if not object_ids:
+        return
+    from .models import Document, WorkRequest
+
+    if kind == OID:
+        reindex(DOCUMENT, Document.objects.filter(oid_id__in=object_ids).values_list('pk', flat=True))
+        reindex(WORK_REQUEST, WorkRequest.objects.filter(items__oid_id__in=object_ids).values_list('pk', flat=True).distinct())
+    elif kind == UNIT:
+        reindex(WORK_REQUEST, WorkRequest.objects.filter(unit_id__in=object_ids).values_list('pk', flat=True))
+
+
+def rebuild(kinds=None, chunk_size=2000, progress=None):
+    """Повна перебудова індексу для вказаних типів (за замовчуванням - усіх). Повертає {тип: кількість}."""
+    counts = {}
+    for kind in kinds or KIND_CODES:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE kind = %s", [kind])
+        ids = list(_models()[kind].objects.order_by('pk').values_list('pk', flat=True))
+        counts[kind] = 0
+        for start in range(0, len(ids), chunk_size):
+            objects = list(_queryset(kind).filter(pk__in=ids[start:start + chunk_size]))
+            index_objects(kind, objects)
+            counts[kind] += len(objects)
+            if progress:
+                progress(kind, counts[kind], len(ids))
+    return counts
+
+
+# --- Пошук ---
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def build_match(query, all_terms=False):
+    """
+    Вираз MATCH для запиту або None, якщо індекс не застосовний (коротший за 3 символи).
+    За замовчуванням - весь запит як один підрядок (як колишній icontains);
+    all_terms=True - кожне слово від 3 символів окремо, всі обов'язкові (глобальний пошук).
+    """
+    query = (query or '').strip()
+    if all_terms:
+        terms = [term for term in query.split() if len(term) >= MIN_QUERY_LENGTH]
+        return ' AND '.join(_phrase(term) for term in terms) or None
+    if len(query) < MIN_QUERY_LENGTH:
+        return None
+    return _phrase(query)
+
+
+def ids_subquery(kind, query, all_terms=False):
+    """RawSQL-підзапит pk об'єктів типу kind, що відповідають запиту (або None)."""
+    match = build_match(query, all_terms=all_terms)
+    if match is None or not is_available():
+        return None
+    return RawSQL(f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s", (match, kind))
+
+
+def search_ids(kind, query, limit=None):
+    """pk об'єктів типу kind за релевантністю (або None, якщо індекс не застосовний)."""
+    match = build_match(query)
+    if match is None or not is_available():
+        return None
+    sql = f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s ORDER BY {_BM25}"
+    params = [match, kind]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_queryset(queryset, kind, query, fallback):
+    """
+    Фільтр списку за пошуковим запитом: через індекс (підзапит, без LIKE-сканування)
+    або, якщо запит закороткий, через fallback (Q з icontains).
+    """
+    subquery = ids_subquery(kind, query)
+    if subquery is None:
+        return queryset.filter(fallback)
+    return queryset.filter(pk__in=subquery)
+
+
+def _hit_url(kind, object_id, label):
+    if kind == OID:
+        return reverse('oids:oid_detail_view_name', args=[object_id])
+    if kind == WORK_REQUEST:
+        return reverse('oids:work_request_detail', args=[object_id])
+    if kind == UNIT:
+        return f"{reverse('oids:list_units')}?{urlencode({'search_query': label.split(' - ')[0]})}"
+    return None
+
+
+def search(query, kinds=None, limit=20):
+    """
+    Глобальний пошук: ранжовані (bm25) збіги всіх або вказаних типів.
+    Повертає список {'kind', 'kind_label', 'id', 'label', 'url', 'score'}.
+    """
+    match = build_match(query, all_terms=True)
+    if match is None or not is_available():
+        return []
+    sql = f"SELECT kind, object_id, label, {_BM25} AS rank FROM {TABLE} WHERE {TABLE} MATCH %s"
+    params = [match]
+    kinds = [kind for kind in (kinds or ()) if kind in KIND_CODES]
+    if kinds:
+        sql += f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+        params.extend(kinds)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    hits = [
+        {'kind': kind, 'kind_label': KIND_LABELS[kind], 'id': object_id, 'label': label,
+         'url': _hit_url(kind, object_id, label), 'score': round(-rank, 4)}
+        for kind, object_id, label, rank in rows
+    ]
+    # Документ відкривається на сторінці свого ОІД - одним запитом для всіх документів
+    document_ids = [hit['id'] for hit in hits if hit['kind'] == DOCUMENT]
+    if document_ids:
+        from .models import Document
+        oid_by_document = dict(Document.objects.filter(pk__in=document_ids).values_list('pk', 'oid_id'))
+        for hit in hits:
+            if hit['kind'] == DOCUMENT and hit['id'] in oid_by_document:
+                hit['url'] = reverse('oids:oid_detail_view_name', args=[oid_by_document[hit['id']]])
+    return hits
@@ -1 +1,442 @@
 # services.py
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Max, Case, When, Value, CharField, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from .models import (OID, Document, OIDValiditySnapshot, OIDProcess, OIDProcessStepInstance,
+                     ProcessStepStatusChoices, Trip, WorkRequest, WorkRequestItem, WorkTypeChoices,
+                     WorkRequestTripSnapshot, WorkRequestItemProcessingSnapshot)
+from .business_calendar import add_working_days_many
+from .document_roles import DocumentRole, get_role_type_ids
+from .oid_status import Transition, apply as apply_oid_transitions, deferred_transitions
+from .status_sync import mark_documents
+from . import instrumentation as trace
+from . import search_index
+from .unit_payload_cache import invalidate_unit_payloads
+
+
+# Категорії документів з терміном дії, які показуються на дашбордах.
+# Ключ - назва поля у відповіді, значення - роль типу документа.
+EXPIRATION_CATEGORIES = {
+    'ik': DocumentRole.IK_CONCLUSION,
+    'attestation': DocumentRole.ATTESTATION_ACT,
+    'prescription': DocumentRole.PRESCRIPTION,
+}
+
+
+# Строк опрацювання документів після завершення відрядження - робочих днів за видом робіт.
+# Для інших видів робіт дедлайн очищається.
+DOC_PROCESSING_WORKING_DAYS = {
+    WorkTypeChoices.IK: 10,
+    WorkTypeChoices.ATTESTATION: 15,
+    WorkTypeChoices.PLAND_ATTESTATION: 15,
+}
+
+
+def get_last_expiration_dates_for_oids(oid_ids, categories=EXPIRATION_CATEGORIES):
+    """
+    Пакетно знаходить дату закінчення дії останнього документа кожної категорії
+    для набору ОІД. Виконує один запит незалежно від кількості ОІД
+    (плюс одноразове завантаження реєстру ролей): документи з віконною функцією
+    ROW_NUMBER() (partition by ОІД і категорія, order by -work_date, -doc_process_date).
+
+    Повертає {oid_id: {категорія: date | None}}; для кожного переданого ОІД
+    присутні всі категорії.
+    """
+    oid_ids = list(oid_ids)
+    result = {oid_id: {category: None for category in categories} for oid_id in oid_ids}
+    if not oid_ids:
+        return result
+
+    whens = []
+    for category, role in categories.items():
+        type_ids = get_role_type_ids(role)
+        if type_ids:
+            whens.append(When(document_type_id__in=type_ids, then=Value(category)))
+    if not whens:
+        return result
+
+    category_expr = Case(*whens, default=Value(None), output_field=CharField())
+    latest_documents = Document.objects.filter(
+        oid_id__in=oid_ids,
+        expiration_date__isnull=False,
+    ).annotate(
+        category=category_expr,
+    ).filter(
+        category__isnull=False,
+    ).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('oid_id'), category_expr],
+            order_by=[F('work_date').desc(), F('doc_process_date').desc(), F('pk').desc()],
+        )
+    ).filter(row_number=1).order_by().values_list('oid_id', 'category', 'expiration_date')
+
+    for oid_id, category, expiration_date in latest_documents:
+        result[oid_id][category] = expiration_date
+    return result
+
+
+def refresh_oid_validity(oid_ids):
+    """
+    Перераховує знімки OIDValiditySnapshot для переданих ОІД набором запитів
+    (незалежно від кількості ОІД) і зберігає їх одним upsert.
+    ОІД, яких вже немає в базі, пропускаються. Змінює версії даних їхніх ВЧ
+    (кеш AJAX-списків ОІД, oids/unit_payload_cache.py).
+    """
+    unit_by_oid = dict(OID.objects.filter(pk__in=set(oid_ids)).values_list('pk', 'unit_id'))
+    oid_ids = list(unit_by_oid)
+    if not oid_ids:
+        return 0
+
+    expirations_by_oid = get_last_expiration_dates_for_oids(oid_ids)
+    last_work_dates = dict(
+        Document.objects.filter(oid_id__in=oid_ids)
+        .order_by()
+        .values('oid_id')
+        .annotate(last_work_date=Max('work_date'))
+        .values_list('oid_id', 'last_work_date')
+    )
+
+    snapshots = []
+    for oid_id in oid_ids:
+        expirations = expirations_by_oid[oid_id]
+        known_dates = [date for date in expirations.values() if date]
+        snapshots.append(OIDValiditySnapshot(
+            oid_id=oid_id,
+            attestation_expiration_date=expirations['attestation'],
+            ik_expiration_date=expirations['ik'],
+            prescription_expiration_date=expirations['prescription'],
+            last_work_date=last_work_dates.get(oid_id),
+            next_expiration_date=min(known_dates) if known_dates else None,
+        ))
+
+    OIDValiditySnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['oid'],
+        update_fields=[
+            'attestation_expiration_date', 'ik_expiration_date', 'prescription_expiration_date',
+            'last_work_date', 'next_expiration_date', 'updated_at',
+        ],
+    )
+    invalidate_unit_payloads(unit_by_oid.values())
+    return len(snapshots)
+
+
+def rebuild_oid_validity(chunk_size=500, progress=None):
+    """
+    Повна перебудова OIDValiditySnapshot порціями по chunk_size ОІД
+    (manage.py rebuild_oid_validity). Повертає кількість знімків.
+    """
+    oid_ids = list(OID.objects.order_by('pk').values_list('pk', flat=True))
+    OIDValiditySnapshot.objects.all().delete()
+    refreshed = 0
+    for start in range(0, len(oid_ids), chunk_size):
+        refreshed += refresh_oid_validity(oid_ids[start:start + chunk_size])
+        if progress:
+            progress(refreshed, len(oid_ids))
+    return refreshed
+
+
+def refresh_work_request_trip_snapshots(work_request_ids):
+    """
+    Перераховує знімки WorkRequestTripSnapshot (останнє відрядження) для переданих заявок
+    одним читанням M2M та одним upsert. Останнє - з найпізнішою датою завершення
+    (відрядження без дати - лише якщо інших немає), за рівних дат - з більшим id.
+    Знімки заявок без відряджень видаляються.
+    """
+    work_request_ids = set(work_request_ids)
+    if not work_request_ids:
+        return 0
+
+    latest = {}
+    for work_request_id, trip_id, start_date, end_date in Trip.work_requests.through.objects.filter(
+        workrequest_id__in=work_request_ids,
+    ).values_list('workrequest_id', 'trip_id', 'trip__start_date', 'trip__end_date'):
+        key = (end_date is not None, end_date or datetime.date.min, trip_id)
+        if work_request_id not in latest or key > latest[work_request_id][0]:
+            latest[work_request_id] = (key, trip_id, start_date, end_date)
+
+    WorkRequestTripSnapshot.objects.filter(
+        work_request_id__in=work_request_ids - set(latest),
+    ).delete()
+    WorkRequestTripSnapshot.objects.bulk_create(
+        [
+            WorkRequestTripSnapshot(
+                work_request_id=work_request_id, trip_id=trip_id,
+                trip_start_date=start_date, trip_end_date=end_date,
+            )
+            for work_request_id, (_, trip_id, start_date, end_date) in latest.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['work_request'],
+        update_fields=['trip', 'trip_start_date', 'trip_end_date', 'updated_at'],
+    )
+    return len(latest)
+
+
+def refresh_processing_snapshots(wri_ids):
+    """
+    Перераховує знімки WorkRequestItemProcessingSnapshot для переданих елементів заявок:
+    дата останнього зареєстрованого акту атестації та останнього висновку ІК -
+    два агрегуючі запити та один upsert незалежно від кількості елементів.
+    Елементи, яких вже немає в базі, пропускаються.
+    """
+    wri_ids = list(WorkRequestItem.objects.filter(pk__in=set(wri_ids)).values_list('pk', flat=True))
+    if not wri_ids:
+        return 0
+
+    def latest_dates(documents):
+        return dict(
+            documents.filter(work_request_item_id__in=wri_ids)
+            .order_by()
+            .values('work_request_item_id')
+            .annotate(latest_date=Max('doc_process_date'))
+            .values_list('work_request_item_id', 'latest_date')
+        )
+
+    attestation_dates = latest_dates(Document.objects.filter(
+        document_type_id__in=get_role_type_ids(DocumentRole.ATTESTATION_ACT),
+        dsszzi_registered_number__isnull=False,
+        dsszzi_registered_date__isnull=False,
+    ))
+    ik_dates = latest_dates(Document.objects.filter(
+        document_type_id__in=get_role_type_ids(DocumentRole.IK_CONCLUSION),
+    ))
+
+    WorkRequestItemProcessingSnapshot.objects.bulk_create(
+        [
+            WorkRequestItemProcessingSnapshot(
+                work_request_item_id=wri_id,
+                final_attestation_date=attestation_dates.get(wri_id),
+                final_ik_date=ik_dates.get(wri_id),
+            )
+            for wri_id in wri_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['work_request_item'],
+        update_fields=['final_attestation_date', 'final_ik_date', 'updated_at'],
+    )
+    return len(wri_ids)
+
+
+def rebuild_processing_snapshots(chunk_size=500, progress=None):
+    """
+    Повна перебудова read model "Контролю опрацювання" порціями по chunk_size
+    (manage.py rebuild_processing_snapshots): WorkRequestTripSnapshot
+    та WorkRequestItemProcessingSnapshot. Повертає (кількість знімків заявок, елементів).
+    """
+    work_request_ids = list(WorkRequest.objects.order_by('pk').values_list('pk', flat=True))
+    wri_ids = list(WorkRequestItem.objects.order_by('pk').values_list('pk', flat=True))
+
+    WorkRequestTripSnapshot.objects.all().delete()
+    trips_refreshed = 0
+    for start in range(0, len(work_request_ids), chunk_size):
+        trips_refreshed += refresh_work_request_trip_snapshots(work_request_ids[start:start + chunk_size])
+
+    WorkRequestItemProcessingSnapshot.objects.all().delete()
+    items_refreshed = 0
+    for start in range(0, len(wri_ids), chunk_size):
+        items_refreshed += refresh_processing_snapshots(wri_ids[start:start + chunk_size])
+        if progress:
+            progress(items_refreshed, len(wri_ids))
+    return trips_refreshed, items_refreshed
+
+
+def complete_process_steps_for_documents(documents):
+    """
+    Завершує кроки активних процесів ОІД, що очікують на документ такого типу і статусу
+    (та для кроку "Відправка реєстраційних номерів до вч" - робить ОІД активним).
+    Активні процеси всіх ОІД шукаються одним запитом; без них - жодних запитів по документах.
+    """
+    documents = list(documents)
+    transitions = []
+    processes = {
+        process.oid_id: process
+        for process in OIDProcess.objects.filter(oid_id__in={document.oid_id for document in documents})
+    }
+
+    for document in documents:
+        oid_process = processes.get(document.oid_id)
+        if oid_process is None:
+            continue # У цього ОІД немає активного процесу
+
+        # Шукаємо крок, який очікує на цей тип документа і цей статус
+        try:
+            step_instance = OIDProcessStepInstance.objects.select_related('process_step').get(
+                oid_process=oid_process,
+                status=ProcessStepStatusChoices.PENDING,
+                process_step__document_type_id=document.document_type_id,
+                process_step__trigger_document_status=document.processing_status
+            )
+        except (OIDProcessStepInstance.DoesNotExist, OIDProcessStepInstance.MultipleObjectsReturned):
+            continue
+
+        step_instance.status = ProcessStepStatusChoices.COMPLETED
+        step_instance.completed_at = timezone.now()
+        step_instance.linked_document = document
+        step_instance.save()
+
+        # Якщо завершено крок "Відправка реєстраційних номерів до вч" - ОІД стає активним
+        if step_instance.process_step.name == "Відправка реєстраційних номерів до вч":
+            transitions.append(Transition(
+                oid=document.oid_id,
+                event='process_completed',
+                context={'step_name': step_instance.process_step.name},
+                initiating_document_id=document.pk,
+            ))
+    # Статуси ОІД - одним пакетом (oids/oid_status.py)
+    apply_oid_transitions(transitions)
+
+
+def _status_effect_kind(document, role_type_ids):
+    """Який "ефект доміно" дає щойно створений документ: 'registration', 'ik' або None."""
+    if not document.work_request_item_id:
+        return None
+    if document.document_type_id in role_type_ids[DocumentRole.IK_CONCLUSION]:
+        return 'ik'
+    is_registered = bool(document.dsszzi_registered_number and document.dsszzi_registered_date)
+    if is_registered and (document.document_type_id in role_type_ids[DocumentRole.ATTESTATION_ACT]
+                          or document.document_type_id in role_type_ids[DocumentRole.AZR_ACT]):
+        return 'registration'
+    return None
+
+
+def ingest_documents(documents, batch_size=500):
+    """
+    Пакетне внесення нових документів (форми опрацювання документів, імпорт).
+
+    Замість document.save() на кожен рядок:
+    - expiration_date рахується в пам'яті (Document.compute_expiration_date);
+    - документи та їх історія (simple_history) вставляються bulk_create;
+    - "ефект доміно" Document.save (статус елемента заявки, примітка/статус ОІД,
+      OIDStatusChange) застосовується один раз на елемент заявки та вид ефекту -
+      за останнім документом пакета;
+    - кроки активних процесів ОІД завершуються як у сигналі post_save;
+    - перерахунок статусів WorkRequestItem/WorkRequest та знімків ОІД - один раз на коміт (status_sync);
+    - записи пошукового індексу додаються одним пакетом (search_index).
+
+    Сигнали post_save для Document при цьому не надсилаються.
+    Повертає список створених документів (з pk).
+    """
+    documents = list(documents)
+    if not documents:
+        return []
+
+    with trace.span('documents.ingest', documents=len(documents)), transaction.atomic():
+        for document in documents:
+            document.expiration_date = document.compute_expiration_date()
+
+        created = bulk_create_with_history(documents, Document, batch_size=batch_size)
+
+        role_type_ids = {
+            role: get_role_type_ids(role)
+            for role in (DocumentRole.ATTESTATION_ACT, DocumentRole.IK_CONCLUSION,
+                         DocumentRole.AZR_ACT, DocumentRole.DECLARATION)
+        }
+        # Document.apply_status_effects нічого не робить, якщо якогось із ключових типів немає
+        if all(role_type_ids.values()):
+            effects = {}
+            for document in created:
+                kind = _status_effect_kind(document, role_type_ids)
+                if kind:
+                    # Останній документ пакета визначає ефект для елемента заявки
+                    effects[(document.work_request_item_id, kind)] = document
+            # Переходи статусів ОІД усіх документів - одним пакетом
+            with deferred_transitions():
+                for document in effects.values():
+                    document.apply_status_effects(is_newly_created=True, was_registered=False)
+            trace.incr('documents.status_effects', len(effects))
+
+        complete_process_steps_for_documents(created)
+        mark_documents(created)
+        search_index.reindex(search_index.DOCUMENT, [document.pk for document in created])
+
+    trace.incr('documents.ingested', len(created))
+    return created
+
+
+def recalculate_trip_deadlines(trip_ids, batch_size=500):
+    """
+    Перераховує doc_processing_deadline елементів заявок для відряджень з датою завершення.
+
+    Елемент заявки належить відрядженню, якщо і його заявка, і його ОІД прив'язані до
+    відрядження. Дедлайн - N-й робочий день після end_date (DOC_PROCESSING_WORKING_DAYS),
+    deadline_trigger_trip - відрядження, що його встановило. Якщо елемент належить кільком
+    відрядженням набору, діє найпізніше (за end_date).
+
+    Кількість запитів не залежить від кількості ОІД: відрядження, два M2M, елементи
+    заявок, один bulk_update та одна вставка історії. Викликається з status_sync
+    один раз на транзакцію (сигнали Trip лише позначають відрядження - mark_trips).
+    Повертає кількість оновлених елементів.
+    """
+    trips = list(
+        Trip.objects.filter(pk__in=set(trip_ids), end_date__isnull=False)
+        .order_by('end_date', 'pk').only('pk', 'end_date')
+    )
+    if not trips:
+        return 0
+
+    with trace.span('trip.deadlines', trips=len(trips)) as span:
+        trip_ids = [trip.pk for trip in trips]
+        work_requests_by_trip = {trip_id: set() for trip_id in trip_ids}
+        for trip_id, work_request_id in Trip.work_requests.through.objects.filter(
+            trip_id__in=trip_ids,
+        ).values_list('trip_id', 'workrequest_id'):
+            work_requests_by_trip[trip_id].add(work_request_id)
+        oids_by_trip = {trip_id: set() for trip_id in trip_ids}
+        for trip_id, oid_id in Trip.oids.through.objects.filter(
+            trip_id__in=trip_ids,
+        ).values_list('trip_id', 'oid_id'):
+            oids_by_trip[trip_id].add(oid_id)
+
+        work_request_ids = set().union(*work_requests_by_trip.values())
+        oid_ids = set().union(*oids_by_trip.values())
+        if not work_request_ids or not oid_ids:
+            span.set(updated=0)
+            return 0
+
+        # Елемент -> відрядження (найпізніше з тих, до яких він належить)
+        assignments = []
+        # Повні об'єкти: запис історії читає всі поля (відкладені поля - запит на кожен)
+        for item in WorkRequestItem.objects.filter(request_id__in=work_request_ids, oid_id__in=oid_ids):
+            for trip in reversed(trips):
+                if item.request_id in work_requests_by_trip[trip.pk] and item.oid_id in oids_by_trip[trip.pk]:
+                    assignments.append((item, trip))
+                    break
+
+        with_deadline = [(item, trip) for item, trip in assignments if item.work_type in DOC_PROCESSING_WORKING_DAYS]
+        deadlines = add_working_days_many(
+            [trip.end_date for _, trip in with_deadline],
+            [DOC_PROCESSING_WORKING_DAYS[item.work_type] for item, _ in with_deadline],
+        )
+
+        changed = []
+        for (item, trip), deadline in zip(with_deadline, deadlines):
+            if item.doc_processing_deadline != deadline or item.deadline_trigger_trip_id != trip.pk:
+                item.doc_processing_deadline = deadline
+                item.deadline_trigger_trip_id = trip.pk
+                changed.append(item)
+        for item, trip in assignments:
+            if item.work_type not in DOC_PROCESSING_WORKING_DAYS and item.doc_processing_deadline is not None:
+                item.doc_processing_deadline = None
+                changed.append(item)
+
+        if changed:
+            now = timezone.now()
+            for item in changed:
+                item.updated_at = now
+            bulk_update_with_history(
+                changed, WorkRequestItem,
+                ['doc_processing_deadline', 'deadline_trigger_trip', 'updated_at'],
+                batch_size=batch_size,
+            )
+        span.set(updated=len(changed))
+    trace.incr('trip.deadlines_updated', len(changed))
+    trace.debug('trip.deadlines', "Trips %s: %s WRI deadlines updated", trip_ids, len(changed))
+    return len(changed)
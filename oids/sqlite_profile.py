@@ -0,0 +1,96 @@
+# oids/sqlite_profile.py
+"""
+Профіль SQLite для роботи кількох користувачів одночасно.
+
+З типовими налаштуваннями (журнал DELETE, транзакції DEFERRED, нове з'єднання на
+кожен запит) довгі транзакції add_work_request_view та
+send_attestation_for_registration_view давали "database is locked" і блокували
+читання. Тепер (див. DATABASES та SQLITE_* у settings.py):
+
+- apply_sqlite_pragmas - обробник connection_created: кожне нове з'єднання SQLite
+  отримує settings.SQLITE_PRAGMAS (WAL - читання не чекають на запис,
+  synchronous=NORMAL - без fsync на кожен коміт, mmap_size, cache_size);
+- OPTIONS['transaction_mode'] = 'IMMEDIATE' - транзакція atomic() бере блокування
+  запису одразу на BEGIN, тож конфлікт двох записів виявляється до виконання
+  будь-якого коду транзакції, а не посеред неї (де SQLite не дає дочекатися);
+- OPTIONS['timeout'] - скільки секунд SQLite сам чекає на блокування;
+- retry_on_busy - якщо й після цього база зайнята, зовнішня транзакція
+  повторюється після випадкової паузи, що зростає з кожною спробою (щоб
+  кілька процесів, які чекали разом, не стукали в базу одночасно);
+- CONN_MAX_AGE - з'єднання (разом із прагмами та кешем сторінок) живе між запитами.
+"""
+import functools
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import instrumentation as trace
+
+_BUSY_CODES = {sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED}
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Застосовує settings.SQLITE_PRAGMAS до нового з'єднання SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_busy_error(exc):
+    """Чи означає помилка, що база зайнята іншим записом (SQLITE_BUSY / SQLITE_LOCKED)."""
+    cause = exc.__cause__ if isinstance(exc.__cause__, sqlite3.Error) else exc
+    code = getattr(cause, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in _BUSY_CODES
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def busy_retry_delay(attempt, base_delay=None):
+    """Пауза перед спробою attempt (1, 2, ...): випадкова в [0, base * 2^(attempt-1)]."""
+    if base_delay is None:
+        base_delay = getattr(settings, 'SQLITE_BUSY_RETRY_DELAY', 0.05)
+    return random.uniform(0, base_delay * 2 ** (attempt - 1))
+
+
+def retry_on_busy(func=None, *, attempts=None, using='default'):
+    """
+    Повторює func, якщо вона завершилась помилкою "база зайнята".
+
+    Ставиться над @transaction.atomic (або над функцією, що сама відкриває
+    транзакцію): повторюється лише зовнішній виклик - всередині чужої транзакції
+    помилка передається далі, бо відкотити лише частину роботи неможливо.
+    З transaction_mode IMMEDIATE зайнятість виявляється на BEGIN, тобто до
+    виконання тіла функції.
+    """
+    if func is None:
+        return functools.partial(retry_on_busy, attempts=attempts, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        max_attempts = attempts or getattr(settings, 'SQLITE_BUSY_RETRIES', 5)
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if (attempt >= max_attempts or connections[using].in_atomic_block
+                        or not is_busy_error(exc)):
+                    raise
+                delay = busy_retry_delay(attempt)
+                trace.incr('sqlite.busy_retries')
+                trace.info('sqlite', "Database is locked in %s, retry %s/%s in %.3fs",
+                           func.__qualname__, attempt, max_attempts - 1, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    return wrapper
@@ -0,0 +1,183 @@
+# oids/status_sync.py
+"""
+Транзакційний "брудний набір" для перерахунку статусів.
+
+Збереження документа, відправки на реєстрацію чи результатів відрядження
+лише позначає зачеплені WorkRequestItem / WorkRequest / ОІД як "брудні".
+Перерахунок виконується один раз на кожен об'єкт у transaction.on_commit
+найзовнішньої транзакції (поза транзакцією - одразу, як і раніше).
+Так пакетні операції (bulk_add_documents_view тощо) не перераховують
+той самий елемент/заявку десятки разів.
+
+Так само збереження відрядження та зміни його M2M (заявки, ОІД) лише позначають
+відрядження (mark_trips); дедлайни опрацювання його елементів заявок
+перераховуються один раз (services.recalculate_trip_deadlines), а знімки
+"останнього відрядження" його заявок (mark_trip_work_requests) - один раз на заявку.
+Разом зі статусом елемента заявки перераховується і його знімок дат опрацювання
+(WorkRequestItemProcessingSnapshot) - read model сторінки "Контроль опрацювання".
+
+Версії даних ВЧ (oids/unit_payload_cache.py), змінені в транзакції, повторно
+змінюються тим самим flush_dirty - вже після коміту його власного перерахунку.
+"""
+import threading
+import weakref
+
+from django.db import transaction
+
+from . import instrumentation as trace
+
+# Захист від нескінченного циклу, якщо перерахунок знову позначає ті самі об'єкти
+MAX_FLUSH_ROUNDS = 5
+
+_state = threading.local()
+
+
+def _new_pending():
+    return {'trips': set(), 'trip_work_requests': set(), 'work_request_items': set(), 'work_requests': set(),
+            'oids': set(), 'units': set()}
+
+
+def _get_pending():
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = _new_pending()
+    return pending
+
+
+def _take_pending(key):
+    pending = _get_pending()
+    ids = pending[key]
+    pending[key] = set()
+    return ids
+
+
+def _schedule_flush():
+    # Під час перерахунку нові позначки підхоплює цикл у flush_dirty()
+    if getattr(_state, 'flushing', False):
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        flush_dirty()
+        return
+    # Вже заплановано на цьому ж рівні savepoint - повторно не реєструємо.
+    # _state тримає лише слабке посилання на callback: якщо savepoint чи транзакція
+    # відкотиться, Django відкине callback, посилання стане порожнім, і наступна
+    # позначка запланує новий.
+    savepoint_ids = frozenset(connection.savepoint_ids)
+    scheduled = getattr(_state, 'scheduled', None)
+    if scheduled is not None and scheduled[0] == savepoint_ids and scheduled[1]() is not None:
+        return
+
+    def flush_on_commit():
+        flush_dirty()
+
+    _state.scheduled = (savepoint_ids, weakref.ref(flush_on_commit))
+    transaction.on_commit(flush_on_commit)
+
+
+def _mark(key, ids):
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return
+    if not transaction.get_connection().in_atomic_block:
+        # Поза транзакцією позначки попередньої (відкоченої) транзакції не потрібні
+        _state.pending = _new_pending()
+    _get_pending()[key].update(ids)
+    _schedule_flush()
+
+
+def mark_trips(trip_ids):
+    """Позначає відрядження для перерахунку дедлайнів опрацювання документів."""
+    _mark('trips', trip_ids)
+
+
+def mark_trip_work_requests(work_request_ids):
+    """Позначає заявки для перерахунку знімка останнього відрядження (WorkRequestTripSnapshot)."""
+    _mark('trip_work_requests', work_request_ids)
+
+
+def mark_work_request_items(wri_ids):
+    """Позначає елементи заявок для перевірки статусу за документами."""
+    _mark('work_request_items', wri_ids)
+
+
+def mark_work_requests(work_request_ids):
+    """Позначає заявки для перерахунку статусу за статусами їх елементів."""
+    _mark('work_requests', work_request_ids)
+
+
+def mark_oids(oid_ids):
+    """Позначає ОІД для оновлення знімка OIDValiditySnapshot."""
+    _mark('oids', oid_ids)
+
+
+def mark_units(unit_ids):
+    """Позначає ВЧ для зміни версії даних після коміту (unit_payload_cache)."""
+    _mark('units', unit_ids)
+
+
+def mark_documents(documents):
+    """Позначає все, що залежить від переданих документів: елементи заявок та ОІД."""
+    documents = list(documents)
+    mark_work_request_items(doc.work_request_item_id for doc in documents)
+    mark_oids(doc.oid_id for doc in documents)
+
+
+def flush_dirty():
+    """
+    Перераховує все позначене: спершу дедлайни та знімки відряджень, потім елементи
+    заявок і їх знімки (вони можуть позначити свої заявки), потім заявки, потім знімки ОІД.
+    Кожен об'єкт - один раз за раунд. Після коміту перерахунку - версії позначених ВЧ.
+    """
+    from .history import buffered_history
+    from .models import WorkRequest, WorkRequestItem
+    from .services import (recalculate_trip_deadlines, refresh_oid_validity, refresh_processing_snapshots,
+                           refresh_work_request_trip_snapshots)
+    from .unit_payload_cache import commit_unit_payloads
+
+    _state.scheduled = None
+    _state.flushing = True
+    try:
+        with transaction.atomic(), buffered_history(), trace.span('status_sync.flush') as span:
+            counts = {'trips': 0, 'trip_work_requests': 0, 'work_request_items': 0, 'work_requests': 0, 'oids': 0,
+                      'rounds': 0}
+            for _ in range(MAX_FLUSH_ROUNDS):
+                counts['rounds'] += 1
+                trip_ids = _take_pending('trips')
+                if trip_ids:
+                    counts['trips'] += len(trip_ids)
+                    recalculate_trip_deadlines(trip_ids)
+
+                trip_work_request_ids = _take_pending('trip_work_requests')
+                if trip_work_request_ids:
+                    counts['trip_work_requests'] += len(trip_work_request_ids)
+                    refresh_work_request_trip_snapshots(trip_work_request_ids)
+
+                wri_ids = _take_pending('work_request_items')
+                if wri_ids:
+                    counts['work_request_items'] += len(wri_ids)
+                    for wri in WorkRequestItem.objects.filter(pk__in=wri_ids).select_related('oid', 'request'):
+                        wri.check_and_update_status_based_on_documents()
+                    refresh_processing_snapshots(wri_ids)
+
+                work_request_ids = _take_pending('work_requests')
+                if work_request_ids:
+                    counts['work_requests'] += len(work_request_ids)
+                    for work_request in WorkRequest.objects.filter(pk__in=work_request_ids):
+                        work_request.update_status_from_items()
+
+                oid_ids = _take_pending('oids')
+                if oid_ids:
+                    counts['oids'] += len(oid_ids)
+                    refresh_oid_validity(oid_ids)
+
+                if not any(ids for key, ids in _get_pending().items() if key != 'units'):
+                    break
+            else:
+                trace.warning('status_sync', "flush_dirty: pending marks left after %s rounds", MAX_FLUSH_ROUNDS)
+            span.set(**counts)
+        unit_ids = _take_pending('units')
+        if unit_ids:
+            commit_unit_payloads(unit_ids)
+    finally:
+        _state.flushing = False
@@ -0,0 +1,116 @@
+# oids/tests/test_business_calendar.py
+
+import datetime
+import random
+
+from django.db import transaction
+from django.test import TestCase
+
+from .. import business_calendar, reference_cache
+from ..business_calendar import (add_working_days, add_working_days_many, get_business_calendar,
+    invalidate_business_calendar, is_working_day, working_days_between)
+from ..models import Holiday
+
+
+def naive_add_working_days(start_date, days_to_add, holidays=(), working_days=()):
+    """Еталон: покроковий перебір днів (колишня реалізація + святкові дні)."""
+    day = start_date
+    counted = 0
+    while counted < days_to_add:
+        day += datetime.timedelta(days=1)
+        if day in working_days or (day.weekday() < 5 and day not in holidays):
+            counted += 1
+    return day
+
+
+class BusinessCalendarTest(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_business_calendar()
+        self.addCleanup(invalidate_business_calendar)
+
+    def test_weekends_skipped(self):
+        """Тест: відлік починається з наступного дня, вихідні не рахуються."""
+        friday = datetime.date(2024, 5, 3)
+        self.assertEqual(add_working_days(friday, 1), datetime.date(2024, 5, 6))
+        self.assertEqual(add_working_days(friday, 10), datetime.date(2024, 5, 17))
+        self.assertEqual(add_working_days(datetime.date(2024, 5, 4), 1), datetime.date(2024, 5, 6))
+        with self.assertRaises(ValueError):
+            add_working_days(friday, 0)
+        with self.assertRaises(ValueError):
+            add_working_days('2024-05-03', 1)
+
+    def test_matches_naive_loop(self):
+        """Тест: результат збігається з покроковим перебором на випадкових датах."""
+        rng = random.Random(13)
+        for _ in range(300):
+            start = datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randrange(5000))
+            days = rng.randint(1, 60)
+            self.assertEqual(add_working_days(start, days), naive_add_working_days(start, days), (start, days))
+
+    def test_holidays_and_working_days(self):
+        """Тест: святкові дні пропускаються, перенесений робочий день рахується; кеш скидається сигналом."""
+        start = datetime.date(2024, 5, 3)  # п'ятниця
+        self.assertEqual(add_working_days(start, 2), datetime.date(2024, 5, 7))
+
+        Holiday.objects.create(date=datetime.date(2024, 5, 6), name="Свято")
+        self.assertFalse(is_working_day(datetime.date(2024, 5, 6)))
+        self.assertEqual(add_working_days(start, 2), datetime.date(2024, 5, 8))
+
+        Holiday.objects.create(date=datetime.date(2024, 5, 4), name="Робоча субота", is_working_day=True)
+        self.assertEqual(add_working_days(start, 2), datetime.date(2024, 5, 7))
+        self.assertEqual(
+            add_working_days(start, 15),
+            naive_add_working_days(start, 15, holidays={datetime.date(2024, 5, 6)}, working_days={datetime.date(2024, 5, 4)}),
+        )
+
+        Holiday.objects.all().delete()
+        self.assertEqual(add_working_days(start, 2), datetime.date(2024, 5, 7))
+
+    def test_shared_version_and_rollback(self):
+        """Тест: зміна спільної версії (інший процес) перебудовує календар; відкочені свята в кеш не потрапляють."""
+        start = datetime.date(2024, 5, 3)  # п'ятниця
+        self.assertTrue(is_working_day(datetime.date(2024, 5, 6)))
+
+        # Інший процес додав свято: у цьому процесі - лише нова версія у спільному кеші
+        Holiday.objects.bulk_create([Holiday(date=datetime.date(2024, 5, 6), name="Свято")])
+        self.assertTrue(is_working_day(datetime.date(2024, 5, 6)))
+        reference_cache._bump(business_calendar.HOLIDAY)
+        self.assertFalse(is_working_day(datetime.date(2024, 5, 6)))
+
+        try:
+            with transaction.atomic():
+                Holiday.objects.create(date=datetime.date(2024, 5, 7), name="Відкочене свято")
+                self.assertEqual(add_working_days(start, 1), datetime.date(2024, 5, 8))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(add_working_days(start, 1), datetime.date(2024, 5, 7))
+
+    def test_working_days_between(self):
+        """Тест: кількість робочих днів у (start, end] - різниця накопичених номерів."""
+        start = datetime.date(2024, 5, 3)
+        self.assertEqual(working_days_between(start, datetime.date(2024, 5, 17)), 10)
+        self.assertEqual(working_days_between(start, start), 0)
+        self.assertEqual(working_days_between(datetime.date(2024, 5, 17), start), -10)
+
+    def test_vectorized_variant(self):
+        """Тест: пакетний варіант - одне число або список днів, календар отримується один раз."""
+        dates = [datetime.date(2024, 5, 3), datetime.date(2024, 12, 27), datetime.date(2025, 1, 1)]
+        self.assertEqual(add_working_days_many(dates, 10), [add_working_days(day, 10) for day in dates])
+        self.assertEqual(add_working_days_many(dates, [1, 5, 15]),
+                         [add_working_days(day, days) for day, days in zip(dates, [1, 5, 15])])
+        self.assertEqual(add_working_days_many([], 10), [])
+        with self.assertRaises(ValueError):
+            add_working_days_many(dates, [1, 2])
+
+    def test_range_extended_on_demand(self):
+        """Тест: дати поза діапазоном календаря розширюють його, один запит до Holiday на побудову."""
+        with self.assertNumQueries(1):
+            calendar = get_business_calendar()
+            add_working_days(datetime.date.today(), 10)
+        far_future = datetime.date(calendar.last_year + 3, 6, 1)
+        self.assertEqual(add_working_days(far_future, 15), naive_add_working_days(far_future, 15))
+        self.assertGreater(business_calendar._calendar[1].last_year, far_future.year)
+        self.assertEqual(add_working_days(datetime.date(2024, 5, 3), 600), naive_add_working_days(datetime.date(2024, 5, 3), 600))
@@ -0,0 +1,100 @@
+# oids/tests/test_field_tracker.py
+
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from taskFlow.models import Project, Status, Task, TaskHistory
+from ..models import (Unit, OID, Document, DocumentType, Person, TechnicalTask, OIDStatusChange,
+    DocumentReviewResultChoices, OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+
+
+def selects_by_pk(queries, table):
+    """SELECT ... LIMIT 1 / LIMIT 21 з таблиці - "старий екземпляр" перед збереженням."""
+    return [q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql'] and 'LIMIT' in q['sql']]
+
+
+class FieldTrackerTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(code="A0001", name="Частина", city="Київ")
+        cls.oid = OID.objects.create(unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+                                     sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+        cls.person = Person.objects.create(full_name="Іваненко Іван", position="Інженер")
+        cls.other_person = Person.objects.create(full_name="Петренко Петро", position="Інженер")
+        document_type = DocumentType.objects.create(name="Акт", oid_type=OIDTypeChoices.SPEAK, work_type=WorkTypeChoices.IK)
+        cls.document = Document.objects.create(
+            oid=cls.oid, document_type=document_type, document_number="1/Д", author=cls.person,
+            doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+
+    def test_previous_and_has_changed(self):
+        """Тест: значення з моменту завантаження; після збереження - нова точка відліку."""
+        document = Document.objects.get(pk=self.document.pk)
+        self.assertFalse(document.has_changed('dsszzi_registered_number'))
+        document.dsszzi_registered_number = "55/ДССЗЗІ"
+        self.assertTrue(document.has_changed('dsszzi_registered_number'))
+        self.assertIsNone(document.previous('dsszzi_registered_number'))
+        document.save()
+        self.assertFalse(document.has_changed('dsszzi_registered_number'))
+        self.assertEqual(document.previous('dsszzi_registered_number'), "55/ДССЗЗІ")
+
+        deferred = Document.objects.only('pk').get(pk=self.document.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(deferred.previous('dsszzi_registered_number'), "55/ДССЗЗІ")
+
+        new_document = Document(oid=self.oid, document_type=self.document.document_type)
+        self.assertTrue(new_document.has_changed('dsszzi_registered_number'))
+        self.assertIsNone(new_document.previous('dsszzi_registered_number'))
+        with self.assertRaises(ValueError):
+            document.has_changed('note')
+
+    def test_document_save_without_preload_select(self):
+        """Тест: Document.save не перечитує документ з БД перед збереженням."""
+        document = Document.objects.get(pk=self.document.pk)
+        document.note = "Оновлено"
+        with CaptureQueriesContext(connection) as queries:
+            document.save()
+        self.assertEqual(selects_by_pk(queries, 'oids_document'), [])
+
+    def test_technical_task_review_result_change(self):
+        """Тест: зміна результату розгляду ТЗ змінює статус ОІД без SELECT старого ТЗ."""
+        technical_task = TechnicalTask.objects.create(
+            oid=self.oid, input_number="ТЗ-1", input_date=datetime.date(2024, 1, 1),
+            read_till_date=datetime.date(2024, 1, 10), review_result=DocumentReviewResultChoices.READ)
+        technical_task = TechnicalTask.objects.get(pk=technical_task.pk)
+        technical_task.review_result = DocumentReviewResultChoices.APPROVED
+        with CaptureQueriesContext(connection) as queries:
+            technical_task.save()
+        self.assertEqual(selects_by_pk(queries, 'oids_technicaltask'), [])
+        self.oid.refresh_from_db()
+        self.assertEqual(self.oid.status, OIDStatusChoices.RECEIVED_TZ_APPROVE)
+        self.assertTrue(OIDStatusChange.objects.filter(oid=self.oid, reason__contains="погоджено").exists())
+
+        count = OIDStatusChange.objects.count()
+        technical_task.note = "Без зміни результату"
+        technical_task.save()
+        self.assertEqual(OIDStatusChange.objects.count(), count)
+
+    def test_task_history_without_preload_select(self):
+        """Тест: історія змін завдання taskFlow - зі значень трекера, без SELECT старого завдання."""
+        project = Project.objects.create(name="Проєкт", key="PRJ")
+        todo = Status.objects.create(name="До виконання", order=1)
+        doing = Status.objects.create(name="В роботі", order=2)
+        task = Task.objects.create(project=project, title="Завдання", status=todo, assignee=self.person)
+
+        task = Task.objects.get(pk=task.pk)
+        task.status = doing
+        task.assignee = self.other_person
+        task.title = "Не відстежується"
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertEqual(selects_by_pk(queries, 'taskFlow_task'), [])
+        history = {h.field_name: (h.old_value, h.new_value) for h in TaskHistory.objects.filter(task=task)}
+        self.assertEqual(history, {
+            'Статус': ("До виконання (Глобальний)", "В роботі (Глобальний)"),
+            'Виконавець': ("Іваненко Іван", "Петренко Петро"),
+        })
@@ -0,0 +1,100 @@
+# oids/tests/test_history.py
+
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..history import buffered_history, compact_history_model, prune_history_model
+from ..models import Unit, OID, OIDStatusChoices, OIDTypeChoices, SecLevelChoices
+
+
+def history_inserts(queries, table):
+    return [q['sql'] for q in queries.captured_queries if q['sql'].startswith(f'INSERT INTO "{table}"')]
+
+
+class HistoryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(code="A0001", name="Частина", city="Київ")
+        cls.oids = [
+            OID.objects.create(unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                               sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            for i in range(3)
+        ]
+
+    def test_buffered_history_single_insert_per_model(self):
+        """Тест: у buffered_history() історія - один INSERT на модель, повторне збереження без змін - без запису."""
+        count = OID.history.count()
+        with CaptureQueriesContext(connection) as queries, transaction.atomic(), buffered_history():
+            for oid in self.oids:
+                oid.note = "Оновлено"
+                oid.save()
+                oid.save()
+            self.assertEqual(OID.history.count(), count)
+        self.assertEqual(len(history_inserts(queries, 'oids_historicaloid')), 1)
+        self.assertEqual(OID.history.count(), count + 3)
+        self.assertEqual(
+            list(OID.history.filter(history_type='~').order_by().values_list('note', flat=True).distinct()), ["Оновлено"])
+
+    def test_buffered_history_discarded_on_error(self):
+        """Тест: виняток у блоці - записи буфера не вставляються, наступні збереження пишуть історію як звичайно."""
+        count = OID.history.count()
+        with self.assertRaises(RuntimeError), transaction.atomic(), buffered_history():
+            self.oids[0].save()
+            raise RuntimeError
+        self.assertEqual(OID.history.count(), count)
+        self.oids[0].save()
+        self.assertEqual(OID.history.count(), count + 1)
+
+    def test_compact_removes_noop_records(self):
+        """Тест: послідовні записи "~" без змін видаляються; записи зі змінами та причиною - лишаються."""
+        oid = self.oids[0]
+        oid.save()
+        oid.note = "Змінено"
+        oid.save()
+        oid.save()
+        oid._change_reason = "Перевірка"
+        oid.save()
+        history = OID.history.filter(id=oid.pk)
+        self.assertEqual(history.count(), 5)
+
+        self.assertEqual(compact_history_model(OID.history.model, dry_run=True), 2)
+        self.assertEqual(history.count(), 5)
+        self.assertEqual(compact_history_model(OID.history.model), 2)
+        self.assertEqual(
+            list(history.order_by('history_date', 'history_id').values_list('history_type', 'note', 'history_change_reason')),
+            [('+', '', None), ('~', "Змінено", None), ('~', "Змінено", "Перевірка")])
+
+    @override_settings(HISTORY_RETENTION_DAYS={'oids.OID': 30})
+    def test_retention_keeps_latest_record(self):
+        """Тест: записи, старші за строк зберігання, видаляються, крім останнього запису об'єкта."""
+        old = timezone.now() - datetime.timedelta(days=60)
+        for oid in self.oids[:2]:
+            oid.note = "Старе"
+            oid.save()
+        OID.history.update(history_date=old)
+        self.oids[0].note = "Нове"
+        self.oids[0].save()
+
+        self.assertEqual(prune_history_model(OID.history.model), 3)
+        self.assertEqual(
+            sorted(OID.history.values_list('id', 'note')),
+            sorted([(self.oids[0].pk, "Нове"), (self.oids[1].pk, "Старе"), (self.oids[2].pk, '')]))
+        with override_settings(HISTORY_RETENTION_DAYS={}):
+            self.assertEqual(prune_history_model(OID.history.model), 0)
+
+    def test_compact_history_command(self):
+        """Тест: команда compact_history - --dry-run нічого не видаляє, --model обмежує моделі."""
+        self.oids[0].save()
+        out = StringIO()
+        call_command('compact_history', '--dry-run', '--model', 'oids.OID', stdout=out)
+        self.assertIn("Would remove 1 no-op", out.getvalue())
+        self.assertEqual(OID.history.filter(id=self.oids[0].pk).count(), 2)
+        call_command('compact_history', stdout=StringIO())
+        self.assertEqual(OID.history.filter(id=self.oids[0].pk).count(), 1)
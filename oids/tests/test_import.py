@@ -0,0 +1,165 @@
+# oids/tests/test_import.py
+
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ..importing import DateColumnParser, ImportCheckpoint
+from ..models import (TerritorialManagement, Unit, Person, DocumentType, OID, WorkRequest,
+    WorkRequestItem, Document, OIDStatusChoices)
+from ..document_roles import invalidate_document_roles
+
+
+class DateColumnParserTest(SimpleTestCase):
+
+    def test_format_detected_once(self):
+        """Тест: формат фіксується за першим значенням, інші формати - через повний перебір."""
+        parser = DateColumnParser('work_date')
+        self.assertEqual(parser.parse('2024.01.15'), datetime.date(2024, 1, 15))
+        self.assertEqual(parser.format, '%Y.%m.%d')
+        self.assertEqual(parser.parse(' 2024.02.01 '), datetime.date(2024, 2, 1))
+        self.assertEqual(parser.parse('03.04.2024'), datetime.date(2024, 4, 3))
+        self.assertIsNone(parser.parse(''))
+        self.assertIsNone(parser.parse('не дата'))
+        self.assertEqual(parser.format, '%Y.%m.%d')
+        self.assertEqual((parser.fallbacks, parser.failures), (1, 1))
+
+
+class ImportRealDataTest(TestCase):
+
+    def setUp(self):
+        invalidate_document_roles()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_dir = os.path.join(self.tmp_dir, 'checkpoints')
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.files = {
+            'tu.csv': [{'tu_code': 'ТУ-1', 'tu_name': 'Перше ТУ'}],
+            'units.csv': [
+                {'unit_code': code, 'tu_code': 'ТУ-1', 'full_name': f'Частина {code}', 'city': 'Київ', 'distance': '10'}
+                for code in ('A0001', 'A0002')
+            ] + [{'unit_code': 'A0003', 'tu_code': 'НЕМАЄ', 'full_name': 'Без ТУ', 'city': 'Київ', 'distance': ''}],
+            'persons.csv': [{'full_name': 'Іваненко Іван', 'position': 'Інженер', 'group': 'ОІД', 'is_active': 'TRUE'}],
+            'document_types.csv': [
+                {'name': 'Висновок ІК', 'oid_type': 'МОВНА', 'work_type': 'ІК', 'has_expiration': 'TRUE', 'duration_months': '20'},
+            ],
+            'oids.csv': [
+                {'unit_code': unit_code, 'cipher': f'ОІД-{i}', 'oid_type': 'МОВНА', 'full_name': f'Кабінет {i}',
+                 'room': str(i), 'status': OIDStatusChoices.ACTIVE, 'sec_level': 'Таємно'}
+                for i, unit_code in enumerate(['A0001'] * 4 + ['A0002'])
+            ],
+            'work_requests.csv': [
+                {'unit_code': 'A0001', 'incoming_number': '1/24', 'incoming_date': '15.01.2024', 'status': 'очікує'},
+            ],
+            'work_request_items.csv': [
+                {'request_unit_code': 'A0001', 'request_incoming_number': '1/24', 'oid_cipher': f'ОІД-{i}',
+                 'work_type': 'ІК', 'status': 'очікує'}
+                for i in range(2)
+            ],
+            'documents.csv': [
+                {'unit_code': 'A0001', 'oid_cipher': f'ОІД-{i}', 'document_number': f'{i}/ІК',
+                 'document_type_name': 'Висновок ІК', 'document_type_oid_type': 'МОВНА', 'document_type_work_type': 'ІК',
+                 'author_full_name': 'Іваненко Іван', 'doc_process_date': '2024.02.01', 'work_date': '2024.01.20',
+                 'wri_request_number': '1/24' if i < 2 else '', 'wri_oid_cipher': f'ОІД-{i}' if i < 2 else '',
+                 'dsszzi_registered_number': '', 'dsszzi_registered_date': ''}
+                for i in range(3)
+            ],
+        }
+
+    def write_files(self):
+        paths = []
+        for name, rows in self.files.items():
+            path = os.path.join(self.tmp_dir, name)
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            paths.append(path)
+        return paths
+
+    def run_import(self, *paths, **options):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_real_data', *paths, chunk_size=2, batch_size=2,
+                         checkpoint_dir=self.checkpoint_dir, stdout=out, **options)
+        return out.getvalue()
+
+    def test_full_import(self):
+        """Тест: всі файли імпортуються порціями, зв'язки знаходяться через словники ключів."""
+        output = self.run_import(*self.write_files())
+
+        self.assertEqual(TerritorialManagement.objects.count(), 1)
+        self.assertEqual(Unit.objects.count(), 2)
+        self.assertEqual(OID.objects.count(), 5)
+        self.assertEqual(WorkRequest.objects.get().incoming_date, datetime.date(2024, 1, 15))
+        self.assertEqual(WorkRequestItem.objects.count(), 2)
+        self.assertEqual(Document.objects.count(), 3)
+
+        document = Document.objects.get(document_number='0/ІК')
+        self.assertEqual(document.expiration_date, datetime.date(2025, 9, 20))
+        self.assertEqual(document.work_request_item.oid_id, document.oid_id)
+        self.assertIsNone(Document.objects.get(document_number='2/ІК').work_request_item)
+        self.assertEqual(Document.history.count(), 3)
+
+        self.assertIn("ТУ з кодом 'НЕМАЄ' не знайдено", output)
+        self.assertIn("рядків/с", output)
+        self.assertIn("Формат дат 'work_date': %Y.%m.%d", output)
+        self.assertFalse(os.listdir(self.checkpoint_dir))
+
+    def test_rerun_updates_documents(self):
+        """Тест: повторний імпорт не дублює записи, документи оновлюються (update_or_create)."""
+        paths = self.write_files()
+        self.run_import(*paths)
+        self.files['documents.csv'][0]['work_date'] = '2024.03.01'
+        paths = self.write_files()
+
+        output = self.run_import(*paths)
+
+        self.assertEqual(OID.objects.count(), 5)
+        self.assertEqual(WorkRequestItem.objects.count(), 2)
+        self.assertEqual(Document.objects.count(), 3)
+        document = Document.objects.get(document_number='0/ІК')
+        self.assertEqual(document.work_date, datetime.date(2024, 3, 1))
+        self.assertEqual(document.expiration_date, datetime.date(2025, 11, 1))
+        self.assertIn("створено 0, оновлено 3", output)
+
+    def test_resume_from_checkpoint(self):
+        """Тест: імпорт продовжується з контрольної точки; змінений файл імпортується спочатку."""
+        paths = self.write_files()
+        self.run_import(*[path for path in paths if not path.endswith('oids.csv')])
+        oids_path = os.path.join(self.tmp_dir, 'oids.csv')
+        ImportCheckpoint(self.checkpoint_dir, oids_path).save(3)
+
+        output = self.run_import(oids_path)
+
+        self.assertIn("3 записів вже імпортовано", output)
+        self.assertEqual(sorted(OID.objects.values_list('cipher', flat=True)), ['ОІД-3', 'ОІД-4'])
+        self.assertEqual(ImportCheckpoint(self.checkpoint_dir, oids_path).load(), 0)
+
+        ImportCheckpoint(self.checkpoint_dir, oids_path).save(3)
+        self.run_import(oids_path, restart=True)
+        self.assertEqual(OID.objects.count(), 5)
+
+    def test_checkpoint_invalidated_by_file_change(self):
+        """Тест: контрольна точка не діє, якщо файл змінився після її збереження."""
+        path = self.write_files()[0]
+        checkpoint = ImportCheckpoint(self.checkpoint_dir, path)
+        checkpoint.save(1)
+        self.assertEqual(checkpoint.load(), 1)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('ТУ-2,Друге ТУ\n')
+        self.assertEqual(checkpoint.load(), 0)
+
+    def test_invalid_oid_skipped(self):
+        """Тест: ОІД, що не проходить валідацію моделі (ПЕМІН без типу ЕОТ), пропускається."""
+        self.files['oids.csv'][0]['oid_type'] = 'ПЕМІН'
+        output = self.run_import(*self.write_files())
+        self.assertEqual(OID.objects.count(), 4)
+        self.assertIn("ОІД 'ОІД-0' не пройшов перевірку", output)
+        self.assertEqual(Person.objects.count(), 1)
+        self.assertEqual(DocumentType.objects.count(), 1)
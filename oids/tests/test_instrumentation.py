@@ -0,0 +1,109 @@
+# oids/tests/test_instrumentation.py
+
+import datetime
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import instrumentation as trace
+from ..models import (Unit, OID, DocumentType, Document, WorkRequest, WorkRequestItem,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+from ..document_roles import invalidate_document_roles
+
+
+class ExplodingArgument:
+    """Аргумент, що падає при форматуванні - перевірка ліниво сформованих повідомлень."""
+
+    def __str__(self):
+        raise AssertionError("Повідомлення не мало форматуватися")
+
+    __repr__ = __str__
+
+
+class InstrumentationApiTest(SimpleTestCase):
+
+    def tearDown(self):
+        trace.reset()
+
+    @override_settings(INSTRUMENTATION_SINKS=[])
+    def test_disabled_is_noop(self):
+        """Тест: без приймачів повідомлення не форматуються, span - спільний порожній об'єкт."""
+        trace.debug('test', "value %s", ExplodingArgument())
+        trace.error('test', "value %s", ExplodingArgument())
+        trace.incr('test.counter')
+        self.assertIs(trace.span('test.span'), trace.span('other.span'))
+        with trace.span('test.span') as span:
+            span.set(rows=1)
+
+    @override_settings(INSTRUMENTATION_SINKS=[{'class': 'oids.instrumentation.LoggingSink', 'level': 'WARNING'}])
+    def test_level_filtering(self):
+        """Тест: події нижче рівня приймача відкидаються до форматування."""
+        trace.debug('test', "value %s", ExplodingArgument())
+        with self.assertLogs('oids.trace.test', 'WARNING') as logs:
+            trace.warning('test', "value %s", 42)
+        self.assertEqual(logs.records[0].getMessage(), "value 42")
+
+    @override_settings(INSTRUMENTATION_SINKS=[{'class': 'oids.instrumentation.AggregateSink'}])
+    def test_aggregate_sink(self):
+        """Тест: лічильники, таймінги та помилки span-ів накопичуються в пам'яті."""
+        sink = trace.get_sinks()[0]
+        trace.incr('test.counter')
+        trace.incr('test.counter', 2)
+        with trace.span('test.span') as span:
+            span.set(rows=3)
+        with self.assertRaises(ValueError):
+            with trace.span('test.span'):
+                raise ValueError
+
+        snapshot = sink.snapshot()
+        self.assertEqual(snapshot['counters'], {'test.counter': 3})
+        self.assertEqual(snapshot['timings']['test.span']['count'], 2)
+        self.assertEqual(snapshot['errors'], {'test.span': 1})
+
+    @override_settings(INSTRUMENTATION_SINKS=[])
+    def test_add_and_remove_sink(self):
+        """Тест: приймач можна підключити та відключити під час роботи."""
+        sink = trace.add_sink(trace.AggregateSink())
+        trace.incr('test.counter')
+        trace.remove_sink(sink)
+        trace.incr('test.counter')
+        self.assertEqual(sink.snapshot()['counters'], {'test.counter': 1})
+        self.assertIs(trace.span('test.span'), trace.span('test.span'))
+
+
+@override_settings(INSTRUMENTATION_SINKS=[
+    {'class': 'oids.instrumentation.AggregateSink'},
+    {'class': 'oids.instrumentation.LoggingSink', 'level': 'DEBUG'},
+])
+class StatusEngineInstrumentationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        work_request = WorkRequest.objects.create(
+            unit=unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        cls.oid = OID.objects.create(
+            unit=unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+        cls.item = WorkRequestItem.objects.create(request=work_request, oid=cls.oid, work_type=WorkTypeChoices.IK)
+
+    def tearDown(self):
+        trace.reset()
+
+    def test_status_transitions_traced(self):
+        """Тест: перерахунок статусів пише лічильники, таймінг flush та DEBUG-події."""
+        sink = trace.get_sinks()[0]
+        with self.assertLogs('oids.trace', 'DEBUG') as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                Document.objects.create(
+                    oid=self.oid, work_request_item=self.item, document_type=self.ik_type,
+                    doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+
+        snapshot = sink.snapshot()
+        self.assertEqual(snapshot['counters']['wri.status_checks'], 1)
+        self.assertEqual(snapshot['counters']['wri.status_changed'], 1)
+        self.assertEqual(snapshot['counters']['wr.status_changed'], 1)
+        self.assertEqual(snapshot['timings']['status_sync.flush']['count'], 1)
+        self.assertIn('oids.trace.wri.status', {record.name for record in logs.records})
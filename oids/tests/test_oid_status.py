@@ -0,0 +1,103 @@
+# oids/tests/test_oid_status.py
+
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..document_roles import invalidate_document_roles
+from ..models import (Unit, OID, Document, DocumentType, OIDStatusChange, WorkRequest, WorkRequestItem,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkRequestStatusChoices, WorkTypeChoices)
+from ..oid_status import Transition, apply_many, deferred_transitions, match_rule
+
+
+def statements(queries, prefix):
+    return [q['sql'] for q in queries.captured_queries if q['sql'].startswith(prefix)]
+
+
+class OIDStatusMachineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        cls.unit = Unit.objects.create(code="A0001", name="Частина", city="Київ")
+        cls.oids = [
+            OID.objects.create(unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                               sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.RECEIVED_TZ_APPROVE)
+            for i in range(50)
+        ]
+
+    def test_transition_table(self):
+        """Тест: правило обирається за поточним статусом; подія без правила нічого не змінює."""
+        self.assertEqual(match_rule('attestation_registered', OIDStatusChoices.NEW).target, OIDStatusChoices.ATTESTED)
+        self.assertIsNone(match_rule('attestation_registered', OIDStatusChoices.ACTIVE).target)
+        self.assertIsNone(match_rule('attestation_registered', OIDStatusChoices.CANCELED))
+        with self.assertRaises(ValueError):
+            Transition(oid=self.oids[0], event='unknown')
+
+        oid = self.oids[0]
+        context = {'registered_number': "12/ДССЗЗІ", 'process_date': "01.02.2024"}
+        apply_many([
+            Transition(oid=oid, event='attestation_registered', context=context),
+            Transition(oid=oid, event='azr_registered', context={'registered_number': "13", 'registered_date': ""}),
+            Transition(oid=oid, event='attestation_registered', context=context),
+            Transition(oid=oid, event='azr_registered', context={'registered_number': "14", 'registered_date': ""}),
+        ])
+        # Переданий екземпляр оновлено, повторний АЗР активного ОІД - без запису
+        self.assertEqual(oid.status, OIDStatusChoices.ACTIVE)
+        self.assertTrue(oid.note.startswith("Проведено чергову атестацію (01.02.2024). ||\nОб'єкт атестовано"))
+        oid.refresh_from_db()
+        self.assertEqual(oid.status, OIDStatusChoices.ACTIVE)
+        self.assertEqual(
+            list(OIDStatusChange.objects.filter(oid=oid).order_by('pk').values_list('old_status', 'new_status')),
+            [("ТЗ/МЗ Погоджено", "атестовано"), ("атестовано", "Активний (В дії)"),
+             ("Активний (В дії)", "Активний (В дії)")])
+        self.assertEqual(oid.history.first().status, OIDStatusChoices.ACTIVE)
+
+        apply_many([Transition(oid=self.oids[1], event='manual', target=OIDStatusChoices.RECEIVED_TZ_APPROVE,
+                               context={'reason': "Перевірка"})])
+        self.assertEqual(OIDStatusChange.objects.get(oid=self.oids[1]).reason, "Перевірка")
+
+    def test_apply_many_query_count_independent_of_size(self):
+        """Тест: 5 і 45 переходів - однакова кількість запитів, один UPDATE та одна вставка журналу."""
+        counts = []
+        for oids in (self.oids[:5], self.oids[5:]):
+            transitions = [Transition(oid=oid.pk, event='tz_for_revision', context={'tz_number': oid.room})
+                           for oid in oids]
+            with CaptureQueriesContext(connection) as queries:
+                apply_many(transitions)
+            counts.append(len(queries.captured_queries))
+            self.assertEqual(len(statements(queries, 'UPDATE "oids_oid"')), 1)
+            self.assertEqual(len(statements(queries, 'INSERT INTO "oids_oidstatuschange"')), 1)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(OID.objects.filter(status=OIDStatusChoices.RECEIVED_TZ_REPEAT).count(), 50)
+        self.assertEqual(OIDStatusChange.objects.count(), 50)
+
+    def test_registering_attestation_acts_in_one_batch(self):
+        """Тест: реєстрація актів з однієї відповіді ДССЗЗІ - переходи ОІД одним пакетом."""
+        act_type = DocumentType.objects.create(oid_type='МОВНА', work_type='Атестація', name="Акт атестації")
+        for name in ("Висновок ІК", "Акт завершення робіт", "Декларація відповідності"):
+            DocumentType.objects.create(oid_type='МОВНА', work_type='ІК', name=name)
+        work_request = WorkRequest.objects.create(
+            unit=self.unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        documents = []
+        for oid in self.oids[:20]:
+            item = WorkRequestItem.objects.create(request=work_request, oid=oid, work_type=WorkTypeChoices.ATTESTATION)
+            documents.append(Document.objects.create(
+                oid=oid, work_request_item=item, document_type=act_type, document_number=f"{oid.pk}/А",
+                doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20)))
+        OIDStatusChange.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries, deferred_transitions():
+            for document in documents:
+                document.dsszzi_registered_number = f"{document.pk}/ДССЗЗІ"
+                document.dsszzi_registered_date = datetime.date(2024, 3, 1)
+                document.save()
+        self.assertEqual(len(statements(queries, 'UPDATE "oids_oid"')), 1)
+        self.assertEqual(len(statements(queries, 'INSERT INTO "oids_oidstatuschange"')), 1)
+        self.assertEqual(OID.objects.filter(status=OIDStatusChoices.ATTESTED).count(), 20)
+        self.assertEqual(OIDStatusChange.objects.filter(initiating_document__in=documents).count(), 20)
+        self.assertEqual(
+            set(WorkRequestItem.objects.filter(request=work_request).values_list('status', flat=True)),
+            {WorkRequestStatusChoices.TO_SEND_VCH})
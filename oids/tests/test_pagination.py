@@ -0,0 +1,152 @@
+# oids/tests/test_pagination.py
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import (Unit, OID, WorkRequest, WorkRequestItem, Document, DocumentType, Person,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+from ..pagination import KeysetPaginator, KeysetPage, UnsupportedOrdering
+from ..views import get_paginated_page
+
+
+class KeysetPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.units = Unit.objects.bulk_create([
+            Unit(code=f"A000{i}", name=f"Частина {i}", city="Київ") for i in range(3)
+        ])
+        cls.oids = OID.objects.bulk_create([
+            OID(unit=cls.units[i % 3], oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i:02d}",
+                sec_level=SecLevelChoices.S, room=str(i % 4), status=OIDStatusChoices.ACTIVE)
+            for i in range(23)
+        ])
+        cls.work_request = WorkRequest.objects.create(
+            unit=cls.units[0], incoming_number="1/24", incoming_date=datetime.date(2024, 1, 1))
+        # Частина дедлайнів - NULL, частина повторюється: перевірка змішаних напрямків та NULL
+        WorkRequestItem.objects.bulk_create([
+            WorkRequestItem(request=cls.work_request, oid=oid, work_type=WorkTypeChoices.IK,
+                            doc_processing_deadline=None if i % 5 == 0 else datetime.date(2024, 5, 1 + i % 4))
+            for i, oid in enumerate(cls.oids)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, queryset, per_page):
+        """Проходить сторінки вперед, потім назад; повертає (pk вперед, pk назад, сторінки)."""
+        paginator = KeysetPaginator(queryset, per_page)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        forward = [obj.pk for page in pages for obj in page]
+
+        back_pages = [pages[-1]]
+        while back_pages[-1].has_previous():
+            back_pages.append(paginator.page(back_pages[-1].previous_cursor))
+        backward = [obj.pk for page in reversed(back_pages) for obj in page]
+        return forward, backward, pages
+
+    def test_pages_match_offset_order(self):
+        """Тест: сторінки вперед і назад дають той самий порядок, що й queryset (змішані напрямки, NULL)."""
+        for ordering in [
+            ('doc_processing_deadline', '-oid__cipher'),
+            ('-doc_processing_deadline', 'oid__unit__code'),
+            ('oid__unit__code', '-oid__room', 'oid__cipher'),
+        ]:
+            with self.subTest(ordering=ordering):
+                queryset = WorkRequestItem.objects.select_related('oid__unit').order_by(*ordering, 'pk')
+                expected = list(queryset.values_list('pk', flat=True))
+                forward, backward, pages = self.walk(queryset.order_by(*ordering), per_page=4)
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+                self.assertEqual([page.start_index() for page in pages], list(range(1, len(expected) + 1, 4)))
+                self.assertEqual(pages[-1].end_index(), len(expected))
+
+    def test_deep_page_without_count_and_offset(self):
+        """Тест: сторінка за курсором - один запит без COUNT та OFFSET."""
+        queryset = OID.objects.order_by('unit__code', 'cipher')
+        paginator = KeysetPaginator(queryset, 5)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.page(cursor)
+            list(page)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+        self.assertEqual(page.start_index(), 6)
+
+    def test_invalid_cursor_gives_first_page(self):
+        """Тест: підроблений курсор або курсор іншого сортування - перша сторінка."""
+        cursor = KeysetPaginator(OID.objects.order_by('cipher'), 5).page().next_cursor
+        other = KeysetPaginator(OID.objects.order_by('-cipher'), 5)
+        self.assertFalse(other.page(cursor).has_previous())
+        self.assertEqual(other.page(cursor)[0], OID.objects.order_by('-cipher').first())
+        self.assertEqual(other.page(cursor[:-2] + 'xx')[0], OID.objects.order_by('-cipher').first())
+
+    def test_cached_and_estimated_count(self):
+        """Тест: точна кількість кешується; оцінка обмежується лімітом."""
+        queryset = OID.objects.filter(unit=self.units[0]).order_by('cipher')
+        self.assertIsNone(KeysetPaginator(queryset, 5).count)
+        self.assertEqual(KeysetPaginator(queryset, 5, count='cached').count, 8)
+        with self.assertNumQueries(0):
+            self.assertEqual(KeysetPaginator(queryset, 5, count='cached').count, 8)
+
+        with override_settings(KEYSET_COUNT_ESTIMATE_LIMIT=10):
+            paginator = KeysetPaginator(OID.objects.order_by('cipher'), 5, count='estimate')
+            self.assertEqual(paginator.count, 10)
+            self.assertTrue(paginator.count_is_estimate)
+
+    def test_unsupported_ordering_falls_back(self):
+        """Тест: сортування за FK або зв'язком "до багатьох" - звичайний Paginator."""
+        for ordering in ['unit', 'trips__end_date', '?']:
+            with self.subTest(ordering=ordering):
+                with self.assertRaises(UnsupportedOrdering):
+                    KeysetPaginator(OID.objects.order_by(ordering), 5)
+        request = RequestFactory().get('/', {'page': 2})
+        page = get_paginated_page(OID.objects.order_by('unit'), request, items_per_page=5, keyset=True)
+        self.assertEqual(page.number, 2)
+        self.assertIsInstance(get_paginated_page(OID.objects.order_by('cipher'), request, keyset=True), KeysetPage)
+
+
+class KeysetListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        unit = Unit.objects.create(code="A0001", name="Частина", city="Київ")
+        oid = OID.objects.create(unit=unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+                                 sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+        person = Person.objects.create(full_name="Іваненко Іван", position="Інженер")
+        document_type = DocumentType.objects.create(name="Довідка", oid_type=OIDTypeChoices.SPEAK, work_type=WorkTypeChoices.IK)
+        Document.objects.bulk_create([
+            Document(oid=oid, document_type=document_type, document_number=f"{i}/Д", author=person,
+                     doc_process_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 30),
+                     work_date=datetime.date(2024, 1, 1))
+            for i in range(130)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_document_list_cursor_navigation(self):
+        """Тест: список документів переходить на наступну сторінку за курсором і показує кількість."""
+        response = self.client.get(reverse('oids:list_documents'))
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertEqual(len(page), 100)
+        self.assertContains(response, '1–100')
+        self.assertContains(response, 'з 130')
+
+        response = self.client.get(reverse('oids:list_documents'), {'cursor': page.next_cursor})
+        second = response.context['page_obj']
+        self.assertEqual(len(second), 30)
+        self.assertEqual(second.start_index(), 101)
+        self.assertFalse({doc.pk for doc in page} & {doc.pk for doc in second})
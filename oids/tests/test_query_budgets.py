@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from oids.benchmarks import BENCHMARK_ENDPOINTS, seed_benchmark_data, get_benchmark_context, measure_endpoint
+
+
+class QueryBudgetTest(TestCase):
+    """Бюджети SQL-запитів з oids.benchmarks.BENCHMARK_ENDPOINTS на наборі даних 'small'."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # З виконанням on_commit - як закомічені дані (інакше кеші довідників не використовуються)
+        with cls.captureOnCommitCallbacks(execute=True):
+            seed_benchmark_data('small')
+        cls.user = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.context = get_benchmark_context()
+
+    def test_endpoints_within_query_budget(self):
+        for endpoint in BENCHMARK_ENDPOINTS:
+            if endpoint.get('budget') is None:
+                continue
+            with self.subTest(endpoint=endpoint['name']):
+                result = measure_endpoint(self.client, endpoint, self.context, repeat=1, measure_memory=False)
+                self.assertEqual(result['status'], 200)
+                self.assertLessEqual(result['query_count'], endpoint['budget'])
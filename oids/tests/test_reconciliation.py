@@ -0,0 +1,112 @@
+# oids/tests/test_reconciliation.py
+
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..document_roles import invalidate_document_roles
+from ..models import (Unit, OID, Document, DocumentType, WorkRequest, WorkRequestItem,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkRequestStatusChoices, WorkTypeChoices)
+from ..reconciliation import reconcile_statuses
+
+
+class ReconciliationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        cls.ik_type = DocumentType.objects.create(oid_type='МОВНА', work_type='ІК', name="Висновок ІК")
+        cls.act_type = DocumentType.objects.create(oid_type='МОВНА', work_type='Атестація', name="Акт атестації")
+        cls.small = cls.create_unit("A0001", 1)
+        cls.large = cls.create_unit("A0002", 5)
+
+    @classmethod
+    def create_unit(cls, code, size):
+        """ВЧ із заявкою: на кожен i - елемент ІК з висновком, атестація із зареєстрованим актом,
+        виконаний елемент та елемент без документів. Статуси не перераховані (on_commit не виконується)."""
+        unit = Unit.objects.create(code=code, name=f"Частина {code}", city="Київ")
+        work_request = WorkRequest.objects.create(unit=unit, incoming_number=f"{code}/1",
+                                                  incoming_date=datetime.date(2024, 1, 1))
+        for i in range(size):
+            oids = [OID.objects.create(unit=unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"{code}-{i}-{n}",
+                                       sec_level=SecLevelChoices.S, room=str(n), status=OIDStatusChoices.ACTIVE)
+                    for n in range(4)]
+            ik_item = WorkRequestItem.objects.create(request=work_request, oid=oids[0], work_type=WorkTypeChoices.IK)
+            Document.objects.create(oid=oids[0], work_request_item=ik_item, document_type=cls.ik_type,
+                                    document_number=f"{i}/ІК", doc_process_date=datetime.date(2024, 2, 1),
+                                    work_date=datetime.date(2024, 1, 20))
+            act_item = WorkRequestItem.objects.create(request=work_request, oid=oids[1],
+                                                      work_type=WorkTypeChoices.ATTESTATION)
+            Document.objects.create(oid=oids[1], work_request_item=act_item, document_type=cls.act_type,
+                                    document_number=f"{i}/А", doc_process_date=datetime.date(2024, 2, 2),
+                                    work_date=datetime.date(2024, 1, 20), dsszzi_registered_number=f"{i}/Д",
+                                    dsszzi_registered_date=datetime.date(2024, 3, 1))
+            WorkRequestItem.objects.create(request=work_request, oid=oids[2], work_type=WorkTypeChoices.IK,
+                                           status=WorkRequestStatusChoices.COMPLETED)
+            WorkRequestItem.objects.create(request=work_request, oid=oids[3], work_type=WorkTypeChoices.IK)
+        WorkRequest.objects.filter(pk=work_request.pk).update(status=WorkRequestStatusChoices.COMPLETED)
+        return work_request
+
+    def item_statuses(self, work_request):
+        return sorted(work_request.items.values_list('status', flat=True))
+
+    def test_dry_run_and_apply(self):
+        """Тест: --dry-run лише рахує (заявки - з урахуванням виправлень елементів); запуск виправляє лише відмінності."""
+        dry = reconcile_statuses(dry_run=True)
+        self.assertEqual(dry.items_checked, 18)  # виконані елементи не перевіряються
+        self.assertEqual(dry.item_changes, {
+            (WorkRequestStatusChoices.PENDING, WorkRequestStatusChoices.TO_SEND_VCH): 12,
+        })
+        self.assertEqual(dry.processed_dates_filled, 12)
+        self.assertEqual(dry.work_request_changes, {
+            (WorkRequestStatusChoices.COMPLETED, WorkRequestStatusChoices.TO_SEND_VCH): 2,
+        })
+        self.assertEqual(self.small.items.filter(status=WorkRequestStatusChoices.PENDING).count(), 3)
+
+        result = reconcile_statuses()
+        self.assertEqual((result.item_changes, result.work_request_changes),
+                         (dry.item_changes, dry.work_request_changes))
+        self.assertEqual(self.item_statuses(self.small), sorted([
+            WorkRequestStatusChoices.PENDING, WorkRequestStatusChoices.TO_SEND_VCH,
+            WorkRequestStatusChoices.TO_SEND_VCH, WorkRequestStatusChoices.COMPLETED,
+        ]))
+        act_item = self.small.items.get(work_type=WorkTypeChoices.ATTESTATION)
+        self.assertEqual(act_item.docs_actually_processed_on, datetime.date(2024, 3, 1))
+        self.small.refresh_from_db()
+        self.assertEqual(self.small.status, WorkRequestStatusChoices.TO_SEND_VCH)
+        self.assertEqual(act_item.history.first().status, WorkRequestStatusChoices.TO_SEND_VCH)
+
+        again = reconcile_statuses()
+        self.assertEqual((again.items_corrected, again.work_requests_corrected, again.processed_dates_filled), (0, 0, 0))
+
+    def test_query_count_independent_of_size(self):
+        """Тест: кількість запитів не залежить від кількості елементів; --unit обмежує набір."""
+        counts = []
+        for work_request in (self.small, self.large):
+            with CaptureQueriesContext(connection) as queries:
+                result = reconcile_statuses(unit_codes=[work_request.unit.code])
+            counts.append(len(queries.captured_queries))
+            self.assertEqual(result.work_requests_checked, 1)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.large.items.filter(status=WorkRequestStatusChoices.TO_SEND_VCH).count(), 10)
+
+    def test_since_and_command(self):
+        """Тест: --since пропускає давно не змінені записи; команда друкує підсумок."""
+        WorkRequestItem.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        WorkRequest.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        Document.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        Document.objects.filter(work_request_item__request=self.small).update(updated_at=datetime.datetime.now(datetime.timezone.utc))
+
+        result = reconcile_statuses(since=datetime.date.today(), dry_run=True)
+        self.assertEqual(result.items_checked, 2)
+        self.assertEqual(result.work_requests_checked, 1)
+
+        out = StringIO()
+        call_command('reconcile_statuses', '--unit', 'A0002', '--chunk-size', '3', stdout=out)
+        self.assertIn("Corrected 10 work request items and 1 work requests", out.getvalue())
+        self.assertIn("Work request items: Очікує -> готово до відправки в в/ч: 10", out.getvalue())
+        self.assertEqual(self.small.items.filter(status=WorkRequestStatusChoices.TO_SEND_VCH).count(), 0)
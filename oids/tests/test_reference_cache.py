@@ -0,0 +1,79 @@
+# oids/tests/test_reference_cache.py
+
+from django import forms
+from django.db import transaction
+from django.test import TestCase
+
+from ..forms_filters import OIDFilterForm
+from ..models import Unit
+from ..reference_cache import (CachedModelChoiceField, CachedModelMultipleChoiceField, get_reference,
+    invalidate_reference_cache)
+
+
+class UnitChoiceForm(forms.Form):
+    unit = CachedModelChoiceField('units', required=False)
+    units = CachedModelMultipleChoiceField('units', required=False)
+
+
+class ReferenceCacheTest(TestCase):
+
+    def setUp(self):
+        # Створення поза setUpTestData та з виконанням on_commit - як закомічені дані
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            invalidate_reference_cache()
+            self.units = [
+                Unit.objects.create(code=f"A000{i}", name=f"Частина {i}", city="Київ") for i in range(3)
+            ]
+
+    def test_choices_served_from_cache(self):
+        """Тест: повторний рендер варіантів ВЧ не звертається до БД."""
+        html = str(OIDFilterForm()['unit'])
+        self.assertIn("A0001 - Частина 1", html)
+        form = OIDFilterForm()  # __init__ читає список міст - поза підрахунком
+        with self.assertNumQueries(0):
+            self.assertEqual(str(form['unit']), html)
+            self.assertEqual(len(UnitChoiceForm().fields['unit'].choices), 4)
+
+    def test_invalidation_and_rollback(self):
+        """Тест: зміна скидає кеш; незакомічені та відкочені зміни в кеш не потрапляють."""
+        get_reference('units')
+        try:
+            with transaction.atomic():
+                Unit.objects.create(code="B0001", name="Відкочена", city="Львів")
+                self.assertIn("Відкочена", str(UnitChoiceForm()['unit']))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertNotIn("Відкочена", str(UnitChoiceForm()['unit']))
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.units[0].name = "Перейменована"
+            self.units[0].save()
+        self.assertIn("A0000 - Перейменована", str(UnitChoiceForm()['unit']))
+        with self.assertNumQueries(0):
+            str(UnitChoiceForm()['unit'])
+
+    def test_submitted_pks_validated(self):
+        """Тест: відомий pk - об'єкт з кешу без запиту; невідомий - помилка; новий (кеш не скинуто) - перевірка в БД."""
+        get_reference('units')
+        form = UnitChoiceForm({'unit': str(self.units[1].pk), 'units': [str(self.units[0].pk), str(self.units[2].pk)]})
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['unit'], self.units[1])
+        self.assertEqual(set(form.cleaned_data['units']), {self.units[0], self.units[2]})
+
+        for data in [{'unit': '999999'}, {'unit': 'abc'}, {'units': [str(self.units[0].pk), '999999']}]:
+            with self.subTest(data=data):
+                self.assertFalse(UnitChoiceForm(data).is_valid())
+
+        bulk_unit = Unit.objects.bulk_create([Unit(code="C0001", name="Без сигналів", city="Київ")])[0]
+        form = UnitChoiceForm({'unit': str(bulk_unit.pk), 'units': [str(bulk_unit.pk)]})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['unit'], bulk_unit)
+
+    def test_replaced_queryset_not_cached(self):
+        """Тест: якщо форма замінює queryset поля - варіанти з нього, а не з кешу."""
+        form = UnitChoiceForm()
+        form.fields['unit'].queryset = Unit.objects.filter(code="A0002")
+        self.assertEqual([label for _, label in form.fields['unit'].choices][1:], ["A0002 - Частина 2"])
+        self.assertEqual(len(UnitChoiceForm().fields['unit'].choices), 4)
@@ -0,0 +1,138 @@
+# oids/tests/test_search_index.py
+
+import datetime
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search_index
+from ..models import (Unit, OID, WorkRequest, WorkRequestItem, Document, DocumentType, Person,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+
+
+class SearchIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A1234", name="Військова частина Полтава", city="Полтава")
+        cls.oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="КАБ-77", full_name="Кабінет командира",
+            sec_level=SecLevelChoices.S, room="101", status=OIDStatusChoices.ACTIVE)
+        cls.other_oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ЗАЛ-1", full_name="Зал нарад",
+            sec_level=SecLevelChoices.S, room="202", status=OIDStatusChoices.ACTIVE, note="поруч з кабінетом")
+        cls.work_request = WorkRequest.objects.create(
+            unit=cls.unit, incoming_number="55/ВХ", incoming_date=datetime.date(2024, 1, 1))
+        WorkRequestItem.objects.create(request=cls.work_request, oid=cls.oid, work_type=WorkTypeChoices.IK)
+        cls.person = Person.objects.create(full_name="Іваненко Іван", position="Інженер")
+        cls.document_type = DocumentType.objects.create(name="Довідка", oid_type=OIDTypeChoices.SPEAK, work_type=WorkTypeChoices.IK)
+        cls.document = Document.objects.create(
+            oid=cls.oid, document_type=cls.document_type, document_number="777/ДОВ", author=cls.person,
+            doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_signals_maintain_index(self):
+        """Тест: записи додаються/оновлюються/видаляються сигналами; пошук без урахування регістру кирилиці."""
+        self.assertEqual(search_index.search_ids(search_index.OID, "каб-77"), [self.oid.pk])
+        self.assertEqual(search_index.search_ids(search_index.OID, "КОМАНДИР"), [self.oid.pk])
+        self.assertEqual(search_index.search_ids(search_index.UNIT, "полтав"), [self.unit.pk])
+        self.assertEqual(search_index.search_ids(search_index.WORK_REQUEST, "каб-77"), [self.work_request.pk])
+
+        self.oid.full_name = "Серверна"
+        self.oid.save()
+        self.assertEqual(search_index.search_ids(search_index.OID, "командир"), [])
+        self.assertEqual(search_index.search_ids(search_index.OID, "серверн"), [self.oid.pk])
+
+        self.document.delete()
+        self.assertEqual(search_index.search_ids(search_index.DOCUMENT, "777/ДОВ"), [])
+
+    def test_cipher_change_cascades(self):
+        """Тест: зміна шифру ОІД переіндексовує документи та заявки, що його містять."""
+        self.oid.cipher = "НОВИЙ-5"
+        self.oid.save()
+        self.assertEqual(search_index.search_ids(search_index.DOCUMENT, "новий-5"), [self.document.pk])
+        self.assertEqual(search_index.search_ids(search_index.WORK_REQUEST, "новий-5"), [self.work_request.pk])
+        self.assertEqual(search_index.search_ids(search_index.WORK_REQUEST, "каб-77"), [])
+
+    def test_non_indexed_update_skips_index(self):
+        """Тест: save(update_fields) без індексованих полів не звертається до індексу."""
+        self.oid.status = OIDStatusChoices.CANCELED
+        with CaptureQueriesContext(connection) as queries:
+            self.oid.save(update_fields=['status'])
+        self.assertFalse([q for q in queries.captured_queries if search_index.TABLE in q['sql']])
+
+    def test_short_query_falls_back(self):
+        """Тест: запит коротший за 3 символи - індекс не застосовний, використовується fallback."""
+        self.assertIsNone(search_index.build_match("ка"))
+        self.assertIsNone(search_index.search_ids(search_index.OID, "ка"))
+        response = self.client.get(reverse('oids:list_oids'), {'search_query': '20'})
+        self.assertEqual([oid.pk for oid in response.context['page_obj']], [self.other_oid.pk])
+
+    def test_list_views_use_index(self):
+        """Тест: списки фільтруються через MATCH, без LIKE."""
+        for url_name, query, expected in [
+            ('oids:list_oids', 'кабінет', {self.oid.pk, self.other_oid.pk}),
+            ('oids:list_units', 'a1234', {self.unit.pk}),
+            ('oids:list_documents', '777/дов', {self.document.pk}),
+            ('oids:list_work_requests', 'каб-77', {self.work_request.pk}),
+        ]:
+            with self.subTest(url_name=url_name):
+                response = self.client.get(reverse(url_name), {'search_query': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual({obj.pk for obj in response.context['page_obj']}, expected)
+
+    def test_global_search_endpoint(self):
+        """Тест: глобальний пошук ранжує збіги в шифрі вище за збіги в примітці; фільтр типів."""
+        response = self.client.get(reverse('oids:global_search'), {'q': 'каб', 'kind': 'oid'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([hit['id'] for hit in data['hits']], [self.oid.pk, self.other_oid.pk])
+        self.assertEqual(data['hits'][0]['url'], reverse('oids:oid_detail_view_name', args=[self.oid.pk]))
+
+        data = self.client.get(reverse('oids:global_search'), {'q': '777/ДОВ'}).json()
+        self.assertEqual([(hit['kind'], hit['id']) for hit in data['hits']], [('document', self.document.pk)])
+        self.assertEqual(data['hits'][0]['url'], reverse('oids:oid_detail_view_name', args=[self.oid.pk]))
+
+        self.assertEqual(self.client.get(reverse('oids:global_search'), {'q': 'к'}).json()['count'], 0)
+
+    def test_rebuild_command(self):
+        """Тест: перебудова відновлює індекс після bulk-операцій без сигналів."""
+        OID.objects.filter(pk=self.oid.pk).update(full_name="Архів")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search_index.TABLE}")
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('ОІД: 2', out.getvalue())
+        self.assertEqual(search_index.search_ids(search_index.OID, "архів"), [self.oid.pk])
+        self.assertEqual(search_index.search_ids(search_index.WORK_REQUEST, "каб-77"), [self.work_request.pk])
+
+    def test_migration_populates_index(self):
+        """Тест: міграція 0051 (історичні моделі) індексує вже існуючі записи так само, як rebuild."""
+        def index_rows():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT rowid, kind, object_id, label, ref, title, body FROM {search_index.TABLE} ORDER BY rowid")
+                return cursor.fetchall()
+
+        search_index.rebuild()
+        expected = index_rows()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search_index.TABLE}")
+
+        migration_apps = MigrationExecutor(connection).loader.project_state(('oids', '0051_search_index')).apps
+        import_module('oids.migrations.0051_search_index').populate_search_index(
+            migration_apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(index_rows(), expected)
+        self.assertEqual(search_index.search_ids(search_index.WORK_REQUEST, "каб-77"), [self.work_request.pk])
+        self.assertIn(self.oid.pk, search_index.search_ids(search_index.OID, self.oid.cipher))
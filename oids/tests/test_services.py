@@ -0,0 +1,544 @@
+# oids/tests/test_services.py
+
+import datetime
+from importlib import import_module
+from io import StringIO
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from ..models import (Unit, OID, DocumentType, Document, OIDValiditySnapshot, WorkRequest, WorkRequestItem,
+    OIDStatusChange, OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices, WorkRequestStatusChoices,
+    Trip, WorkRequestTripSnapshot, WorkRequestItemProcessingSnapshot)
+from ..services import get_last_expiration_dates_for_oids, ingest_documents, rebuild_processing_snapshots
+from .. import reference_cache
+from ..document_roles import DOCUMENT_TYPE, DocumentRole, get_role_type, get_role_type_ids, invalidate_document_roles
+
+
+def historical_apps(migration):
+    """Реєстр історичних моделей станом на міграцію - як його отримує RunPython."""
+    return MigrationExecutor(connection).loader.project_state(migration).apps
+
+
+class LastExpirationDatesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        cls.act_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Акт атестації", has_expiration=True, duration_months=60)
+        cls.prescription_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Припис", has_expiration=True, duration_months=60)
+
+        cls.oids = []
+        for i in range(5):
+            oid = OID.objects.create(
+                unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            cls.oids.append(oid)
+            for work_date in (datetime.date(2023, 1, 10), datetime.date(2024, 3, 15)):
+                for doc_type in (cls.ik_type, cls.act_type):
+                    Document.objects.create(
+                        oid=oid, document_type=doc_type,
+                        doc_process_date=work_date, work_date=work_date)
+
+    def test_latest_expiration_per_category(self):
+        """Тест: для кожного ОІД повертається дата останнього документа кожної категорії."""
+        result = get_last_expiration_dates_for_oids([oid.id for oid in self.oids])
+
+        for oid in self.oids:
+            self.assertEqual(result[oid.id]['ik'], datetime.date(2025, 11, 15))
+            self.assertEqual(result[oid.id]['attestation'], datetime.date(2029, 3, 15))
+            self.assertIsNone(result[oid.id]['prescription'])
+
+    def test_constant_number_of_queries(self):
+        """Тест: кількість запитів не залежить від кількості ОІД."""
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_document_roles()
+        with self.assertNumQueries(2):  # реєстр ролей + документи
+            get_last_expiration_dates_for_oids([self.oids[0].id])
+        with self.assertNumQueries(1):
+            get_last_expiration_dates_for_oids([oid.id for oid in self.oids])
+        with self.assertNumQueries(0):
+            get_last_expiration_dates_for_oids([])
+
+    def test_main_dashboard_queries_do_not_grow_with_oids(self):
+        """Тест: головна сторінка виконує однакову кількість запитів для 1 та 5 активних ОІД."""
+        self.client.login(username='testuser', password='password123')
+        other_unit = Unit.objects.create(code="B0000", name="Інша частина", city="Львів")
+        OID.objects.create(
+            unit=other_unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-B",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+
+        url = reverse('oids:main_dashboard')
+        self.client.get(url, {'unit': other_unit.id})  # прогрів сесії
+        with CaptureQueriesContext(connection) as single_oid_queries:
+            self.client.get(url, {'unit': other_unit.id})
+        with CaptureQueriesContext(connection) as many_oids_queries:
+            response = self.client.get(url, {'unit': self.unit.id})
+
+        self.assertEqual(len(response.context['oids_active']), 5)
+        self.assertEqual(len(many_oids_queries), len(single_oid_queries))
+
+
+class DocumentRoleRegistryTest(TestCase):
+
+    def setUp(self):
+        invalidate_document_roles()
+
+    def test_roles_resolved_and_cached(self):
+        """Тест: реєстр завантажується одним запитом і далі не звертається до БД."""
+        with self.captureOnCommitCallbacks(execute=True):
+            act_type = DocumentType.objects.create(
+                oid_type='МОВНА', work_type='Атестація', name="Акт атестації", has_expiration=True, duration_months=60)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_role_type(DocumentRole.ATTESTATION_ACT), act_type)
+            self.assertEqual(get_role_type_ids(DocumentRole.ATTESTATION_ACT), {act_type.pk})
+            self.assertEqual(get_role_type_ids(DocumentRole.AZR_ACT), frozenset())
+
+    def test_registry_invalidated_on_document_type_change(self):
+        """Тест: збереження/видалення DocumentType скидає кеш реєстру."""
+        self.assertIsNone(get_role_type(DocumentRole.AZR_ACT))
+        azr_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Акт завершення робіт")
+        self.assertEqual(get_role_type(DocumentRole.AZR_ACT), azr_type)
+        azr_type.delete()
+        self.assertIsNone(get_role_type(DocumentRole.AZR_ACT))
+
+    def test_registry_follows_shared_version_and_rollback(self):
+        """Тест: зміна спільної версії (інший процес) перечитує реєстр; відкочені типи в кеш не потрапляють."""
+        with self.captureOnCommitCallbacks(execute=True):
+            azr_type = DocumentType.objects.create(
+                oid_type='МОВНА', work_type='Атестація', name="Акт завершення робіт")
+        self.assertEqual(get_role_type(DocumentRole.AZR_ACT), azr_type)
+
+        # Інший процес змінив довідник: у цьому процесі - лише нова версія у спільному кеші
+        DocumentType.objects.filter(pk=azr_type.pk).update(name="Акт огляду")
+        self.assertEqual(get_role_type(DocumentRole.AZR_ACT), azr_type)
+        reference_cache._bump(DOCUMENT_TYPE)
+        self.assertIsNone(get_role_type(DocumentRole.AZR_ACT))
+
+        try:
+            with transaction.atomic():
+                rolled_back = DocumentType.objects.create(
+                    oid_type='МОВНА', work_type='Атестація', name="Акт завершення (відкочений)")
+                self.assertEqual(get_role_type(DocumentRole.AZR_ACT), rolled_back)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIsNone(get_role_type(DocumentRole.AZR_ACT))
+
+
+class OIDValiditySnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        cls.act_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Акт атестації", has_expiration=True, duration_months=60)
+        cls.oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+
+    def test_snapshot_follows_document_changes(self):
+        """Тест: знімок оновлюється при створенні та видаленні документів."""
+        with self.captureOnCommitCallbacks(execute=True):
+            act = Document.objects.create(
+                oid=self.oid, document_type=self.act_type,
+                doc_process_date=datetime.date(2024, 1, 10), work_date=datetime.date(2024, 1, 10))
+            Document.objects.create(
+                oid=self.oid, document_type=self.ik_type,
+                doc_process_date=datetime.date(2024, 5, 20), work_date=datetime.date(2024, 5, 20))
+
+        snapshot = OIDValiditySnapshot.objects.get(oid=self.oid)
+        self.assertEqual(snapshot.attestation_expiration_date, datetime.date(2029, 1, 10))
+        self.assertEqual(snapshot.ik_expiration_date, datetime.date(2026, 1, 20))
+        self.assertEqual(snapshot.last_work_date, datetime.date(2024, 5, 20))
+        self.assertEqual(snapshot.next_expiration_date, datetime.date(2026, 1, 20))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            act.delete()
+        snapshot.refresh_from_db()
+        self.assertIsNone(snapshot.attestation_expiration_date)
+        self.assertEqual(snapshot.next_expiration_date, datetime.date(2026, 1, 20))
+
+    def test_rebuild_command(self):
+        """Тест: команда rebuild_oid_validity перебудовує знімки з нуля."""
+        Document.objects.create(
+            oid=self.oid, document_type=self.act_type,
+            doc_process_date=datetime.date(2024, 1, 10), work_date=datetime.date(2024, 1, 10))
+        OIDValiditySnapshot.objects.all().delete()
+
+        call_command('rebuild_oid_validity', stdout=StringIO())
+
+        snapshot = OIDValiditySnapshot.objects.get(oid=self.oid)
+        self.assertEqual(snapshot.attestation_expiration_date, datetime.date(2029, 1, 10))
+
+    def test_migration_backfill(self):
+        """Тест: міграція 0049 (історичні моделі) заповнює знімки так само, як rebuild_oid_validity."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for work_date in (datetime.date(2023, 1, 10), datetime.date(2024, 1, 10)):
+                Document.objects.create(
+                    oid=self.oid, document_type=self.act_type, doc_process_date=work_date, work_date=work_date)
+            Document.objects.create(
+                oid=self.oid, document_type=self.ik_type,
+                doc_process_date=datetime.date(2024, 5, 20), work_date=datetime.date(2024, 5, 20))
+        fields = ('attestation_expiration_date', 'ik_expiration_date', 'prescription_expiration_date',
+                  'last_work_date', 'next_expiration_date')
+        expected = OIDValiditySnapshot.objects.values(*fields).get(oid=self.oid)
+        OIDValiditySnapshot.objects.all().delete()
+
+        migration_apps = historical_apps(('oids', '0049_oidvaliditysnapshot'))
+        import_module('oids.migrations.0049_oidvaliditysnapshot').backfill_oid_validity(migration_apps, None)
+
+        self.assertEqual(OIDValiditySnapshot.objects.values(*fields).get(oid=self.oid), expected)
+        self.assertEqual(expected['attestation_expiration_date'], datetime.date(2029, 1, 10))
+
+
+class ProcessingSnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        cls.act_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Акт атестації", has_expiration=True, duration_months=60)
+        cls.oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+        cls.work_request = WorkRequest.objects.create(
+            unit=cls.unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        cls.ik_item = WorkRequestItem.objects.create(request=cls.work_request, oid=cls.oid, work_type=WorkTypeChoices.IK)
+        cls.act_item = WorkRequestItem.objects.create(
+            request=cls.work_request, oid=cls.oid, work_type=WorkTypeChoices.ATTESTATION)
+
+    def create_trip(self, start_date, end_date):
+        trip = Trip.objects.create(start_date=start_date, end_date=end_date, purpose="Тест")
+        trip.work_requests.add(self.work_request)
+        return trip
+
+    def test_trip_snapshot_follows_trip_changes(self):
+        """Тест: останнє відрядження заявки оновлюється при додаванні, зміні дат, видаленні відряджень."""
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            early = self.create_trip(datetime.date(2024, 2, 1), datetime.date(2024, 2, 5))
+            late = self.create_trip(datetime.date(2024, 4, 1), datetime.date(2024, 4, 5))
+        snapshot = WorkRequestTripSnapshot.objects.get(work_request=self.work_request)
+        self.assertEqual((snapshot.trip_id, snapshot.trip_start_date), (late.pk, datetime.date(2024, 4, 1)))
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            late.end_date = datetime.date(2024, 1, 20)
+            late.save()
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.trip_id, snapshot.trip_end_date), (early.pk, datetime.date(2024, 2, 5)))
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            early.delete()
+        self.assertEqual(WorkRequestTripSnapshot.objects.get(work_request=self.work_request).trip_id, late.pk)
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            late.work_requests.clear()
+        self.assertFalse(WorkRequestTripSnapshot.objects.exists())
+
+    def test_processing_snapshot_follows_documents(self):
+        """Тест: дата висновку ІК - останнього; дата акту атестації - лише зареєстрованого."""
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for day in (10, 20):
+                Document.objects.create(
+                    oid=self.oid, work_request_item=self.ik_item, document_type=self.ik_type,
+                    doc_process_date=datetime.date(2024, 5, day), work_date=datetime.date(2024, 5, 1))
+            act = Document.objects.create(
+                oid=self.oid, work_request_item=self.act_item, document_type=self.act_type,
+                doc_process_date=datetime.date(2024, 6, 1), work_date=datetime.date(2024, 6, 1))
+        self.assertEqual(WorkRequestItemProcessingSnapshot.objects.get(pk=self.ik_item.pk).final_ik_date,
+                         datetime.date(2024, 5, 20))
+        self.assertIsNone(WorkRequestItemProcessingSnapshot.objects.get(pk=self.act_item.pk).final_attestation_date)
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            act.dsszzi_registered_number = "123/ДССЗЗІ"
+            act.dsszzi_registered_date = datetime.date(2024, 6, 10)
+            act.save()
+        self.assertEqual(WorkRequestItemProcessingSnapshot.objects.get(pk=self.act_item.pk).final_attestation_date,
+                         datetime.date(2024, 6, 1))
+
+    def test_dashboard_reads_snapshots(self):
+        """Тест: сторінка контролю опрацювання - дати зі знімків, без DISTINCT і корельованих підзапитів."""
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.create_trip(datetime.date(2024, 2, 1), datetime.date(2024, 2, 5))
+            self.create_trip(datetime.date(2024, 4, 1), datetime.date(2024, 4, 5))
+            Document.objects.create(
+                oid=self.oid, work_request_item=self.ik_item, document_type=self.ik_type,
+                doc_process_date=datetime.date(2024, 5, 10), work_date=datetime.date(2024, 5, 1))
+        other_request = WorkRequest.objects.create(
+            unit=self.unit, incoming_number="2/2024", incoming_date=datetime.date(2024, 1, 2))
+        WorkRequestItem.objects.create(request=other_request, oid=self.oid, work_type=WorkTypeChoices.IK)
+
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('oids:processing_control_dashboard'), {'wri-unit': [self.unit.pk]})
+        self.assertEqual(response.status_code, 200)
+        items = {item.pk: item for item in response.context['work_request_items']}
+        self.assertEqual(set(items), {self.ik_item.pk, self.act_item.pk})
+        self.assertEqual(items[self.ik_item.pk].relevant_trip_end_date, datetime.date(2024, 4, 5))
+        self.assertEqual(items[self.ik_item.pk].final_ik_date, datetime.date(2024, 5, 10))
+        self.assertIsNone(items[self.act_item.pk].final_attestation_date)
+        item_queries = [q['sql'] for q in queries.captured_queries if 'FROM "oids_workrequestitem"' in q['sql']]
+        self.assertTrue(item_queries)
+        for sql in item_queries:
+            self.assertNotIn('DISTINCT', sql)
+            self.assertNotIn('oids_trip_work_requests', sql)
+
+    def test_rebuild_command(self):
+        """Тест: команда rebuild_processing_snapshots перебудовує обидва знімки з нуля."""
+        trip = Trip.objects.create(
+            start_date=datetime.date(2024, 2, 1), end_date=datetime.date(2024, 2, 5), purpose="Тест")
+        Trip.work_requests.through.objects.create(trip=trip, workrequest=self.work_request)
+        Document.objects.bulk_create([Document(
+            oid=self.oid, work_request_item=self.ik_item, document_type=self.ik_type,
+            doc_process_date=datetime.date(2024, 5, 10), work_date=datetime.date(2024, 5, 1))])
+
+        call_command('rebuild_processing_snapshots', stdout=StringIO())
+
+        self.assertEqual(WorkRequestTripSnapshot.objects.get(work_request=self.work_request).trip_id, trip.pk)
+        self.assertEqual(WorkRequestItemProcessingSnapshot.objects.get(pk=self.ik_item.pk).final_ik_date,
+                         datetime.date(2024, 5, 10))
+        self.assertEqual(WorkRequestItemProcessingSnapshot.objects.count(), 2)
+
+    def test_migration_backfill(self):
+        """Тест: міграція 0052 (історичні моделі) заповнює знімки так само, як rebuild_processing_snapshots."""
+        trip = Trip.objects.create(
+            start_date=datetime.date(2024, 2, 1), end_date=datetime.date(2024, 2, 5), purpose="Тест")
+        Trip.work_requests.through.objects.create(trip=trip, workrequest=self.work_request)
+        with self.captureOnCommitCallbacks(execute=True):
+            Document.objects.create(
+                oid=self.oid, work_request_item=self.ik_item, document_type=self.ik_type,
+                doc_process_date=datetime.date(2024, 2, 10), work_date=datetime.date(2024, 2, 3))
+        rebuild_processing_snapshots()
+        item_fields = ('work_request_item_id', 'final_attestation_date', 'final_ik_date')
+        expected_items = list(WorkRequestItemProcessingSnapshot.objects.order_by('pk').values_list(*item_fields))
+        WorkRequestTripSnapshot.objects.all().delete()
+        WorkRequestItemProcessingSnapshot.objects.all().delete()
+
+        migration_apps = historical_apps(('oids', '0052_processing_snapshots'))
+        import_module('oids.migrations.0052_processing_snapshots').backfill_processing_snapshots(migration_apps, None)
+
+        self.assertEqual(WorkRequestTripSnapshot.objects.get(work_request=self.work_request).trip_id, trip.pk)
+        self.assertEqual(
+            list(WorkRequestItemProcessingSnapshot.objects.order_by('pk').values_list(*item_fields)), expected_items)
+        self.assertIn((self.ik_item.pk, None, datetime.date(2024, 2, 10)), expected_items)
+
+
+class StatusSyncTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        cls.work_request = WorkRequest.objects.create(
+            unit=unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        cls.items = []
+        for i in range(3):
+            oid = OID.objects.create(
+                unit=unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            cls.items.append(WorkRequestItem.objects.create(
+                request=cls.work_request, oid=oid, work_type=WorkTypeChoices.IK))
+
+    def test_single_recompute_per_transaction(self):
+        """Тест: кілька документів у транзакції - один відкладений перерахунок статусів."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for item in self.items:
+                Document.objects.create(
+                    oid=item.oid, work_request_item=item, document_type=self.ik_type,
+                    doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+            # До коміту статуси ще не перераховані
+            self.assertEqual(WorkRequestItem.objects.get(pk=self.items[0].pk).status, WorkRequestStatusChoices.PENDING)
+
+        self.assertEqual(len(callbacks), 1)
+        for item in self.items:
+            item.refresh_from_db()
+            self.assertEqual(item.status, WorkRequestStatusChoices.TO_SEND_VCH)
+        self.work_request.refresh_from_db()
+        self.assertEqual(self.work_request.status, WorkRequestStatusChoices.TO_SEND_VCH)
+
+    def test_recompute_scheduled_again_after_rollback(self):
+        """Тест: відкочена транзакція не блокує перерахунок у наступній."""
+        first, second = self.items[0], self.items[1]
+        try:
+            with transaction.atomic():
+                Document.objects.create(
+                    oid=first.oid, work_request_item=first, document_type=self.ik_type,
+                    doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+            Document.objects.create(
+                oid=second.oid, work_request_item=second, document_type=self.ik_type,
+                doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+
+        self.assertEqual(len(callbacks), 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, WorkRequestStatusChoices.PENDING)
+        self.assertEqual(second.status, WorkRequestStatusChoices.TO_SEND_VCH)
+
+
+class WorkRequestStatusHistogramTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.work_request = WorkRequest.objects.create(
+            unit=unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        statuses = [WorkRequestStatusChoices.COMPLETED, WorkRequestStatusChoices.COMPLETED,
+                    WorkRequestStatusChoices.PENDING]
+        for i, status in enumerate(statuses):
+            oid = OID.objects.create(
+                unit=unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            WorkRequestItem.objects.create(
+                request=cls.work_request, oid=oid, work_type=WorkTypeChoices.IK, status=status)
+
+    def test_histogram_single_query(self):
+        """Тест: гістограма статусів елементів заявки рахується одним запитом."""
+        with self.assertNumQueries(1):
+            counts = WorkRequest.objects.filter(pk=self.work_request.pk).status_histogram()
+        self.assertEqual(counts['total'], 3)
+        self.assertEqual(counts['completed'], 2)
+        self.assertEqual(counts['pending'], 1)
+        self.assertEqual(counts['canceled'], 0)
+
+    def test_annotation_not_inflated_by_search_join(self):
+        """Тест: пошук по шифру ОІД (JOIN по items) не множить лічильники у списку заявок."""
+        self.client.login(username='testuser', password='password123')
+        response = self.client.get(reverse('oids:list_work_requests'), {'search_query': 'ОІД'})
+        work_request = response.context['object_list'][0]
+        self.assertEqual(work_request.items_total, 3)
+        self.assertEqual(work_request.items_completed, 2)
+
+    def test_annotation_not_limited_by_search_match(self):
+        """Тест: пошук одного шифру в заявці з кількома ОІД - лічильники по всіх елементах заявки."""
+        self.client.login(username='testuser', password='password123')
+        # "-2" - коротший за 3 символи (icontains), "ОІД-2" - через пошуковий індекс
+        for search_query in ('-2', 'ОІД-2'):
+            with self.subTest(search_query=search_query):
+                response = self.client.get(reverse('oids:list_work_requests'), {'search_query': search_query})
+                work_requests = list(response.context['object_list'])
+                self.assertEqual([wr.pk for wr in work_requests], [self.work_request.pk])
+                self.assertEqual(work_requests[0].items_total, 3)
+                self.assertEqual(work_requests[0].items_completed, 2)
+                self.assertEqual(work_requests[0].items_pending, 1)
+
+    def test_update_status_from_items(self):
+        """Тест: статус заявки визначається гістограмою - завершена лише коли завершені всі елементи."""
+        self.work_request.update_status_from_items()
+        self.work_request.refresh_from_db()
+        self.assertEqual(self.work_request.status, WorkRequestStatusChoices.PENDING)
+
+        self.work_request.items.update(status=WorkRequestStatusChoices.COMPLETED)
+        with self.assertNumQueries(3):  # гістограма + UPDATE статусу + запис історії
+            self.work_request.update_status_from_items()
+        self.work_request.refresh_from_db()
+        self.assertEqual(self.work_request.status, WorkRequestStatusChoices.COMPLETED)
+
+
+class DocumentIngestionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        invalidate_document_roles()
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.ik_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Висновок ІК", has_expiration=True, duration_months=20)
+        cls.protocol_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='ІК', name="Протокол ІК", has_expiration=False)
+        # Ефекти Document.save спрацьовують лише коли в довіднику є всі ключові типи
+        for name in ("Акт атестації", "Акт завершення робіт", "Декларація відповідності"):
+            DocumentType.objects.create(oid_type='МОВНА', work_type='Атестація', name=name)
+        cls.work_request = WorkRequest.objects.create(
+            unit=cls.unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        cls.oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+        cls.item = WorkRequestItem.objects.create(
+            request=cls.work_request, oid=cls.oid, work_type=WorkTypeChoices.IK)
+
+    def _documents(self, count):
+        return [
+            Document(
+                oid=self.oid, work_request_item=self.item,
+                document_type=self.ik_type if i == 0 else self.protocol_type,
+                document_number=f"27/14-{i}",
+                doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+            for i in range(count)
+        ]
+
+    def test_bulk_ingestion(self):
+        """Тест: пакет документів - bulk_create з історією, ефекти та перерахунок один раз."""
+        with self.captureOnCommitCallbacks(execute=True):
+            created = ingest_documents(self._documents(30))
+
+        self.assertEqual(len(created), 30)
+        self.assertTrue(all(document.pk for document in created))
+        self.assertEqual(Document.history.filter(history_type='+').count(), 30)
+        self.assertEqual(created[0].expiration_date, datetime.date(2025, 9, 20))
+        self.assertIsNone(created[1].expiration_date)
+
+        self.item.refresh_from_db()
+        self.work_request.refresh_from_db()
+        self.assertEqual(self.item.status, WorkRequestStatusChoices.COMPLETED)
+        self.assertEqual(self.work_request.status, WorkRequestStatusChoices.COMPLETED)
+        # Висновок ІК - одна примітка та один запис історії статусу ОІД на пакет
+        self.assertEqual(OIDStatusChange.objects.filter(oid=self.oid, initiating_document__isnull=False).count(), 1)
+        self.assertEqual(OIDValiditySnapshot.objects.get(oid=self.oid).ik_expiration_date, datetime.date(2025, 9, 20))
+
+    def test_queries_do_not_grow_with_package_size(self):
+        """Тест: кількість запитів не залежить від розміру пакета."""
+        with CaptureQueriesContext(connection) as small_package:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_documents(self._documents(2))
+        with CaptureQueriesContext(connection) as large_package:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_documents(self._documents(30))
+        self.assertLessEqual(len(large_package), len(small_package))
+
+    def test_bulk_add_documents_view(self):
+        """Тест: форма пакетного внесення зберігає всі рядки через ingest_documents."""
+        self.client.login(username='testuser', password='password123')
+        data = {
+            'main-unit': self.unit.pk,
+            'main-oid': self.oid.pk,
+            'main-work_request_item': self.item.pk,
+            'main-doc_process_date': '2024-02-01',
+            'main-work_date': '2024-01-20',
+            'docs-TOTAL_FORMS': 3,
+            'docs-INITIAL_FORMS': 0,
+        }
+        for i in range(3):
+            data[f'docs-{i}-document_type'] = self.protocol_type.pk
+            data[f'docs-{i}-document_number'] = f"27/14-{i}"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('oids:bulk_add_documents'), data)
+
+        self.assertRedirects(response, reverse('oids:oid_detail_view_name', args=[self.oid.pk]),
+                             fetch_redirect_response=False)
+        self.assertEqual(Document.objects.filter(oid=self.oid, work_request_item=self.item).count(), 3)
@@ -0,0 +1,167 @@
+# oids/tests/test_sqlite_profile.py
+
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+
+from ..sqlite_profile import busy_retry_delay, is_busy_error, retry_on_busy
+
+
+def busy_error():
+    try:
+        raise sqlite3.OperationalError("database is locked")
+    except sqlite3.OperationalError as exc:
+        try:
+            raise OperationalError(*exc.args) from exc
+        except OperationalError as wrapped:
+            return wrapped
+
+
+class SqlitePragmasTest(TestCase):
+
+    def test_connection_pragmas(self):
+        """Тест: нове з'єднання отримує прагми з settings.SQLITE_PRAGMAS, транзакції - BEGIN IMMEDIATE."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class RetryOnBusyTest(SimpleTestCase):
+
+    def test_retries_busy_errors_with_growing_jitter(self):
+        """Тест: "database is locked" - повтор після випадкової паузи; інші помилки - одразу."""
+        calls = []
+
+        @retry_on_busy(attempts=3)
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise busy_error()
+            return "ok"
+
+        with mock.patch('oids.sqlite_profile.time.sleep') as sleep:
+            self.assertEqual(write(), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+        @retry_on_busy(attempts=2)
+        def always_locked():
+            calls.append(1)
+            raise busy_error()
+
+        calls.clear()
+        with mock.patch('oids.sqlite_profile.time.sleep'), self.assertRaises(OperationalError):
+            always_locked()
+        self.assertEqual(len(calls), 2)
+
+        @retry_on_busy
+        def broken():
+            calls.append(1)
+            raise OperationalError("no such table: oids_oid")
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+        self.assertTrue(is_busy_error(busy_error()))
+        self.assertFalse(is_busy_error(OperationalError("no such table: oids_oid")))
+        for attempt in (1, 2, 3):
+            self.assertLessEqual(busy_retry_delay(attempt, base_delay=0.1), 0.1 * 2 ** (attempt - 1))
+
+    def test_no_retry_inside_outer_transaction(self):
+        """Тест: всередині чужої транзакції помилка не повторюється."""
+        calls = []
+
+        @retry_on_busy
+        def write():
+            calls.append(1)
+            raise busy_error()
+
+        with mock.patch('oids.sqlite_profile.connections') as connections:
+            connections.__getitem__.return_value.in_atomic_block = True
+            with self.assertRaises(OperationalError):
+                write()
+        self.assertEqual(len(calls), 1)
+
+
+class SqliteConcurrencyStressTest(SimpleTestCase):
+    """Файлова база з прагмами профілю: читання йдуть, поки відкрита транзакція запису."""
+
+    WRITE_SECONDS = 0.5
+    READERS = 4
+
+    def connect(self, path):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def test_reads_progress_while_write_in_flight(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / 'stress.sqlite3')
+            setup = self.connect(path)
+            self.assertEqual(setup.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            setup.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, value TEXT)')
+            setup.executemany('INSERT INTO item (value) VALUES (?)', [(f'v{i}',) for i in range(1000)])
+            setup.close()
+
+            write_started, write_done = threading.Event(), threading.Event()
+            reads_during_write, seen_counts, errors = [0] * self.READERS, set(), []
+
+            def writer():
+                conn = self.connect(path)
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    write_started.set()
+                    deadline = time.monotonic() + self.WRITE_SECONDS
+                    while time.monotonic() < deadline:
+                        conn.execute("INSERT INTO item (value) VALUES ('new')")
+                        time.sleep(0.005)
+                    write_done.set()
+                    conn.execute('COMMIT')
+                except Exception as exc:  # pragma: no cover - звіт у головний потік
+                    errors.append(exc)
+                finally:
+                    write_done.set()
+                    conn.close()
+
+            def reader(index):
+                conn = self.connect(path)
+                try:
+                    write_started.wait(5)
+                    while not write_done.is_set():
+                        count = conn.execute('SELECT COUNT(*) FROM item').fetchone()[0]
+                        if write_done.is_set():
+                            break  # Читання могло початися вже після коміту
+                        seen_counts.add(count)
+                        reads_during_write[index] += 1
+                except Exception as exc:  # pragma: no cover
+                    errors.append(exc)
+                finally:
+                    conn.close()
+
+            threads = [threading.Thread(target=writer)] + [
+                threading.Thread(target=reader, args=(i,)) for i in range(self.READERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+            self.assertEqual(errors, [])
+            # Кожен читач виконав багато запитів, поки запис був відкритий, і бачив лише закомічені дані
+            self.assertTrue(all(count > 10 for count in reads_during_write), reads_during_write)
+            self.assertEqual(seen_counts, {1000})
+            final = self.connect(path)
+            self.assertGreater(final.execute('SELECT COUNT(*) FROM item').fetchone()[0], 1000)
+            final.close()
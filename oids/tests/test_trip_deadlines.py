@@ -0,0 +1,99 @@
+# oids/tests/test_trip_deadlines.py
+
+import datetime
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..business_calendar import add_working_days, invalidate_business_calendar
+from ..models import (Unit, OID, WorkRequest, WorkRequestItem, Trip, Person,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+from ..services import recalculate_trip_deadlines
+
+
+class TripDeadlineRecalculationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.person = Person.objects.create(full_name="Іваненко Іван", position="Інженер")
+        cls.work_request = WorkRequest.objects.create(
+            unit=cls.unit, incoming_number="1/2024", incoming_date=datetime.date(2024, 1, 1))
+        cls.oids = OID.objects.bulk_create([
+            OID(unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            for i in range(120)
+        ])
+        work_types = [WorkTypeChoices.IK, WorkTypeChoices.ATTESTATION]
+        cls.items = WorkRequestItem.objects.bulk_create([
+            WorkRequestItem(request=cls.work_request, oid=oid, work_type=work_types[i % 2])
+            for i, oid in enumerate(cls.oids)
+        ])
+
+    def setUp(self):
+        invalidate_business_calendar()
+
+    def plan_trip(self, end_date, oids=None):
+        trip = Trip.objects.create(start_date=end_date - datetime.timedelta(days=3), end_date=end_date, purpose="Атестація")
+        trip.units.set([self.unit])
+        trip.persons.set([self.person])
+        trip.oids.set(oids if oids is not None else self.oids)
+        trip.work_requests.set([self.work_request])
+        return trip
+
+    def test_deadlines_set_once_per_transaction(self):
+        """Тест: post_save та обидва M2M-сигнали об'єднуються в один перерахунок з bulk_update."""
+        end_date = datetime.date(2024, 5, 3)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                trip = self.plan_trip(end_date)
+
+        update_queries = [q['sql'] for q in queries.captured_queries
+                          if q['sql'].startswith('UPDATE "oids_workrequestitem"')]
+        self.assertEqual(len(update_queries), 1)
+        self.assertLess(len(queries), 40)
+
+        ik_item = WorkRequestItem.objects.get(pk=self.items[0].pk)
+        attestation_item = WorkRequestItem.objects.get(pk=self.items[1].pk)
+        self.assertEqual(ik_item.doc_processing_deadline, add_working_days(end_date, 10))
+        self.assertEqual(attestation_item.doc_processing_deadline, add_working_days(end_date, 15))
+        self.assertEqual(ik_item.deadline_trigger_trip, trip)
+        self.assertEqual(WorkRequestItem.history.filter(history_type='~').count(), len(self.items))
+
+    def test_queries_do_not_grow_with_oids(self):
+        """Тест: кількість запитів перерахунку не залежить від кількості ОІД."""
+        small = self.plan_trip(datetime.date(2024, 5, 3), oids=self.oids[:4])
+        large = self.plan_trip(datetime.date(2024, 5, 3), oids=self.oids)
+        WorkRequestItem.objects.update(doc_processing_deadline=None, deadline_trigger_trip=None)
+        add_working_days(datetime.date(2024, 5, 3), 1)  # Календар будується один раз - не рахуємо
+        with CaptureQueriesContext(connection) as small_queries:
+            recalculate_trip_deadlines([small.pk])
+        WorkRequestItem.objects.update(doc_processing_deadline=None, deadline_trigger_trip=None)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.assertEqual(recalculate_trip_deadlines([large.pk]), len(self.items))
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_end_date_change_recalculates(self):
+        """Тест: зміна end_date (save без update_fields) перераховує дедлайни; без змін - без UPDATE."""
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = self.plan_trip(datetime.date(2024, 5, 3))
+        # Окрема транзакція, як у view (попередній flush вже виконано)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            trip.end_date = datetime.date(2024, 6, 7)
+            trip.save()
+        self.assertEqual(WorkRequestItem.objects.get(pk=self.items[0].pk).doc_processing_deadline,
+                         add_working_days(datetime.date(2024, 6, 7), 10))
+        self.assertEqual(recalculate_trip_deadlines([trip.pk]), 0)
+
+    def test_latest_trip_wins_and_reverse_m2m(self):
+        """Тест: елемент у кількох відрядженнях отримує дедлайн найпізнішого; зміна з боку ОІД теж враховується."""
+        with self.captureOnCommitCallbacks(execute=True):
+            early = self.plan_trip(datetime.date(2024, 5, 3))
+            late = self.plan_trip(datetime.date(2024, 6, 7), oids=self.oids[1:])
+        self.assertEqual(WorkRequestItem.objects.get(pk=self.items[0].pk).deadline_trigger_trip, early)
+        self.assertEqual(WorkRequestItem.objects.get(pk=self.items[1].pk).deadline_trigger_trip, late)
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.oids[0].trips.add(late)
+        self.assertEqual(WorkRequestItem.objects.get(pk=self.items[0].pk).deadline_trigger_trip, late)
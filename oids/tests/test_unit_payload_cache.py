@@ -0,0 +1,120 @@
+# oids/tests/test_unit_payload_cache.py
+
+import datetime
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import (Unit, OID, Document, DocumentType, Person,
+    OIDStatusChoices, OIDTypeChoices, SecLevelChoices, WorkTypeChoices)
+from ..unit_payload_cache import invalidate_unit_payloads
+
+
+class UnitPayloadCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Створення з виконанням on_commit - як закомічені дані
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.unit = Unit.objects.create(code="A0001", name="Частина 1", city="Київ")
+            self.other_unit = Unit.objects.create(code="A0002", name="Частина 2", city="Львів")
+            self.oids = [
+                OID.objects.create(unit=self.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                                   sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+                for i in range(3)
+            ]
+
+    def get(self, url_name, params, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse(url_name), params, headers=headers)
+
+    def test_not_modified_without_queries(self):
+        """Тест: повторний запит з If-None-Match - 304 без запитів до БД; без нього - JSON з кешу."""
+        for url_name, params in [
+            ('oids:ajax_load_oids_for_unit', {'unit_id': self.unit.pk}),
+            ('oids:ajax_load_oids_categorized', {'unit_id': self.unit.pk}),
+            ('oids:ajax_load_oids_for_multiple_units', {'unit_ids[]': [self.unit.pk, self.other_unit.pk]}),
+        ]:
+            with self.subTest(url_name=url_name):
+                response = self.get(url_name, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'])
+                self.assertTrue(response['Last-Modified'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(0):
+                    not_modified = self.get(url_name, params, etag=response['ETag'])
+                    cached = self.get(url_name, params)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(cached.content, response.content)
+
+        data = self.get('oids:ajax_load_oids_for_unit', {'unit_id': self.unit.pk}).json()
+        self.assertEqual([item['cipher'] for item in data], ["ОІД-0", "ОІД-1", "ОІД-2"])
+
+    def test_oid_change_bumps_unit_version(self):
+        """Тест: зміна ОІД дає нову відповідь; перенесення ОІД змінює версії обох ВЧ."""
+        params = {'unit_id': self.unit.pk}
+        etag = self.get('oids:ajax_load_oids_for_unit', params)['ETag']
+        other_etag = self.get('oids:ajax_load_oids_for_unit', {'unit_id': self.other_unit.pk})['ETag']
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.oids[0].status = OIDStatusChoices.CANCELED
+            self.oids[0].save()
+        response = self.get('oids:ajax_load_oids_for_unit', params, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['status'], OIDStatusChoices.CANCELED)
+        self.assertEqual(
+            self.get('oids:ajax_load_oids_categorized', params).json()['cancelled'][0]['id'], self.oids[0].pk)
+
+        etag = response['ETag']
+        oid = OID.objects.get(pk=self.oids[1].pk)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic(), \
+                CaptureQueriesContext(connection) as queries:
+            oid.unit = self.other_unit
+            oid.save()
+        # Попередня ВЧ - з FieldTrackerMixin, без окремого SELECT перед збереженням
+        self.assertFalse([q['sql'] for q in queries.captured_queries
+                          if q['sql'].startswith('SELECT "oids_oid"."unit_id"')])
+        self.assertEqual(self.get('oids:ajax_load_oids_for_unit', params, etag=etag).status_code, 200)
+        response = self.get('oids:ajax_load_oids_for_unit', {'unit_id': self.other_unit.pk}, etag=other_etag)
+        self.assertEqual([item['id'] for item in response.json()], [self.oids[1].pk])
+
+    def test_document_change_bumps_unit_version(self):
+        """Тест: новий документ ОІД (знімок OIDValiditySnapshot) змінює версію його ВЧ."""
+        params = {'unit_id': self.unit.pk}
+        etag = self.get('oids:ajax_load_oids_categorized', params)['ETag']
+        other_etag = self.get('oids:ajax_load_oids_categorized', {'unit_id': self.other_unit.pk})['ETag']
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Document.objects.create(
+                oid=self.oids[0], document_number="1/Д",
+                document_type=DocumentType.objects.create(name="Довідка", oid_type=OIDTypeChoices.SPEAK, work_type=WorkTypeChoices.IK),
+                author=Person.objects.create(full_name="Іваненко Іван", position="Інженер"),
+                doc_process_date=datetime.date(2024, 2, 1), work_date=datetime.date(2024, 1, 20))
+        self.assertEqual(self.get('oids:ajax_load_oids_categorized', params, etag=etag).status_code, 200)
+        self.assertEqual(
+            self.get('oids:ajax_load_oids_categorized', {'unit_id': self.other_unit.pk}, etag=other_etag).status_code, 304)
+
+    def test_uncommitted_and_bulk_changes(self):
+        """Тест: bulk-зміни - явне скидання; незакомічені зміни - без кешу та ETag, після відкату не видно."""
+        params = {'unit_id': self.unit.pk}
+        etag = self.get('oids:ajax_load_oids_for_unit', params)['ETag']
+        OID.objects.filter(pk=self.oids[0].pk).update(full_name="Без сигналів")
+        self.assertEqual(self.get('oids:ajax_load_oids_for_unit', params, etag=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            invalidate_unit_payloads([self.unit.pk])
+        response = self.get('oids:ajax_load_oids_for_unit', params, etag=etag)
+        self.assertEqual(response.json()[0]['full_name'], "Без сигналів")
+        self.assertNotEqual(response['ETag'], etag)
+
+        try:
+            with transaction.atomic():
+                OID.objects.create(unit=self.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-9",
+                                   sec_level=SecLevelChoices.S, room="9", status=OIDStatusChoices.ACTIVE)
+                uncommitted = self.get('oids:ajax_load_oids_for_unit', params)
+                self.assertNotIn('ETag', uncommitted)
+                self.assertEqual(len(uncommitted.json()), 4)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(len(self.get('oids:ajax_load_oids_for_unit', params).json()), 3)
@@ -0,0 +1,145 @@
+# oids/tests/test_utils.py
+
+import datetime
+import io
+import shutil
+import tempfile
+
+import openpyxl
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Unit, OID, DocumentType, Document, OIDValiditySnapshot, OIDStatusChoices, OIDTypeChoices, SecLevelChoices
+from ..utils import build_export_rows, export_to_excel
+from ..export_jobs import export_fingerprint, read_job_state, STATUS_DONE
+
+EXPORT_JOBS_TEST_DIR = tempfile.mkdtemp(prefix='export_jobs_test_')
+
+
+@override_settings(EXPORT_JOBS_SYNC=True, EXPORT_JOBS_DIR=EXPORT_JOBS_TEST_DIR)
+class ExportToExcelTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(EXPORT_JOBS_TEST_DIR, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.act_type = DocumentType.objects.create(
+            oid_type='МОВНА', work_type='Атестація', name="Акт атестації", has_expiration=True, duration_months=60)
+        for i in range(3):
+            oid = OID.objects.create(
+                unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher=f"ОІД-{i}",
+                sec_level=SecLevelChoices.S, room=str(i), status=OIDStatusChoices.ACTIVE)
+            Document.objects.create(
+                oid=oid, document_type=cls.act_type, document_number=f"{i}/24",
+                doc_process_date=datetime.date(2024, 1, 10), work_date=datetime.date(2024, 1, 10))
+
+    def _read_rows(self, response):
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        return [[cell.value for cell in row] for row in workbook['Data'].iter_rows()]
+
+    def test_field_columns_use_single_values_query(self):
+        """Тест: стовпці-поля (через FK та get_..._display) читаються одним запитом без створення об'єктів."""
+        columns = {'unit__code': 'В/Ч', 'cipher': 'Шифр ОІД', 'get_status_display': 'Статус'}
+        with self.assertNumQueries(1):
+            rows = list(build_export_rows(OID.objects.order_by('cipher'), columns))
+        self.assertEqual(rows[0], ["A0000", "ОІД-0", OIDStatusChoices.ACTIVE.label])
+
+    def test_method_columns_fall_back_to_objects(self):
+        """Тест: методи моделі в стовпцях - режим об'єктів з select_related для зв'язків."""
+        columns = {'oid__unit__code': 'ВЧ', 'oid__display_name': 'ОІД'}
+        with self.assertNumQueries(1):
+            rows = list(build_export_rows(Document.objects.order_by('oid__cipher'), columns))
+        self.assertEqual(rows[0], ["A0000", "ОІД-0"])
+        self.assertEqual(len(rows), 3)
+
+    def test_workbook_content(self):
+        """Тест: файл містить заголовки, нумерацію рядків та дати як дати."""
+        columns = {'oid__cipher': 'ОІД', 'document_number': 'Підг. №', 'doc_process_date': 'Підг. від'}
+        response = export_to_excel(Document.objects.order_by('oid__cipher'), columns, include_row_numbers=True)
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="export.xlsx"', response['Content-Disposition'])
+        rows = self._read_rows(response)
+        self.assertEqual(rows[0], ['№', 'ОІД', 'Підг. №', 'Підг. від'])
+        self.assertEqual(rows[1], ['1.', 'ОІД-0', '0/24', datetime.datetime(2024, 1, 10)])
+        self.assertEqual(len(rows), 4)
+
+    def test_oid_list_export_view(self):
+        """Тест: експорт зі списку ОІД формується завданням і віддається файлом."""
+        self.client.login(username='testuser', password='password123')
+        response = self.client.get(reverse('oids:list_oids'), {'export': 'excel'})
+        self.assertEqual(response.status_code, 200)
+        rows = self._read_rows(response)
+        self.assertEqual(len(rows), 4)
+
+
+@override_settings(EXPORT_JOBS_SYNC=True, EXPORT_JOBS_DIR=EXPORT_JOBS_TEST_DIR)
+class ExportJobsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.unit = Unit.objects.create(code="A0000", name="Тестова частина A0000", city="Київ")
+        cls.oid = OID.objects.create(
+            unit=cls.unit, oid_type=OIDTypeChoices.SPEAK, cipher="ОІД-1",
+            sec_level=SecLevelChoices.S, room="1", status=OIDStatusChoices.ACTIVE)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='password123')
+
+    def test_fingerprint_normalizes_params(self):
+        """Тест: порядок параметрів, сторінка та порожні значення не змінюють ключ кешу."""
+        first = export_fingerprint('oid_list', QueryDict('sort_by=cipher&unit=2&unit=1&export=excel'), [OID])
+        second = export_fingerprint('oid_list', QueryDict('unit=1&page=3&unit=2&status=&sort_by=cipher'), [OID])
+        other = export_fingerprint('oid_list', QueryDict('sort_by=-cipher&unit=1&unit=2'), [OID])
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_fingerprint_changes_with_data(self):
+        """Тест: зміна даних (новий запис історії) дає новий ключ кешу."""
+        params = QueryDict('export=excel')
+        before = export_fingerprint('oid_list', params, [OID, Unit])
+        self.oid.room = "2"
+        self.oid.save()
+        self.assertNotEqual(export_fingerprint('oid_list', params, [OID, Unit]), before)
+
+    def test_identical_export_served_from_cache(self):
+        """Тест: повторний ідентичний експорт не формується заново."""
+        url = reverse('oids:list_oids')
+        self.client.get(url, {'export': 'excel', 'sort_by': 'cipher'})
+        key = export_fingerprint('oid_list', QueryDict('sort_by=cipher'), [OID, Unit, OIDValiditySnapshot])
+        state = read_job_state(key)
+        self.assertEqual(state['status'], STATUS_DONE)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'sort_by': 'cipher', 'export': 'excel', 'page': '2'})
+        self.assertEqual(response.status_code, 200)
+        # Лише запити версій даних - самі ОІД не вибираються
+        self.assertFalse([query for query in queries if 'FROM "oids_oid"' in query['sql']])
+        self.assertEqual(read_job_state(key)['finished_at'], state['finished_at'])
+
+    def test_json_status_and_download(self):
+        """Тест: AJAX-запит отримує статус і URL завантаження."""
+        response = self.client.get(
+            reverse('oids:list_documents'), {'export': 'excel'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job['status'], STATUS_DONE)
+
+        status_response = self.client.get(job['status_url'])
+        self.assertEqual(status_response.json()['download_url'], job['download_url'])
+        download = self.client.get(job['download_url'])
+        self.assertIn('documents_export.xlsx', download['Content-Disposition'])
+
+    def test_invalid_key_not_found(self):
+        """Тест: ключ, що не є відбитком, не перетворюється на шлях до файлу."""
+        response = self.client.get(reverse('oids:export_job_status', args=['..%2F..%2Fsettings']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,154 @@
+# oids/unit_payload_cache.py
+"""
+Кеш JSON-відповідей зі списками ОІД військової частини для AJAX-випадаючих списків
+(ajax_load_oids_for_unit, ajax_load_oids_for_unit_categorized,
+ajax_load_oids_for_multiple_units).
+
+Ці відповіді перебудовувались при кожній зміні ВЧ у кожній формі (plan_trip_view,
+add_work_request_view, форми документів). Тепер:
+
+- для кожної ВЧ у кеші Django зберігається версія даних (випадковий токен + час зміни);
+  вона змінюється, коли змінюються ОІД частини (сигнали OID), сама частина (код, місто)
+  або знімки OIDValiditySnapshot її ОІД (refresh_oid_validity - після змін документів);
+- готовий JSON зберігається під ключем (endpoint, ВЧ) з версією частини - після зміни
+  старі записи просто перестають читатися;
+- відповідь має ETag (з версій) та Last-Modified (час останньої зміни); запит з
+  If-None-Match, що збігається, отримує 304 без жодного запиту до БД (If-Modified-Since
+  не перевіряється - точність у секунду пропустила б зміни в межах тієї ж секунди);
+- поки в поточній транзакції є незакомічені зміни ВЧ, відповідь будується з БД
+  без кешу та без ETag (як у oids/reference_cache.py); після коміту версії змінюються
+  ще раз - разом з перерахунком status_sync (один on_commit на транзакцію).
+
+Зміни в обхід сигналів (bulk_create, QuerySet.update) потребують явного
+invalidate_unit_payloads(unit_ids) (без аргументу - для всіх ВЧ).
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .status_sync import mark_units
+
+ALL_UNITS = '*'  # "версія" всіх ВЧ - змінюється при invalidate_unit_payloads() без аргументу
+
+_pending = threading.local()  # ВЧ, змінені в незакоміченій транзакції
+
+
+def _cache():
+    return caches[getattr(settings, 'UNIT_PAYLOAD_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'UNIT_PAYLOAD_CACHE_TIMEOUT', 3600)
+
+
+def _version_key(unit_id):
+    return f'oids:unit-data-version:{unit_id}'
+
+
+def _payload_key(endpoint, unit_ids):
+    return f'oids:unit-payload:{endpoint}:' + hashlib.sha1(','.join(map(str, unit_ids)).encode()).hexdigest()
+
+
+def _new_version():
+    return uuid.uuid4().hex, time.time()
+
+
+def _pending_units():
+    units = getattr(_pending, 'units', None)
+    if units is None:
+        units = _pending.units = set()
+    elif units and not connection.in_atomic_block:
+        # Транзакція завершилась (коміт уже змінив версії, або відкат) - позначки не потрібні
+        units.clear()
+    return units
+
+
+def get_unit_versions(unit_ids):
+    """{ВЧ або ALL_UNITS: (токен, час зміни)} - лише кеш, без запитів до БД."""
+    cache = _cache()
+    keys = {_version_key(unit_id): unit_id for unit_id in [ALL_UNITS, *unit_ids]}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, unit_id in keys.items():
+        version = found.get(key)
+        if version is None:
+            # Версії нема (перший запит або витіснена з кешу) - нова, тож старі записи не збіжуться
+            version = _new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[unit_id] = version
+    return versions
+
+
+def _bump(unit_ids):
+    _cache().set_many({_version_key(unit_id): _new_version() for unit_id in unit_ids}, None)
+
+
+def invalidate_unit_payloads(unit_ids=None):
+    """
+    Змінює версію даних переданих ВЧ (без аргументу - всіх). Усередині транзакції
+    відповіді для цих ВЧ до коміту будуються з БД; після коміту версія змінюється ще раз.
+    """
+    unit_ids = {ALL_UNITS} if unit_ids is None else {unit_id for unit_id in unit_ids if unit_id is not None}
+    if not unit_ids:
+        return
+    _bump(unit_ids)
+    if connection.in_atomic_block:
+        _pending_units().update(unit_ids)
+        mark_units(unit_ids)
+
+
+def commit_unit_payloads(unit_ids):
+    """Повторна зміна версій після коміту (викликається з status_sync.flush_dirty)."""
+    _bump(unit_ids)
+    getattr(_pending, 'units', set()).difference_update(unit_ids)
+
+
+def invalidate_unit_payloads_for_oids(oid_ids):
+    """Змінює версії ВЧ, яким належать передані ОІД (один запит)."""
+    from .models import OID
+
+    oid_ids = set(oid_ids)
+    if oid_ids:
+        invalidate_unit_payloads(
+            OID.objects.filter(pk__in=oid_ids).order_by().values_list('unit_id', flat=True).distinct()
+        )
+
+
+def unit_payload_response(request, endpoint, unit_ids, build):
+    """
+    JSON-відповідь endpoint для ВЧ unit_ids: 304 за збігом If-None-Match,
+    готовий JSON з кешу або build(unit_ids) (дані для JsonResponse), збережений у кеш.
+    """
+    unit_ids = sorted(set(unit_ids))
+    pending = _pending_units()
+    if pending and (ALL_UNITS in pending or pending.intersection(unit_ids)):
+        return JsonResponse(build(unit_ids), safe=False)
+
+    versions = get_unit_versions(unit_ids)
+    tokens = ':'.join(f'{unit_id}={versions[unit_id][0]}' for unit_id in [ALL_UNITS, *unit_ids])
+    etag = '"%s"' % hashlib.sha1(f'{endpoint}:{tokens}'.encode()).hexdigest()
+    last_modified = int(max(modified for _, modified in versions.values()))
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache = _cache()
+        key = _payload_key(endpoint, unit_ids)
+        content = cache.get(key, version=etag)
+        if content is None:
+            content = JsonResponse(build(unit_ids), safe=False).content
+            cache.set(key, content, _timeout(), version=etag)
+        response = HttpResponse(content, content_type='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    # Браузер зберігає відповідь, але перевіряє її актуальність при кожному запиті
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -96,6 +96,9 @@ urlpatterns = [
     path('oid-status-changes/', views.oid_status_change_list_view, name='list_oid_status_changes'),
    	path('attestation-registrations/', views.attestation_registration_list_view, name='list_attestation_registrations'), # URL для списку Відправок на реєстрацію
     path('attestation-responses/', views.attestation_response_list_view, name='list_attestation_responses'),  # URL для списку Отриманих відповідей на реєстрацію
+    path('exports/<str:key>/status/', views.export_job_status_view, name='export_job_status'), # Фонові експорти в Excel
+    path('exports/<str:key>/download/', views.export_job_download_view, name='export_job_download'),
+    path('search/', views.global_search_view, name='global_search'), # Глобальний пошук (JSON)
 	path('azr/list/', views.azr_documents_list_view, name='list_azr_documents'),
 	path('declaration-registrations/', views.list_declaration_registrations_view, name='list_declaration_registrations'),
 	
@@ -1,27 +1,165 @@
 # oids/utils.py
-import openpyxl
 import datetime
-from django.http import HttpResponse
+import tempfile
+from copy import copy
+from itertools import chain, islice
+from operator import itemgetter
+
+import openpyxl
+from django.core.exceptions import FieldDoesNotExist
+from django.http import FileResponse
+from django.utils import timezone
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment
+from openpyxl.worksheet.worksheet import Worksheet
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-def export_to_excel(queryset, columns, filename='export.xlsx', include_row_numbers=False):
+# Скільки рядків читати з БД за раз (queryset.iterator(chunk_size=...))
+EXPORT_CHUNK_SIZE = 2000
+# Ширина стовпців оцінюється за першими N рядками, а не за всім файлом
+EXPORT_WIDTH_SAMPLE_ROWS = 200
+# Текст переноситься (wrap_text), тому дуже довгі значення не розтягують стовпець
+EXPORT_MAX_COLUMN_WIDTH = 80
+
+
+def _resolve_value_path(model, field_name):
     """
-	:param queryset: QuerySet з даними для експорту.
-    :param columns: Словник, де ключ - це рядок доступу до поля (напр. 'unit__code'), 
-                    а значення - це назва стовпця в Excel.
-    :param filename: Ім'я файлу для завантаження.
-    :param include_row_numbers: Якщо True, додає стовпець '№' з нумерацією рядків.
+    Пробує звести рядок доступу ('unit__code', 'get_status_display') до шляху
+    для queryset.values_list(). Повертає (шлях, choices) або None, якщо стовпець
+    можна отримати лише з об'єкта (метод, властивість, зв'язок "багато", власне поле).
+    choices - словник значення -> назва для get_<поле>_display, інакше None.
+    """
+    parts = field_name.split('__')
+    *relations, last = parts
+    display = last.startswith('get_') and last.endswith('_display')
+    if display:
+        last = last[len('get_'):-len('_display')]
+
+    current_model = model
+    for part in relations:
+        try:
+            field = current_model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        # Лише зв'язки "до одного" - інакше values() розмножить рядки
+        if not (field.many_to_one or field.one_to_one):
+            return None
+        current_model = field.related_model
+
+    try:
+        field = current_model._meta.get_field(last)
+    except FieldDoesNotExist:
+        return None
+    # Зовнішній ключ у values() дав би id, а не str(об'єкта); власні поля (MultiSelectField тощо)
+    # можуть по-своєму перетворювати значення - їх беремо з об'єкта
+    if field.is_relation or not field.concrete or not type(field).__module__.startswith('django.'):
+        return None
+    if display and not field.choices:
+        return None
 
+    choices = dict(field.flatchoices) if display else None
+    return '__'.join(relations + [field.name]), choices
+
+
+def _select_related_path(model, field_name):
+    """Найдовший ланцюжок зв'язків "до одного" в рядку доступу - для select_related() в режимі об'єктів."""
+    relations = []
+    current_model = model
+    for part in field_name.split('__')[:-1]:
+        try:
+            field = current_model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not (field.many_to_one or field.one_to_one):
+            break
+        relations.append(part)
+        current_model = field.related_model
+    return '__'.join(relations)
+
+
+def _make_object_accessor(field_name):
+    """Заздалегідь розібраний ланцюжок getattr (з викликом методів) для одного стовпця."""
+    parts = field_name.split('__')
+
+    def accessor(obj):
+        value = obj
+        try:
+            for part in parts:
+                attr = getattr(value, part)
+                value = attr() if callable(attr) else attr
+        except (AttributeError, TypeError):
+            value = None
+        return value
+    return accessor
+
+
+def _make_value_accessor(index, choices):
+    getter = itemgetter(index)
+    if choices is None:
+        return getter
+    return lambda row: choices.get(getter(row), getter(row))
+
+
+def build_export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
     """
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    Генератор рядків для експорту: кожен рядок - список значень у порядку columns.
+
+    Якщо всі стовпці - звичайні поля моделі (у т.ч. через ForeignKey/OneToOne та
+    get_<поле>_display), дані читаються через values_list() без створення об'єктів.
+    Інакше - об'єкти з select_related() для всіх зв'язків зі стовпців.
+    В обох випадках - queryset.iterator(chunk_size), тож пам'ять не росте з кількістю рядків.
+    """
+    model = queryset.model
+    resolved = [_resolve_value_path(model, field_name) for field_name in columns]
+
+    if all(resolved):
+        # pk першим - щоб .distinct() у queryset і далі працював по рядках моделі, а не по значеннях
+        paths = ['pk'] + [path for path, _ in resolved]
+        accessors = [_make_value_accessor(index, choices) for index, (_, choices) in enumerate(resolved, 1)]
+        # prefetch_related() для кортежів values_list() не має сенсу (і ламає iterator)
+        rows = queryset.prefetch_related(None).values_list(*paths).iterator(chunk_size=chunk_size)
+    else:
+        related = {_select_related_path(model, field_name) for field_name in columns} - {''}
+        # Для .only()/.defer() select_related() може конфліктувати з відкладеними полями - не чіпаємо
+        if related and not queryset.query.deferred_loading[0]:
+            queryset = queryset.select_related(*sorted(related))
+        accessors = [_make_object_accessor(field_name) for field_name in columns]
+        rows = queryset.iterator(chunk_size=chunk_size)
 
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = 'Data'
+    for row in rows:
+        yield [accessor(row) for accessor in accessors]
+
+
+def _to_cell_value(value):
+    """Значення для комірки: дати лишаються датами (Excel не підтримує часові пояси), решта - текст."""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value).replace(tzinfo=None)
+        return value
+    if isinstance(value, datetime.date):
+        return value
+    return str(value) if value is not None else ""
+
+
+def _estimate_column_widths(header, sample_rows):
+    widths = []
+    for col_index, title in enumerate(header):
+        max_length = max([len(str(title))] + [len(str(row[col_index])) for row in sample_rows])
+        # +5 додає невеликий відступ для кращої читабельності
+        widths.append(min(max_length + 5, EXPORT_MAX_COLUMN_WIDTH))
+    return widths
+
+
+def write_excel_export(output, queryset, columns, include_row_numbers=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Записує експорт у файлоподібний об'єкт output у режимі write-only:
+    рядки одразу скидаються у тимчасовий файл openpyxl, у пам'яті лише поточна порція.
+    Повертає кількість записаних рядків даних.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
 
     # --- 1. СТВОРЮЄМО СТИЛІ ---
     header_font = Font(name='Times New Roman', size=14, bold=True)
@@ -30,81 +168,80 @@ def export_to_excel(queryset, columns, filename='export.xlsx', include_row_numbe
     wrap_alignment_header = Alignment(wrap_text=True, vertical='center', horizontal='center')
     wrap_alignment_data = Alignment(wrap_text=True, vertical='center', horizontal='left')
 
-    # --- Записуємо заголовки ---
-    start_col = 1
+    header = (['№'] if include_row_numbers else []) + list(columns.values())
+
+    rows = build_export_rows(queryset, columns, chunk_size=chunk_size)
     if include_row_numbers:
-        cell = sheet.cell(row=1, column=1)
-        cell.value = '№'
-        cell.font = header_font
-        cell.alignment = wrap_alignment_header
-        start_col = 2
+        rows = ([f"{row_num}."] + row for row_num, row in enumerate(rows, 1))
+    rows = (list(map(_to_cell_value, row)) for row in rows)
 
-    for col_num, column_title in enumerate(columns.values(), start_col):
-        cell = sheet.cell(row=1, column=col_num)
-        cell.value = column_title
+    # --- 2. ШИРИНА СТОВПЦІВ за вибіркою перших рядків (у write-only її треба задати до запису даних) ---
+    sample_rows = list(islice(rows, EXPORT_WIDTH_SAMPLE_ROWS))
+    for col_num, width in enumerate(_estimate_column_widths(header, sample_rows), 1):
+        sheet.column_dimensions[get_column_letter(col_num)].width = width
+
+    # --- Записуємо заголовки ---
+    header_cells = []
+    for column_title in header:
+        cell = WriteOnlyCell(sheet, value=column_title)
         cell.font = header_font
         cell.alignment = wrap_alignment_header
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    # Стилі реєструються у книзі один раз на шаблонних комірках; далі комірки даних
+    # лише копіюють готовий індекс стилю (присвоєння font/alignment на кожну комірку - найдорожча частина)
+    text_style_cell = WriteOnlyCell(sheet)
+    text_style_cell.font = data_font
+    text_style_cell.alignment = wrap_alignment_data
+    date_style_cell = WriteOnlyCell(sheet)
+    date_style_cell.font = data_font
+    date_style_cell.alignment = wrap_alignment_data
+    # --- ЛОГІКА ФОРМАТУВАННЯ ДАТ ---
+    date_style_cell.number_format = 'dd.mm.yyyy'
+    text_style, date_style = text_style_cell._style, date_style_cell._style
 
     # --- Записуємо дані ---
-    for row_num, obj in enumerate(queryset, 2):
-        row_in_list = row_num - 1
-        
-        if include_row_numbers:
-            cell = sheet.cell(row=row_num, column=1)
-            cell.value = f"{row_in_list}."
-            cell.font = data_font
-            cell.alignment = wrap_alignment_data
-
-        for col_num, field_name in enumerate(columns.keys(), start_col):
-            cell = sheet.cell(row=row_num, column=col_num)
-            
-            value = obj
-            try:
-                for part in field_name.split('__'):
-                    attr = getattr(value, part)
-                    if callable(attr):
-                        value = attr()
-                    else:
-                        value = attr
-            except (AttributeError, TypeError):
-                value = None
-            
-            # --- ЛОГІКА ФОРМАТУВАННЯ ДАТ ---
-            if isinstance(value, (datetime.date, datetime.datetime)):
-                cell.value = value
-                cell.number_format = 'dd.mm.yyyy'
-            else:
-                cell.value = str(value) if value is not None else ""
-
-            # Застосовуємо стилі
-            cell.font = data_font
-            cell.alignment = wrap_alignment_data
-
-    # --- 2. НАЛАШТУВАННЯ АВТОМАТИЧНОЇ ШИРИНИ СТОВПЦІВ ---
-    for column_cells in sheet.columns:
-        # +2 додає невеликий відступ для кращої читабельності
-        max_length = 0
-        column_letter = get_column_letter(column_cells[0].column)
-        for cell in column_cells:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 5)
-        sheet.column_dimensions[column_letter].width = adjusted_width
+    row_count = 0
+    for row in chain(sample_rows, rows):
+        data_cells = []
+        for value in row:
+            cell = WriteOnlyCell(sheet, value=value)
+            cell._style = copy(date_style if isinstance(value, datetime.date) else text_style)
+            data_cells.append(cell)
+        sheet.append(data_cells)
+        row_count += 1
 
     # --- Налаштування друку (як і раніше) ---
-    max_row = sheet.max_row
-    max_col_letter = get_column_letter(sheet.max_column)
-    if max_row > 0 and sheet.max_column > 0:
-        sheet.print_area = f'A1:{max_col_letter}{max_row}'
-    
-    sheet.page_setup.orientation = sheet.ORIENTATION_LANDSCAPE
-    sheet.page_setup.paperSize = sheet.PAPERSIZE_A4
-    sheet.page_setup.fitToPage = True
+    sheet.print_area = f'A1:{get_column_letter(len(header))}{row_count + 1}'
+    sheet.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE
+    sheet.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+    sheet.sheet_properties.pageSetUpPr.fitToPage = True
     sheet.page_setup.fitToWidth = 1
     sheet.page_setup.fitToHeight = 0
 
-    workbook.save(response)
-    return response
\ No newline at end of file
+    workbook.save(output)
+    return row_count
+
+
+def export_to_excel(queryset, columns, filename='export.xlsx', include_row_numbers=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+	:param queryset: QuerySet з даними для експорту.
+    :param columns: Словник, де ключ - це рядок доступу до поля (напр. 'unit__code'),
+                    а значення - це назва стовпця в Excel.
+    :param filename: Ім'я файлу для завантаження.
+    :param include_row_numbers: Якщо True, додає стовпець '№' з нумерацією рядків.
+    :param chunk_size: Скільки рядків читати з БД за раз.
+
+    Файл збирається у тимчасовому файлі на диску і віддається потоком (FileResponse),
+    тож пам'ять процесу не залежить від кількості рядків.
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        write_excel_export(output, queryset, columns, include_row_numbers=include_row_numbers, chunk_size=chunk_size)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    # FileResponse закриє (і тим видалить) тимчасовий файл після відправки
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -8,23 +8,35 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
-from django.db.models import Q, Max, Prefetch, Count, OuterRef, Subquery
+from django.db.models import Q, F, Max, Prefetch, Count
 from django.db import  transaction
 from django.utils import timezone
 import datetime
 from django.utils.safestring import mark_safe
-from .utils import export_to_excel
+from functools import partial
+from .utils import export_to_excel, write_excel_export
+from .export_jobs import export_in_background, read_job_state, job_file_response, job_status_payload, STATUS_DONE
+from .services import get_last_expiration_dates_for_oids, ingest_documents
+from .document_roles import DocumentRole, get_role_type, get_role_type_ids
+from . import search_index
+from .reference_cache import get_reference
+from .unit_payload_cache import unit_payload_response
+from .sqlite_profile import retry_on_busy
+from .oid_status import Transition, apply as apply_oid_transitions, deferred_transitions
+from .history import buffered_history
+from .pagination import CURSOR_PARAM, COUNT_CACHED, COUNT_ESTIMATE, KeysetPaginator, UnsupportedOrdering
 
 
 
 from .models import (OIDTypeChoices, OIDStatusChoices, SecLevelChoices, WorkRequestStatusChoices, WorkTypeChoices, 
-    DocumentReviewResultChoices, AttestationRegistrationStatusChoices, PeminSubTypeChoices, DocumentProcessingStatusChoices, add_working_days
+    DocumentReviewResultChoices, AttestationRegistrationStatusChoices, PeminSubTypeChoices, DocumentProcessingStatusChoices, add_working_days,
+    WORK_REQUEST_ITEM_STATUS_KEYS,
 )
 from .models import (Unit, UnitGroup, OID, DskEot, OIDStatusChange, TerritorialManagement, 
 	Document, DocumentType, WorkRequest, WorkRequestItem, Trip, TripResultForUnit, 
     Person, TechnicalTask, AttestationRegistration, AttestationResponse, WorkCompletionRegistration,
     ProcessTemplate, OIDProcess, OIDProcessStepInstance,
-    Declaration, DeclarationRegistration,
+    Declaration, DeclarationRegistration, OIDValiditySnapshot,
 )
 
 
@@ -51,7 +63,17 @@ from .forms_filters import (
 
 # def add_working_days(start_date, days_to_add): ... (якщо не в utils.py)
 
-def get_paginated_page(queryset, request, items_per_page=100):
+def get_paginated_page(queryset, request, items_per_page=100, keyset=False, count=None):
+    """
+    Сторінка списку. keyset=True - пагінація за ключем сортування (курсор у GET-параметрі
+    'cursor', без COUNT(*) та OFFSET; count - None/'cached'/'estimate', див. oids/pagination.py).
+    Якщо сортування queryset не підходить для keyset - звичайний Paginator.
+    """
+    if keyset:
+        try:
+            return KeysetPaginator(queryset, items_per_page, count=count).get_page(request.GET.get(CURSOR_PARAM))
+        except UnsupportedOrdering:
+            pass
     paginator = Paginator(queryset, items_per_page)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -77,89 +99,96 @@ def ajax_get_oid_current_status(request):
 
  # changede by gemeni. перейшли від передачі словників до передачі повних екземплярів моделі OID у функцію get_last_document_expiration_date. Це важливо для коректної роботи сервера, незалежно від фронтенд-фільтрації.
 
-def ajax_load_oids_for_unit_categorized(request):
-    unit_id_str = request.GET.get('unit_id')
+def _build_oids_for_unit_categorized(unit_ids):
     data = {
         'creating': [],
         'active': [],
         'cancelled': []
     }
+    # Замість .values(), отримуємо повні об'єкти OID, щоб передавати їх у helper
+    # Дати закінчення дії беремо зі знімка OIDValiditySnapshot (один JOIN)
+    oids_for_unit_qs = OID.objects.filter(unit__id__in=unit_ids)\
+                                .select_related('unit', 'unit__territorial_management', 'validity')\
+                                .order_by('cipher')
+
+    active_statuses = [OIDStatusChoices.ACTIVE, OIDStatusChoices.RECEIVED_REQUEST_IK, OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,]
+
+    for oid_instance in oids_for_unit_qs: # Тепер це повний екземпляр OID
+        oid_item = {
+            'id': oid_instance.id,
+            'cipher': oid_instance.cipher,
+            'full_name': oid_instance.full_name or oid_instance.unit.city,
+            'oid_type_display': oid_instance.get_oid_type_display(), # Використовуємо метод моделі
+            'status_display': oid_instance.get_status_display(),   # Використовуємо метод моделі
+            'detail_url': reverse('oids:oid_detail_view_name', args=[oid_instance.id])
+        }
 
-    if unit_id_str:
-        try:
-            unit_id = int(unit_id_str)
-            # Замість .values(), отримуємо повні об'єкти OID, щоб передавати їх у helper
-            oids_for_unit_qs = OID.objects.filter(unit__id=unit_id)\
-                                        .select_related('unit', 'unit__territorial_management')\
-                                        .order_by('cipher')
-
-            for oid_instance in oids_for_unit_qs: # Тепер це повний екземпляр OID
-                oid_item = {
-                    'id': oid_instance.id,
-                    'cipher': oid_instance.cipher,
-                    'full_name': oid_instance.full_name or oid_instance.unit.city,
-                    'oid_type_display': oid_instance.get_oid_type_display(), # Використовуємо метод моделі
-                    'status_display': oid_instance.get_status_display(),   # Використовуємо метод моделі
-                    'detail_url': reverse('oids:oid_detail_view_name', args=[oid_instance.id])
-                }
+        if oid_instance.status in [OIDStatusChoices.NEW, OIDStatusChoices.RECEIVED_REQUEST, OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION, OIDStatusChoices.RECEIVED_TZ]:
+            data['creating'].append(oid_item)
+        # elif oid_instance.status == OIDStatusChoices.ACTIVE:
+        elif oid_instance.status in active_statuses:
+            validity = getattr(oid_instance, 'validity', None)
+            oid_item['ik_expiration_date'] = validity.ik_expiration_date if validity else None
+            oid_item['attestation_expiration_date'] = validity.attestation_expiration_date if validity else None
+            oid_item['prescription_expiration_date'] = validity.prescription_expiration_date if validity else None
+            data['active'].append(oid_item)
+        elif oid_instance.status in [OIDStatusChoices.CANCELED, OIDStatusChoices.TERMINATED, OIDStatusChoices.INACTIVE]:
+            data['cancelled'].append(oid_item)
+    return data
 
-                if oid_instance.status in [OIDStatusChoices.NEW, OIDStatusChoices.RECEIVED_REQUEST, OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION, OIDStatusChoices.RECEIVED_TZ]:
-                    data['creating'].append(oid_item)
-                # elif oid_instance.status == OIDStatusChoices.ACTIVE:
-                elif oid_instance.status in [OIDStatusChoices.ACTIVE, OIDStatusChoices.RECEIVED_REQUEST_IK, OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,]:
-                    # Тепер передаємо повний екземпляр oid_instance
-                    oid_item['ik_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Висновок')
-                    oid_item['attestation_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Акт атестації')
-                    oid_item['prescription_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Припис')
-                    data['active'].append(oid_item)
-                elif oid_instance.status in [OIDStatusChoices.CANCELED, OIDStatusChoices.TERMINATED, OIDStatusChoices.INACTIVE]:
-                    data['cancelled'].append(oid_item)
-        
-        except ValueError:
-            return JsonResponse({'error': 'Невірний ID військової частини'}, status=400)
-        except Exception as e:
-            # Виводимо помилку в консоль Django для дебагу
-            print(f"SERVER ERROR in ajax_load_oids_for_unit_categorized: {type(e).__name__} - {e}")
-            import traceback
-            traceback.print_exc() # Друкує повний трейсбек
-            return JsonResponse({'error': f'Серверна помилка: {type(e).__name__}'}, status=500)
-            
-    return JsonResponse(data)
+def ajax_load_oids_for_unit_categorized(request):
+    unit_id_str = request.GET.get('unit_id')
+    if not unit_id_str:
+        return JsonResponse({'creating': [], 'active': [], 'cancelled': []})
+
+    try:
+        unit_id = int(unit_id_str)
+        # Готовий JSON - з кешу за версією даних ВЧ; 304, якщо у браузера актуальна копія
+        return unit_payload_response(request, 'oids_categorized', [unit_id], _build_oids_for_unit_categorized)
+    except ValueError:
+        return JsonResponse({'error': 'Невірний ID військової частини'}, status=400)
+    except Exception as e:
+        # Виводимо помилку в консоль Django для дебагу
+        print(f"SERVER ERROR in ajax_load_oids_for_unit_categorized: {type(e).__name__} - {e}")
+        import traceback
+        traceback.print_exc() # Друкує повний трейсбек
+        return JsonResponse({'error': f'Серверна помилка: {type(e).__name__}'}, status=500)
 # Ваш ajax_load_oids_for_unit (якщо потрібен окремо для простого списку ОІДів, наприклад, для форм)
  
+def _build_oids_for_multiple_units(unit_ids):
+    oids_data = []
+    # Отримуємо ОІДи, що належать до будь-якої з обраних ВЧ
+    oids_queryset = OID.objects.filter(
+        unit__id__in=unit_ids,
+        # Можна додати фільтр за статусом ОІД, наприклад:
+        # status__in=[OIDStatusChoices.ACTIVE, OIDStatusChoices.NEW, OIDStatusChoices.RECEIVED_REQUEST, OIDStatusChoices.RECEIVED_TZ]
+    ).select_related('unit').order_by('unit__code', 'cipher').distinct()
+
+    for oid in oids_queryset:
+        oids_data.append({
+            'id': oid.id,
+            'cipher': oid.cipher, 
+            'full_name': oid.full_name or "",
+            'unit_code': oid.unit.code, # Додаємо код ВЧ для кращого відображення
+            'unit_city': oid.unit.city,
+			'oid_type_display': oid.get_oid_type_display(),
+            'pemin_sub_type': oid.get_pemin_sub_type_display()
+        })
+    return oids_data
+
 def ajax_load_oids_for_multiple_units(request):
     unit_ids_str = request.GET.getlist('unit_ids[]') # Отримуємо список ID як рядки
     # Або якщо JS надсилає як 'unit_ids' через кому: request.GET.get('unit_ids', '').split(',')
     
-    oids_data = []
     unit_ids = []
     for uid_str in unit_ids_str:
         if uid_str.isdigit():
             unit_ids.append(int(uid_str))
 
-    if unit_ids:
-        try:
-            # Отримуємо ОІДи, що належать до будь-якої з обраних ВЧ
-            oids_queryset = OID.objects.filter(
-                unit__id__in=unit_ids,
-                # Можна додати фільтр за статусом ОІД, наприклад:
-                # status__in=[OIDStatusChoices.ACTIVE, OIDStatusChoices.NEW, OIDStatusChoices.RECEIVED_REQUEST, OIDStatusChoices.RECEIVED_TZ]
-            ).select_related('unit').order_by('unit__code', 'cipher').distinct()
-            
-            for oid in oids_queryset:
-                oids_data.append({
-                    'id': oid.id,
-                    'cipher': oid.cipher, 
-                    'full_name': oid.full_name or "",
-                    'unit_code': oid.unit.code, # Додаємо код ВЧ для кращого відображення
-                    'unit_city': oid.unit.city,
-					'oid_type_display': oid.get_oid_type_display(),
-                    'pemin_sub_type': oid.get_pemin_sub_type_display()
-                })
-        except ValueError:
-            return JsonResponse({'error': 'Невірні ID військових частин'}, status=400)
-            
-    return JsonResponse(oids_data, safe=False)
+    if not unit_ids:
+        return JsonResponse([], safe=False)
+    # Кеш за версіями всіх обраних ВЧ: зміна будь-якої з них - нова відповідь
+    return unit_payload_response(request, 'oids_for_multiple_units', unit_ids, _build_oids_for_multiple_units)
  
 def ajax_load_work_request_items_for_oid(request):
     oid_id_str = request.GET.get('oid_id')
@@ -182,34 +211,31 @@ def ajax_load_work_request_items_for_oid(request):
             return JsonResponse({'error': 'Невірний ID ОІД'}, status=400)    
     return JsonResponse(items_data, safe=False)
 
+def _build_oids_for_unit(unit_ids):
+    oids_data = []
+    # Отримуємо всі ОІДи для вказаної ВЧ.
+    # Можна додати додаткові фільтри, якщо потрібно (наприклад, тільки активні ОІДи)
+    # OID.objects.filter(unit_id=unit_id, status=OIDStatusChoices.ACTIVE).order_by('cipher')
+    oids_queryset = OID.objects.filter(unit_id__in=unit_ids).order_by('cipher')
+
+    for oid in oids_queryset:
+        oids_data.append({
+            'id': oid.id,
+            'cipher': oid.cipher, 
+            'full_name': oid.full_name or "", # Повертаємо порожній рядок, якщо full_name None
+			'oid_type': oid.oid_type, 
+			'status': oid.status, 
+		    # Додайте інші поля, якщо вони потрібні для відображення в TomSelect у JS:
+            # наприклад, 'unit_code': oid.unit.code (якщо unit вже завантажено через select_related у запиті)
+        })
+    return oids_data
+
 def ajax_load_oids_for_unit(request):
     unit_id_str = request.GET.get('unit_id')
-    oids_data = []
-    if unit_id_str and unit_id_str.isdigit():
-        unit_id = int(unit_id_str)
-        try:
-            # Отримуємо всі ОІДи для вказаної ВЧ.
-            # Можна додати додаткові фільтри, якщо потрібно (наприклад, тільки активні ОІДи)
-            # OID.objects.filter(unit_id=unit_id, status=OIDStatusChoices.ACTIVE).order_by('cipher')
-            oids_queryset = OID.objects.filter(unit_id=unit_id).order_by('cipher')
-            
-            for oid in oids_queryset:
-                oids_data.append({
-                    'id': oid.id,
-                    'cipher': oid.cipher, 
-                    'full_name': oid.full_name or "", # Повертаємо порожній рядок, якщо full_name None
-					'oid_type': oid.oid_type, 
-					'status': oid.status, 
-				    # Додайте інші поля, якщо вони потрібні для відображення в TomSelect у JS:
-                    # наприклад, 'unit_code': oid.unit.code (якщо unit вже завантажено через select_related у запиті)
-                })
-        except ValueError: # На випадок, якщо unit_id не є валідним числом (хоча isdigit вже перевіряє)
-            return JsonResponse({'error': 'Невірний ID військової частини'}, status=400)
-        # except Unit.DoesNotExist: # Якщо ВЧ з таким ID не існує
-            # return JsonResponse({'error': 'Військова частина не знайдена'}, status=404) 
-            # Зазвичай, якщо queryset порожній, повернеться порожній список, що є нормальним.
-    
-    return JsonResponse(oids_data, safe=False) # safe=False, оскільки ми повертаємо список
+    if not (unit_id_str and unit_id_str.isdigit()):
+        return JsonResponse([], safe=False) # safe=False, оскільки ми повертаємо список
+    # Зазвичай, якщо ВЧ не існує, повертається порожній список, що є нормальним.
+    return unit_payload_response(request, 'oids_for_unit', [int(unit_id_str)], _build_oids_for_unit)
 
 def ajax_load_document_types_for_oid_and_work(request):
     oid_id_str = request.GET.get('oid_id')
@@ -300,17 +326,16 @@ def ajax_load_attestation_acts_for_oid(request):
     if oid_id_str and oid_id_str.isdigit():
         oid_id = int(oid_id_str)
         try:
-            # Знаходимо тип документа "Акт атестації"
-            # Краще мати більш надійний спосіб ідентифікації типу, наприклад, по slug або константі
-            attestation_act_doc_type = DocumentType.objects.filter(name__icontains="Акт атестації").first()
+            # Знаходимо типи документа "Акт атестації" через реєстр ролей
+            attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
             
             
-            if attestation_act_doc_type:
+            if attestation_act_type_ids:
                 # Обираємо документи типу "Акт атестації" для даного ОІД,
                 # які ще не були відправлені на реєстрацію
                 acts_queryset = Document.objects.filter(
                     oid_id=oid_id,
-                    document_type=attestation_act_doc_type,
+                    document_type_id__in=attestation_act_type_ids,
                     attestation_registration_sent__isnull=True # Ключовий фільтр
                 ).select_related('oid__unit').order_by('-work_date', '-doc_process_date')
                 
@@ -341,14 +366,13 @@ def ajax_load_attestation_acts_for_multiple_oids(request):
 
     if oid_ids:
         try:
-            # Ваш спосіб ідентифікації типу документа "Акт атестації"
-            attestation_act_doc_type = DocumentType.objects.filter(name__icontains="Акт атестації").first() 
-            # Переконайтеся, що цей фільтр надійний, або використовуйте ID/slug типу документа
+            # Типи документа "Акт атестації" з реєстру ролей
+            attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
 
-            if attestation_act_doc_type:
+            if attestation_act_type_ids:
                 acts_queryset = Document.objects.filter(
                     oid_id__in=oid_ids, # Акти, що належать до будь-якого з обраних ОІДів
-                    document_type=attestation_act_doc_type,
+                    document_type_id__in=attestation_act_type_ids,
                     attestation_registration_sent__isnull=True # Ще не відправлені
                 ).select_related('oid__unit').order_by('oid__unit__code', 'oid__cipher', '-work_date')
                 
@@ -450,10 +474,9 @@ def ajax_load_documents_for_trip_oids(request):
                 if wri.oid_id not in oid_work_types: # Беремо перший знайдений тип роботи для ОІД в рамках відрядження
                     oid_work_types[wri.oid_id] = wri.work_type
 
-            # Визначаємо DocumentType для "Акт атестації" та "Висновок ІК"
-            # Краще мати константи або slug для цих типів
-            attestation_act_type = DocumentType.objects.filter(name__icontains="Акт атестації").first()
-            ik_conclusion_type = DocumentType.objects.filter(duration_months="20").first()
+            # Визначаємо DocumentType для "Акт атестації" та "Висновок ІК" через реєстр ролей
+            attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
+            ik_conclusion_type_ids = get_role_type_ids(DocumentRole.IK_CONCLUSION)
             
             # Інші типи документів, які входять до пакетів (за потреби)
             # attestation_act_type = DocumentType.objects.filter(name__icontains="Акт атестації").first()
@@ -473,7 +496,7 @@ def ajax_load_documents_for_trip_oids(request):
                     # Для ІК додаємо всі документи, що традиційно входять до пакету
                     # Або, якщо простіше, тільки Висновок ІК (або всі до нього)
                     # Наприклад, якщо doc.document_type є одним з документів пакету ІК
-                    if doc.document_type == ik_conclusion_type: # Або більш розширена логіка
+                    if doc.document_type_id in ik_conclusion_type_ids: # Або більш розширена логіка
                         add_document = True
                     # Тут можна додати інші типи документів для ІК: План пошуку, Акт пошуку, Протоколи...
                     # if doc.document_type in [plan_search_type, act_search_type, protocol_ik_type, ik_conclusion_type]:
@@ -481,7 +504,7 @@ def ajax_load_documents_for_trip_oids(request):
 
                 elif work_type_for_this_oid == WorkTypeChoices.ATTESTATION:
                     # Для Атестації додаємо пакет документів, якщо Акт Атестації зареєстрований
-                    if doc.document_type == attestation_act_type and \
+                    if doc.document_type_id in attestation_act_type_ids and \
                        doc.dsszzi_registered_number and doc.dsszzi_registered_date:
                         add_document = True # Додаємо сам зареєстрований акт
                         # Тут можна додати логіку для додавання інших документів з пакету атестації,
@@ -851,10 +874,33 @@ def main_dashboard(request):
             selected_unit_id = int(selected_unit_id_str)
             selected_unit_object = Unit.objects.get(pk=selected_unit_id)
             
+            # Дати закінчення дії - зі знімка OIDValiditySnapshot (один JOIN)
             oids_for_selected_unit = OID.objects.filter(unit_id=selected_unit_id)\
-                                              .select_related('unit')\
+                                              .select_related('unit', 'validity')\
                                               .order_by('cipher')
 
+            OID_to_show_main_dashboard_creating = [
+                OIDStatusChoices.NEW,
+                OIDStatusChoices.RECEIVED_TZ,
+                OIDStatusChoices.RECEIVED_TZ_REPEAT,
+                OIDStatusChoices.RECEIVED_TZ_APPROVE,
+                OIDStatusChoices.RECEIVED_REQUEST,
+                OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION,
+                OIDStatusChoices.ATTESTED,
+                OIDStatusChoices.AZR_SEND , 
+                OIDStatusChoices.RECEIVED_DECLARATION
+                ]
+            OID_to_show_main_dashboard_active = [
+                OIDStatusChoices.ACTIVE,
+                OIDStatusChoices.RECEIVED_REQUEST_IK,
+                OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,
+            ]
+            OID_to_show_main_dashboard_cancel = [
+                OIDStatusChoices.CANCELED,
+                OIDStatusChoices.TERMINATED,
+                OIDStatusChoices.INACTIVE
+            ]
+
             for oid_instance in oids_for_selected_unit:
                 oid_item_data = {
                     'id': oid_instance.id,
@@ -864,33 +910,13 @@ def main_dashboard(request):
                     'status_display': oid_instance.get_status_display(),
                     'detail_url': reverse('oids:oid_detail_view_name', args=[oid_instance.id])
                 }
-                OID_to_show_main_dashboard_creating = [
-                    OIDStatusChoices.NEW,
-                    OIDStatusChoices.RECEIVED_TZ,
-                    OIDStatusChoices.RECEIVED_TZ_REPEAT,
-                    OIDStatusChoices.RECEIVED_TZ_APPROVE,
-                    OIDStatusChoices.RECEIVED_REQUEST,
-                    OIDStatusChoices.RECEIVED_REQUEST_ATTESTATION,
-                    OIDStatusChoices.ATTESTED,
-                    OIDStatusChoices.AZR_SEND , 
-                    OIDStatusChoices.RECEIVED_DECLARATION
-                    ]
-                OID_to_show_main_dashboard_active = [
-                    OIDStatusChoices.ACTIVE,
-                    OIDStatusChoices.RECEIVED_REQUEST_IK,
-                    OIDStatusChoices.RECEIVED_REQUEST_PLAND_ATTESTATION,
-				]
-                OID_to_show_main_dashboard_cancel = [
-                    OIDStatusChoices.CANCELED,
-                    OIDStatusChoices.TERMINATED,
-                    OIDStatusChoices.INACTIVE
-				]
                 if oid_instance.status in OID_to_show_main_dashboard_creating:
                     oids_creating_list.append(oid_item_data)
                 elif oid_instance.status in OID_to_show_main_dashboard_active:
-                    oid_item_data['ik_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Висновок')
-                    oid_item_data['attestation_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Акт атестації')
-                    oid_item_data['prescription_expiration_date'] = get_last_document_expiration_date(oid_instance, 'Припис')
+                    validity = getattr(oid_instance, 'validity', None)
+                    oid_item_data['ik_expiration_date'] = validity.ik_expiration_date if validity else None
+                    oid_item_data['attestation_expiration_date'] = validity.attestation_expiration_date if validity else None
+                    oid_item_data['prescription_expiration_date'] = validity.prescription_expiration_date if validity else None
                     oids_active_list.append(oid_item_data)
                 elif oid_instance.status in OID_to_show_main_dashboard_cancel:
                     oids_cancelled_list.append(oid_item_data)
@@ -913,6 +939,7 @@ def main_dashboard(request):
     return render(request, 'oids/main_dashboard.html', context)
 
 @login_required 
+@retry_on_busy
 @transaction.atomic
 def send_trip_results_view(request):
     if request.method == 'POST':
@@ -980,7 +1007,7 @@ def oid_detail_view(request, oid_id):
     ).order_by('-doc_process_date', '-work_date')
 
     # Отримуємо тільки документи типу "Акт атестації" для цього ОІД для секції реєстрації
-    attestation_acts_for_oid = documents.filter(document_type__name__icontains="Акт атестації")
+    attestation_acts_for_oid = documents.filter(document_type_id__in=get_role_type_ids(DocumentRole.ATTESTATION_ACT))
 
     trips_for_oid = oid.trips.prefetch_related(
         'units',
@@ -998,9 +1025,10 @@ def oid_detail_view(request, oid_id):
     # Натомість, ми будемо використовувати attestation_acts_for_oid та їх зв'язок з AttestationRegistration
 
 
-    last_attestation_expiration = get_last_document_expiration_date(oid, 'Акт атестації')
-    last_ik_expiration = get_last_document_expiration_date(oid, 'Висновок')
-    last_prescription_expiration = get_last_document_expiration_date(oid, 'Припис')
+    expirations = get_last_expiration_dates_for_oids([oid.id])[oid.id]
+    last_attestation_expiration = expirations['attestation']
+    last_ik_expiration = expirations['ik']
+    last_prescription_expiration = expirations['prescription']
 
     context = {
         'oid': oid,
@@ -1047,6 +1075,7 @@ def oid_create_view(request):
 
 
 @login_required 
+@retry_on_busy
 @transaction.atomic
 def add_work_request_view(request):
     """
@@ -1234,12 +1263,18 @@ def get_work_request_stats(work_request):
     Повертає детальну статистику про заявку
     Можна використовувати для додаткових звітів
     """
-    items = work_request.items.all()
+    items = work_request.items.select_related('oid__unit')
+    status_counts = WorkRequest.objects.filter(pk=work_request.pk).status_histogram()
     
     stats = {
-        'total_items': items.count(),
+        'total_items': status_counts['total'],
         'by_work_type': {},
-        'by_status': {},
+        # Статистика по статусу - з гістограми одним запитом, лише ненульові
+        'by_status': {
+            WorkRequestStatusChoices(status).label: status_counts[key]
+            for key, status in WORK_REQUEST_ITEM_STATUS_KEYS.items()
+            if status_counts[key]
+        },
         'oids_list': []
     }
     
@@ -1250,11 +1285,7 @@ def get_work_request_stats(work_request):
             stats['by_work_type'][work_type] = 0
         stats['by_work_type'][work_type] += 1
         
-        # Статистика по статусу
         status = item.get_status_display()
-        if status not in stats['by_status']:
-            stats['by_status'][status] = 0
-        stats['by_status'][status] += 1
         
         # Список ОІДів
         stats['oids_list'].append({
@@ -1317,6 +1348,7 @@ def work_request_detail_view(request, pk):
     }
     return render(request, 'oids/lists/work_request_detail.html', context)
 
+@retry_on_busy
 @transaction.atomic
 def plan_trip_view(request):
     if request.method == 'POST':
@@ -1327,45 +1359,9 @@ def plan_trip_view(request):
             trip.save() # Перше збереження для отримання trip.id
             form.save_m2m() # Зберігаємо ManyToMany зв'язки (units, oids, work_requests)
 
-            # --- Логіка встановлення дедлайнів ПІСЛЯ збереження M2M ---
-            if trip.end_date:
-                print(f"PLAN_TRIP_VIEW: Trip ID {trip.pk} saved with end_date: {trip.end_date}. Calculating deadlines.")
-                
-                linked_work_requests = trip.work_requests.all()
-                linked_oids_direct = trip.oids.all()
-                
-                print(f"PLAN_TRIP_VIEW: Trip linked to WorkRequest IDs: {[wr.id for wr in linked_work_requests]}")
-                print(f"PLAN_TRIP_VIEW: Trip directly linked to OID IDs: {[o.id for o in linked_oids_direct]}")
-
-                if linked_work_requests.exists():
-                    items_to_process = WorkRequestItem.objects.filter(
-                        request__in=linked_work_requests,
-                        oid__in=linked_oids_direct 
-                        # Можна додати: doc_processing_deadline__isnull=True
-                    ).select_related('oid', 'request__unit')
-
-                    print(f"PLAN_TRIP_VIEW: Found {items_to_process.count()} WRI to update for trip {trip.id}")
-                    
-                    start_counting_from_date = trip.end_date
-
-                    for item in items_to_process:
-                        days_for_processing = 0
-                        if item.work_type == WorkTypeChoices.IK: days_for_processing = 10 # налаштувати кількість днів для розрахунку часу на опрацювання   
-                        elif item.work_type == WorkTypeChoices.ATTESTATION: days_for_processing = 15 # налаштувати кількість днів для розрахунку часу на опрацювання 
-                        elif item.work_type == WorkTypeChoices.PLAND_ATTESTATION: days_for_processing = 15 # налаштувати кількість днів для розрахунку часу на опрацювання 
-                        
-                        if days_for_processing > 0:
-                           new_deadline = add_working_days(start_counting_from_date, days_for_processing)
-                           if item.doc_processing_deadline != new_deadline or item.deadline_trigger_trip != trip: # Додано перевірку trip
-                               item.doc_processing_deadline = new_deadline
-                               item.deadline_trigger_trip = trip # <--- Встановлюємо зв'язок
-                               item.save(update_fields=['doc_processing_deadline', 'deadline_trigger_trip', 'updated_at'])
-                               print(f"PLAN_TRIP_VIEW: WRI ID {item.id} (OID: {item.oid.cipher}) deadline -> {item.doc_processing_deadline}")
-                else:
-                    print(f"PLAN_TRIP_VIEW: No WorkRequests linked to Trip ID {trip.pk} to calculate item deadlines.")
-            else:
-                print(f"PLAN_TRIP_VIEW: Trip ID {trip.pk} has no end_date. Deadline calculation skipped.")
-            # --- Кінець логіки дедлайнів ---
+            # Дедлайни опрацювання документів для елементів заявок розраховуються сигналами
+            # Trip (post_save + M2M) один раз після коміту - services.recalculate_trip_deadlines
+            linked_work_requests = trip.work_requests.all()
 
 
             messages.success(request, f'Відрядження заплановано успішно (ID: {trip.id}).')
@@ -1447,7 +1443,7 @@ def add_document_processing_view(request, oid_id=None, work_request_item_id=None
             work_date_from_main = main_form.cleaned_data['work_date']
             author_instance = main_form.cleaned_data.get('author')
 
-            saved_docs_count = 0
+            documents_to_create = []
             for item_form in formset:
                 if item_form.is_valid() and item_form.has_changed(): # Обробляємо тільки валідні та змінені форми
                     document_instance = item_form.save(commit=False)
@@ -1456,10 +1452,11 @@ def add_document_processing_view(request, oid_id=None, work_request_item_id=None
                     document_instance.doc_process_date = doc_process_date_from_main
                     document_instance.work_date = work_date_from_main
                     document_instance.author = author_instance
-                    
-                    # Логіка обчислення expiration_date вже є в моделі Document.save()
-                    document_instance.save() # Це викличе Document.save() з усіма обчисленнями
-                    saved_docs_count += 1
+                    documents_to_create.append(document_instance)
+
+            # Один bulk_create + історія; expiration_date, статуси елемента заявки / заявки
+            # та знімок ОІД - один раз на пакет (services.ingest_documents)
+            saved_docs_count = len(ingest_documents(documents_to_create))
             
             if saved_docs_count > 0:
                 messages.success(request, f'{saved_docs_count} документ(ів) успішно додано до ОІД "{oid_instance.cipher}".')
@@ -1531,7 +1528,7 @@ def bulk_add_documents_view(request):
             work_date = main_form.cleaned_data['work_date']
             author = main_form.cleaned_data.get('author')
 
-            saved_docs_count = 0
+            documents_to_create = []
             for item_form in formset:
                 if item_form.is_valid() and item_form.has_changed():
                     doc = item_form.save(commit=False)
@@ -1540,8 +1537,10 @@ def bulk_add_documents_view(request):
                     doc.doc_process_date = doc_process_date
                     doc.work_date = work_date
                     doc.author = author
-                    doc.save() # Тут спрацює ваша логіка expiration_date
-                    saved_docs_count += 1
+                    documents_to_create.append(doc)
+
+            # Пакетне внесення: expiration_date в пам'яті, bulk_create + історія, статуси один раз на коміт
+            saved_docs_count = len(ingest_documents(documents_to_create))
             
             if saved_docs_count > 0:
                 messages.success(request, f'Успішно додано {saved_docs_count} документів до {oid_instance.cipher}')
@@ -1581,22 +1580,14 @@ def update_oid_status_view(request, oid_id_from_url=None):
             doc_number = form.cleaned_data.get('initiating_document_number')
             doc_date = form.cleaned_data.get('initiating_document_date')
 
-            old_status_val = oid_to_update.status 
-            
-            # Створюємо запис в історії
-            OIDStatusChange.objects.create(
+            # Статус ОІД та запис в історії - через машину статусів (oids/oid_status.py)
+            apply_oid_transitions([Transition(
                 oid=oid_to_update,
-                old_status=old_status_val, # Зберігаємо старий статус
-                new_status=new_status,
-                reason=reason_for_change,
-                changed_by=changed_by_person, # TODO: Замінити на request.user, коли буде автентифікація
-                # Якщо потрібно пов'язати з документом, тут потрібна логіка пошуку/створення Document
-                # initiating_document= ... 
-            )
-            
-            # Оновлюємо статус самого ОІД
-            oid_to_update.status = new_status
-            oid_to_update.save(update_fields=['status', 'updated_at']) # Оновлюємо тільки потрібні поля
+                event='manual',
+                target=new_status,
+                context={'reason': reason_for_change or ''},
+                changed_by_id=changed_by_person.pk if changed_by_person else None, # TODO: Замінити на request.user, коли буде автентифікація
+            )])
 
             messages.success(request, f"Статус для ОІД '{oid_to_update.cipher}' успішно змінено на '{oid_to_update.get_status_display()}'.")
             return redirect('oids:oid_detail_view_name', oid_id=oid_to_update.id)
@@ -1627,6 +1618,7 @@ def update_oid_status_view(request, oid_id_from_url=None):
     return render(request, 'oids/forms/update_oid_status_form.html', context)
 
 @login_required 
+@retry_on_busy
 @transaction.atomic
 def send_attestation_for_registration_view(request):
     """
@@ -1839,9 +1831,8 @@ def send_azr_for_registration_view(request):
                 )
 
                 # Перевіряємо наявність типу документу
-                try:
-                    azr_doc_type = DocumentType.objects.get(name__icontains="Акт завершення")
-                except DocumentType.DoesNotExist:
+                azr_doc_type = get_role_type(DocumentRole.AZR_ACT)
+                if azr_doc_type is None:
                     messages.error(
                         request, 
                         "❌ Критична помилка: Тип документу 'Акт завершення робіт' не знайдено в системі."
@@ -2008,6 +1999,7 @@ def record_azr_response_view(request, registration_id):
 
 
 @login_required
+@retry_on_busy
 @transaction.atomic
 def send_declaration_for_registration_view(request):
     """
@@ -2155,7 +2147,7 @@ def send_declaration_for_registration_view(request):
     context = {
         'submission_form': submission_form,
         'item_formset': item_formset,
-        'all_units': Unit.objects.all().order_by('code'),
+        'all_units': get_reference('units').objects,
         'page_title': 'Відправка Декларацій відповідності на реєстрацію'
     }
     return render(request, 'oids/forms/send_declaration_for_registration.html', context)
@@ -2468,11 +2460,12 @@ def document_list_view(request):
 
         search_query = form.cleaned_data.get('search_query')
         if search_query:
-            documents_list = documents_list.filter(
+            # Пошук через повнотекстовий індекс; короткий запит - icontains
+            documents_list = search_index.filter_queryset(documents_list, search_index.DOCUMENT, search_query, (
                 Q(document_number__icontains=search_query) |
                 Q(oid__cipher__icontains=search_query) |
                 Q(note__icontains=search_query)
-            ).distinct()
+            )).distinct()
             
 	# --- ОНОВЛЕНА ЛОГІКА СОРТУВАННЯ ---
     sort_by = request.GET.get('sort_by', 'doc_process_date') # Ключ для сортування
@@ -2513,19 +2506,21 @@ def document_list_view(request):
             'author__full_name': 'Автор',
             'note': 'Примітки',
         }
-        return export_to_excel(
-            documents_list, 
-            columns, 
-            filename='documents_export.xlsx', 
-            include_row_numbers=True
+        # Великий список - формуємо у фоні, повторний такий самий експорт віддається з кешу
+        return export_in_background(
+            request,
+            'document_list',
+            partial(write_excel_export, queryset=documents_list, columns=columns, include_row_numbers=True),
+            filename='documents_export.xlsx',
+            models=[Document, OID, Unit, DocumentType, Person],
         )
 
     # --- Пагінація ---
-    page_obj = get_paginated_page(documents_list, request)
+    page_obj = get_paginated_page(documents_list, request, keyset=True, count=COUNT_CACHED)
 
 	# Готуємо параметри для URL-адрес сортування
     query_params = request.GET.copy()
-    for key in ['sort_by', 'sort_order', 'page']:
+    for key in ['sort_by', 'sort_order', 'page', CURSOR_PARAM]:
         if key in query_params:
             del query_params[key]
 
@@ -2560,11 +2555,11 @@ def unit_list_view(request):
     
     search_query = request.GET.get('search_query')
     if search_query:
-        units_list_qs = units_list_qs.filter(
+        units_list_qs = search_index.filter_queryset(units_list_qs, search_index.UNIT, search_query, (
             Q(code__icontains=search_query) | 
             Q(name__icontains=search_query) | 
             Q(city__icontains=search_query)
-        )
+        ))
 
     # --- Сортування ---
     sort_by = request.GET.get('sort_by', 'territorial_management__name')
@@ -2587,7 +2582,7 @@ def unit_list_view(request):
     units_list_qs = units_list_qs.order_by(order_by_field, 'code' if order_by_field != 'code' else 'name')
     page_obj = get_paginated_page(units_list_qs, request)
 
-    territorial_managements_for_filter = TerritorialManagement.objects.all().order_by('name')
+    territorial_managements_for_filter = get_reference('territorial_managements').objects
 
     context = {
         'page_title': 'Список військових частин',
@@ -2655,7 +2650,8 @@ def document_type_list_view(request):
 def oid_list_view(request):
     oid_list_queryset = OID.objects.select_related(
         'unit',  # Завантажуємо пов'язану військову частину
-        'unit__territorial_management' # А також ТУ для ВЧ, якщо потрібно (наприклад, для відображення)
+        'unit__territorial_management', # А також ТУ для ВЧ, якщо потрібно (наприклад, для відображення)
+        'validity' # Знімок дат закінчення дії документів
     )
 	
     # --- Фільтрація ---
@@ -2676,12 +2672,12 @@ def oid_list_view(request):
         
         search_query = form.cleaned_data.get('search_query')
         if search_query:
-            oid_list_queryset = oid_list_queryset.filter(
+            oid_list_queryset = search_index.filter_queryset(oid_list_queryset, search_index.OID, search_query, (
                 Q(cipher__icontains=search_query) |
                 Q(full_name__icontains=search_query) |
                 Q(room__icontains=search_query) |
                 Q(note__icontains=search_query)
-            )
+            ))
 
     # --- Сортування ---
     # За замовчуванням сортуємо за датою створення (новіші спочатку), якщо поле created_at існує
@@ -2713,7 +2709,8 @@ def oid_list_view(request):
             'room': 'room',
             'status': 'status',
             'sec_level': 'sec_level',
-            'created_at': 'created_at'
+            'created_at': 'created_at',
+            'next_expiration': 'validity__next_expiration_date',
         }
         
         # Якщо поле не знайдено, сортуємо за created_at як fallback
@@ -2750,13 +2747,18 @@ def oid_list_view(request):
             'room': 'Приміщення №',
             'get_status_display': 'Статус',
             'get_sec_level_display': 'Гриф',
+            'validity__attestation_expiration_date': 'Атестація діє до',
+            'validity__ik_expiration_date': 'ІК діє до',
+            'validity__prescription_expiration_date': 'Припис діє до',
             'unit__note': 'Примітка',
         }
-        return export_to_excel(
-            oid_list_queryset, 
-            columns, 
-            filename='OID_list_export.xlsx', 
-            include_row_numbers=True # Вмикаємо нумерацію
+        # Великий список - формуємо у фоні, повторний такий самий експорт віддається з кешу
+        return export_in_background(
+            request,
+            'oid_list',
+            partial(write_excel_export, queryset=oid_list_queryset, columns=columns, include_row_numbers=True), # Вмикаємо нумерацію
+            filename='OID_list_export.xlsx',
+            models=[OID, Unit, OIDValiditySnapshot],
         )
     
     # --- Пагінація ---
@@ -2781,6 +2783,9 @@ def work_request_list_view(request):
     ).prefetch_related(
         Prefetch('items', queryset=WorkRequestItem.objects.select_related('oid')) 
     )
+    # Лічильники статусів елементів (items_total, items_completed, ...) - в тому ж запиті, що й сторінка.
+    # Анотація до фільтрів: пошук по items__oid__cipher тоді додає окремий JOIN і не обмежує лічильники
+    work_request_list_queryset = work_request_list_queryset.with_status_histogram()
 
     # --- ЛОГІКА ФІЛЬТРАЦІЇ ---
     form = WorkRequestFilterForm(request.GET or None)
@@ -2796,12 +2801,13 @@ def work_request_list_view(request):
 
         search_query = form.cleaned_data.get('search_query')
         if search_query:
-            work_request_list_queryset = work_request_list_queryset.filter(
+            work_request_list_queryset = search_index.filter_queryset(
+                work_request_list_queryset, search_index.WORK_REQUEST, search_query, (
                 Q(incoming_number__icontains=search_query) |
                 Q(unit__code__icontains=search_query) |
                 Q(unit__name__icontains=search_query) |
                 Q(items__oid__cipher__icontains=search_query)
-            ).distinct()
+            )).distinct()
             
     # --- Сортування ---
     sort_by_param = request.GET.get('sort_by', '-incoming_date') # За замовчуванням - новіші заявки
@@ -2957,8 +2963,8 @@ def trip_list_view(request):
     page_obj = get_paginated_page(trip_list_queryset, request)
         
     # Дані для фільтрів
-    units_for_filter = Unit.objects.all().order_by('code')
-    persons_for_filter = Person.objects.filter(is_active=True).order_by('full_name')
+    units_for_filter = get_reference('units').objects
+    persons_for_filter = get_reference('active_persons').objects
         
     context = {
         'page_title': 'Список Відряджень',
@@ -3363,10 +3369,10 @@ def oid_status_change_list_view(request):
     status_change_list_queryset = status_change_list_queryset.order_by(final_order_by_field, secondary_sort).distinct()
 
     # --- Пагінація ---
-    page_obj = get_paginated_page(status_change_list_queryset, request)
+    page_obj = get_paginated_page(status_change_list_queryset, request, keyset=True, count=COUNT_CACHED)
         
     # Дані для фільтрів
-    units_for_filter = Unit.objects.all().order_by('code')
+    units_for_filter = get_reference('units').objects
     oids_for_filter = OID.objects.select_related('unit').all().order_by('unit__code', 'cipher')
     # Припускаємо, що old_status та new_status використовують ті ж choices, що й статус ОІД
     status_choices_for_filter = OIDStatusChoices.choices 
@@ -3434,7 +3440,13 @@ def attestation_registration_list_view(request):
     
     # Експорт в Excel
     if request.GET.get('export') == 'excel':
-        return export_attestation_registrations_to_excel(queryset)
+        return export_in_background(
+            request,
+            'attestation_registrations',
+            partial(write_attestation_registrations_excel, queryset=queryset),
+            filename=f"attestation_registrations_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            models=[AttestationRegistration, Unit, Document, OID, DocumentType, Person],
+        )
     
     # Пагінація
     page_obj = get_paginated_page(queryset, request)
@@ -3450,12 +3462,10 @@ def attestation_registration_list_view(request):
 
 
 # Додаткова функція для експорту (якщо потрібна)
-def export_attestation_registrations_to_excel(queryset):
-    """Експорт відправок в Excel"""
+def write_attestation_registrations_excel(output, queryset):
+    """Експорт відправок в Excel (записує .xlsx у файлоподібний об'єкт output)"""
     import openpyxl
     from openpyxl.styles import Font, Alignment, PatternFill
-    from django.http import HttpResponse
-    from datetime import datetime
     
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -3520,15 +3530,7 @@ def export_attestation_registrations_to_excel(queryset):
         adjusted_width = min(max_length + 2, 50)
         ws.column_dimensions[column_letter].width = adjusted_width
     
-    # Відправка файлу
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f"attestation_registrations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    wb.save(output)
 
 # @login_required 
 # def attestation_registration_list_view(request):
@@ -3661,7 +3663,13 @@ def attestation_response_list_view(request):
     
     # Експорт в Excel
     if request.GET.get('export') == 'excel':
-        return export_attestation_responses_to_excel(queryset)
+        return export_in_background(
+            request,
+            'attestation_responses',
+            partial(write_attestation_responses_excel, queryset=queryset),
+            filename=f"attestation_responses_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            models=[AttestationResponse, AttestationRegistration, Document, OID, Person],
+        )
     
     # Пагінація
     page_obj = get_paginated_page(queryset, request)
@@ -3678,12 +3686,10 @@ def attestation_response_list_view(request):
 
 
 # Функція експорту в Excel (бонус)
-def export_attestation_responses_to_excel(queryset):
-    """Експорт відповідей в Excel"""
+def write_attestation_responses_excel(output, queryset):
+    """Експорт відповідей в Excel (записує .xlsx у файлоподібний об'єкт output)"""
     import openpyxl
     from openpyxl.styles import Font, Alignment, PatternFill
-    from django.http import HttpResponse
-    from datetime import datetime
     
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -3762,15 +3768,51 @@ def export_attestation_responses_to_excel(queryset):
         adjusted_width = min(max_length + 2, 50)
         ws.column_dimensions[column_letter].width = adjusted_width
     
-    # Відправка файлу
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f"attestation_responses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    wb.save(output)
+
+
+@login_required
+@require_GET
+def export_job_status_view(request, key):
+    """Статус фонового експорту (опитується сторінкою очікування)."""
+    state = read_job_state(key)
+    if state is None:
+        return JsonResponse({'status': 'not_found'}, status=404)
+    return JsonResponse(job_status_payload(state))
+
+
+@login_required
+@require_GET
+def export_job_download_view(request, key):
+    """Завантаження готового файлу фонового експорту."""
+    state = read_job_state(key)
+    if state is None or state['status'] != STATUS_DONE:
+        messages.error(request, "Файл експорту ще не готовий або вже застарів. Сформуйте експорт повторно.")
+        return redirect('oids:main_dashboard')
+    try:
+        return job_file_response(state)
+    except FileNotFoundError:
+        messages.error(request, "Файл експорту вже видалено. Сформуйте експорт повторно.")
+        return redirect('oids:main_dashboard')
+
+
+GLOBAL_SEARCH_MAX_LIMIT = 50
+
+
+@login_required
+@require_GET
+def global_search_view(request):
+    """
+    Глобальний пошук по ОІД, ВЧ, документах та заявках (повнотекстовий індекс).
+    Параметри: q - запит; kind (можна кілька) - обмеження типів; limit (до 50).
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), GLOBAL_SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = 20
+    hits = search_index.search(query, kinds=request.GET.getlist('kind'), limit=limit)
+    return JsonResponse({'query': query, 'count': len(hits), 'hits': hits})
 
 @login_required
 def attestation_registered_acts_list_view(request):
@@ -3786,9 +3828,10 @@ def attestation_registered_acts_list_view(request):
     #         pass
     # except DocumentType.MultipleObjectsReturned: 
     #     attestation_act_type = DocumentType.objects.filter(duration_months=60).first() # Якщо все ще повертається кілька об'єктів
-        attestation_act_type = DocumentType.objects.get(name__icontains="Акт атестації")
+        # Якщо тип не знайдено, document_type_id__in з порожньою множиною дає порожній queryset
+        attestation_act_type_ids = get_role_type_ids(DocumentRole.ATTESTATION_ACT)
         base_queryset = Document.objects.filter(
-            document_type=attestation_act_type,
+            document_type_id__in=attestation_act_type_ids,
             dsszzi_registered_number__isnull=False
         ).exclude(dsszzi_registered_number__exact='').select_related(
             'oid__unit', 
@@ -3882,6 +3925,7 @@ def attestation_registered_acts_list_view(request):
     return render(request, 'oids/lists/attestation_registered_num_list.html', context)
 
 @login_required 
+@retry_on_busy
 @transaction.atomic
 def record_attestation_response_view(request, att_reg_sent_id=None): # Може приймати ID з URL
     attestation_registration_instance = None
@@ -3951,8 +3995,10 @@ def record_attestation_response_view(request, att_reg_sent_id=None): # Може
                     
                     attestation_response.save() 
 
-                    # Зберігаємо зміни в документах (реєстраційні номери та дати ДССЗЗІ)
-                    act_update_formset.save() 
+                    # Зберігаємо зміни в документах (реєстраційні номери та дати ДССЗЗІ).
+                    # Статуси ОІД усіх актів та їх історія - одним пакетом
+                    with deferred_transitions(), buffered_history():
+                        act_update_formset.save() 
 
                     # Оновлюємо статус оригінальної відправки AttestationRegistration
                     # Ця логіка тепер у AttestationResponse.save()
@@ -4029,48 +4075,23 @@ def processing_control_view(request):
     today_date = datetime.date.today().strftime("%Y-%m-%d")
 # --- ОНОВЛЕНА ЛОГІКА ---
 
-    # 1. Створюємо підзапити, щоб "дістати" дати ОСТАННЬОГО відрядження,
-    #    пов'язаного з батьківською заявкою кожного елемента.
-    latest_trip_start_date = Subquery(
-        Trip.objects.filter(
-            work_requests=OuterRef('request')
-        ).order_by('-end_date').values('start_date')[:1]
-    )
-    latest_trip_end_date = Subquery(
-        Trip.objects.filter(
-            work_requests=OuterRef('request')
-        ).order_by('-end_date').values('end_date')[:1]
-    )
-
-    attestation_act_type = DocumentType.objects.filter(name__icontains="Акт атестації").first()
-    ik_conclusion_type = DocumentType.objects.filter(duration_months=20).first()
-
-    attestation_date_subquery = Document.objects.filter(
-        work_request_item=OuterRef('pk'),
-        document_type=attestation_act_type,
-        dsszzi_registered_number__isnull=False,
-        dsszzi_registered_date__isnull=False
-    ).order_by('-doc_process_date').values('doc_process_date')[:1]
-
-    ik_date_subquery = Document.objects.filter(
-        work_request_item=OuterRef('pk'),
-        document_type=ik_conclusion_type
-    ).order_by('-doc_process_date').values('doc_process_date')[:1]
-
-    # 2. Змінюємо головний фільтр: тепер ми шукаємо всі елементи, у яких
-    #    батьківська заявка має хоча б одне відрядження.
+    # 1. Дати останнього відрядження заявки та дати акту атестації / висновку ІК
+    #    беремо з read model (WorkRequestTripSnapshot, WorkRequestItemProcessingSnapshot),
+    #    які підтримуються сигналами Trip і Document через status_sync.
+    # 2. Знімок відрядження є лише у заявок з відрядженнями - INNER JOIN замість
+    #    request__trips + .distinct(); знімок дат елемента - LEFT JOIN.
     wri_queryset = WorkRequestItem.objects.filter(
-        request__trips__isnull=False
+        request__trip_snapshot__isnull=False
     ).select_related(
         'request__unit', 'oid__unit'
     ).annotate(
         # 3. Додаємо дати останнього відрядження як нові поля до кожного елемента
-        relevant_trip_start_date=latest_trip_start_date,
-        relevant_trip_end_date=latest_trip_end_date,
+        relevant_trip_start_date=F('request__trip_snapshot__trip_start_date'),
+        relevant_trip_end_date=F('request__trip_snapshot__trip_end_date'),
         # Твої існуючі анотації
-        final_attestation_date=Subquery(attestation_date_subquery),
-        final_ik_date=Subquery(ik_date_subquery)
-    ).distinct()
+        final_attestation_date=F('processing_snapshot__final_attestation_date'),
+        final_ik_date=F('processing_snapshot__final_ik_date')
+    )
     
   
     wri_filter_form = WorkRequestItemProcessingFilterForm(request.GET or None, prefix="wri")
@@ -4079,7 +4100,7 @@ def processing_control_view(request):
             wri_queryset = wri_queryset.filter(
                 Q(request__unit__in=wri_filter_form.cleaned_data['unit']) | 
                 Q(oid__unit__in=wri_filter_form.cleaned_data['unit'])
-            ).distinct()
+            )
         if wri_filter_form.cleaned_data.get('oid'):
             wri_queryset = wri_queryset.filter(oid__in=wri_filter_form.cleaned_data['oid'])
         if wri_filter_form.cleaned_data.get('status'):
@@ -4147,9 +4168,9 @@ def processing_control_view(request):
     else: # За замовчуванням
         wri_queryset = wri_queryset.order_by('doc_processing_deadline', 'request__incoming_date', 'oid__cipher')
         current_wri_sort_order_for_template = 'asc' 
-    page_obj = get_paginated_page(wri_queryset, request)
+    page_obj = get_paginated_page(wri_queryset, request, keyset=True, count=COUNT_ESTIMATE)
 
-    all_units = Unit.objects.all().order_by('code')
+    all_units = get_reference('units').objects
 
     context = {
         'page_title': 'Контроль опрацювання',
@@ -4214,6 +4235,7 @@ def technical_task_control_view(request):
     }
     return render(request, 'oids/technical_task_control.html', context)
 
+@retry_on_busy
 @transaction.atomic
 def start_declaration_process_view(request):
     template_name = "ДСК-Декларація"
@@ -4286,13 +4308,12 @@ def azr_documents_list_view(request):
     Відображає список всіх документів типу "АЗР" з фільтрацією та сортуванням.
     Також обробляє експорт в Excel.
     """
-    try:
-        azr_doc_type = DocumentType.objects.get(name__icontains="Акт завершення")
-    except DocumentType.DoesNotExist:
+    azr_type_ids = get_role_type_ids(DocumentRole.AZR_ACT)
+    if not azr_type_ids:
         messages.error(request, "Тип документу 'Акт завершення' не знайдено.")
         return redirect('oids:main_dashboard')
 
-    queryset = Document.objects.filter(document_type=azr_doc_type).select_related('oid__unit')
+    queryset = Document.objects.filter(document_type_id__in=azr_type_ids).select_related('oid__unit')
     
     # --- Фільтрація (залишається без змін) ---
     filter_form = AzrDocumentFilterForm(request.GET or None)
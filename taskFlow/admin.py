@@ -7,7 +7,7 @@ from django.utils.html import format_html
 from django.db.models import Count, Q
 from django.utils import timezone
 from oids.models import Person, PersonGroup  # Імпорт з oids
-from .models import Project, Status, Task, TaskComment, TaskHistory
+from .models import Project, Status, Task, TaskComment, TaskHistory, archive_cutoff
 
 
 # @admin.register(Person)
@@ -377,9 +377,11 @@ class TaskAdmin(admin.ModelAdmin):
     
     def mark_as_completed(self, request, queryset):
         """Позначити як виконані"""
+        now = timezone.now()
         updated = queryset.filter(is_completed=False).update(
             is_completed=True,
-            completed_at=timezone.now()
+            completed_at=now,
+            archive_at=archive_cutoff(now)
         )
         self.message_user(request, f'Виконано {updated} завдань')
     mark_as_completed.short_description = 'Позначити як виконані'
@@ -388,7 +390,8 @@ class TaskAdmin(admin.ModelAdmin):
         """Позначити як невиконані"""
         updated = queryset.filter(is_completed=True).update(
             is_completed=False,
-            completed_at=None
+            completed_at=None,
+            archive_at=None
         )
         self.message_user(request, f'Повернуто {updated} завдань')
     mark_as_incomplete.short_description = 'Позначити як невиконані'
@@ -7,11 +7,16 @@ python manage.py archive_completed_tasks
 
 Для автоматичного запуску додайте в crontab:
 10 8 * * * cd /path/to/project && python manage.py archive_completed_tasks
+
+Час архівації зберігається в Task.archive_at (встановлюється при виконанні
+завдання), тож команда не перевіряє завдання по одному: лічильники - один
+агрегатний запит, а завдання без archive_at отримують його пакетним UPDATE.
 """
 
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
 from django.utils import timezone
-from taskFlow.models import Task
+from taskFlow.models import Task, archive_cutoff
 
 
 class Command(BaseCommand):
@@ -43,37 +48,47 @@ class Command(BaseCommand):
         else:
             self.stdout.write('')
         
-        # Отримуємо всі виконані завдання
-        completed_tasks = Task.objects.filter(
-            is_completed=True,
-            completed_at__isnull=False
-        ).select_related('project', 'status')
-        
-        self.stdout.write(f'Знайдено виконаних завдань: {completed_tasks.count()}')
-        
-        # Фільтруємо ті, що мають бути заархівовані
-        tasks_to_archive = []
-        tasks_still_visible = []
+        now = timezone.now()
         
-        for task in completed_tasks:
-            if task.should_be_archived():
-                tasks_to_archive.append(task)
-            else:
-                tasks_still_visible.append(task)
+        # Виконані завдання без archive_at (виконані через QuerySet.update, імпорт тощо) -
+        # отримують час архівації одним UPDATE ... CASE на пакет
+        missing = list(
+            Task.objects.filter(is_completed=True, completed_at__isnull=False, archive_at__isnull=True)
+            .only('pk', 'completed_at').order_by()
+        )
+        for task in missing:
+            task.archive_at = archive_cutoff(task.completed_at)
+        if missing and not dry_run:
+            Task.objects.bulk_update(missing, ['archive_at'], batch_size=500)
+        if missing:
+            self.stdout.write(f'Встановлено час архівації: {len(missing)}')
+        
+        # Лічильники - одним агрегатним запитом (у dry-run враховуємо ще не збережені archive_at)
+        counts = Task.objects.filter(is_completed=True).aggregate(
+            completed=Count('pk'),
+            archived=Count('pk', filter=Q(archive_at__lte=now)),
+        )
+        missing_archived = [task for task in missing if task.archive_at <= now]
+        archived_count = counts['archived'] + (len(missing_archived) if dry_run else 0)
         
-        self.stdout.write(f'Мають бути заархівовані: {len(tasks_to_archive)}')
-        self.stdout.write(f'Ще видимі на дошці: {len(tasks_still_visible)}')
+        self.stdout.write(f'Знайдено виконаних завдань: {counts["completed"]}')
+        self.stdout.write(f'Мають бути заархівовані: {archived_count}')
+        self.stdout.write(f'Ще видимі на дошці: {counts["completed"] - archived_count}')
         self.stdout.write('')
         
-        if not tasks_to_archive:
+        if not archived_count:
             self.stdout.write(self.style.SUCCESS('✓ Немає завдань для архівування'))
             return
         
+        tasks_to_archive = Task.objects.archived(now)
+        if dry_run:
+            tasks_to_archive = tasks_to_archive | Task.objects.filter(pk__in=[task.pk for task in missing_archived])
+        
         # Виводимо список завдань
         if verbose or dry_run:
             self.stdout.write('Завдання для архівування:')
-            for task in tasks_to_archive:
-                completed_ago = timezone.now() - task.completed_at
+            for task in tasks_to_archive.only('key', 'title', 'completed_at').order_by('completed_at'):
+                completed_ago = now - task.completed_at
                 hours_ago = int(completed_ago.total_seconds() / 3600)
                 
                 self.stdout.write(
@@ -91,14 +106,13 @@ class Command(BaseCommand):
             )
             return
         
-        # Архівуємо (в нашому випадку просто підтверджуємо що вони приховані)
-        # Фактично нічого не робимо, тому що фільтрація відбувається динамічно
-        # через методи should_be_archived() та is_recently_completed()
+        # Заархівовані завдання приховуються з дошки фільтром archive_at
+        # (Task.objects.visible_on_board), окремого поля "archived" немає
         
         self.stdout.write('')
         self.stdout.write(
             self.style.SUCCESS(
-                f'✓ Завдань заархівовано: {len(tasks_to_archive)}'
+                f'✓ Завдань заархівовано: {archived_count}'
             )
         )
         
@@ -107,15 +121,9 @@ class Command(BaseCommand):
             self.stdout.write('')
             self.stdout.write('Статистика по проєктах:')
             
-            projects = {}
-            for task in tasks_to_archive:
-                project_name = task.project.name
-                if project_name not in projects:
-                    projects[project_name] = 0
-                projects[project_name] += 1
-            
-            for project_name, count in sorted(projects.items()):
-                self.stdout.write(f'  • {project_name}: {count}')
+            projects = tasks_to_archive.order_by().values('project__name').annotate(count=Count('pk'))
+            for row in sorted(projects, key=lambda row: row['project__name']):
+                self.stdout.write(f'  • {row["project__name"]}: {row["count"]}')
         
         self.stdout.write('')
         self.stdout.write('='*60)
@@ -123,35 +131,3 @@ class Command(BaseCommand):
             self.style.SUCCESS('✓ Архівування завершено успішно')
         )
         self.stdout.write('='*60)
-
-
-class Command2(BaseCommand):
-    """
-    Альтернативна версія команди з реальним оновленням поля
-    Якщо хочете додати поле 'archived' в модель Task
-    """
-    help = 'Архівує виконані завдання (з оновленням поля archived)'
-
-    def handle(self, *args, **options):
-        from taskFlow.models import Task
-        
-        # Отримуємо всі виконані завдання
-        tasks = Task.objects.filter(
-            is_completed=True,
-            completed_at__isnull=False,
-            archived=False  # Якщо додасте це поле
-        )
-        
-        archived_count = 0
-        
-        for task in tasks:
-            if task.should_be_archived():
-                task.archived = True
-                task.save(update_fields=['archived'])
-                archived_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Заархівовано {archived_count} завдань'
-            )
-        )
\ No newline at end of file
@@ -1,8 +1,17 @@
 """
 Middleware для автоматичного визначення Person з User
+та опціонального профілювання SQL-запитів
 """
 
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
 from oids.models import Person
+from . import profiling
 
 
 class PersonMiddleware:
@@ -24,4 +33,39 @@ class PersonMiddleware:
             request.person = None
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+
+class QueryProfilerMiddleware:
+    """
+    Опціональне профілювання запитів (QUERY_PROFILER_ENABLED = True у settings):
+    кількість SQL, час у БД, повтори однакових запитів (N+1) та час Python на кожен запит.
+    Результати - у кільцевий буфер taskFlow.profiling, звіт - сторінка taskFlow:profiling_report.
+    Вимкнене профілювання прибирається зі стеку middleware при старті (MiddlewareNotUsed).
+    """
+
+    def __init__(self, get_response):
+        if not profiling.is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'QUERY_PROFILER_SAMPLE_RATE', 1.0)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+
+        profile_record = profile.build_record(request, response)
+        # Сторінку звіту не рахуємо, щоб вона не потрапляла в "найгірші"
+        if profile_record['endpoint'] != 'taskFlow:profiling_report':
+            profiling.record(profile_record)
+        response['Server-Timing'] = (
+            f"db;dur={profile_record['db_ms']};desc=\"{profile_record['query_count']} queries\", "
+            f"app;dur={profile_record['python_ms']}"
+        )
+        return response
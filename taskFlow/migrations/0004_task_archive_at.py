@@ -0,0 +1,39 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:18
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Копія taskFlow.models.ARCHIVE_TIME / archive_cutoff на момент міграції
+ARCHIVE_TIME = datetime.time(8, 10)
+
+
+def backfill_archive_at(apps, schema_editor):
+    """archive_at для вже виконаних завдань: ARCHIVE_TIME наступного дня після completed_at."""
+    Task = apps.get_model('taskFlow', 'Task')
+    tasks = list(Task.objects.filter(is_completed=True, completed_at__isnull=False).only('pk', 'completed_at'))
+    for task in tasks:
+        next_day = timezone.localtime(task.completed_at).date() + datetime.timedelta(days=1)
+        task.archive_at = timezone.make_aware(datetime.datetime.combine(next_day, ARCHIVE_TIME))
+    Task.objects.bulk_update(tasks, ['archive_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskFlow', '0003_alter_project_group_alter_task_department'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='archive_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='З якого моменту виконане завдання не показується на дошці', null=True, verbose_name='Дата архівації'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_completed', 'archive_at'], name='taskFlow_ta_is_comp_e85d57_idx'),
+        ),
+        migrations.RunPython(backfill_archive_at, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,14 @@ Django Task Manager Models
 Система управління проєктами та завданнями
 """
 
+import datetime
+
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from oids.models import PersonGroup, Person
+from oids.field_tracker import FieldTrackerMixin
 
 
 
@@ -168,11 +172,39 @@ class Status(models.Model):
         super().clean()
 
 
-class Task(models.Model):
+# Час архівації виконаних завдань (наступного дня після виконання, за місцевим часом)
+ARCHIVE_TIME = datetime.time(8, 10)
+
+
+def archive_cutoff(completed_at):
+    """Момент, з якого виконане завдання ховається з дошки: ARCHIVE_TIME наступного дня."""
+    if completed_at is None:
+        return None
+    next_day = timezone.localtime(completed_at).date() + datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(next_day, ARCHIVE_TIME))
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def archived(self, now=None):
+        """Виконані завдання, час архівації яких настав."""
+        return self.filter(is_completed=True, archive_at__lte=now or timezone.now())
+
+    def visible_on_board(self, now=None):
+        """Незавершені та щойно виконані (ще не заархівовані) завдання."""
+        return self.filter(
+            Q(is_completed=False) | Q(archive_at__isnull=True) | Q(archive_at__gt=now or timezone.now())
+        )
+
+
+class Task(FieldTrackerMixin, models.Model):
     """
     Модель завдання
     Основна одиниця роботи в системі
     """
+    # Поля, зміни яких пишуться в історію (taskFlow.signals.track_task_changes)
+    tracked_fields = ('status', 'assignee', 'priority', 'due_date', 'department')
+
     PRIORITY_CHOICES = [
         ('low', 'Низький'),
         ('medium', 'Середній'),
@@ -259,6 +291,13 @@ class Task(models.Model):
         blank=True,
         help_text="Коли завдання було виконано"
     )
+    archive_at = models.DateTimeField(
+        "Дата архівації",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="З якого моменту виконане завдання не показується на дошці"
+    )
     created_at = models.DateTimeField(
         "Дата створення",
         auto_now_add=True
@@ -268,6 +307,8 @@ class Task(models.Model):
         auto_now=True
     )
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Завдання"
         verbose_name_plural = "Завдання"
@@ -277,6 +318,7 @@ class Task(models.Model):
             models.Index(fields=['assignee', 'is_completed']),
             models.Index(fields=['due_date']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['is_completed', 'archive_at']),
         ]
 
     def __str__(self):
@@ -311,6 +353,7 @@ class Task(models.Model):
             if self.is_completed:
                 self.is_completed = False
                 self.completed_at = None
+        self.archive_at = archive_cutoff(self.completed_at) if self.is_completed else None
 
         super().save(*args, **kwargs)
 
@@ -339,33 +382,9 @@ class Task(models.Model):
     def should_be_archived(self):
         """
         Перевіряє чи завдання має бути заархівоване
-        Завдання архівується якщо воно виконане та пройшло 8:10 наступного дня
+        Завдання архівується якщо воно виконане та настав archive_at (8:10 наступного дня)
         """
-        if not self.is_completed or not self.completed_at:
-            return False
-        
-        # Отримуємо дату та час виконання
-        completed_datetime = self.completed_at
-        
-        # Обчислюємо наступний день о 8:10
-        archive_time = completed_datetime.replace(
-            hour=8, 
-            minute=10, 
-            second=0, 
-            microsecond=0
-        )
-        
-        # Якщо виконано після 8:10, то архівація буде наступного дня о 8:10
-        if completed_datetime.hour >= 8 and completed_datetime.minute >= 10:
-            archive_time = archive_time + timezone.timedelta(days=1)
-        # Якщо виконано до 8:10, то архівація буде сьогодні о 8:10
-        # але якщо зараз вже після 8:10, то наступного дня
-        else:
-            if timezone.now() >= archive_time:
-                archive_time = archive_time + timezone.timedelta(days=1)
-        
-        # Перевіряємо чи настав час архівації
-        return timezone.now() >= archive_time
+        return self.is_completed and self.archive_at is not None and timezone.now() >= self.archive_at
     
     def is_recently_completed(self):
         """
@@ -0,0 +1,150 @@
+"""
+Профілювання запитів: кільцевий буфер вимірів та звіт "найгірші ендпоінти".
+
+Виміри пише QueryProfilerMiddleware (taskFlow/middleware.py), якщо в settings
+увімкнено QUERY_PROFILER_ENABLED. Буфер живе в пам'яті процесу, тож у кожного
+воркера своя статистика за останні QUERY_PROFILER_BUFFER_SIZE запитів.
+"""
+
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+
+# SQL приходить з плейсхолдерами (%s), тож запити з різними параметрами вже однакові.
+# Додатково згортаємо списки IN (...) різної довжини та літерали, вбудовані в текст.
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_lock = threading.Lock()
+_buffer = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_enabled():
+    return _setting('QUERY_PROFILER_ENABLED', False)
+
+
+def _get_buffer():
+    global _buffer
+    size = _setting('QUERY_PROFILER_BUFFER_SIZE', 500)
+    if _buffer is None or _buffer.maxlen != size:
+        _buffer = deque(_buffer or (), maxlen=size)
+    return _buffer
+
+
+def fingerprint_sql(sql):
+    """Нормалізований текст запиту: однаковий для однакових запитів з різними параметрами."""
+    sql = _IN_LIST_RE.sub('(%s, ...)', sql)
+    sql = _STRING_RE.sub("'?'", sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """Лічильники одного HTTP-запиту; execute_wrapper для всіх з'єднань БД."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.fingerprints = Counter()
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.query_count += 1
+            self.fingerprints[fingerprint_sql(sql)] += 1
+
+    def build_record(self, request, response):
+        total_ms = (time.perf_counter() - self.started) * 1000
+        db_ms = self.db_seconds * 1000
+        threshold = _setting('QUERY_PROFILER_DUPLICATE_THRESHOLD', 3)
+        duplicates = [
+            (sql, count) for sql, count in self.fingerprints.most_common(5) if count >= threshold
+        ]
+        resolver_match = getattr(request, 'resolver_match', None)
+        return {
+            'timestamp': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': resolver_match.view_name if resolver_match else request.path,
+            'status': response.status_code,
+            'query_count': self.query_count,
+            'db_ms': round(db_ms, 2),
+            'python_ms': round(max(total_ms - db_ms, 0), 2),
+            'total_ms': round(total_ms, 2),
+            # N+1: скільки разів повторився найчастіший запит
+            'max_duplicates': duplicates[0][1] if duplicates else 0,
+            'duplicates': duplicates,
+        }
+
+
+def record(profile_record):
+    with _lock:
+        _get_buffer().append(profile_record)
+
+
+def get_records():
+    with _lock:
+        return list(_get_buffer())
+
+
+def clear_records():
+    with _lock:
+        _get_buffer().clear()
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+REPORT_SORT_KEYS = {
+    'total': 'p95_total_ms',
+    'queries': 'max_queries',
+    'db': 'avg_db_ms',
+    'duplicates': 'max_duplicates',
+    'requests': 'requests',
+}
+
+
+def get_endpoint_report(sort='total'):
+    """
+    Агрегує буфер по ендпоінтах (view_name): кількість запитів, середня/максимальна
+    кількість SQL, середній час БД і Python, p95 загального часу, найгірші повтори запитів.
+    """
+    by_endpoint = {}
+    for item in get_records():
+        by_endpoint.setdefault(item['endpoint'], []).append(item)
+
+    report = []
+    for endpoint, items in by_endpoint.items():
+        count = len(items)
+        worst_duplicates = max(items, key=lambda item: item['max_duplicates'])
+        report.append({
+            'endpoint': endpoint,
+            'requests': count,
+            'avg_queries': round(sum(item['query_count'] for item in items) / count, 1),
+            'max_queries': max(item['query_count'] for item in items),
+            'avg_db_ms': round(sum(item['db_ms'] for item in items) / count, 2),
+            'avg_python_ms': round(sum(item['python_ms'] for item in items) / count, 2),
+            'p95_total_ms': _percentile(sorted(item['total_ms'] for item in items), 95),
+            'max_duplicates': worst_duplicates['max_duplicates'],
+            'duplicates': worst_duplicates['duplicates'],
+            'example_path': worst_duplicates['path'],
+        })
+
+    report.sort(key=lambda row: row[REPORT_SORT_KEYS.get(sort, 'p95_total_ms')], reverse=True)
+    return report
@@ -15,15 +15,11 @@ def track_task_changes(sender, instance, **kwargs):
     Відстеження змін завдання перед збереженням
     Створює записи в історії для важливих полів
     """
-    if not instance.pk:
+    if not instance.pk or instance._state.adding:
         # Нове завдання - не відстежуємо
         return
     
-    try:
-        old_instance = Task.objects.get(pk=instance.pk)
-    except Task.DoesNotExist:
-        return
-    
+    # Попередні значення - запам'ятовані при завантаженні (FieldTrackerMixin), без SELECT
     # Поля для відстеження
     fields_to_track = {
         'status': 'Статус',
@@ -36,12 +32,10 @@ def track_task_changes(sender, instance, **kwargs):
     changes = []
     
     for field, field_label in fields_to_track.items():
-        old_value = getattr(old_instance, field)
-        new_value = getattr(instance, field)
-        
-        if old_value != new_value:
+        if instance.has_changed(field):
+            new_value = getattr(instance, field)
             # Форматуємо значення для історії
-            old_display = _format_field_value(field, old_value)
+            old_display = _format_field_value(field, _previous_value(instance, field))
             new_display = _format_field_value(field, new_value)
             
             changes.append({
@@ -158,6 +152,18 @@ def create_default_statuses(sender, instance, created, **kwargs):
             )
 
 
+def _previous_value(instance, field_name):
+    """
+    Попереднє значення поля завдання. Для ForeignKey трекер зберігає лише id -
+    пов'язаний об'єкт читається тільки для поля, що справді змінилося.
+    """
+    value = instance.previous(field_name)
+    field = instance._meta.get_field(field_name)
+    if field.is_relation and value is not None:
+        return field.related_model._base_manager.filter(pk=value).first()
+    return value
+
+
 def _format_field_value(field_name, value):
     """
     Форматування значення поля для читабельного відображення
@@ -0,0 +1,71 @@
+# taskFlow/tests/test_profiling.py
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from .. import profiling
+from oids.models import Unit
+
+
+class QueryProfilerTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.staff = User.objects.create_user(username='staffuser', password='password123', is_staff=True)
+        for i in range(3):
+            Unit.objects.create(code=f"A000{i}", name=f"Частина {i}", city="Київ")
+
+    def setUp(self):
+        profiling.clear_records()
+
+    def test_fingerprint_ignores_parameters(self):
+        """Тест: запити, що відрізняються лише параметрами/довжиною IN, мають однаковий відбиток."""
+        self.assertEqual(
+            profiling.fingerprint_sql('SELECT * FROM t WHERE id IN (%s, %s) AND x = 5'),
+            profiling.fingerprint_sql('SELECT *  FROM t WHERE id IN (%s, %s, %s) AND x = 7'),
+        )
+
+    def test_duplicate_queries_detected(self):
+        """Тест: однаковий запит у циклі (N+1) потрапляє в повтори."""
+        profile = profiling.RequestProfile()
+        with connection.execute_wrapper(profile):
+            for unit in Unit.objects.all():
+                Unit.objects.get(pk=unit.pk)
+        record = profile.build_record(RequestFactory().get('/'), HttpResponse())
+        self.assertEqual(record['query_count'], 4)
+        self.assertEqual(record['max_duplicates'], 3)
+
+    @override_settings(QUERY_PROFILER_ENABLED=True)
+    def test_middleware_records_requests(self):
+        """Тест: увімкнений профайлер записує кожен запит у буфер і додає Server-Timing."""
+        self.client.login(username='testuser', password='password123')
+        response = self.client.get(reverse('oids:list_units'))
+
+        self.assertIn('Server-Timing', response)
+        records = profiling.get_records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['endpoint'], 'oids:list_units')
+        self.assertGreater(records[0]['query_count'], 0)
+
+    def test_middleware_disabled_by_default(self):
+        """Тест: без QUERY_PROFILER_ENABLED нічого не записується."""
+        self.client.login(username='testuser', password='password123')
+        response = self.client.get(reverse('oids:list_units'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiling.get_records(), [])
+
+    @override_settings(QUERY_PROFILER_ENABLED=True)
+    def test_report_staff_only(self):
+        """Тест: звіт доступний лише staff і показує зібрані ендпоінти."""
+        url = reverse('taskFlow:profiling_report')
+        self.client.login(username='testuser', password='password123')
+        self.client.get(reverse('oids:list_units'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='staffuser', password='password123')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'oids:list_units')
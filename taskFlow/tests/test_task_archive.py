@@ -0,0 +1,105 @@
+# taskFlow/tests/test_task_archive.py
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Project, Status, Task, archive_cutoff
+
+
+def local(*args):
+    return timezone.make_aware(datetime.datetime(*args))
+
+
+class TaskArchiveTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='password123')
+        cls.project = Project.objects.create(name="Проєкт", key="PRJ")
+        cls.todo = Status.objects.create(name="До виконання", order=1)
+        cls.done = Status.objects.create(name="Виконано", order=2, is_final=True)
+
+    def create_task(self, title, status, completed_at=None):
+        task = Task.objects.create(project=self.project, title=title, status=status)
+        if completed_at:
+            # Завдання, виконане раніше: час виконання задається явно
+            task.completed_at = completed_at
+            task.save()
+        return task
+
+    def test_archive_cutoff(self):
+        """Тест: архівація о 8:10 наступного дня - незалежно від часу виконання."""
+        self.assertEqual(archive_cutoff(local(2024, 3, 1, 7, 0)), local(2024, 3, 2, 8, 10))
+        self.assertEqual(archive_cutoff(local(2024, 3, 1, 9, 5)), local(2024, 3, 2, 8, 10))
+        self.assertEqual(archive_cutoff(local(2024, 3, 1, 23, 59)), local(2024, 3, 2, 8, 10))
+        self.assertIsNone(archive_cutoff(None))
+
+    def test_save_sets_and_clears_archive_at(self):
+        """Тест: archive_at встановлюється при виконанні та скидається при поверненні в роботу."""
+        task = self.create_task("Завдання", self.todo)
+        self.assertIsNone(task.archive_at)
+        task.status = self.done
+        task.save()
+        self.assertEqual(task.archive_at, archive_cutoff(task.completed_at))
+        self.assertFalse(task.should_be_archived())
+        self.assertTrue(task.is_recently_completed())
+
+        task.status = self.todo
+        task.save()
+        task.refresh_from_db()
+        self.assertIsNone(task.archive_at)
+
+    def test_board_hides_archived_tasks(self):
+        """Тест: дошка фільтрує заархівовані завдання в SQL, одним запитом для всіх колонок."""
+        open_task = self.create_task("Відкрите", self.todo)
+        recent = self.create_task("Щойно виконане", self.done)
+        old = self.create_task("Давно виконане", self.done, completed_at=timezone.now() - datetime.timedelta(days=3))
+
+        self.assertEqual(set(Task.objects.visible_on_board()), {open_task, recent})
+        self.assertEqual(set(Task.objects.archived()), {old})
+
+        self.client.login(username='testuser', password='password123')
+        url = reverse('taskFlow:project_board', args=[self.project.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        columns = {column['status']: column['tasks'] for column in response.context['board_data']}
+        self.assertEqual(columns[self.todo], [open_task])
+        self.assertEqual(columns[self.done], [recent])
+
+        # Кількість запитів не залежить від кількості колонок і завдань
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        review = Status.objects.create(name="Перевірка", order=3)
+        for i in range(3):
+            self.create_task(f"Ще {i}", review)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
+
+    def test_command_fills_missing_archive_at(self):
+        """Тест: команда дозаповнює archive_at пакетно; --dry-run нічого не зберігає."""
+        old = self.create_task("Давно виконане", self.done, completed_at=timezone.now() - datetime.timedelta(days=3))
+        Task.objects.filter(pk=old.pk).update(archive_at=None)
+        self.create_task("Щойно виконане", self.done)
+
+        out = StringIO()
+        call_command('archive_completed_tasks', '--dry-run', stdout=out)
+        self.assertIn('Мають бути заархівовані: 1', out.getvalue())
+        self.assertIn(old.key, out.getvalue())
+        old.refresh_from_db()
+        self.assertIsNone(old.archive_at)
+
+        out = StringIO()
+        with self.assertNumQueries(3):
+            call_command('archive_completed_tasks', stdout=out)
+        self.assertIn('Завдань заархівовано: 1', out.getvalue())
+        old.refresh_from_db()
+        self.assertEqual(old.archive_at, archive_cutoff(old.completed_at))
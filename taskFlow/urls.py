@@ -24,4 +24,7 @@ urlpatterns = [
     # API endpoints (якщо потрібно)
     path('api/tasks/<int:pk>/status/', views.task_update_status, name='task_update_status'),
     path('api/tasks/<int:pk>/assign/', views.task_assign, name='task_assign'),
+
+    # Профілювання запитів (лише staff)
+    path('profiling/', views.profiling_report, name='profiling_report'),
 ]
\ No newline at end of file
@@ -5,6 +5,7 @@ Views для TaskFlow
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.db.models import Q, Count
@@ -13,6 +14,7 @@ from django.utils import timezone
 
 from oids.models import Person, PersonGroup
 from .models import Project, Task, Status, TaskComment
+from . import profiling
 from .signals import (
     set_task_changed_by,
     get_overdue_tasks,
@@ -120,21 +122,20 @@ def project_board(request, pk):
     else:
         statuses = Status.objects.filter(project=None).order_by('order')
     
+    # Показуємо незавершені + щойно завершені (до архівації) - фільтр archive_at в SQL,
+    # одним запитом для всіх колонок
+    tasks_by_status = {}
+    visible = Task.objects.filter(
+        project=project,
+        status__in=statuses
+    ).visible_on_board().select_related('assignee', 'created_by').prefetch_related('comments')
+    for task in visible:
+        tasks_by_status.setdefault(task.status_id, []).append(task)
+    
     # Формуємо дані для кожного статусу
     board_data = []
     for status in statuses:
-        # Отримуємо всі завдання зі статусом
-        all_tasks = Task.objects.filter(
-            project=project,
-            status=status
-        ).select_related('assignee', 'created_by').prefetch_related('comments')
-        
-        # Фільтруємо: показуємо незавершені + щойно завершені (до архівації)
-        visible_tasks = [
-            task for task in all_tasks 
-            if not task.is_completed or task.is_recently_completed()
-        ]
-        
+        visible_tasks = tasks_by_status.get(status.pk, [])
         board_data.append({
             'status': status,
             'tasks': visible_tasks,
@@ -583,4 +584,33 @@ def dashboard(request):
         'current_person': person,
     }
     
-    return render(request, 'taskFlow/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'taskFlow/dashboard.html', context)
+
+# ==================== ПРОФІЛЮВАННЯ ====================
+
+@staff_member_required
+def profiling_report(request):
+    """
+    Найгірші ендпоінти за даними QueryProfilerMiddleware (лише для staff).
+    POST з clear=1 очищає буфер.
+    """
+    if request.method == 'POST' and request.POST.get('clear'):
+        profiling.clear_records()
+        messages.success(request, 'Буфер профілювання очищено')
+        return redirect('taskFlow:profiling_report')
+
+    sort = request.GET.get('sort', 'total')
+    context = {
+        'profiling_enabled': profiling.is_enabled(),
+        'report': profiling.get_endpoint_report(sort=sort),
+        'records_count': len(profiling.get_records()),
+        'sort': sort,
+        'sort_options': {
+            'total': 'p95 загального часу',
+            'queries': 'Кількість SQL',
+            'db': 'Час у БД',
+            'duplicates': 'Повтори запитів (N+1)',
+            'requests': 'Кількість запитів',
+        },
+    }
+    return render(request, 'taskFlow/profiling_report.html', context)